@@ -51,6 +51,12 @@ class Settings(BaseSettings):
     twilio_account_sid: Optional[str] = None
     twilio_auth_token: Optional[str] = None
 
+    # Twilio REST client pool (one keep-alive client per account SID). Blocking SDK
+    # calls made from async code run in a bounded executor of this size.
+    twilio_executor_workers: int = 16
+    twilio_http_timeout_seconds: float = 15.0
+    twilio_http_max_retries: int = 0
+
     # FreJun Configuration
     frejun_api_key: Optional[str] = None
 
@@ -66,8 +72,152 @@ class Settings(BaseSettings):
     enable_post_call_ai: bool = True
     enable_auto_retry: bool = True
 
-    # Campaign scheduler (reduced to 1 second for ultra-fast call progression)
-    campaign_dispatch_interval_seconds: int = 1
+    # Campaign scheduler: full scan of running campaigns. Freed lines, window openings, start
+    # times and retries wake the dispatcher on their own (webhooks and Redis timers), so this
+    # only catches campaigns started without a wake-up.
+    campaign_dispatch_interval_seconds: int = 60
+    # Event-driven dispatch: every worker owns a share of the running campaigns (heartbeats and
+    # per-campaign leases in Redis; a worker silent for the lease time loses its campaigns), keeps
+    # their ready-queues loaded in batches and refills a line as soon as its completion webhook arrives.
+    campaign_dispatch_batch_size: int = 200
+    campaign_dispatch_concurrency: int = 8  # Twilio calls started in parallel
+    campaign_dispatch_lease_seconds: int = 10
+    # Campaigns with working_window.use_lead_timezone: how often the timezones of their queued leads are re-read
+    campaign_cohort_refresh_seconds: int = 300
+    # A line is freed if its call sends no answer/completion webhook within the ring timeout,
+    # or no completion within the max call length once answered
+    campaign_ring_timeout_seconds: int = 90
+    campaign_max_call_seconds: int = 3600
+    # Call completions (status/recording callbacks, assistant hang-ups) are queued in Redis and
+    # applied once per call_sid; one sweeper per interval closes calls that never reported back.
+    call_sweep_interval_seconds: int = 30
+    # Predictive pacing (campaign pacing.mode "predictive", see services/campaign_pacing.py):
+    # answer rate, ring and handle times are averaged over this many minutes, and campaigns
+    # dial one lead per free slot until this many dials have finished in the window.
+    campaign_pacing_window_minutes: int = 15
+    campaign_pacing_min_samples: int = 20
+    campaign_pacing_max_abandon_rate: float = 0.03  # default for pacing.max_abandon_rate
+    # CSV lead uploads run as background import jobs (upload returns a job id; see
+    # services/lead_import.py); numbers are validated on a process pool chunk by chunk.
+    lead_import_work_path: str = os.path.join(os.path.dirname(__file__), "../../uploads/lead_imports")
+    lead_import_processes: int = 2  # per API worker
+    lead_import_chunk_rows: int = 5000  # rows per pool task and per bulk insert
+    lead_import_max_concurrent_jobs: int = 1  # per API worker
+    lead_import_lease_seconds: int = 120
+    lead_import_poll_interval_seconds: float = 2.0
+    lead_import_max_attempts: int = 3
+    # Campaign stats are read from one counters document per campaign, kept up to date with $inc
+    # on every lead transition; a leased pass recounts campaigns whose counters are older than this.
+    campaign_counters_reconcile_seconds: int = 300
+    campaign_counters_reconcile_batch: int = 200  # campaigns recounted per pass
+
+    # Assistant runtime snapshot cache (per worker). Entries are invalidated via
+    # MongoDB change streams, or Redis pub/sub when change streams are unavailable;
+    # the TTL is only a safety net against missed invalidations.
+    assistant_runtime_cache_ttl_seconds: int = 900
+    assistant_runtime_invalidation_channel: str = "convis:assistant-runtime:invalidate"
+
+    # Pre-opened OpenAI Realtime sessions (opened from the Twilio webhooks, adopted by
+    # the media stream). Outbound calls get a longer TTL to cover ringing time.
+    realtime_preopen_enabled: bool = True
+    realtime_preopen_ttl_seconds: float = 30.0
+    realtime_preopen_outbound_ttl_seconds: float = 75.0
+    realtime_preopen_claim_wait_seconds: float = 5.0
+    realtime_preopen_reap_interval_seconds: float = 5.0
+
+    # Worker tiers: "all" (REST + media in one app), "api" (REST only, media
+    # websockets are routed to app.media_main) or "media" (set by app.media_main).
+    worker_role: str = "all"
+    media_worker_max_streams: int = 50  # concurrent call streams per media worker process
+    worker_load_report_interval_seconds: float = 2.0
+    media_capacity_cache_seconds: float = 1.0
+
+    # Knowledge-base vector indexes: one directory per assistant, memory-mapped and
+    # shared by every worker. The budget caps indexes loaded per worker. Every API and
+    # media replica must mount the same directory (the kb-index volume), since any of
+    # them may serve an index another one built.
+    kb_index_path: str = os.path.join(os.path.dirname(__file__), "../../kb_index")
+    # Uploaded documents, kept with the index so whichever API worker claims the job can read them
+    kb_upload_path: str = os.path.join(os.path.dirname(__file__), "../../kb_index/uploads")
+    kb_index_memory_budget_mb: int = 256
+    # Chunk embeddings shared across assistants and uploads, keyed by content hash (kb_embeddings collection)
+    kb_embedding_store_ttl_days: int = 90
+    # Packed storage of those vectors: float32 (exact), float16 or int8 (+ per-vector scale)
+    kb_embedding_store_dtype: str = "float32"
+
+    # Hybrid KB retrieval: vector and BM25 rankings fused by reciprocal rank; the context
+    # injected into a call is capped by an estimated token budget.
+    kb_hybrid_search: bool = True
+    kb_hybrid_candidates: int = 20  # rows taken from each ranking before fusion
+    kb_rrf_k: int = 60
+    kb_context_token_budget: int = 400
+
+    # Query embeddings on the call path: LRU cache size and cross-call micro-batching
+    embedding_cache_size: int = 4096
+    embedding_batch_window_ms: float = 5.0
+    embedding_batch_max_size: int = 64
+
+    # Local (fastembed ONNX) embedding backend for assistants with kb_embedding_backend="local".
+    # The model loads once per worker; set preload on media workers to keep it off the first call.
+    local_embedding_model: str = "BAAI/bge-small-en-v1.5"
+    local_embedding_threads: int = 2  # ONNX intra-op threads per inference
+    local_embedding_executor_workers: int = 2
+    local_embedding_preload: bool = False
+
+    # Background knowledge-base ingestion jobs (upload returns a job id; see services/kb_ingestion.py).
+    # Per-stage checkpoints live under the work path so a crashed job resumes where it stopped.
+    kb_ingest_work_path: str = os.path.join(os.path.dirname(__file__), "../../kb_index/jobs")
+    kb_ingest_max_concurrent_jobs: int = 2  # per API worker
+    kb_ingest_embedding_concurrency: int = 4  # embedding batches in flight per job
+    kb_ingest_embedding_batch_size: int = 100
+    kb_ingest_lease_seconds: int = 120  # a job whose lease expires is resumed by another worker
+    kb_ingest_poll_interval_seconds: float = 2.0
+    kb_ingest_max_attempts: int = 3
+
+    # PDF extraction: pages without a text layer are OCR'd on a process pool; results are
+    # cached by file hash for preview and re-ingest.
+    pdf_ocr_workers: int = 2
+    pdf_ocr_page_timeout_seconds: int = 60
+    pdf_ocr_zoom: float = 2.0
+    pdf_min_page_text_chars: int = 25  # less text than this on an image page means "scanned"
+    pdf_extraction_cache_path: str = os.path.join(os.path.dirname(__file__), "../../uploads/pdf_cache")
+    pdf_extraction_cache_max_entries: int = 500
+
+    # Semantic answer cache: repeated questions ("what are your hours?") replay a cached
+    # answer and its audio instead of a new LLM + TTS round. Scoped per assistant to the
+    # prompt, voice and KB version; see services/answer_cache.py.
+    answer_cache_enabled: bool = True
+    answer_cache_similarity_threshold: float = 0.92  # cosine between the utterance and a cached question
+    answer_cache_ttl_seconds: int = 6 * 3600
+    answer_cache_max_entries: int = 200  # per assistant (least recently hit are dropped)
+    answer_cache_min_words: int = 3  # shorter utterances ("yes", "ok sure") depend on context
+
+    # Customer databases looked up during calls (assistant database_config): one pool per
+    # assistant, bounded by timeouts and a circuit breaker; see services/external_db.py.
+    external_db_pool_size: int = 4  # connections per assistant
+    external_db_max_pools: int = 200  # per worker (least recently used are closed)
+    external_db_executor_workers: int = 16
+    external_db_connect_timeout_seconds: int = 3
+    external_db_statement_timeout_ms: int = 1500  # enforced by the database server
+    external_db_query_timeout_seconds: float = 2.0  # whole lookup as seen by the call
+    external_db_max_rows: int = 10
+    external_db_result_cache_ttl_seconds: int = 60
+    external_db_result_cache_size: int = 1024
+    external_db_breaker_failures: int = 3  # consecutive failures/timeouts that open the breaker
+    external_db_breaker_cooldown_seconds: int = 30
+
+    # Local snapshots of customer tables (database_config.sync_mode="snapshot"), searched in
+    # memory by calls; see utils/db_snapshot.py. Only the api tier refreshes them (app.main);
+    # media workers read the same directory, so it must be shared (the db-snapshots volume).
+    db_snapshot_path: str = os.path.join(os.path.dirname(__file__), "../../db_snapshots")
+    db_snapshot_memory_budget_mb: int = 128  # snapshots loaded per worker
+    db_snapshot_max_rows: int = 200000  # larger tables stay in live mode
+    db_snapshot_full_refresh_hours: int = 24  # incremental refreshes cannot see deletes
+    db_snapshot_statement_timeout_seconds: int = 300
+    db_snapshot_max_concurrent_refreshes: int = 2  # per API worker
+    db_snapshot_lease_seconds: int = 900
+    db_snapshot_poll_interval_seconds: float = 30.0
+    db_snapshot_retry_seconds: int = 120
 
     # Google Calendar
     google_client_id: Optional[str] = None
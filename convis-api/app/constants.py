@@ -6,3 +6,22 @@ DEFAULT_CALL_GREETING = (
     "Hello! Thanks for calling. How can I help you today?"
 )
 
+
+# Human-readable names used when instructing the model to answer in the
+# assistant's configured bot_language.
+LANGUAGE_NAMES = {
+    'hi': 'Hindi',
+    'es': 'Spanish',
+    'fr': 'French',
+    'de': 'German',
+    'pt': 'Portuguese',
+    'it': 'Italian',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'ar': 'Arabic',
+    'ru': 'Russian',
+    'zh': 'Chinese',
+    'nl': 'Dutch',
+    'pl': 'Polish',
+    'tr': 'Turkish'
+}
@@ -24,6 +24,7 @@ from app.routes.phone_numbers import phone_numbers_router, twilio_management_rou
 from app.routes.calendar import router as calendar_router
 from app.routes.campaigns import router as campaigns_router
 from app.routes.twilio_webhooks import router as twilio_webhooks_router
+from app.routes.frejun import router as frejun_router
 from app.routes.campaign_twilio_callbacks import router as campaign_twilio_router
 from app.routes.dashboard import router as dashboard_router
 from app.routes.whatsapp import credentials_router, messages_router, webhooks_router
@@ -32,6 +33,21 @@ from app.routes.voices import router as voices_router
 from app.config.database import Database
 from app.config.settings import settings
 from app.services.campaign_scheduler import campaign_scheduler
+from app.services.call_events import call_events
+from app.services.assistant_runtime_cache import assistant_runtime_cache
+from app.services.twilio_client_pool import twilio_client_pool
+from app.services.http_clients import http_clients
+from app.services.realtime_session_pool import realtime_session_pool
+from app.services.worker_load import WorkerLoadMiddleware, worker_load
+from app.utils.kb_index import kb_index_store
+from app.services.embedding_service import embedding_service
+from app.services.answer_cache import answer_cache
+from app.services.external_db import external_databases
+from app.services.db_snapshot_sync import db_snapshot_sync
+from app.services.kb_ingestion import kb_ingestion
+from app.services.lead_import import lead_importer
+from app.services.campaign_counters import campaign_counters
+from app.utils.pdf_extraction import pdf_extractor
 from app.middleware.rate_limiter import limiter, custom_rate_limit_exceeded_handler
 
 # Configure logging
@@ -92,6 +108,9 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# In-flight request / open websocket counters for load reporting
+app.add_middleware(WorkerLoadMiddleware, load=worker_load)
+
 # Include routers
 app.include_router(registration_router, prefix="/api/register", tags=["Registration"])
 app.include_router(verify_email_router, prefix="/api/register", tags=["Registration"])
@@ -134,6 +153,9 @@ app.include_router(calendar_router, prefix="/api/calendar", tags=["Calendar"])
 app.include_router(twilio_webhooks_router, prefix="/api/twilio-webhooks", tags=["Twilio Webhooks"])
 app.include_router(campaign_twilio_router, tags=["Campaign Webhooks"])
 
+# FreJun flows and media streams
+app.include_router(frejun_router, prefix="/api/frejun", tags=["FreJun"])
+
 # WhatsApp Integration
 app.include_router(credentials_router, prefix="/api/whatsapp", tags=["WhatsApp"])
 app.include_router(messages_router, prefix="/api/whatsapp", tags=["WhatsApp"])
@@ -204,7 +226,17 @@ async def startup_event():
     except Exception as e:
         logging.warning(f"Failed to create database indexes (non-critical): {e}")
 
+    await http_clients.start()
     await campaign_scheduler.start()
+    await call_events.start()
+    await assistant_runtime_cache.start()
+    await realtime_session_pool.start()
+    await embedding_service.start()
+    await kb_ingestion.start()
+    await lead_importer.start()
+    await campaign_counters.start()
+    await db_snapshot_sync.start()
+    await worker_load.start(settings.worker_role)
 
     # Start background transcription task
     import asyncio
@@ -214,6 +246,19 @@ async def startup_event():
 async def shutdown_event():
     """Close database connection on shutdown"""
     await campaign_scheduler.shutdown()
+    await call_events.shutdown()
+    await assistant_runtime_cache.shutdown()
+    await realtime_session_pool.shutdown()
+    await kb_ingestion.shutdown()
+    await lead_importer.shutdown()
+    await campaign_counters.shutdown()
+    await db_snapshot_sync.shutdown()
+    pdf_extractor.shutdown()
+    await embedding_service.shutdown()
+    await external_databases.shutdown()
+    await worker_load.shutdown()
+    twilio_client_pool.shutdown()
+    await http_clients.shutdown()
     Database.close()
     logging.info("Closed MongoDB connection")
 
@@ -234,6 +279,21 @@ async def health_check():
     return {
         "status": "running" if db_status == "healthy" else "degraded",
         "database": db_status,
+        "twilio_rest": twilio_client_pool.stats(),
+        "http_clients": http_clients.stats(),
+        "realtime_sessions": realtime_session_pool.stats(),
+        "load": worker_load.stats(),
+        "kb_index": kb_index_store.stats(),
+        "embeddings": embedding_service.stats(),
+        "answer_cache": answer_cache.stats(),
+        "external_databases": external_databases.stats(),
+        "db_snapshots": db_snapshot_sync.stats(),
+        "campaign_dispatcher": campaign_scheduler.stats(),
+        "call_events": call_events.stats(),
+        "kb_ingestion": kb_ingestion.stats(),
+        "lead_imports": lead_importer.stats(),
+        "campaign_counters": campaign_counters.stats(),
+        "pdf_extraction": pdf_extractor.stats(),
         "version": "1.0.0"
     }
 
@@ -0,0 +1,118 @@
+"""
+Media-tier application: live call websockets only.
+
+Run with `uvicorn app.media_main:app` next to the REST tier (`app.main:app` with
+WORKER_ROLE=api) so dashboard queries, CSV imports and knowledge-base ingestion
+never share an event loop with in-progress calls. Only the streaming routes and
+the TwiML webhooks that hand calls to them are mounted here; the REST routers
+(and their imports) are never loaded.
+"""
+
+import logging
+from pathlib import Path
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from fastapi.routing import APIRoute, APIRouter, APIWebSocketRoute
+
+# Load .env file from the project root
+env_path = Path(__file__).resolve().parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+from app.config.settings import settings
+
+# This entry point always serves the media tier, whatever WORKER_ROLE the shared env sets
+settings.worker_role = "media"
+
+from app.config.database import Database
+from app.routes.inbound_calls import inbound_calls_router
+from app.routes.outbound_calls import outbound_calls_router
+from app.routes.frejun import router as frejun_router
+from app.routes.twilio_webhooks import router as twilio_webhooks_router
+from app.services.assistant_runtime_cache import assistant_runtime_cache
+from app.services.http_clients import http_clients
+from app.services.realtime_session_pool import realtime_session_pool
+from app.services.twilio_client_pool import twilio_client_pool
+from app.services.worker_load import WorkerLoadMiddleware, worker_load
+from app.services.embedding_service import embedding_service
+from app.services.answer_cache import answer_cache
+from app.services.external_db import external_databases
+from app.utils.db_snapshot import snapshot_store
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+app = FastAPI(
+    title="Convis Media Workers",
+    description="Twilio/FreJun media streams bridged to the voice AI providers",
+    version="1.0.0",
+    docs_url=None,
+    redoc_url=None,
+)
+app.add_middleware(WorkerLoadMiddleware, load=worker_load)
+
+
+def include_routes(router: APIRouter, prefix: str, http_paths: Optional[Iterable[str]] = None):
+    """Mount a router's websocket routes (and the listed HTTP paths) without its REST endpoints."""
+    http_paths = set(http_paths or ())
+    for route in router.routes:
+        if isinstance(route, APIWebSocketRoute):
+            app.router.add_api_websocket_route(f"{prefix}{route.path}", route.endpoint, name=route.name)
+        elif isinstance(route, APIRoute) and route.path in http_paths:
+            app.router.add_api_route(
+                f"{prefix}{route.path}",
+                route.endpoint,
+                methods=list(route.methods),
+                name=route.name,
+                include_in_schema=False,
+            )
+
+
+# Media streams
+include_routes(inbound_calls_router, "/api/inbound-calls")
+include_routes(outbound_calls_router, "/api/outbound-calls")
+include_routes(frejun_router, "/api/frejun")
+
+# TwiML webhooks that pre-open the Realtime session must run where the stream will land
+include_routes(twilio_webhooks_router, "/api/twilio-webhooks", http_paths=("/voice", "/outbound-call"))
+
+
+@app.on_event("startup")
+async def startup_event():
+    Database.connect()
+    await http_clients.start()
+    await assistant_runtime_cache.start()
+    await realtime_session_pool.start()
+    await embedding_service.start()
+    await worker_load.start("media")
+    logging.info("Media worker ready")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await worker_load.shutdown()
+    await realtime_session_pool.shutdown()
+    await embedding_service.shutdown()
+    await external_databases.shutdown()
+    await assistant_runtime_cache.shutdown()
+    await http_clients.shutdown()
+    twilio_client_pool.shutdown()
+    Database.close()
+
+
+@app.get("/health")
+async def health_check():
+    """Health and load for the media tier (used by the container health check)."""
+    return {
+        "status": "running",
+        "role": "media",
+        "load": worker_load.stats(),
+        "realtime_sessions": realtime_session_pool.stats(),
+        "embeddings": embedding_service.stats(),
+        "answer_cache": answer_cache.stats(),
+        "external_databases": external_databases.stats(),
+        "db_snapshots": snapshot_store.stats(),
+    }
@@ -55,6 +55,10 @@ class AIAssistantCreate(BaseModel):
     # Language Configuration
     bot_language: Optional[str] = "en"  # Language for bot responses (en, hi, es, fr, de, etc.)
 
+    # Knowledge Base
+    kb_embedding_backend: Optional[str] = "openai"  # openai (text-embedding-3-small) or local (fastembed, no network at query time)
+    answer_cache_enabled: Optional[bool] = True  # Replay cached answers (text + audio) to repeated questions
+
     # Noise Suppression & Voice Activity Detection (VAD)
     noise_suppression_level: Optional[str] = "medium"  # off, low, medium, high, maximum
     vad_threshold: Optional[float] = Field(default=0.5, ge=0.0, le=1.0)  # Voice activity detection threshold (0.0-1.0)
@@ -111,6 +115,10 @@ class AIAssistantUpdate(BaseModel):
     # Language Configuration
     bot_language: Optional[str] = None  # Language for bot responses
 
+    # Knowledge Base
+    kb_embedding_backend: Optional[str] = None  # openai or local (existing files are re-indexed)
+    answer_cache_enabled: Optional[bool] = None
+
     # Noise Suppression & Voice Activity Detection (VAD)
     noise_suppression_level: Optional[str] = None  # off, low, medium, high, maximum
     vad_threshold: Optional[float] = Field(default=None, ge=0.0, le=1.0)  # Voice activity detection threshold
@@ -123,6 +131,8 @@ class KnowledgeBaseFile(BaseModel):
     file_size: int
     uploaded_at: str
     file_path: str
+    status: str = "ready"  # processing, ready or failed (see ingestion job)
+    job_id: Optional[str] = None
 
 class DatabaseConfig(BaseModel):
     enabled: bool = False
@@ -134,6 +144,13 @@ class DatabaseConfig(BaseModel):
     password: str = ""
     table_name: str = ""
     search_columns: List[str] = []
+    # Snapshot mode: the table is copied into a local index that calls search instead of the database
+    sync_mode: str = "live"  # live or snapshot
+    primary_key: str = "id"  # row identity for incremental refreshes (MongoDB: _id)
+    key_columns: List[str] = []  # exact-match lookups, e.g. phone, email, account_number
+    snapshot_columns: List[str] = []  # columns copied (default: primary key, search, key and updated-at columns)
+    updated_at_column: Optional[str] = None  # enables incremental refresh of changed rows
+    snapshot_refresh_minutes: int = Field(default=15, ge=1, le=1440)
 
 class AIAssistantResponse(BaseModel):
     id: str
@@ -196,6 +213,10 @@ class AIAssistantResponse(BaseModel):
     # Language Configuration
     bot_language: str = "en"  # Language for bot responses
 
+    # Knowledge Base
+    kb_embedding_backend: str = "openai"  # openai or local
+    answer_cache_enabled: bool = True
+
     # Noise Suppression & Voice Activity Detection (VAD)
     noise_suppression_level: str = "medium"  # off, low, medium, high, maximum
     vad_threshold: float = 0.5  # Voice activity detection threshold
@@ -216,6 +237,7 @@ class FileUploadResponse(BaseModel):
     message: str
     file: KnowledgeBaseFile
     total_files: int
+    job_id: Optional[str] = None
 
 class DatabaseConnectionTestRequest(BaseModel):
     enabled: bool
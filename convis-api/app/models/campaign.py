@@ -9,6 +9,10 @@ class WorkingWindow(BaseModel):
     start: str = Field(..., description="Start time in HH:MM (24h) format")
     end: str = Field(..., description="End time in HH:MM (24h) format")
     days: List[int] = Field(..., description="List of weekdays allowed (0=Mon .. 6=Sun)")
+    use_lead_timezone: bool = Field(
+        False,
+        description="Apply start/end in each lead's timezone (leads without one use `timezone`)"
+    )
 
     @validator("start", "end")
     def validate_time(cls, value: str) -> str:
@@ -85,6 +89,15 @@ class AttemptBackoff(BaseModel):
 class Pacing(BaseModel):
     calls_per_minute: int = Field(1, ge=1, le=30)
     max_concurrent: int = Field(1, ge=1, le=10)
+    mode: Literal["fixed", "predictive"] = Field(
+        "fixed",
+        description="fixed: one call per free line up to max_concurrent; "
+                    "predictive: keep max_concurrent conversations live, dialing ahead on up to `lines` lines"
+    )
+    max_abandon_rate: float = Field(
+        0.03, ge=0, le=0.2,
+        description="Predictive mode: bound on the share of answered calls that find max_concurrent conversations live"
+    )
 
 
 class CampaignDatabaseConfig(BaseModel):
@@ -240,6 +253,9 @@ class LeadUploadResponse(BaseModel):
     invalid: int
     mismatches: int
     message: str
+    duplicates: int = 0
+    job_id: Optional[str] = None  # background import job (counts fill in as it runs)
+    status: Optional[str] = None
 
 
 class ManualRetryRequest(BaseModel):
@@ -341,3 +357,4 @@ class CampaignStats(BaseModel):
     calendar_bookings: int
     total_calls: int
     avg_call_duration: Optional[float] = None
+    total_cost: Dict[str, float] = Field(default_factory=dict)  # per currency
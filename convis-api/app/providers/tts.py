@@ -8,7 +8,8 @@ from abc import ABC, abstractmethod
 from typing import Optional, Dict
 import os
 import base64
-import aiohttp
+
+from app.services.http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -363,7 +364,7 @@ class SarvamTTS(TTSProvider):
                 'Content-Type': 'application/json'
             }
 
-            async with aiohttp.ClientSession() as session:
+            async with http_clients.session("sarvam") as session:
                 async with session.post(self.api_url, json=payload, headers=headers) as response:
                     if response.status == 200:
                         data = await response.json()
@@ -12,10 +12,15 @@ from app.models.ai_assistant import (
 from app.config.database import Database
 from app.constants import DEFAULT_CALL_GREETING
 from app.utils.encryption import encryption_service
+from app.services.assistant_runtime_cache import assistant_runtime_cache
+from app.services.embedding_service import EMBEDDING_BACKENDS
+from app.utils import conversational_rag
+from app.utils.assistant_keys import resolve_assistant_api_key
 from bson import ObjectId
 from datetime import datetime
 from typing import Optional, Dict, Any, Literal
 from pydantic import BaseModel, validator
+import asyncio
 import logging
 import os
 import httpx
@@ -51,6 +56,20 @@ LEGACY_TTS_VOICES = {
 TTS1_VOICES = {"alloy", "verse"}
 DEFAULT_TTS_MODEL = "gpt-4o-mini-tts"
 
+# Background knowledge base rebuilds started by embedding backend switches
+_reindex_futures: set = set()
+
+
+def _reindex_done(assistant_id: str, future: asyncio.Future) -> None:
+    _reindex_futures.discard(future)
+    try:
+        result = future.result()
+    except Exception as exc:
+        logger.error(f"Knowledge base re-index failed for assistant {assistant_id}: {exc}")
+        return
+    if not result.get('success'):
+        logger.error(f"Knowledge base re-index failed for assistant {assistant_id}: {result.get('error')}")
+
 
 def resolve_tts_model_and_voice(requested_voice: str) -> tuple[str, str]:
     """Return the preferred OpenAI TTS model and the voice id to pass to it."""
@@ -303,6 +322,13 @@ async def create_assistant(request: Request, assistant_data: AIAssistantCreate):
                 detail="voice_mode must be either 'realtime' or 'custom'"
             )
 
+        kb_embedding_backend = (assistant_data.kb_embedding_backend or "openai").lower()
+        if kb_embedding_backend not in EMBEDDING_BACKENDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"kb_embedding_backend must be one of: {', '.join(EMBEDDING_BACKENDS)}"
+            )
+
         # Create assistant document
         now = datetime.utcnow()
         frejun_token = generate_unique_frejun_token(assistants_collection)
@@ -344,6 +370,9 @@ async def create_assistant(request: Request, assistant_data: AIAssistantCreate):
             "llm_max_tokens": assistant_data.llm_max_tokens if assistant_data.llm_max_tokens is not None else 150,
             # Language Configuration
             "bot_language": assistant_data.bot_language or "en",
+            # Knowledge Base
+            "kb_embedding_backend": kb_embedding_backend,
+            "answer_cache_enabled": assistant_data.answer_cache_enabled is not False,
             "frejun_flow_token": frejun_token,
             "created_at": now,
             "updated_at": now
@@ -408,6 +437,8 @@ async def create_assistant(request: Request, assistant_data: AIAssistantCreate):
             llm_max_tokens=assistant_data.llm_max_tokens if assistant_data.llm_max_tokens is not None else 150,
             # Language Configuration
             bot_language=assistant_data.bot_language or "en",
+            kb_embedding_backend=kb_embedding_backend,
+            answer_cache_enabled=assistant_data.answer_cache_enabled is not False,
             created_at=now.isoformat() + "Z",
             updated_at=now.isoformat() + "Z"
         )
@@ -475,7 +506,9 @@ async def get_user_assistants(user_id: str):
                     file_type=file_data['file_type'],
                     file_size=file_data['file_size'],
                     uploaded_at=file_data['uploaded_at'].isoformat() + "Z",
-                    file_path=file_data['file_path']
+                    file_path=file_data['file_path'],
+                    status=file_data.get('status', 'ready'),
+                    job_id=file_data.get('job_id')
                 ))
 
             api_key_metadata = None
@@ -551,6 +584,8 @@ async def get_user_assistants(user_id: str):
                 llm_max_tokens=assistant.get('llm_max_tokens', 150),
                 # Language Configuration
                 bot_language=assistant.get('bot_language', 'en'),
+                kb_embedding_backend=assistant.get('kb_embedding_backend', 'openai'),
+                answer_cache_enabled=assistant.get('answer_cache_enabled', True),
                 calendar_account_ids=[str(obj_id) for obj_id in assistant.get('calendar_account_ids', [])],
                 calendar_enabled=assistant.get('calendar_enabled', False),
                 last_calendar_used_index=assistant.get('last_calendar_used_index', -1),
@@ -623,7 +658,9 @@ async def get_assistant(assistant_id: str):
                 file_type=file_data['file_type'],
                 file_size=file_data['file_size'],
                 uploaded_at=file_data['uploaded_at'].isoformat() + "Z",
-                file_path=file_data['file_path']
+                file_path=file_data['file_path'],
+                status=file_data.get('status', 'ready'),
+                job_id=file_data.get('job_id')
             ))
 
         api_key_metadata = None
@@ -699,6 +736,8 @@ async def get_assistant(assistant_id: str):
             llm_max_tokens=assistant.get('llm_max_tokens', 150),
             # Language Configuration
             bot_language=assistant.get('bot_language', 'en'),
+            kb_embedding_backend=assistant.get('kb_embedding_backend', 'openai'),
+            answer_cache_enabled=assistant.get('answer_cache_enabled', True),
             created_at=assistant['created_at'].isoformat() + "Z",
             updated_at=assistant['updated_at'].isoformat() + "Z"
         )
@@ -819,6 +858,16 @@ async def update_assistant(assistant_id: str, update_data: AIAssistantUpdate):
             update_doc["llm_max_tokens"] = update_data.llm_max_tokens
         if update_data.bot_language is not None:
             update_doc["bot_language"] = update_data.bot_language
+        if update_data.kb_embedding_backend is not None:
+            kb_embedding_backend = update_data.kb_embedding_backend.lower()
+            if kb_embedding_backend not in EMBEDDING_BACKENDS:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"kb_embedding_backend must be one of: {', '.join(EMBEDDING_BACKENDS)}"
+                )
+            update_doc["kb_embedding_backend"] = kb_embedding_backend
+        if update_data.answer_cache_enabled is not None:
+            update_doc["answer_cache_enabled"] = update_data.answer_cache_enabled
 
         # Handle calendar_account_id update (legacy support)
         if update_data.calendar_account_id is not None:
@@ -874,15 +923,33 @@ async def update_assistant(assistant_id: str, update_data: AIAssistantUpdate):
         if update_data.calendar_enabled is not None:
             update_doc["calendar_enabled"] = update_data.calendar_enabled
 
+        # Switching embedding backend rebuilds the knowledge base index; resolve its key before
+        # saving so a missing key rejects the update instead of leaving it without a rebuild
+        new_backend = update_doc.get("kb_embedding_backend")
+        reindex = bool(new_backend) and new_backend != assistant.get("kb_embedding_backend", "openai")
+        reindex_api_key = None
+        if reindex and new_backend == "openai":
+            reindex_api_key, _ = resolve_assistant_api_key(db, {**assistant, **update_doc}, required_provider="openai")
+
         # Update the assistant
         assistants_collection.update_one(
             {"_id": assistant_obj_id},
             {"$set": update_doc}
         )
+        assistant_runtime_cache.publish_invalidation(assistant_id=assistant_id)
 
         # Fetch updated assistant
         updated_assistant = assistants_collection.find_one({"_id": assistant_obj_id})
 
+        # Rebuild in the background (searches keep using the old index, embedded with its
+        # recorded model, until the swap)
+        if reindex:
+            future = asyncio.get_running_loop().run_in_executor(
+                None, conversational_rag.reindex_knowledge_base, assistant_id, reindex_api_key, new_backend
+            )
+            _reindex_futures.add(future)
+            future.add_done_callback(lambda done: _reindex_done(assistant_id, done))
+
         logger.info(f"AI assistant {assistant_id} updated successfully")
 
         frejun_token = ensure_frejun_token(updated_assistant, assistants_collection)
@@ -896,7 +963,9 @@ async def update_assistant(assistant_id: str, update_data: AIAssistantUpdate):
                 file_type=file_data['file_type'],
                 file_size=file_data['file_size'],
                 uploaded_at=file_data['uploaded_at'].isoformat() + "Z",
-                file_path=file_data['file_path']
+                file_path=file_data['file_path'],
+                status=file_data.get('status', 'ready'),
+                job_id=file_data.get('job_id')
             ))
 
         api_key_metadata = None
@@ -971,6 +1040,8 @@ async def update_assistant(assistant_id: str, update_data: AIAssistantUpdate):
             llm_max_tokens=updated_assistant.get('llm_max_tokens', 150),
             # Language Configuration
             bot_language=updated_assistant.get('bot_language', 'en'),
+            kb_embedding_backend=updated_assistant.get('kb_embedding_backend', 'openai'),
+            answer_cache_enabled=updated_assistant.get('answer_cache_enabled', True),
             created_at=updated_assistant['created_at'].isoformat() + "Z",
             updated_at=updated_assistant['updated_at'].isoformat() + "Z"
         )
@@ -1024,6 +1095,7 @@ async def delete_assistant(assistant_id: str):
                 detail="AI assistant not found"
             )
 
+        assistant_runtime_cache.publish_invalidation(assistant_id=assistant_id)
         logger.info(f"AI assistant {assistant_id} deleted successfully")
 
         return DeleteResponse(message="AI assistant deleted successfully")
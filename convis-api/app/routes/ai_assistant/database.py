@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.models.ai_assistant import DatabaseConnectionTestRequest, DatabaseConnectionTestResponse, DatabaseConfig
 from app.config.database import Database
+from app.services.db_snapshot_sync import db_snapshot_sync
+from app.utils.db_snapshot import snapshot_store
 import psycopg2
 import pymongo
 from typing import Optional
@@ -140,6 +143,11 @@ async def save_database_config(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Assistant not found")
 
+        if config.enabled and config.sync_mode == "snapshot":
+            db_snapshot_sync.request_refresh(assistant_id, full=True)
+        else:
+            snapshot_store.remove(assistant_id)
+
         return {"message": "Database configuration saved successfully"}
 
     except Exception as e:
@@ -165,156 +173,17 @@ async def get_database_config(assistant_id: str) -> Optional[DatabaseConfig]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve database configuration: {str(e)}")
 
-async def query_database(config: DatabaseConfig, query_text: str) -> Optional[dict]:
+@router.get("/{assistant_id}/snapshot")
+async def get_snapshot_status(assistant_id: str):
     """
-    Query the configured database based on user input
-    Used by the RAG system to fetch relevant user data
+    Size, staleness and last refresh of the assistant's local table snapshot
     """
-    try:
-        if not config.enabled:
-            return None
+    return await run_in_threadpool(db_snapshot_sync.status, assistant_id)
 
-        if config.type == "postgresql":
-            return await query_postgresql(config, query_text)
-        elif config.type == "mysql":
-            return await query_mysql(config, query_text)
-        elif config.type == "mongodb":
-            return await query_mongodb(config, query_text)
-
-        return None
-
-    except Exception as e:
-        print(f"Database query error: {str(e)}")
-        return None
-
-async def query_postgresql(config: DatabaseConfig, query_text: str) -> Optional[dict]:
-    """Query PostgreSQL database for relevant records"""
-    try:
-        conn = psycopg2.connect(
-            host=config.host,
-            port=int(config.port),
-            database=config.database,
-            user=config.username,
-            password=config.password,
-            connect_timeout=10
-        )
-
-        cursor = conn.cursor()
-
-        # Build search query across specified columns
-        search_conditions = []
-        for column in config.search_columns:
-            search_conditions.append(f"{column}::text ILIKE %s")
-
-        where_clause = " OR ".join(search_conditions)
-        query = f"SELECT * FROM {config.table_name} WHERE {where_clause} LIMIT 10"
-
-        search_term = f"%{query_text}%"
-        params = tuple([search_term] * len(config.search_columns))
-
-        cursor.execute(query, params)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-
-        results = []
-        for row in rows:
-            results.append(dict(zip(columns, row)))
-
-        cursor.close()
-        conn.close()
-
-        return {
-            "source": "database",
-            "database_type": "postgresql",
-            "table": config.table_name,
-            "records": results,
-            "count": len(results)
-        }
-    except Exception as e:
-        print(f"PostgreSQL query error: {str(e)}")
-        return None
-
-async def query_mysql(config: DatabaseConfig, query_text: str) -> Optional[dict]:
-    """Query MySQL database for relevant records"""
-    try:
-        import mysql.connector
-
-        conn = mysql.connector.connect(
-            host=config.host,
-            port=int(config.port),
-            database=config.database,
-            user=config.username,
-            password=config.password,
-            connection_timeout=10
-        )
-
-        cursor = conn.cursor(dictionary=True)
-
-        # Build search query across specified columns
-        search_conditions = []
-        for column in config.search_columns:
-            search_conditions.append(f"{column} LIKE %s")
-
-        where_clause = " OR ".join(search_conditions)
-        query = f"SELECT * FROM {config.table_name} WHERE {where_clause} LIMIT 10"
-
-        search_term = f"%{query_text}%"
-        params = tuple([search_term] * len(config.search_columns))
-
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
-
-        return {
-            "source": "database",
-            "database_type": "mysql",
-            "table": config.table_name,
-            "records": results,
-            "count": len(results)
-        }
-    except Exception as e:
-        print(f"MySQL query error: {str(e)}")
-        return None
-
-async def query_mongodb(config: DatabaseConfig, query_text: str) -> Optional[dict]:
-    """Query MongoDB database for relevant documents"""
-    try:
-        client = pymongo.MongoClient(
-            host=config.host,
-            port=int(config.port),
-            username=config.username,
-            password=config.password,
-            serverSelectionTimeoutMS=10000
-        )
-
-        db_conn = client[config.database]
-        collection = db_conn[config.table_name]
-
-        # Build search query across specified fields
-        search_conditions = []
-        for field in config.search_columns:
-            search_conditions.append({field: {"$regex": query_text, "$options": "i"}})
-
-        query = {"$or": search_conditions} if search_conditions else {}
-
-        results = list(collection.find(query).limit(10))
-
-        # Convert ObjectId to string for JSON serialization
-        for result in results:
-            if "_id" in result:
-                result["_id"] = str(result["_id"])
-
-        client.close()
-
-        return {
-            "source": "database",
-            "database_type": "mongodb",
-            "collection": config.table_name,
-            "documents": results,
-            "count": len(results)
-        }
-    except Exception as e:
-        print(f"MongoDB query error: {str(e)}")
-        return None
+@router.post("/{assistant_id}/snapshot/refresh")
+async def refresh_snapshot(assistant_id: str, full: bool = False):
+    """
+    Refresh the assistant's table snapshot now (full=true reloads every row)
+    """
+    await run_in_threadpool(db_snapshot_sync.request_refresh, assistant_id, full)
+    return {"message": "Snapshot refresh requested"}
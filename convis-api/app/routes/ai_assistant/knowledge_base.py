@@ -2,10 +2,14 @@
 Knowledge Base endpoints for AI Assistants
 """
 from fastapi import APIRouter, HTTPException, status, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from app.models.ai_assistant import FileUploadResponse, KnowledgeBaseFile, DeleteResponse
 from app.config.database import Database
+from app.config.settings import settings
 from app.utils import conversational_rag
 from app.utils.assistant_keys import resolve_assistant_api_key
+from app.services.kb_ingestion import kb_ingestion
+from app.utils.pdf_extraction import pdf_extractor
 from bson import ObjectId
 from datetime import datetime
 import os
@@ -17,12 +21,13 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Base directory for uploads
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "../../../uploads/knowledge_base")
+# Base directory for uploads (on the shared kb-index volume, see settings.kb_upload_path)
+UPLOAD_DIR = settings.kb_upload_path
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 ALLOWED_EXTENSIONS = {'.pdf', '.docx', '.doc', '.xlsx', '.xls', '.txt'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_READ_SIZE = 1024 * 1024
 
 
 def get_file_extension(filename: str) -> str:
@@ -38,12 +43,15 @@ async def upload_knowledge_base_file(
     """
     Upload a knowledge base file for an AI assistant
 
+    The file is saved and queued for ingestion; poll
+    GET /{assistant_id}/jobs/{job_id} for progress.
+
     Args:
         assistant_id: AI Assistant ID
         file: Uploaded file (PDF, DOCX, XLSX, TXT)
 
     Returns:
-        FileUploadResponse: Upload status and file info
+        FileUploadResponse: Upload status, file info and ingestion job id
     """
     try:
         db = Database.get_db()
@@ -76,17 +84,6 @@ async def upload_knowledge_base_file(
                 detail=f"File type not supported. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
             )
 
-        # Read file content
-        content = await file.read()
-        file_size = len(content)
-
-        # Check file size
-        if file_size > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
-            )
-
         # Create assistant-specific directory
         assistant_dir = os.path.join(UPLOAD_DIR, str(assistant_id))
         os.makedirs(assistant_dir, exist_ok=True)
@@ -96,61 +93,45 @@ async def upload_knowledge_base_file(
         safe_filename = f"{timestamp}_{file.filename}"
         file_path = os.path.join(assistant_dir, safe_filename)
 
-        # Save file
+        # Stream the upload to disk (never holds the whole file in memory)
+        file_size = 0
         with open(file_path, 'wb') as f:
-            f.write(content)
+            while True:
+                block = await file.read(UPLOAD_READ_SIZE)
+                if not block:
+                    break
+                file_size += len(block)
+                if file_size > MAX_FILE_SIZE:
+                    f.close()
+                    os.remove(file_path)
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
+                    )
+                f.write(block)
 
         logger.info(f"File saved to {file_path}")
 
-        # Get OpenAI API key for processing
-        try:
-            openai_api_key, _ = resolve_assistant_api_key(db, assistant, required_provider="openai")
-        except HTTPException as exc:
-            os.remove(file_path)
-            raise exc
-
-        # Process document and create embeddings with ChromaDB
-        logger.info(f"Processing document and creating embeddings...")
-        result = conversational_rag.process_document_for_conversation(
-            assistant_id=assistant_id,
-            file_path=file_path,
-            filename=file.filename,
-            file_type=file_ext.replace('.', ''),
-            api_key=openai_api_key
-        )
-
-        if not result['success']:
-            os.remove(file_path)
-            error_msg = result.get('error', 'Unknown error')
-
-            # Provide helpful error messages for common issues
-            if 'OCR not available' in error_msg or 'Tesseract' in error_msg:
-                error_msg = (
-                    "This PDF appears to be image-based/scanned and requires OCR to extract text. "
-                    "Please install Tesseract OCR:\n"
-                    "Ubuntu/Debian: sudo apt-get install tesseract-ocr tesseract-ocr-eng\n"
-                    "macOS: brew install tesseract\n"
-                    "Or convert your PDF to a text-searchable PDF first."
-                )
-            elif 'Could not extract text' in error_msg:
-                error_msg = (
-                    "Failed to extract text from PDF. This may be an image-based/scanned document. "
-                    "Try converting it to a text-searchable PDF or install Tesseract OCR for automatic text recognition."
-                )
-
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=error_msg
-            )
-
-        # Store file metadata
+        # Fail fast on a missing OpenAI key (the local embedding backend needs none)
+        if assistant.get('kb_embedding_backend', 'openai') != 'local':
+            try:
+                resolve_assistant_api_key(db, assistant, required_provider="openai")
+            except HTTPException as exc:
+                os.remove(file_path)
+                raise exc
+
+        # Store file metadata (status becomes "ready" or "failed" when the ingestion job ends)
+        file_type = file_ext.replace('.', '')
+        job_id = str(ObjectId())
         file_metadata = {
             "filename": file.filename,
-            "file_type": file_ext.replace('.', ''),
+            "file_type": file_type,
             "file_size": file_size,
             "uploaded_at": datetime.utcnow(),
             "file_path": file_path,
-            "chunks_count": result['chunks_count']
+            "chunks_count": 0,
+            "status": "processing",
+            "job_id": job_id
         }
 
         # Update assistant document
@@ -162,22 +143,34 @@ async def upload_knowledge_base_file(
             }
         )
 
-        logger.info(f"Successfully processed {result['chunks_count']} chunks from {file.filename}")
+        # Queue extraction, chunking and embedding as a background job
+        kb_ingestion.enqueue(
+            assistant_id=assistant_id,
+            filename=file.filename,
+            file_type=file_type,
+            file_path=file_path,
+            file_size=file_size,
+            job_id=job_id
+        )
+        logger.info(f"Queued ingestion job {job_id} for {file.filename}")
 
         # Get total files count
         updated_assistant = assistants_collection.find_one({"_id": assistant_obj_id})
         total_files = len(updated_assistant.get('knowledge_base_files', []))
 
         return FileUploadResponse(
-            message=f"File uploaded and processed successfully. Created {result['chunks_count']} knowledge chunks.",
+            message="File uploaded. Processing has started; poll the job for progress.",
             file=KnowledgeBaseFile(
                 filename=file.filename,
-                file_type=file_ext.replace('.', ''),
+                file_type=file_type,
                 file_size=file_size,
                 uploaded_at=file_metadata['uploaded_at'].isoformat() + "Z",
-                file_path=file_path
+                file_path=file_path,
+                status="processing",
+                job_id=job_id
             ),
-            total_files=total_files
+            total_files=total_files,
+            job_id=job_id
         )
 
     except HTTPException:
@@ -255,20 +248,17 @@ async def preview_document_content(assistant_id: str, filename: str):
 
         try:
             if file_ext == '.pdf':
-                import PyPDF2
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    num_pages = len(pdf_reader.pages)
+                # Same page extraction as ingestion (cached by file hash, OCR for scanned pages)
+                pages = await run_in_threadpool(pdf_extractor.extract, file_path)
+                num_pages = len(pages)
 
-                    # Try to extract text from each page
-                    for page_num, page in enumerate(pdf_reader.pages, 1):
-                        page_text = page.extract_text()
-                        if page_text and page_text.strip():
-                            extracted_text += f"--- Page {page_num} ---\n{page_text}\n\n"
+                for page in pages:
+                    if page['text'].strip():
+                        extracted_text += f"--- Page {page['page'] + 1} ---\n{page['text']}\n\n"
 
-                    # If no text was extracted, this might be a scanned/image-based PDF
-                    if not extracted_text.strip():
-                        extracted_text = f"""📄 PDF Document Information:
+                # If no text was extracted, this might be a scanned/image-based PDF
+                if not extracted_text.strip():
+                    extracted_text = f"""📄 PDF Document Information:
 
 Filename: {filename}
 Total Pages: {num_pages}
@@ -449,7 +439,7 @@ async def delete_knowledge_base_file(assistant_id: str, filename: str):
                 detail="File not found in knowledge base"
             )
 
-        # Delete from ChromaDB
+        # Delete from the knowledge base index
         conversational_rag.delete_document_from_kb(assistant_id, filename)
 
         # Delete physical file
@@ -480,3 +470,96 @@ async def delete_knowledge_base_file(assistant_id: str, filename: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete file: {str(error)}"
         )
+
+
+@router.post("/{assistant_id}/reindex", status_code=status.HTTP_200_OK)
+async def reindex_knowledge_base(assistant_id: str):
+    """
+    Rebuild an assistant's knowledge base index with its current embedding backend
+
+    Runs automatically when kb_embedding_backend changes; this endpoint re-runs
+    the migration (e.g. after a failure) and reports the model the index uses.
+
+    Args:
+        assistant_id: AI Assistant ID
+
+    Returns:
+        JSON with model, chunks_count and whether the index was rebuilt
+    """
+    try:
+        db = Database.get_db()
+
+        # Validate assistant_id
+        try:
+            assistant_obj_id = ObjectId(assistant_id)
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid assistant_id format"
+            )
+
+        assistant = db['assistants'].find_one({"_id": assistant_obj_id})
+        if not assistant:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="AI assistant not found"
+            )
+
+        embedding_backend = assistant.get('kb_embedding_backend', 'openai')
+        openai_api_key = None
+        if embedding_backend != 'local':
+            openai_api_key, _ = resolve_assistant_api_key(db, assistant, required_provider="openai")
+
+        result = await run_in_threadpool(
+            conversational_rag.reindex_knowledge_base,
+            assistant_id,
+            openai_api_key,
+            embedding_backend
+        )
+        if not result['success']:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to re-index knowledge base: {result.get('error', 'Unknown error')}"
+            )
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as error:
+        logger.error(f"Error re-indexing knowledge base: {str(error)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to re-index knowledge base: {str(error)}"
+        )
+
+
+@router.get("/{assistant_id}/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_ingestion_job(assistant_id: str, job_id: str):
+    """
+    Status and progress of a knowledge base ingestion job
+
+    Args:
+        assistant_id: AI Assistant ID
+        job_id: Job id returned by the upload endpoint
+
+    Returns:
+        JSON with status (queued/running/completed/failed), stage, progress and error
+    """
+    job = await run_in_threadpool(kb_ingestion.get_job, job_id)
+    if not job or job.get('assistant_id') != assistant_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ingestion job not found"
+        )
+
+    return {
+        "job_id": str(job['_id']),
+        "filename": job['filename'],
+        "status": job['status'],
+        "stage": job.get('stage'),
+        "progress": job.get('progress', {}),
+        "attempts": job.get('attempts', 0),
+        "error": job.get('error'),
+        "created_at": job['created_at'].isoformat() + "Z",
+        "updated_at": job['updated_at'].isoformat() + "Z"
+    }
@@ -5,6 +5,7 @@ from typing import Optional, Dict, Any
 from app.config.database import Database
 from app.models.api_key import APIKeyCreate, APIKeyUpdate, APIKeyResponse, APIKeyListResponse, AllowedProvider
 from app.utils.encryption import encryption_service
+from app.services.assistant_runtime_cache import assistant_runtime_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -149,6 +150,7 @@ async def update_api_key(key_id: str, payload: APIKeyUpdate):
 
         update_doc['updated_at'] = datetime.utcnow()
         keys_collection.update_one({"_id": existing['_id']}, {"$set": update_doc})
+        assistant_runtime_cache.publish_invalidation(user_id=existing['user_id'])
 
         refreshed = keys_collection.find_one({"_id": existing['_id']})
         return format_api_key_response(refreshed)
@@ -180,6 +182,7 @@ async def delete_api_key(key_id: str):
             )
 
         keys_collection.delete_one({"_id": doc['_id']})
+        assistant_runtime_cache.publish_invalidation(user_id=doc['user_id'])
         logger.info(f"Deleted API key {key_id}")
         return None
     except HTTPException:
@@ -13,6 +13,8 @@ from fastapi.responses import RedirectResponse
 from app.config.database import Database
 from app.config.settings import settings
 from app.services.calendar_service import CalendarService
+from app.services.http_clients import http_clients
+from app.services.assistant_runtime_cache import assistant_runtime_cache
 from app.utils.auth import get_current_user, verify_user_ownership
 from app.utils.encryption import encryption_service
 
@@ -74,7 +76,7 @@ async def _exchange_google_token(code: str, redirect_uri: str) -> dict:
     if not client_id or not client_secret:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Google credentials not configured")
 
-    async with httpx.AsyncClient() as client:
+    async with http_clients.client("google") as client:
         response = await client.post(
             "https://oauth2.googleapis.com/token",
             data={
@@ -96,7 +98,7 @@ async def _exchange_microsoft_token(code: str, redirect_uri: str) -> dict:
     if not client_id or not client_secret:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Microsoft credentials not configured")
 
-    async with httpx.AsyncClient() as client:
+    async with http_clients.client("microsoft") as client:
         response = await client.post(
             "https://login.microsoftonline.com/common/oauth2/v2.0/token",
             data={
@@ -114,7 +116,7 @@ async def _exchange_microsoft_token(code: str, redirect_uri: str) -> dict:
 
 
 async def _fetch_google_profile(access_token: str) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_clients.client("google") as client:
         response = await client.get(
             "https://www.googleapis.com/oauth2/v2/userinfo",
             headers={"Authorization": f"Bearer {access_token}"},
@@ -125,7 +127,7 @@ async def _fetch_google_profile(access_token: str) -> dict:
 
 
 async def _fetch_microsoft_profile(access_token: str) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with http_clients.client("microsoft") as client:
         response = await client.get(
             "https://graph.microsoft.com/v1.0/me",
             headers={"Authorization": f"Bearer {access_token}"},
@@ -174,6 +176,7 @@ async def delete_calendar_account(account_id: str, current_user: dict = Depends(
     result = accounts_collection.delete_one({"_id": account_obj_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Calendar account not found")
+    assistant_runtime_cache.publish_invalidation(user_id=account.get("user_id"))
 
     logger.info(f"User {current_user['user_id']} disconnected calendar account {account_id}")
     return {"message": "Calendar disconnected"}
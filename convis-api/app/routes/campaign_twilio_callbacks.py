@@ -2,7 +2,7 @@ from fastapi import APIRouter, Request, Form, HTTPException
 from typing import Optional
 import logging
 
-from app.services.call_status_processor import process_call_status
+from app.services.call_events import CallEvent, call_events
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +43,7 @@ async def universal_twilio_call_webhook(
             campaignId
         )
 
-        process_call_status(CallSid, CallStatus, CallDuration, leadId, campaignId)
+        await call_events.submit(CallEvent(CallSid, CallStatus, CallDuration, leadId, campaignId))
         return {"message": "Status processed"}
 
     except HTTPException:
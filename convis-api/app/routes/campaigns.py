@@ -1,14 +1,16 @@
 from datetime import datetime, timedelta
 from typing import List
-import csv
-import io
+import os
+import shutil
 
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pymongo import ReturnDocument
 
 from app.config.database import Database
+from app.config.settings import settings
 from app.models.campaign import (
     CampaignCreate,
     CampaignListResponse,
@@ -21,8 +23,11 @@ from app.models.campaign import (
     AttemptBackoff,
     ManualRetryRequest,
 )
-from app.services.phone_service import PhoneService
 from app.services.campaign_dialer import CampaignDialer
+from app.services.campaign_counters import campaign_counters, campaign_stats
+from app.services.campaign_export import EXPORT_FORMATS, PARQUET_AVAILABLE, stream_report
+from app.services.campaign_queues import campaign_queues
+from app.services.lead_import import lead_importer
 
 import logging
 
@@ -31,9 +36,10 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Initialize services
-phone_service = PhoneService()
 dialer_service = CampaignDialer()
 
+UPLOAD_COPY_BUFFER_BYTES = 1024 * 1024
+
 
 def serialize_campaign(doc: dict) -> CampaignResponse:
     doc = doc.copy()
@@ -376,7 +382,8 @@ async def trigger_test_call(campaign_id: str):
             )
             terminal_statuses = {"completed", "busy", "no-answer", "failed", "canceled"}
             if latest_attempt and latest_attempt.get("status") in terminal_statuses:
-                leads_collection.update_one(
+                campaign_counters.update_lead(
+                    leads_collection,
                     {"_id": active_call["_id"]},
                     {
                         "$set": {
@@ -395,7 +402,7 @@ async def trigger_test_call(campaign_id: str):
                 detail="A call is already in progress for this campaign. Please wait for it to finish before testing."
             )
         # Requeue any stale calls that never completed
-        leads_collection.update_many(
+        requeued = leads_collection.update_many(
             {
                 "campaign_id": campaign_obj_id,
                 "status": "calling",
@@ -410,6 +417,7 @@ async def trigger_test_call(campaign_id: str):
                 }
             }
         )
+        campaign_counters.lead_transition(campaign_obj_id, "calling", "queued", requeued.modified_count)
 
         next_lead = dialer_service.get_next_lead(
             campaign_id,
@@ -455,12 +463,14 @@ async def upload_leads(
     """
     Upload leads from CSV file.
     Expected columns: phone, name (optional), email (optional)
+
+    The file is streamed to disk and imported by a background job; poll
+    /{campaign_id}/leads/imports/{job_id} for progress and counts.
     """
-    next_index_counter = 0
+    file_path = None
     try:
         db = Database.get_db()
         campaigns_collection = db["campaigns"]
-        leads_collection = db["leads"]
 
         # Verify campaign exists
         try:
@@ -468,153 +478,88 @@ async def upload_leads(
         except Exception:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid campaign_id format")
 
-        campaign = campaigns_collection.find_one({"_id": campaign_obj_id})
+        campaign = campaigns_collection.find_one({"_id": campaign_obj_id}, {"_id": 1})
         if not campaign:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
-        next_index_counter = int(campaign.get("next_index", 0) or 0)
-
-        # Get campaign country and timezone
-        campaign_country = campaign.get("country", "US")
-        campaign_tz = campaign.get("working_window", {}).get("timezone", "America/New_York")
-
-        # Read CSV
-        contents = await file.read()
-        csv_text = contents.decode("utf-8")
-        csv_reader = csv.DictReader(io.StringIO(csv_text))
-
-        # Process leads
-        total = 0
-        valid = 0
-        invalid = 0
-        mismatches = 0
-        now = datetime.utcnow()
 
-        leads_to_insert = []
-        batch_name_clean = batch_name.strip() if batch_name else None
+        # Stream the upload to disk without holding it in memory
+        job_id = str(ObjectId())
+        os.makedirs(settings.lead_import_work_path, exist_ok=True)
+        file_path = os.path.join(settings.lead_import_work_path, f"{job_id}.csv")
 
-        for row in csv_reader:
-            total += 1
-            normalized_keys = {(key or "").strip(): (row[key] or "").strip() for key in row.keys()}
-            lowercase_lookup = {key.lower(): value for key, value in normalized_keys.items() if key}
-
-            def pick_value(possible_keys):
-                for possible_key in possible_keys:
-                    value = lowercase_lookup.get(possible_key.lower(), "")
-                    if value:
-                        return value
-                return ""
-
-            phone_keys = {"phone", "phone_number", "number", "mobile", "mobile_number", "contact_number", "contact"}
-            name_keys = {"name", "full_name", "contact_name"}
-            email_keys = {"email", "email_address"}
-            first_name_keys = {"firstname", "first_name", "first"}
-            last_name_keys = {"lastname", "last_name", "surname", "family_name"}
-            timezone_keys = {"timezone", "tz"}
-
-            raw_number = pick_value(phone_keys)
-            first_name = pick_value(first_name_keys) or None
-            last_name = pick_value(last_name_keys) or None
-            name = pick_value(name_keys) or None
-            email = pick_value(email_keys) or None
-
-            if not raw_number:
-                invalid += 1
-                continue
-
-            if not first_name and not name:
-                invalid += 1
-                continue
-
-            # Validate and normalize phone number
-            is_valid, e164, region, timezones = phone_service.normalize_and_validate(raw_number, campaign_country)
-
-            if not is_valid:
-                invalid += 1
-                continue
-
-            # Check for region mismatch
-            is_mismatch = phone_service.check_region_mismatch(e164, campaign_country)
-            if is_mismatch:
-                mismatches += 1
-
-            # Detect timezone
-            timezone_override = pick_value(timezone_keys)
-            lead_tz = timezone_override or (timezones[0] if timezones else campaign_tz)
-
-            if not name and (first_name or last_name):
-                name_parts = [part for part in [first_name, last_name] if part]
-                name = " ".join(name_parts) if name_parts else None
-
-            # Create lead document
-            lead_doc = {
-                "campaign_id": campaign_obj_id,
-                "raw_number": raw_number,
-                "e164": e164,
-                "timezone": lead_tz,
-                "first_name": first_name,
-                "last_name": last_name,
-                "batch_name": batch_name_clean,
-                "name": name,
-                "email": email,
-                "status": "queued",
-                "attempts": 0,
-                "order_index": next_index_counter,
-                "next_retry_at": None,
-                "fallback_round": 0,
-                "last_outcome": None,
-                "last_call_sid": None,
-                "retry_on": None,
-                "sentiment": None,
-                "summary": None,
-                "calendar_booked": False,
-                "created_at": now,
-                "updated_at": now,
-                "custom_fields": {
-                    key: value
-                    for key, value in normalized_keys.items()
-                    if key.lower() not in phone_keys | name_keys | email_keys | first_name_keys | last_name_keys | timezone_keys
-                    and value
-                }
-            }
+        def save_upload():
+            with open(file_path, "wb") as out:
+                shutil.copyfileobj(file.file, out, UPLOAD_COPY_BUFFER_BYTES)
+            return os.path.getsize(file_path)
 
-            leads_to_insert.append(lead_doc)
-            next_index_counter += 1
-            valid += 1
-
-        # Bulk insert leads
-        if leads_to_insert:
-            leads_collection.insert_many(leads_to_insert)
-            # Create indexes
-            leads_collection.create_index([("campaign_id", 1), ("status", 1), ("_id", 1)])
-            leads_collection.create_index([("campaign_id", 1), ("retry_on", 1)])
-            leads_collection.create_index([("campaign_id", 1), ("order_index", 1)])
-            campaigns_collection.update_one(
-                {"_id": campaign_obj_id},
-                {"$set": {"next_index": next_index_counter}}
-            )
-            logger.info(f"Inserted {len(leads_to_insert)} leads for campaign {campaign_id}")
+        file_size = await run_in_threadpool(save_upload)
+        if file_size == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file is empty")
 
-        message = f"Uploaded {valid} valid leads"
-        if invalid > 0:
-            message += f", {invalid} invalid"
-        if mismatches > 0:
-            message += f", {mismatches} region mismatches"
+        batch_name_clean = batch_name.strip() if batch_name else None
+        await run_in_threadpool(
+            lead_importer.enqueue,
+            campaign_id=campaign_id,
+            filename=file.filename or "leads.csv",
+            file_path=file_path,
+            file_size=file_size,
+            batch_name=batch_name_clean,
+            job_id=job_id,
+        )
+        logger.info(f"Queued lead import job {job_id} for campaign {campaign_id} ({file_size} bytes)")
 
         return LeadUploadResponse(
-            total=total,
-            valid=valid,
-            invalid=invalid,
-            mismatches=mismatches,
-            message=message
+            total=0,
+            valid=0,
+            invalid=0,
+            mismatches=0,
+            message="Upload received. Leads are being imported; poll the import job for progress.",
+            job_id=job_id,
+            status="queued"
         )
 
     except HTTPException:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
         raise
     except Exception as error:
         logger.error(f"Error uploading leads: {error}")
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to upload leads: {str(error)}")
 
 
+@router.get("/{campaign_id}/leads/imports/{job_id}", status_code=status.HTTP_200_OK)
+async def get_lead_import_job(campaign_id: str, job_id: str):
+    """
+    Status and progress of a lead import job
+
+    Args:
+        campaign_id: Campaign ID
+        job_id: Job id returned by the upload endpoint
+
+    Returns:
+        JSON with status (queued/running/completed/failed), progress counts and error
+    """
+    job = await run_in_threadpool(lead_importer.get_job, job_id)
+    if not job or job.get("campaign_id") != campaign_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lead import job not found")
+
+    progress = job.get("progress", {})
+    bytes_total = progress.get("bytes_total") or 0
+    return {
+        "job_id": str(job["_id"]),
+        "filename": job["filename"],
+        "status": job["status"],
+        "progress": progress,
+        "percent": round(100.0 * progress.get("bytes_read", 0) / bytes_total, 1) if bytes_total else 0.0,
+        "attempts": job.get("attempts", 0),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat() + "Z",
+        "updated_at": job["updated_at"].isoformat() + "Z"
+    }
+
+
 @router.get("/{campaign_id}/leads", response_model=List[LeadResponse], status_code=status.HTTP_200_OK)
 async def get_campaign_leads(campaign_id: str, skip: int = 0, limit: int = 100):
     """Get leads for a campaign"""
@@ -749,6 +694,9 @@ async def manual_retry_leads(campaign_id: str, payload: ManualRetryRequest):
                 "$inc": {"fallback_round": 1}
             }
         )
+        if result.modified_count:
+            # The leads came from any status
+            campaign_counters.recount(campaign_obj_id)
 
         return {
             "message": f"Queued {result.modified_count} lead(s) for retry",
@@ -803,6 +751,7 @@ async def update_campaign_status(campaign_id: str, payload: CampaignStatusUpdate
                         }
                     }
                 )
+                campaign_counters.recount(campaign_obj_id)
 
                 # Clear campaign's last call timestamp to start immediately
                 campaigns_collection.update_one(
@@ -817,34 +766,12 @@ async def update_campaign_status(campaign_id: str, payload: CampaignStatusUpdate
                 )
                 logger.info(f"Reset {leads_collection.count_documents({'campaign_id': campaign_obj_id})} leads to queued status")
 
-                # CRITICAL FIX: Immediately trigger first call instead of waiting for scheduler
-                # This eliminates the 2-second delay for first call
-                # When user manually starts campaign, bypass working window (they explicitly want it to run)
+                # Ask the campaign dispatcher to fill the lines now instead of on its next scan
                 try:
-                    import threading
-                    def trigger_first_call():
-                        try:
-                            logger.info(f"[START_CAMPAIGN] Triggering immediate first call for campaign {campaign_id}")
-                            # Use ignore_window=True because user explicitly clicked Start Campaign
-                            lead = dialer_service.get_next_lead(campaign_id, ignore_window=True, ignore_attempt_limit=False)
-                            if lead:
-                                logger.info(f"[START_CAMPAIGN] Found lead: {lead.get('name')} ({lead.get('e164')})")
-                                call_sid = dialer_service.place_call(campaign_id, str(lead["_id"]))
-                                if call_sid:
-                                    logger.info(f"[START_CAMPAIGN] First call placed successfully: {call_sid}")
-                                else:
-                                    logger.warning(f"[START_CAMPAIGN] Failed to place first call: {dialer_service.last_error}")
-                            else:
-                                logger.warning(f"[START_CAMPAIGN] No leads available for immediate call")
-                        except Exception as e:
-                            logger.error(f"[START_CAMPAIGN] Error triggering first call: {e}")
-                            import traceback
-                            logger.error(traceback.format_exc())
-
-                    # Run in background thread to not block the API response
-                    threading.Thread(target=trigger_first_call, daemon=True).start()
+                    campaign_queues.clear(campaign_id)
+                    campaign_queues.wake(campaign_id)
                 except Exception as e:
-                    logger.error(f"Error starting first call thread: {e}")
+                    logger.warning(f"[START_CAMPAIGN] Could not wake campaign dispatcher: {e}")
             else:
                 # Campaign is already running, just update status (resume scenario)
                 campaigns_collection.update_one(
@@ -887,6 +814,7 @@ async def update_campaign_status(campaign_id: str, payload: CampaignStatusUpdate
                         }
                     }
                 )
+                campaign_counters.lead_transition(campaign_obj_id, "calling", "no-answer", stuck_leads.modified_count)
                 if stuck_leads.modified_count > 0:
                     logger.warning(f"Reset {stuck_leads.modified_count} stuck 'calling' leads when stopping campaign {campaign_id}")
 
@@ -928,6 +856,7 @@ async def reset_stuck_leads(campaign_id: str):
             }
         )
 
+        campaign_counters.lead_transition(campaign_obj_id, "calling", "no-answer", result.modified_count)
         logger.info(f"Manually reset {result.modified_count} stuck leads for campaign {campaign_id}")
 
         return {
@@ -944,79 +873,15 @@ async def reset_stuck_leads(campaign_id: str):
 
 @router.get("/{campaign_id}/stats", response_model=CampaignStats, status_code=status.HTTP_200_OK)
 async def get_campaign_stats(campaign_id: str):
-    """Get campaign statistics"""
+    """Get campaign statistics (from the campaign's counters document)"""
     try:
-        db = Database.get_db()
-        leads_collection = db["leads"]
-        call_attempts_collection = db["call_attempts"]
-
         try:
             campaign_obj_id = ObjectId(campaign_id)
         except Exception:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid campaign_id format")
 
-        # Aggregate lead stats
-        lead_stats = list(leads_collection.aggregate([
-            {"$match": {"campaign_id": campaign_obj_id}},
-            {
-                "$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1}
-                }
-            }
-        ]))
-
-        # Convert to dict
-        stats_dict = {item["_id"]: item["count"] for item in lead_stats}
-        total_leads = sum(stats_dict.values())
-
-        # Get sentiment average
-        sentiment_pipeline = [
-            {"$match": {"campaign_id": campaign_obj_id, "sentiment": {"$ne": None}}},
-            {
-                "$group": {
-                    "_id": None,
-                    "avg_score": {"$avg": "$sentiment.score"}
-                }
-            }
-        ]
-        sentiment_result = list(leads_collection.aggregate(sentiment_pipeline))
-        avg_sentiment = sentiment_result[0]["avg_score"] if sentiment_result else None
-
-        # Get calendar bookings
-        calendar_bookings = leads_collection.count_documents({
-            "campaign_id": campaign_obj_id,
-            "calendar_booked": True
-        })
-
-        # Get call stats
-        call_stats = list(call_attempts_collection.aggregate([
-            {"$match": {"campaign_id": campaign_obj_id}},
-            {
-                "$group": {
-                    "_id": None,
-                    "total_calls": {"$sum": 1},
-                    "avg_duration": {"$avg": "$duration"}
-                }
-            }
-        ]))
-
-        total_calls = call_stats[0]["total_calls"] if call_stats else 0
-        avg_duration = call_stats[0]["avg_duration"] if call_stats else None
-
-        return CampaignStats(
-            total_leads=total_leads,
-            queued=stats_dict.get("queued", 0),
-            completed=stats_dict.get("completed", 0),
-            failed=stats_dict.get("failed", 0),
-            no_answer=stats_dict.get("no-answer", 0),
-            busy=stats_dict.get("busy", 0),
-            calling=stats_dict.get("calling", 0),
-            avg_sentiment_score=avg_sentiment,
-            calendar_bookings=calendar_bookings,
-            total_calls=total_calls,
-            avg_call_duration=avg_duration
-        )
+        counters = campaign_counters.get(campaign_obj_id)
+        return CampaignStats(**campaign_stats(counters))
 
     except HTTPException:
         raise
@@ -1044,11 +909,8 @@ async def get_campaign_status_overview(campaign_id: str):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
 
         leads_collection = db["leads"]
-        pipeline = [
-            {"$match": {"campaign_id": campaign_obj_id}},
-            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-        ]
-        summary = {doc["_id"]: doc["count"] for doc in leads_collection.aggregate(pipeline)}
+        counters = campaign_counters.get(campaign_obj_id)
+        summary = {key: count for key, count in counters.get("status", {}).items() if count > 0}
         now = datetime.utcnow()
         next_retry = leads_collection.count_documents({
             "campaign_id": campaign_obj_id,
@@ -1081,71 +943,38 @@ async def get_campaign_status_overview(campaign_id: str):
 
 
 @router.get("/{campaign_id}/export", status_code=status.HTTP_200_OK)
-async def export_campaign_report(campaign_id: str):
-    """Export campaign report as CSV"""
+async def export_campaign_report(campaign_id: str, export_format: str = Query("csv", alias="format")):
+    """
+    Export campaign report, streamed as the leads are read.
+
+    Formats: csv (default), csv.gz, parquet (needs pyarrow on the server)
+    """
     try:
         db = Database.get_db()
-        leads_collection = db["leads"]
-        call_attempts_collection = db["call_attempts"]
 
         try:
             campaign_obj_id = ObjectId(campaign_id)
         except Exception:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid campaign_id format")
 
-        # Get all leads with call attempts
-        leads = list(leads_collection.find({"campaign_id": campaign_obj_id}))
-
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Write header
-        writer.writerow([
-            "Lead ID",
-            "Number",
-            "Name",
-            "Status",
-            "Attempts",
-            "Sentiment",
-            "Sentiment Score",
-            "Calendar Booked",
-            "Recording URL",
-            "Summary"
-        ])
-
-        # Write data rows
-        for lead in leads:
-            lead_id = str(lead["_id"])
-
-            # Get last call attempt with recording
-            call_attempt = call_attempts_collection.find_one(
-                {"lead_id": lead["_id"], "recording_url": {"$ne": None}},
-                sort=[("started_at", -1)]
+        if export_format not in EXPORT_FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported format; use one of {', '.join(EXPORT_FORMATS)}"
             )
+        if export_format == "parquet" and not PARQUET_AVAILABLE:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parquet export is not available on this server")
+
+        campaign = await run_in_threadpool(db["campaigns"].find_one, {"_id": campaign_obj_id}, {"_id": 1})
+        if not campaign:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
 
-            recording_url = call_attempt.get("recording_url") if call_attempt else ""
-            sentiment = lead.get("sentiment", {})
-
-            writer.writerow([
-                lead_id,
-                lead.get("e164", ""),
-                lead.get("name", ""),
-                lead.get("status", ""),
-                lead.get("attempts", 0),
-                sentiment.get("label", "") if sentiment else "",
-                sentiment.get("score", "") if sentiment else "",
-                "Yes" if lead.get("calendar_booked") else "No",
-                recording_url,
-                lead.get("summary", "")
-            ])
-
-        # Return as streaming response
-        output.seek(0)
+        # StreamingResponse iterates the (blocking) generator in a thread pool
+        media_type, extension = EXPORT_FORMATS[export_format]
         return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=campaign_{campaign_id}_report.csv"}
+            stream_report(db, campaign_obj_id, export_format),
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename=campaign_{campaign_id}_report.{extension}"}
         )
 
     except HTTPException:
@@ -1213,6 +1042,7 @@ async def delete_campaign(campaign_id: str):
 
         # Delete the campaign
         campaigns_collection.delete_one({"_id": campaign_obj_id})
+        campaign_counters.remove(campaign_obj_id)
         logger.info(f"Campaign {campaign_id} deleted successfully")
 
         return {
@@ -7,6 +7,7 @@ from twilio.base.exceptions import TwilioException, TwilioRestException
 from twilio.rest import Client
 
 from app.config.database import Database
+from app.services.twilio_client_pool import twilio_client_pool
 from app.models.dashboard import AssistantSentimentBreakdown, AssistantSummaryItem, AssistantSummaryResponse
 from app.utils.twilio_helpers import decrypt_twilio_credentials
 from app.utils.auth import get_current_user, verify_user_ownership
@@ -147,7 +148,7 @@ async def get_assistant_summary(
                 if account_sid and auth_token:
                     try:
                         # Validate credentials by creating client
-                        twilio_client = Client(account_sid, auth_token)
+                        twilio_client = twilio_client_pool.get_client(account_sid, auth_token)
                     except (TwilioException, TwilioRestException) as twilio_error:
                         logger.warning(f"Twilio authentication failed for user {user_id}: {twilio_error}")
                         # Continue without Twilio client - will use DB data only
@@ -253,7 +254,7 @@ async def get_assistant_summary(
         # Process Twilio call logs for additional data (inbound/outbound not captured in DB)
         if twilio_client:
             try:
-                calls = twilio_client.calls.list(limit=1000)
+                calls = await twilio_client_pool.list_calls(twilio_client, limit=1000)
             except (TwilioException, TwilioRestException) as e:
                 logger.error(f"Twilio API error while fetching calls for user {user_id}: {e}")
                 # Don't fail the entire request if Twilio API fails
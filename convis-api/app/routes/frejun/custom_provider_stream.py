@@ -21,9 +21,14 @@ from app.utils.assistant_keys import resolve_provider_keys, resolve_assistant_ap
 from app.utils.twilio_mark_handler import TwilioMarkHandler
 from app.services.calendar_service import CalendarService
 from app.services.calendar_intent_service import CalendarIntentService
+from app.services.answer_cache import answer_cache, answer_scope, repeats_caller_details
+from app.services.embedding_service import embedding_model_id
 
 logger = logging.getLogger(__name__)
 
+# Spoken when the LLM call fails (never cached)
+LLM_FALLBACK_RESPONSE = "I apologize, I'm having trouble processing that right now."
+
 
 def detect_language_from_text(text: str) -> str:
     """
@@ -199,6 +204,11 @@ class CustomProviderStreamHandler:
         self.llm_model = assistant_config.get('llm_model')
         self.llm_max_tokens = assistant_config.get('llm_max_tokens', 150)
 
+        # Semantic answer cache (repeated questions replay a cached answer and audio)
+        self.assistant_id = str(assistant_config.get('assistant_id') or assistant_config.get('_id') or '') or None
+        self.answer_cache_enabled = bool(self.assistant_id) and assistant_config.get('answer_cache_enabled', True) is not False
+        self.embedding_model = embedding_model_id(assistant_config.get('kb_embedding_backend'))
+
     async def initialize_providers(self):
         """Initialize ASR, TTS, and LLM providers"""
         try:
@@ -622,18 +632,31 @@ class CustomProviderStreamHandler:
             })
             logger.info(f"[CUSTOM] 💬 Added user message to conversation history (total: {len(self.conversation_history)} messages)")
 
-            # Generate LLM response
-            logger.info(f"[CUSTOM] 🤖 === LLM GENERATION START ===")
-            logger.info(f"[CUSTOM] 🔄 Calling LLM provider: {self.llm_provider}/{self.llm_model}")
-            llm_start = datetime.now()
-            response_text = await self.generate_llm_response()
-            llm_time = (datetime.now() - llm_start).total_seconds() * 1000
+            # Repeated question: replay a cached answer (and its audio) instead of LLM + TTS
+            scope = self._answer_scope()
+            cached_answer, question_vector = None, None
+            if scope:
+                cached_answer, question_vector = await answer_cache.lookup(
+                    self.assistant_id, scope, transcript, self.openai_api_key, self.embedding_model
+                )
 
-            if not response_text:
-                logger.warning(f"[CUSTOM] ⚠️ Empty LLM response, skipping")
-                return
+            if cached_answer:
+                response_text = cached_answer.answer
+                llm_time = 0.0
+                logger.info(f"[CUSTOM] ⚡ Answer cache hit ({len(response_text)} chars): \"{response_text}\"")
+            else:
+                # Generate LLM response
+                logger.info(f"[CUSTOM] 🤖 === LLM GENERATION START ===")
+                logger.info(f"[CUSTOM] 🔄 Calling LLM provider: {self.llm_provider}/{self.llm_model}")
+                llm_start = datetime.now()
+                response_text = await self.generate_llm_response()
+                llm_time = (datetime.now() - llm_start).total_seconds() * 1000
+
+                if not response_text:
+                    logger.warning(f"[CUSTOM] ⚠️ Empty LLM response, skipping")
+                    return
 
-            logger.info(f"[CUSTOM] ✅ LLM response ({len(response_text)} chars) in {llm_time:.0f}ms: \"{response_text}\"")
+                logger.info(f"[CUSTOM] ✅ LLM response ({len(response_text)} chars) in {llm_time:.0f}ms: \"{response_text}\"")
 
             # Add assistant message to history
             self.conversation_history.append({
@@ -642,24 +665,37 @@ class CustomProviderStreamHandler:
             })
             logger.info(f"[CUSTOM] 💬 Added assistant message to conversation history")
 
-            # ⚡ OPTIMIZATION: Run TTS synthesis and calendar check IN PARALLEL to reduce lag
-            logger.info(f"[CUSTOM] ⚡ Starting TTS synthesis and calendar check in parallel...")
-
-            # Start TTS synthesis immediately (don't wait)
-            tts_task = asyncio.create_task(self._synthesize_response(response_text))
-
             # Check for calendar intent in parallel (non-blocking)
             if self.calendar_enabled and not self.appointment_scheduled and not self.scheduling_task:
                 asyncio.create_task(self.check_calendar_intent())  # Fire and forget
 
-            # Wait ONLY for TTS to complete (calendar check runs in background)
-            response_audio, tts_time = await tts_task
+            converted_audio = cached_answer.audio.get(self.platform) if cached_answer else None
+            tts_time = 0.0
+            if converted_audio:
+                logger.info(f"[CUSTOM] ⚡ Using cached audio: {len(converted_audio)} bytes")
+            else:
+                # ⚡ OPTIMIZATION: TTS runs while the calendar check (above) continues in the background
+                response_audio, tts_time = await self._synthesize_response(response_text)
 
-            if not response_audio:
-                logger.error(f"[CUSTOM] ❌ TTS synthesis returned no audio!")
-                return
+                if not response_audio:
+                    logger.error(f"[CUSTOM] ❌ TTS synthesis returned no audio!")
+                    return
 
-            logger.info(f"[CUSTOM] ✅ TTS completed: {len(response_audio)} bytes")
+                logger.info(f"[CUSTOM] ✅ TTS completed: {len(response_audio)} bytes")
+                converted_audio = self._convert_tts_audio(response_audio)
+
+                if cached_answer:
+                    # Hit from the other platform: keep this encoding too
+                    cached_answer.audio[self.platform] = converted_audio
+                elif (
+                    scope
+                    and response_text != LLM_FALLBACK_RESPONSE
+                    and not repeats_caller_details(transcript, response_text, self.system_message)
+                ):
+                    answer_cache.store(
+                        self.assistant_id, scope, transcript, question_vector,
+                        response_text, self.platform, converted_audio
+                    )
 
             # ⏱️ Log complete pipeline timing breakdown
             total_time = (datetime.now() - pipeline_start).total_seconds() * 1000
@@ -670,85 +706,8 @@ class CustomProviderStreamHandler:
             logger.info(f"[CUSTOM]   ⚡ TOTAL PIPELINE:     {total_time:.0f}ms")
             logger.info(f"[CUSTOM] ⚡ === END PIPELINE TIMING ===")
 
-            # Convert audio format if needed
-            logger.info(f"[CUSTOM] 🔄 Converting audio format...")
-            # Determine input sample rate based on TTS provider
-            input_sample_rate = 8000  # Default for Cartesia
-            is_wav_format = False  # Flag for WAV-encoded audio
-
-            if self.tts_provider_name == 'elevenlabs':
-                input_sample_rate = 16000
-            elif self.tts_provider_name == 'openai':
-                input_sample_rate = 24000  # OpenAI TTS outputs 24kHz
-            elif self.tts_provider_name == 'sarvam':
-                # Sarvam returns WAV format @ 8kHz
-                input_sample_rate = 8000
-                is_wav_format = True
-
-            logger.info(f"[CUSTOM]   └─ Input sample rate: {input_sample_rate}Hz, Target: 8000Hz (Twilio requirement)")
-            logger.info(f"[CUSTOM]   └─ Is WAV format: {is_wav_format}")
-
-            # Step 0: Extract PCM from WAV if needed (for Sarvam)
-            if is_wav_format:
-                try:
-                    from app.voice_pipeline.helpers.utils import wav_bytes_to_pcm
-                    logger.info(f"[CUSTOM]   └─ Extracting PCM from WAV container...")
-                    response_audio = wav_bytes_to_pcm(response_audio)
-                    logger.info(f"[CUSTOM] ✅ Extracted PCM: {len(response_audio)} bytes")
-                except Exception as wav_error:
-                    logger.error(f"[CUSTOM] ❌ WAV extraction failed: {wav_error}")
-
-            # Step 1: Resample to 8kHz if needed
-            if input_sample_rate != 8000:
-                try:
-                    logger.info(f"[CUSTOM]   └─ Resampling from {input_sample_rate}Hz to 8000Hz...")
-                    converted_audio, _ = audioop.ratecv(response_audio, 2, 1, input_sample_rate, 8000, None)
-                    logger.info(f"[CUSTOM] ✅ Resampled audio: {len(converted_audio)} bytes")
-                except Exception as conv_error:
-                    logger.error(f"[CUSTOM] ❌ Audio resampling failed: {conv_error}")
-                    converted_audio = response_audio
-            else:
-                logger.info(f"[CUSTOM]   └─ No resampling needed (already 8kHz)")
-                converted_audio = response_audio
-
-            # Step 2: Encode to μ-law for Twilio, keep PCM for FreJun
-            if self.platform == "twilio":
-                try:
-                    logger.info(f"[CUSTOM]   └─ Converting PCM to μ-law for Twilio...")
-                    # Convert PCM to μ-law (G.711) for Twilio
-                    converted_audio = audioop.lin2ulaw(converted_audio, 2)
-                    logger.info(f"[CUSTOM] ✅ Encoded to μ-law: {len(converted_audio)} bytes")
-                except Exception as enc_error:
-                    logger.error(f"[CUSTOM] ❌ μ-law encoding failed: {enc_error}")
-                    # Fall back to PCM (won't work but at least won't crash)
-                    pass
-
-            # Send audio in platform-specific format
-            logger.info(f"[CUSTOM] 📤 === SENDING AUDIO TO {self.platform.upper()} ===")
-            if self.platform == "frejun":
-                # FreJun format
-                audio_b64 = base64.b64encode(converted_audio).decode('utf-8')
-                logger.info(f"[CUSTOM]   └─ Sending FreJun format audio ({len(audio_b64)} chars base64)")
-                await self.websocket.send_json({
-                    "type": "audio",
-                    "audio_b64": audio_b64
-                })
-                logger.info(f"[CUSTOM] ✅ Audio sent to FreJun successfully")
-            else:
-                # Twilio format with mark events (Bolna-style)
-                if not self.stream_sid:
-                    logger.error("[CUSTOM] ❌ Missing streamSid for Twilio audio! Cannot send.")
-                    logger.error("[CUSTOM]   └─ This usually means 'start' event was not received properly")
-                    return
-                else:
-                    logger.info(f"[CUSTOM]   └─ Sending Twilio format audio with mark events (streamSid: {self.stream_sid})")
-                    logger.info(f"[CUSTOM]   └─ Audio size: {len(converted_audio)} bytes")
-                    await self.mark_handler.send_audio_with_marks(
-                        converted_audio,
-                        response_text,
-                        is_final=True
-                    )
-                    logger.info(f"[CUSTOM] ✅ Audio sent to Twilio with mark events")
+            if not await self._send_response_audio(converted_audio, response_text):
+                return
 
             logger.info(f"[CUSTOM] 🎉 === RESPONSE PIPELINE COMPLETE === ({len(converted_audio)} bytes sent)")
 
@@ -758,6 +717,107 @@ class CustomProviderStreamHandler:
         except Exception as e:
             logger.error(f"[CUSTOM] Error in transcribe_and_respond: {e}", exc_info=True)
 
+    def _answer_scope(self) -> Optional[str]:
+        """Answer-cache scope for the current prompt and voice, or None when caching is off for this turn."""
+        if not self.answer_cache_enabled or self.scheduling_task:
+            # Answers during an appointment booking depend on the booking state
+            return None
+        if self.conversation_history[:-1] != [{'role': 'system', 'content': self.system_message}]:
+            # Only the opening question is context-free: later turns depend on (and may repeat)
+            # what this caller said or what was injected, and the cache is shared by all callers
+            return None
+        return answer_scope(self.assistant_id, self.system_message, {
+            "llm": [self.llm_provider, self.llm_model, self.temperature, self.llm_max_tokens],
+            "tts": [self.tts_provider_name, self.tts_model, self.tts_voice, self.tts_speed],
+            "language": self.bot_language,
+        })
+
+    def _convert_tts_audio(self, response_audio: bytes) -> bytes:
+        """Convert TTS output to the platform's wire format (8kHz PCM for FreJun, 8kHz μ-law for Twilio)."""
+        logger.info(f"[CUSTOM] 🔄 Converting audio format...")
+        # Determine input sample rate based on TTS provider
+        input_sample_rate = 8000  # Default for Cartesia
+        is_wav_format = False  # Flag for WAV-encoded audio
+
+        if self.tts_provider_name == 'elevenlabs':
+            input_sample_rate = 16000
+        elif self.tts_provider_name == 'openai':
+            input_sample_rate = 24000  # OpenAI TTS outputs 24kHz
+        elif self.tts_provider_name == 'sarvam':
+            # Sarvam returns WAV format @ 8kHz
+            input_sample_rate = 8000
+            is_wav_format = True
+
+        logger.info(f"[CUSTOM]   └─ Input sample rate: {input_sample_rate}Hz, Target: 8000Hz (Twilio requirement)")
+        logger.info(f"[CUSTOM]   └─ Is WAV format: {is_wav_format}")
+
+        # Step 0: Extract PCM from WAV if needed (for Sarvam)
+        if is_wav_format:
+            try:
+                from app.voice_pipeline.helpers.utils import wav_bytes_to_pcm
+                logger.info(f"[CUSTOM]   └─ Extracting PCM from WAV container...")
+                response_audio = wav_bytes_to_pcm(response_audio)
+                logger.info(f"[CUSTOM] ✅ Extracted PCM: {len(response_audio)} bytes")
+            except Exception as wav_error:
+                logger.error(f"[CUSTOM] ❌ WAV extraction failed: {wav_error}")
+
+        # Step 1: Resample to 8kHz if needed
+        if input_sample_rate != 8000:
+            try:
+                logger.info(f"[CUSTOM]   └─ Resampling from {input_sample_rate}Hz to 8000Hz...")
+                converted_audio, _ = audioop.ratecv(response_audio, 2, 1, input_sample_rate, 8000, None)
+                logger.info(f"[CUSTOM] ✅ Resampled audio: {len(converted_audio)} bytes")
+            except Exception as conv_error:
+                logger.error(f"[CUSTOM] ❌ Audio resampling failed: {conv_error}")
+                converted_audio = response_audio
+        else:
+            logger.info(f"[CUSTOM]   └─ No resampling needed (already 8kHz)")
+            converted_audio = response_audio
+
+        # Step 2: Encode to μ-law for Twilio, keep PCM for FreJun
+        if self.platform == "twilio":
+            try:
+                logger.info(f"[CUSTOM]   └─ Converting PCM to μ-law for Twilio...")
+                # Convert PCM to μ-law (G.711) for Twilio
+                converted_audio = audioop.lin2ulaw(converted_audio, 2)
+                logger.info(f"[CUSTOM] ✅ Encoded to μ-law: {len(converted_audio)} bytes")
+            except Exception as enc_error:
+                logger.error(f"[CUSTOM] ❌ μ-law encoding failed: {enc_error}")
+                # Fall back to PCM (won't work but at least won't crash)
+                pass
+
+        return converted_audio
+
+    async def _send_response_audio(self, converted_audio: bytes, response_text: str) -> bool:
+        """Send converted audio to the platform; False if it could not be sent."""
+        logger.info(f"[CUSTOM] 📤 === SENDING AUDIO TO {self.platform.upper()} ===")
+        if self.platform == "frejun":
+            # FreJun format
+            audio_b64 = base64.b64encode(converted_audio).decode('utf-8')
+            logger.info(f"[CUSTOM]   └─ Sending FreJun format audio ({len(audio_b64)} chars base64)")
+            await self.websocket.send_json({
+                "type": "audio",
+                "audio_b64": audio_b64
+            })
+            logger.info(f"[CUSTOM] ✅ Audio sent to FreJun successfully")
+        else:
+            # Twilio format with mark events (Bolna-style)
+            if not self.stream_sid:
+                logger.error("[CUSTOM] ❌ Missing streamSid for Twilio audio! Cannot send.")
+                logger.error("[CUSTOM]   └─ This usually means 'start' event was not received properly")
+                return False
+            else:
+                logger.info(f"[CUSTOM]   └─ Sending Twilio format audio with mark events (streamSid: {self.stream_sid})")
+                logger.info(f"[CUSTOM]   └─ Audio size: {len(converted_audio)} bytes")
+                await self.mark_handler.send_audio_with_marks(
+                    converted_audio,
+                    response_text,
+                    is_final=True
+                )
+                logger.info(f"[CUSTOM] ✅ Audio sent to Twilio with mark events")
+
+        return True
+
     async def _synthesize_response(self, text: str) -> tuple[Optional[bytes], float]:
         """
         Internal helper to synthesize speech from text
@@ -810,7 +870,7 @@ class CustomProviderStreamHandler:
 
         except Exception as e:
             logger.error(f"[CUSTOM] Error generating LLM response: {e}", exc_info=True)
-            return "I apologize, I'm having trouble processing that right now."
+            return LLM_FALLBACK_RESPONSE
 
     async def check_calendar_intent(self):
         """Check if conversation indicates an appointment should be scheduled"""
@@ -1207,6 +1267,8 @@ async def handle_custom_provider_stream(
             "llm_model": assistant.get("llm_model"),
             "llm_max_tokens": assistant.get("llm_max_tokens", 150),
             "bot_language": assistant.get("bot_language", "en"),
+            "kb_embedding_backend": assistant.get("kb_embedding_backend"),
+            "answer_cache_enabled": assistant.get("answer_cache_enabled", True),
             # Calendar integration settings
             "calendar_enabled": assistant.get("calendar_enabled", False),
             "calendar_account_ids": assistant.get("calendar_account_ids", []),
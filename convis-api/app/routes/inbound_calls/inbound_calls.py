@@ -1,23 +1,24 @@
 import os
 import json
 import asyncio
-import websockets
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, WebSocket, Request, HTTPException, status
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.websockets import WebSocketDisconnect
 from twilio.twiml.voice_response import VoiceResponse, Connect
-from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 from bson import ObjectId
 from app.config.database import Database
 from app.config.settings import settings
-from app.utils.assistant_keys import resolve_assistant_api_key
-from app.utils.twilio_helpers import decrypt_twilio_credentials
 from app.utils import conversational_rag
 from app.utils.openai_session import (
     send_session_update,
+    send_prebuilt_session_update,
+    send_initial_conversation_item,
+    read_until_stream_start,
+    replay_then_iter,
     send_mark,
     handle_interruption,
     inject_knowledge_base_context,
@@ -31,6 +32,9 @@ from app.utils.openai_session import (
 )
 from app.services.calendar_service import CalendarService
 from app.services.calendar_intent_service import CalendarIntentService
+from app.services.assistant_runtime_cache import assistant_runtime_cache
+from app.services.twilio_client_pool import twilio_client_pool
+from app.services.realtime_session_pool import realtime_session_pool
 from app.models.inbound_calls import InboundCallConfig, InboundCallResponse
 from fastapi.responses import PlainTextResponse
 import logging
@@ -152,24 +156,21 @@ async def handle_incoming_call(assistant_id: str, request: Request):
         HTTPException: If assistant not found or error occurs
     """
     try:
-        db = Database.get_db()
-        assistants_collection = db['assistants']
-
         logger.info(f"Incoming call for assistant: {assistant_id}")
 
         # Convert to ObjectId
         try:
-            assistant_obj_id = ObjectId(assistant_id)
+            ObjectId(assistant_id)
         except Exception:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid assistant_id format"
             )
 
-        # Fetch assistant configuration
-        assistant = assistants_collection.find_one({"_id": assistant_obj_id})
+        # Fetch (and warm) the compiled assistant snapshot used by the media stream
+        runtime = assistant_runtime_cache.get(assistant_id)
 
-        if not assistant:
+        if not runtime:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="AI assistant not found"
@@ -229,9 +230,6 @@ async def handle_custom_stream(websocket: WebSocket, assistant_id: str):
     logger.info(f"[CUSTOM_STREAM] ✅ WebSocket connection accepted")
 
     try:
-        db = Database.get_db()
-        assistants_collection = db['assistants']
-
         # Fetch assistant configuration
         try:
             assistant_obj_id = ObjectId(assistant_id)
@@ -241,14 +239,16 @@ async def handle_custom_stream(websocket: WebSocket, assistant_id: str):
             await websocket.close(code=1008, reason="Invalid assistant_id")
             return
 
-        logger.info(f"[CUSTOM_STREAM] 🔍 Fetching assistant from database...")
-        assistant = assistants_collection.find_one({"_id": assistant_obj_id})
+        logger.info(f"[CUSTOM_STREAM] 🔍 Loading assistant runtime snapshot...")
+        runtime = assistant_runtime_cache.get(assistant_id)
 
-        if not assistant:
+        if not runtime:
             logger.error(f"[CUSTOM_STREAM] ❌ Assistant not found in database: {assistant_id}")
             await websocket.close(code=1008, reason="Assistant not found")
             return
 
+        assistant = runtime.assistant_copy()
+
         logger.info(f"[CUSTOM_STREAM] ✅ Assistant found: {assistant.get('name', 'Unknown')}")
 
         # Verify this is a custom provider assistant
@@ -265,26 +265,17 @@ async def handle_custom_stream(websocket: WebSocket, assistant_id: str):
 
         # Use CustomProviderStreamHandler (Bolna-style)
         from app.routes.frejun.custom_provider_stream import CustomProviderStreamHandler
-        from app.utils.assistant_keys import resolve_provider_keys, resolve_assistant_api_key
-
-        # Get user ID for API key resolution
-        assistant_user_id = assistant.get('user_id')
-        if isinstance(assistant_user_id, str):
-            assistant_user_id = ObjectId(assistant_user_id)
 
-        logger.info(f"[CUSTOM_STREAM] 🔑 Resolving API keys for user: {assistant_user_id}")
-
-        # Resolve OpenAI API key
-        try:
-            openai_api_key, _ = resolve_assistant_api_key(db, assistant, required_provider="openai")
-            logger.info(f"[CUSTOM_STREAM] ✅ OpenAI API key resolved")
-        except HTTPException as exc:
-            logger.error(f"[CUSTOM_STREAM] ❌ Failed to resolve OpenAI API key: {exc.detail}")
-            await websocket.close(code=1008, reason=f"API key error: {exc.detail}")
+        # OpenAI API key (resolved when the snapshot was compiled)
+        openai_api_key = runtime.openai_api_key
+        if runtime.openai_key_error:
+            logger.error(f"[CUSTOM_STREAM] ❌ Failed to resolve OpenAI API key: {runtime.openai_key_error}")
+            await websocket.close(code=1008, reason=f"API key error: {runtime.openai_key_error}")
             return
+        logger.info(f"[CUSTOM_STREAM] ✅ OpenAI API key resolved")
 
-        # Resolve all provider keys
-        provider_keys = resolve_provider_keys(db, assistant, assistant_user_id)
+        # All provider keys
+        provider_keys = dict(runtime.provider_keys)
         logger.info(f"[CUSTOM_STREAM] ✅ Resolved provider keys: {list(provider_keys.keys())}")
 
         # Initialize custom provider handler
@@ -326,47 +317,33 @@ async def handle_media_stream(websocket: WebSocket, assistant_id: str):
     """
     logger.info(f"Client connected for assistant: {assistant_id}")
     await websocket.accept()
+    media_connected_at = time.perf_counter()
 
     try:
         db = Database.get_db()
-        assistants_collection = db['assistants']
 
         # Convert to ObjectId
         try:
-            assistant_obj_id = ObjectId(assistant_id)
+            ObjectId(assistant_id)
         except Exception as e:
             logger.error(f"Invalid assistant_id format: {e}")
             await websocket.close(code=1008, reason="Invalid assistant_id")
             return
 
-        # Fetch assistant configuration
-        assistant = assistants_collection.find_one({"_id": assistant_obj_id})
+        # Compiled assistant snapshot (no database reads when the cache is warm)
+        runtime = assistant_runtime_cache.get(assistant_id)
 
-        if not assistant:
+        if not runtime:
             logger.error(f"Assistant not found: {assistant_id}")
             await websocket.close(code=1008, reason="Assistant not found")
             return
 
-        provider_connections_collection = db['provider_connections']
+        assistant = runtime.assistant_copy()
         twilio_client = None
-        assistant_user_id = assistant.get('user_id')
+        assistant_user_id = runtime.user_id
         try:
-            twilio_connection = None
-            if assistant_user_id:
-                twilio_connection = provider_connections_collection.find_one({
-                    "user_id": assistant_user_id,
-                    "provider": "twilio"
-                })
-            account_sid = None
-            auth_token = None
-            if twilio_connection:
-                account_sid, auth_token = decrypt_twilio_credentials(twilio_connection)
-            if not account_sid:
-                account_sid = settings.twilio_account_sid
-            if not auth_token:
-                auth_token = settings.twilio_auth_token
-            if account_sid and auth_token:
-                twilio_client = Client(account_sid, auth_token)
+            if runtime.twilio_account_sid and runtime.twilio_auth_token:
+                twilio_client = twilio_client_pool.get_client(runtime.twilio_account_sid, runtime.twilio_auth_token)
             else:
                 logger.warning(
                     "Twilio credentials not available for assistant %s; hangup control will be limited",
@@ -376,21 +353,19 @@ async def handle_media_stream(websocket: WebSocket, assistant_id: str):
             logger.error(f"Failed to initialize Twilio client for assistant {assistant_id}: {cred_error}")
             twilio_client = None
 
-        system_message = assistant['system_message']
-        voice = assistant['voice']
-        temperature = assistant['temperature']
-        call_greeting = assistant.get('call_greeting')
-        bot_language = assistant.get('bot_language', 'en')
-        voice_mode = assistant.get('voice_mode', 'realtime')  # Get voice mode
+        system_message = runtime.system_message
+        voice = runtime.voice
+        temperature = runtime.temperature
+        call_greeting = runtime.call_greeting
+        voice_mode = runtime.voice_mode  # Get voice mode
 
         logger.info(f"[INBOUND] Voice mode: {voice_mode}")
 
-        # Resolve OpenAI API key for the assistant (needed for both modes)
-        try:
-            openai_api_key, _ = resolve_assistant_api_key(db, assistant, required_provider="openai")
-        except HTTPException as exc:
-            logger.error(f"Failed to resolve OpenAI API key: {exc.detail}")
-            await websocket.close(code=1008, reason=f"API key configuration error: {exc.detail}")
+        # OpenAI API key for the assistant (needed for both modes)
+        openai_api_key = runtime.openai_api_key
+        if runtime.openai_key_error:
+            logger.error(f"Failed to resolve OpenAI API key: {runtime.openai_key_error}")
+            await websocket.close(code=1008, reason=f"API key configuration error: {runtime.openai_key_error}")
             return
 
         # Route to appropriate handler based on voice mode
@@ -398,16 +373,8 @@ async def handle_media_stream(websocket: WebSocket, assistant_id: str):
             # Use advanced streaming voice pipeline (WebSocket-based ASR -> LLM -> TTS)
             logger.info("[INBOUND] Using advanced streaming pipeline for custom provider mode")
             from app.voice_pipeline.pipeline import StreamProviderHandler
-            from app.utils.assistant_keys import resolve_provider_keys
-
-            # Get user ID for API key resolution
-            assistant_user_id = assistant.get('user_id')
-            if isinstance(assistant_user_id, str):
-                from bson import ObjectId
-                assistant_user_id = ObjectId(assistant_user_id)
 
-            # Resolve API keys from database (user's stored keys) with environment fallback
-            api_keys = resolve_provider_keys(db, assistant, assistant_user_id)
+            api_keys = dict(runtime.provider_keys)
 
             logger.info(f"[INBOUND] Resolved API keys for providers: {list(api_keys.keys())}")
 
@@ -433,117 +400,24 @@ async def handle_media_stream(websocket: WebSocket, assistant_id: str):
         # Continue with realtime API mode (default)
         logger.info("[INBOUND] Using OpenAI Realtime API mode")
 
-        # Add language instruction to system message if not English
-        if bot_language and bot_language != 'en':
-            language_names = {
-                'hi': 'Hindi',
-                'es': 'Spanish',
-                'fr': 'French',
-                'de': 'German',
-                'pt': 'Portuguese',
-                'it': 'Italian',
-                'ja': 'Japanese',
-                'ko': 'Korean',
-                'ar': 'Arabic',
-                'ru': 'Russian',
-                'zh': 'Chinese',
-                'nl': 'Dutch',
-                'pl': 'Polish',
-                'tr': 'Turkish'
-            }
-            language_name = language_names.get(bot_language, bot_language.upper())
-            system_message = f"{system_message}\n\nIMPORTANT: You MUST speak and respond ONLY in {language_name}. All your responses should be in {language_name} language."
-
-        timezone_hint = (
-            assistant.get('timezone')
-            or settings.default_timezone
-            or "America/New_York"
-        )
+        # Language and calendar instructions are already compiled into the snapshot prompt
+        system_message = runtime.realtime_system_message
+        timezone_hint = runtime.timezone_hint
 
-        # Calendar integration state
-        assistant_user_id = assistant.get('user_id')
-        calendar_enabled = False
-        default_calendar_provider = "google"
-        calendar_service: Optional[CalendarService] = None
-        calendar_intent_service: Optional[CalendarIntentService] = None
+        # Calendar integration state (calendar accounts were validated when the snapshot was built)
+        calendar_enabled = runtime.calendar_enabled
+        default_calendar_provider = runtime.default_calendar_provider
+        calendar_service: Optional[CalendarService] = CalendarService() if calendar_enabled else None
+        calendar_intent_service: Optional[CalendarIntentService] = CalendarIntentService() if calendar_enabled else None
         conversation_history: List[Dict[str, str]] = []
         scheduling_task: Optional[asyncio.Task] = None
         appointment_scheduled = False
         appointment_metadata: Dict[str, Any] = {}
-        calendar_account_id_for_booking = None
-        calendar_account_ids_list = []
-
-        # Check if assistant has calendar accounts assigned (new multi-calendar support)
-        assistant_calendar_ids = assistant.get('calendar_account_ids', [])
-        assistant_calendar_enabled = assistant.get('calendar_enabled', False)
-
-        # NEW: Support multiple calendars
-        if assistant_calendar_ids and assistant_calendar_enabled and assistant_user_id:
-            calendar_accounts_collection = db["calendar_accounts"]
-            # Verify all calendar accounts exist and belong to the user
-            valid_calendar_ids = []
-            for cal_id in assistant_calendar_ids:
-                calendar_account = calendar_accounts_collection.find_one({
-                    "_id": cal_id,
-                    "user_id": assistant_user_id
-                })
-                if calendar_account:
-                    valid_calendar_ids.append(str(cal_id))
-
-            if valid_calendar_ids:
-                calendar_enabled = True
-                calendar_account_ids_list = valid_calendar_ids
-                calendar_service = CalendarService()
-                calendar_intent_service = CalendarIntentService()
-                logger.info(f"[INBOUND] Multi-calendar enabled for assistant {assistant_id} with {len(valid_calendar_ids)} calendar(s)")
-
-        # FALLBACK: Support legacy single calendar_account_id
-        elif not calendar_enabled:
-            assistant_calendar_id = assistant.get('calendar_account_id')
-            if assistant_calendar_id and assistant_user_id:
-                calendar_accounts_collection = db["calendar_accounts"]
-                calendar_account = calendar_accounts_collection.find_one({
-                    "_id": assistant_calendar_id,
-                    "user_id": assistant_user_id
-                })
-                if calendar_account:
-                    calendar_enabled = True
-                    calendar_account_id_for_booking = assistant_calendar_id
-                    calendar_account_ids_list = [str(assistant_calendar_id)]
-                    default_calendar_provider = calendar_account.get("provider", "google")
-                    calendar_service = CalendarService()
-                    calendar_intent_service = CalendarIntentService()
-                    logger.info(f"[INBOUND] Calendar enabled for assistant {assistant_id} using legacy single account {calendar_account.get('email')}")
-                calendar_instructions = f"""
-
----
-Calendar Scheduling Instructions:
-You can schedule meetings and appointments during this call. When the person requests to schedule a meeting or appointment:
-
-1. Ask for the preferred date and time
-2. Confirm the meeting title/purpose
-3. Confirm the duration (default to 30 minutes if not specified)
-4. **IMPORTANT: Confirm their timezone** - Ask "What timezone are you in?" or "Just to confirm, you're in [timezone], correct?"
-5. Let them know you'll schedule it
-
-Default timezone (if they don't specify): {timezone_hint}
-
-Example conversation:
-Person: "Can we schedule a follow-up meeting?"
-You: "Of course! When would you like to schedule the meeting? What date and time works best for you?"
-Person: "How about next Tuesday at 2 PM?"
-You: "Perfect! And just to confirm, what timezone are you in?"
-Person: "I'm in India, IST timezone."
-You: "Great! So I'll schedule a follow-up meeting for next Tuesday at 2 PM Indian Standard Time. It will be for 30 minutes. Is that correct?"
-Person: "Yes, that works."
-You: "Excellent! I've scheduled your meeting and it will be added to your calendar."
-
-IMPORTANT:
-- Always confirm the timezone before finalizing the appointment
-- Be natural and conversational
-- Don't mention "the system" or technical details
-- If they mention a timezone, use it; otherwise use {timezone_hint}"""
-                system_message = f"{system_message}{calendar_instructions}"
+        calendar_account_id_for_booking = runtime.calendar_account_id_for_booking
+        calendar_account_ids_list = list(runtime.calendar_account_ids)
+
+        if calendar_enabled:
+            logger.info(f"[INBOUND] Calendar enabled for assistant {assistant_id} with {len(calendar_account_ids_list)} calendar(s)")
 
         async def maybe_schedule_from_conversation(trigger: str = "") -> None:
             """
@@ -824,10 +698,9 @@ IMPORTANT:
         if not use_openai_realtime:
             logger.info(f"[INBOUND] Routing to custom provider handler for assistant {assistant_id}")
             from app.routes.frejun.custom_provider_stream import CustomProviderStreamHandler
-            from app.utils.assistant_keys import resolve_provider_keys
 
-            # Resolve all necessary API keys
-            provider_keys = resolve_provider_keys(db, assistant, assistant_user_id)
+            # API keys were resolved when the runtime snapshot was compiled
+            provider_keys = dict(runtime.provider_keys)
 
             # Ensure we have a key for the configured LLM provider
             llm_api_key = provider_keys.get(llm_provider)
@@ -843,6 +716,7 @@ IMPORTANT:
 
             # Create assistant config for custom provider handler
             assistant_config = {
+                'assistant_id': assistant_id,
                 'system_message': system_message,
                 'voice': voice,
                 'temperature': temperature,
@@ -864,6 +738,8 @@ IMPORTANT:
                 'response_rate': assistant.get('response_rate', 'balanced'),
                 'check_user_online': assistant.get('check_user_online', True),
                 'audio_buffer_size': assistant.get('audio_buffer_size', 200),
+                'kb_embedding_backend': assistant.get('kb_embedding_backend'),
+                'answer_cache_enabled': assistant.get('answer_cache_enabled', True),
                 'provider_keys': provider_keys
             }
 
@@ -893,134 +769,39 @@ IMPORTANT:
             logger.warning(f"Temperature {temperature} is below OpenAI minimum. Adjusting to 0.6")
             temperature = 0.6
 
-        # Retrieve the assistant's OpenAI API key
-        try:
-            openai_api_key, _ = resolve_assistant_api_key(db, assistant, required_provider="openai")
-        except HTTPException as exc:
-            logger.error(f"Failed to resolve API key for assistant {assistant_id}: {exc.detail}")
-            await websocket.close(code=1008, reason=exc.detail)
-            return
-
-        # Determine if we should use OpenAI Realtime API or custom providers
-        asr_provider = assistant.get('asr_provider', 'openai')
-        tts_provider = assistant.get('tts_provider', 'openai')
-        llm_provider = assistant.get('llm_provider', 'openai')
-
-        # Check if using all OpenAI providers (eligible for Realtime API)
-        # Accept both 'openai' and 'openai-realtime' as valid OpenAI Realtime providers
-        use_openai_realtime = (
-            asr_provider == 'openai' and
-            tts_provider == 'openai' and
-            (llm_provider == 'openai' or llm_provider == 'openai-realtime')
-        )
-
-        logger.info(f"[INBOUND] Provider Configuration: ASR={asr_provider}, TTS={tts_provider}, LLM={llm_provider}")
-        logger.info(f"[INBOUND] Using OpenAI Realtime API: {use_openai_realtime}")
-
-        # If using custom providers, delegate to custom provider handler
-        if not use_openai_realtime:
-            logger.info(f"[INBOUND] Routing to custom provider handler for assistant {assistant_id}")
-            from app.routes.frejun.custom_provider_stream import CustomProviderStreamHandler
-            from app.utils.assistant_keys import resolve_provider_keys
-
-            # Resolve all necessary API keys
-            provider_keys = resolve_provider_keys(db, assistant, assistant_user_id)
-
-            # Ensure we have a key for the configured LLM provider
-            llm_api_key = provider_keys.get(llm_provider)
-            if llm_provider in ('openai', 'openai-realtime') and not llm_api_key:
-                llm_api_key = provider_keys.get('openai') or openai_api_key
-
-            if not llm_api_key:
-                logger.error(f"No API key found for LLM provider: {llm_provider}")
-                await websocket.close(code=1008, reason=f"No API key configured for {llm_provider}")
-                return
-
-            # Create assistant config for custom provider handler
-            assistant_config = {
-                'system_message': system_message,
-                'voice': voice,
-                'temperature': temperature,
-                'greeting': call_greeting,
-                'asr_provider': asr_provider,
-                'tts_provider': tts_provider,
-                'llm_provider': llm_provider,
-                'asr_language': assistant.get('asr_language', 'en'),
-                'asr_model': assistant.get('asr_model'),
-                'asr_keywords': assistant.get('asr_keywords', []),
-                'tts_model': assistant.get('tts_model'),
-                'tts_speed': assistant.get('tts_speed', 1.0),
-                'tts_voice': assistant.get('tts_voice'),
-                'llm_model': assistant.get('llm_model'),
-                'llm_max_tokens': assistant.get('llm_max_tokens', 150),
-                'bot_language': bot_language,
-                'enable_precise_transcript': assistant.get('enable_precise_transcript', False),
-                'interruption_threshold': assistant.get('interruption_threshold', 2),
-                'response_rate': assistant.get('response_rate', 'balanced'),
-                'check_user_online': assistant.get('check_user_online', True),
-                'audio_buffer_size': assistant.get('audio_buffer_size', 200),
-                'provider_keys': provider_keys  # Pass all resolved keys
-            }
-
-            # Use custom provider stream handler (Twilio platform for inbound)
-            handler = CustomProviderStreamHandler(
-                websocket=websocket,
-                assistant_config=assistant_config,
-                openai_api_key=llm_api_key,  # Use the resolved LLM key
-                call_id="twilio_inbound_custom_provider",  # Twilio will provide call_sid via websocket
-                platform="twilio",
-                provider_keys=provider_keys
-            )
-
-            try:
-                await handler.handle_stream()
-            except Exception as e:
-                logger.error(f"[INBOUND] Error in custom provider handler: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
-            finally:
-                await websocket.close()
-            return
-
         # OpenAI Realtime API path (existing code)
         # Get the LLM model to use for OpenAI Realtime API
-        llm_model = assistant.get('llm_model', 'gpt-4o-mini-realtime-preview')
+        llm_model = runtime.llm_model
         logger.info(f"[INBOUND] Using OpenAI Realtime API - Model: {llm_model}, Voice: {voice}, Temperature: {temperature}")
 
-        # Connect to OpenAI WebSocket using the assistant's API key and selected model
-        # Increased timeout to handle connection delays
-        async with websockets.connect(
-            f"wss://api.openai.com/v1/realtime?model={llm_model}&temperature={temperature}",
-            additional_headers={
-                "Authorization": f"Bearer {openai_api_key}",
-                "OpenAI-Beta": "realtime=v1"
-            },
-            open_timeout=30,  # Increased from default 10s to 30s
-            close_timeout=10,
-            ping_interval=20,
-            ping_timeout=20
-        ) as openai_ws:
-            # Initialize session with interruption handling enabled
-            # NOTE: send_session_update now calls send_initial_conversation_item internally
-            # This matches the original pattern from CallTack_IN_out/inbound_calls.py line 223
-
+        # Read Twilio's `start` event first so a session pre-opened by the webhook
+        # (keyed by call SID) can be adopted; otherwise connect cold as before.
+        buffered_twilio_messages, stream_call_sid = await read_until_stream_start(websocket)
+
+        async with realtime_session_pool.session(
+            stream_call_sid,
+            runtime,
+            llm_model,
+            temperature,
+            openai_api_key
+        ) as (openai_ws, preopened):
             # Get VAD settings from assistant config for noise suppression
-            vad_threshold = assistant_config.get('vad_threshold', 0.5)
-            vad_prefix_padding_ms = assistant_config.get('vad_prefix_padding_ms', 300)
-            vad_silence_duration_ms = assistant_config.get('vad_silence_duration_ms', 500)
-
-            await send_session_update(
-                openai_ws,
-                system_message,
-                voice,
-                temperature,
-                enable_interruptions=True,
-                greeting_text=call_greeting,
-                max_response_output_tokens="inf",  # Allow unlimited response length for natural conversation
-                vad_threshold=vad_threshold,  # Noise sensitivity control
-                vad_prefix_padding_ms=vad_prefix_padding_ms,  # Speech start padding
-                vad_silence_duration_ms=vad_silence_duration_ms  # Silence detection for noise handling
-            )
+            vad_threshold = assistant.get('vad_threshold', 0.5)
+            vad_prefix_padding_ms = assistant.get('vad_prefix_padding_ms', 300)
+            vad_silence_duration_ms = assistant.get('vad_silence_duration_ms', 500)
+
+            if preopened:
+                # Session already carries runtime.session_update; just start the greeting
+                await send_initial_conversation_item(openai_ws, call_greeting)
+            else:
+                # Initialize session with the precompiled session.update payload
+                # NOTE: send_prebuilt_session_update sends the initial conversation item internally
+                # This matches the original pattern from CallTack_IN_out/inbound_calls.py line 223
+                await send_prebuilt_session_update(
+                    openai_ws,
+                    runtime.session_update,
+                    greeting_text=call_greeting
+                )
 
             # Connection specific state
             stream_sid = None
@@ -1032,12 +813,13 @@ IMPORTANT:
             awaiting_hangup_confirmation = False
             pending_hangup_goodbye = False
             hangup_completed = False
+            first_audio_sent = False
 
             async def receive_from_twilio():
                 """Receive audio data from Twilio and send it to the OpenAI Realtime API."""
                 nonlocal stream_sid, latest_media_timestamp, call_sid, hangup_completed
                 try:
-                    async for message in websocket.iter_text():
+                    async for message in replay_then_iter(buffered_twilio_messages, websocket):
                         if hangup_completed:
                             logger.info("Hangup already completed; stopping Twilio receive loop")
                             break
@@ -1153,6 +935,7 @@ IMPORTANT:
                 """Receive events from the OpenAI Realtime API, send audio back to Twilio."""
                 nonlocal stream_sid, last_assistant_item, response_start_timestamp_twilio
                 nonlocal awaiting_hangup_confirmation, pending_hangup_goodbye, hangup_completed
+                nonlocal first_audio_sent
                 nonlocal conversation_history, appointment_scheduled, scheduling_task
 
                 response_transcript_buffers: Dict[str, str] = {}
@@ -1165,7 +948,7 @@ IMPORTANT:
                     pending_hangup_goodbye = False
                     if twilio_client and call_sid:
                         try:
-                            twilio_client.calls(call_sid).update(status="completed")
+                            await twilio_client_pool.hangup_call(twilio_client, call_sid)
                             logger.info(f"Requested Twilio to end call {call_sid}")
                         except TwilioRestException as twilio_error:
                             logger.error(f"Twilio error ending call {call_sid}: {twilio_error}")
@@ -1228,6 +1011,12 @@ IMPORTANT:
                             }
                             await websocket.send_json(audio_delta)
 
+                            if not first_audio_sent:
+                                first_audio_sent = True
+                                realtime_session_pool.record_first_audio(
+                                    preopened, (time.perf_counter() - media_connected_at) * 1000
+                                )
+
                             if response_start_timestamp_twilio is None:
                                 response_start_timestamp_twilio = latest_media_timestamp
                                 if SHOW_TIMING_MATH:
@@ -1359,12 +1148,13 @@ IMPORTANT:
 
                                             # Search knowledge base
                                             try:
-                                                kb_context = conversational_rag.search_conversation_context(
+                                                kb_context = await conversational_rag.search_conversation_context(
                                                     assistant_id=assistant_id,
                                                     query=transcript,
                                                     api_key=openai_api_key,
                                                     top_k=3,
-                                                    relevance_threshold=0.7
+                                                    relevance_threshold=0.7,
+                                                    database_config=runtime.database_config
                                                 )
                                                 if kb_context:
                                                     logger.info("Found relevant knowledge base context")
@@ -2,7 +2,7 @@ import os
 import json
 import asyncio
 import re
-import websockets
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, WebSocket, HTTPException, status, Request
@@ -18,6 +18,10 @@ from app.utils.twilio_helpers import decrypt_twilio_credentials
 from app.utils import conversational_rag
 from app.utils.openai_session import (
     send_session_update,
+    send_prebuilt_session_update,
+    send_initial_conversation_item,
+    read_until_stream_start,
+    replay_then_iter,
     send_mark,
     handle_interruption,
     inject_knowledge_base_context,
@@ -31,6 +35,11 @@ from app.utils.openai_session import (
 )
 from app.services.calendar_service import CalendarService
 from app.services.calendar_intent_service import CalendarIntentService
+from app.services.assistant_runtime_cache import assistant_runtime_cache, build_calendar_instructions
+from app.services.twilio_client_pool import twilio_client_pool
+from app.services.realtime_session_pool import realtime_session_pool
+from app.services.worker_load import worker_load
+from app.services.call_events import CallEvent, call_events
 from app.models.outbound_calls import (
     OutboundCallRequest,
     OutboundCallResponse,
@@ -167,10 +176,10 @@ async def get_call_status(call_sid: str, user_id: str):
                 detail="Stored Twilio credentials are missing or invalid. Please reconnect Twilio."
             )
 
-        twilio_client = Client(account_sid, auth_token)
+        twilio_client = twilio_client_pool.get_client(account_sid, auth_token)
 
         # Fetch call status from Twilio
-        call = twilio_client.calls(call_sid).fetch()
+        call = await twilio_client_pool.fetch_call(twilio_client, call_sid)
 
         # Update database with latest status
         call_logs_collection.update_one(
@@ -261,10 +270,10 @@ async def hangup_call(call_sid: str, user_id: str):
                 detail="Stored Twilio credentials are missing or invalid. Please reconnect Twilio."
             )
 
-        twilio_client = Client(account_sid, auth_token)
+        twilio_client = twilio_client_pool.get_client(account_sid, auth_token)
 
         # Hang up the call
-        call = twilio_client.calls(call_sid).update(status='completed')
+        call = await twilio_client_pool.hangup_call(twilio_client, call_sid)
 
         # Update database
         call_logs_collection.update_one(
@@ -354,7 +363,7 @@ async def check_phone_number(user_id: str, phone_number: str):
             )
 
         # Initialize Twilio client with user's credentials
-        twilio_client = Client(account_sid, auth_token)
+        twilio_client = twilio_client_pool.get_client(account_sid, auth_token)
 
         # Check if number is allowed
         is_allowed = await check_number_allowed(twilio_client, phone_number)
@@ -452,7 +461,7 @@ async def make_outbound_call(assistant_id: str, request: OutboundCallRequest):
             )
 
         # Initialize Twilio client with user's credentials
-        twilio_client = Client(account_sid, auth_token)
+        twilio_client = twilio_client_pool.get_client(account_sid, auth_token)
 
         # Validate phone number format (basic E.164 check)
         phone_number = request.phone_number.strip()
@@ -462,6 +471,13 @@ async def make_outbound_call(assistant_id: str, request: OutboundCallRequest):
                 detail="Invalid phone number format. Use E.164 format (e.g., +1234567890)"
             )
 
+        # Admission control: the media tier must have a free stream for this call
+        if not worker_load.admit_call():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="All call lines are busy. Please try again shortly."
+            )
+
         # Check if number is allowed to be called
         is_allowed = await check_number_allowed(twilio_client, phone_number)
         if not is_allowed:
@@ -523,7 +539,8 @@ async def make_outbound_call(assistant_id: str, request: OutboundCallRequest):
         logger.info(f"WebSocket URL: wss://{domain}/api/outbound-calls/media-stream/{assistant_id}")
 
         # Make the call with recording enabled
-        call = twilio_client.calls.create(
+        call = await twilio_client_pool.create_call(
+            twilio_client,
             from_=phone_number_from,
             to=phone_number,
             twiml=outbound_twiml,
@@ -536,6 +553,13 @@ async def make_outbound_call(assistant_id: str, request: OutboundCallRequest):
 
         logger.info(f"Call created with SID: {call.sid}")
 
+        # Open the Realtime session while the phone rings; kept long enough to cover ringing
+        realtime_session_pool.preopen(
+            call.sid,
+            assistant_runtime_cache.get(assistant_id),
+            ttl=settings.realtime_preopen_outbound_ttl_seconds
+        )
+
         # Build voice configuration info for tracking
         voice_config = {
             "asr_provider": assistant.get('asr_provider', 'openai'),
@@ -605,47 +629,33 @@ async def handle_media_stream(websocket: WebSocket, assistant_id: str):
     """
     logger.info(f"Outbound call media stream connected for assistant: {assistant_id}")
     await websocket.accept()
+    media_connected_at = time.perf_counter()
 
     try:
         db = Database.get_db()
-        assistants_collection = db['assistants']
 
         # Convert to ObjectId
         try:
-            assistant_obj_id = ObjectId(assistant_id)
+            ObjectId(assistant_id)
         except Exception as e:
             logger.error(f"Invalid assistant_id format: {e}")
             await websocket.close(code=1008, reason="Invalid assistant_id")
             return
 
-        # Fetch assistant configuration
-        assistant = assistants_collection.find_one({"_id": assistant_obj_id})
+        # Compiled assistant snapshot (no database reads when the cache is warm)
+        runtime = assistant_runtime_cache.get(assistant_id)
 
-        if not assistant:
+        if not runtime:
             logger.error(f"Assistant not found: {assistant_id}")
             await websocket.close(code=1008, reason="Assistant not found")
             return
 
-        provider_connections_collection = db['provider_connections']
+        assistant = runtime.assistant_copy()
         twilio_client = None
-        assistant_user_id = assistant.get('user_id')
+        assistant_user_id = runtime.user_id
         try:
-            twilio_connection = None
-            if assistant_user_id:
-                twilio_connection = provider_connections_collection.find_one({
-                    "user_id": assistant_user_id,
-                    "provider": "twilio"
-                })
-            account_sid = None
-            auth_token = None
-            if twilio_connection:
-                account_sid, auth_token = decrypt_twilio_credentials(twilio_connection)
-            if not account_sid:
-                account_sid = settings.twilio_account_sid
-            if not auth_token:
-                auth_token = settings.twilio_auth_token
-            if account_sid and auth_token:
-                twilio_client = Client(account_sid, auth_token)
+            if runtime.twilio_account_sid and runtime.twilio_auth_token:
+                twilio_client = twilio_client_pool.get_client(runtime.twilio_account_sid, runtime.twilio_auth_token)
             else:
                 logger.warning(
                     "Twilio credentials not available for assistant %s; hangup control will be limited",
@@ -655,21 +665,19 @@ async def handle_media_stream(websocket: WebSocket, assistant_id: str):
             logger.error(f"Failed to initialize Twilio client for assistant {assistant_id}: {cred_error}")
             twilio_client = None
 
-        system_message = assistant['system_message']
-        voice = assistant['voice']
-        temperature = assistant['temperature']
-        call_greeting = assistant.get('call_greeting')
-        bot_language = assistant.get('bot_language', 'en')
-        voice_mode = assistant.get('voice_mode', 'realtime')  # Get voice mode
+        system_message = runtime.system_message
+        voice = runtime.voice
+        temperature = runtime.temperature
+        call_greeting = runtime.call_greeting
+        voice_mode = runtime.voice_mode  # Get voice mode
 
         logger.info(f"[OUTBOUND] Voice mode: {voice_mode}")
 
-        # Resolve OpenAI API key for the assistant (needed for both modes)
-        try:
-            openai_api_key, _ = resolve_assistant_api_key(db, assistant, required_provider="openai")
-        except HTTPException as exc:
-            logger.error(f"Failed to resolve OpenAI API key: {exc.detail}")
-            await websocket.close(code=1008, reason=f"API key configuration error: {exc.detail}")
+        # OpenAI API key for the assistant (needed for both modes)
+        openai_api_key = runtime.openai_api_key
+        if runtime.openai_key_error:
+            logger.error(f"Failed to resolve OpenAI API key: {runtime.openai_key_error}")
+            await websocket.close(code=1008, reason=f"API key configuration error: {runtime.openai_key_error}")
             return
 
         # Route to appropriate handler based on voice mode
@@ -725,32 +733,8 @@ async def handle_media_stream(websocket: WebSocket, assistant_id: str):
         # Continue with realtime API mode (default)
         logger.info("[OUTBOUND] Using OpenAI Realtime API mode")
 
-        # Add language instruction to system message if not English
-        if bot_language and bot_language != 'en':
-            language_names = {
-                'hi': 'Hindi',
-                'es': 'Spanish',
-                'fr': 'French',
-                'de': 'German',
-                'pt': 'Portuguese',
-                'it': 'Italian',
-                'ja': 'Japanese',
-                'ko': 'Korean',
-                'ar': 'Arabic',
-                'ru': 'Russian',
-                'zh': 'Chinese',
-                'nl': 'Dutch',
-                'pl': 'Polish',
-                'tr': 'Turkish'
-            }
-            language_name = language_names.get(bot_language, bot_language.upper())
-            system_message = f"{system_message}\n\nIMPORTANT: You MUST speak and respond ONLY in {language_name}. All your responses should be in {language_name} language."
-
-        timezone_hint = (
-            assistant.get('timezone')
-            or settings.default_timezone
-            or "America/New_York"
-        )
+        # Language instruction is already applied to the snapshot prompt
+        timezone_hint = runtime.timezone_hint
 
         calendar_enabled = False
         default_calendar_provider = "google"
@@ -778,7 +762,7 @@ async def handle_media_stream(websocket: WebSocket, assistant_id: str):
         if campaign_id_param:
             try:
                 campaign_obj_id = ObjectId(campaign_id_param)
-                campaign = campaigns_collection.find_one({"_id": campaign_obj_id})
+                campaign = db['campaigns'].find_one({"_id": campaign_obj_id})
                 if campaign:
                     campaign_id = campaign_id_param
                     logger.info(f"Loaded campaign {campaign_id_param} for outbound media stream")
@@ -836,77 +820,21 @@ async def handle_media_stream(websocket: WebSocket, assistant_id: str):
 
             if account_doc:
                 default_calendar_provider = account_doc.get("provider", "google")
-        else:
-            # Check for NEW multi-calendar support (calendar_account_ids)
-            assistant_calendar_ids = assistant.get('calendar_account_ids', [])
-            assistant_calendar_enabled = assistant.get('calendar_enabled', False)
-
-            if assistant_calendar_ids and assistant_calendar_enabled and assistant_user_id:
-                # Verify all calendar accounts exist and belong to the user
-                valid_calendar_ids = []
-                for cal_id in assistant_calendar_ids:
-                    calendar_account = calendar_accounts_collection.find_one({
-                        "_id": cal_id,
-                        "user_id": assistant_user_id
-                    })
-                    if calendar_account:
-                        valid_calendar_ids.append(str(cal_id))
-
-                if valid_calendar_ids:
-                    calendar_enabled = True
-                    calendar_account_ids_list = valid_calendar_ids
-                    calendar_service = CalendarService()
-                    calendar_intent_service = CalendarIntentService()
-                    logger.info(f"[OUTBOUND] Multi-calendar enabled for assistant {assistant_id} with {len(valid_calendar_ids)} calendar(s)")
-
-            # FALLBACK: Support legacy single calendar_account_id
-            if not calendar_enabled and assistant.get('calendar_account_id'):
-                logger.info(f"[OUTBOUND_CALENDAR_CHECK] Entering legacy single calendar check block")
-                assistant_calendar_id = assistant.get('calendar_account_id')
-                account_doc = calendar_accounts_collection.find_one({"_id": assistant_calendar_id})
-                if account_doc:
-                    calendar_enabled = True
-                    calendar_account_id_for_booking = assistant_calendar_id
-                    calendar_account_ids_list = [str(assistant_calendar_id)]
-                    calendar_service = CalendarService()
-                    calendar_intent_service = CalendarIntentService()
-                    default_calendar_provider = account_doc.get("provider", "google")
-                    logger.info(f"[OUTBOUND] Calendar enabled via assistant using legacy single account: {account_doc.get('email')}")
-                else:
-                    logger.error(f"[OUTBOUND] ❌ Calendar account not found for ID: {assistant_calendar_id}")
+        elif runtime.calendar_enabled:
+            # Assistant calendars (multi-calendar, then legacy single) were validated
+            # when the runtime snapshot was compiled
+            calendar_enabled = True
+            calendar_account_ids_list = list(runtime.calendar_account_ids)
+            calendar_account_id_for_booking = runtime.calendar_account_id_for_booking
+            default_calendar_provider = runtime.default_calendar_provider
+            calendar_service = CalendarService()
+            calendar_intent_service = CalendarIntentService()
+            logger.info(f"[OUTBOUND] Calendar enabled for assistant {assistant_id} with {len(calendar_account_ids_list)} calendar(s)")
 
         # Add calendar scheduling instructions if calendar is enabled
         logger.info(f"[OUTBOUND_CALENDAR_CHECK] Final calendar_enabled status: {calendar_enabled}")
         if calendar_enabled:
-            calendar_instructions = f"""
-
----
-Calendar Scheduling Instructions:
-You can schedule meetings and appointments during this call. When the person requests to schedule a meeting or appointment:
-
-1. Ask for the preferred date and time
-2. Confirm the meeting title/purpose
-3. Confirm the duration (default to 30 minutes if not specified)
-4. **IMPORTANT: Confirm their timezone** - Ask "What timezone are you in?" or "Just to confirm, you're in [timezone], correct?"
-5. Let them know you'll schedule it
-
-Default timezone (if they don't specify): {timezone_hint}
-
-Example conversation:
-Person: "Can we schedule a follow-up meeting?"
-You: "Of course! When would you like to schedule the meeting? What date and time works best for you?"
-Person: "How about next Tuesday at 2 PM?"
-You: "Perfect! And just to confirm, what timezone are you in?"
-Person: "I'm in India, IST timezone."
-You: "Great! So I'll schedule a follow-up meeting for next Tuesday at 2 PM Indian Standard Time. It will be for 30 minutes. Is that correct?"
-Person: "Yes, that works."
-You: "Excellent! I've scheduled your meeting and it will be added to your calendar."
-
-IMPORTANT:
-- Always confirm the timezone before finalizing the appointment
-- Be natural and conversational
-- Don't mention "the system" or technical details
-- If they mention a timezone, use it; otherwise use {timezone_hint}"""
+            calendar_instructions = build_calendar_instructions(timezone_hint)
             system_message = f"{system_message}{calendar_instructions}"
 
         async def maybe_schedule_from_conversation(trigger: str = "") -> None:
@@ -1211,10 +1139,9 @@ IMPORTANT:
         if not use_openai_realtime:
             logger.info(f"[TWILIO] Routing to custom provider handler for assistant {assistant_id}")
             from app.routes.frejun.custom_provider_stream import CustomProviderStreamHandler
-            from app.utils.assistant_keys import resolve_provider_keys
 
-            # Resolve all necessary API keys
-            provider_keys = resolve_provider_keys(db, assistant, assistant_user_id)
+            # API keys were resolved when the runtime snapshot was compiled
+            provider_keys = dict(runtime.provider_keys)
 
             # Ensure we have a key for the configured LLM provider
             llm_api_key = provider_keys.get(llm_provider)
@@ -1230,6 +1157,7 @@ IMPORTANT:
 
             # Create assistant config for custom provider handler
             assistant_config = {
+                'assistant_id': assistant_id,
                 'system_message': system_message,
                 'voice': voice,
                 'temperature': temperature,
@@ -1255,6 +1183,8 @@ IMPORTANT:
                 'vad_threshold': assistant.get('vad_threshold', 0.5),
                 'vad_prefix_padding_ms': assistant.get('vad_prefix_padding_ms', 300),
                 'vad_silence_duration_ms': assistant.get('vad_silence_duration_ms', 500),
+                'kb_embedding_backend': assistant.get('kb_embedding_backend'),
+                'answer_cache_enabled': assistant.get('answer_cache_enabled', True),
                 'provider_keys': provider_keys  # Pass all resolved keys
             }
 
@@ -1284,30 +1214,21 @@ IMPORTANT:
             logger.warning(f"Temperature {temperature} is below OpenAI minimum. Adjusting to 0.6")
             temperature = 0.6
 
-        try:
-            openai_api_key, _ = resolve_assistant_api_key(db, assistant, required_provider="openai")
-        except HTTPException as exc:
-            logger.error(f"Failed to resolve API key for assistant {assistant_id}: {exc.detail}")
-            await websocket.close(code=1008, reason=exc.detail)
-            return
-
         # Get the LLM model to use for OpenAI Realtime API
-        llm_model = assistant.get('llm_model', 'gpt-4o-mini-realtime-preview')
+        llm_model = runtime.llm_model
         logger.info(f"[TWILIO] Using OpenAI Realtime API - Model: {llm_model}, Voice: {voice}, Temperature: {temperature}")
 
-        # Connect to OpenAI WebSocket using the assistant's API key and selected model
-        # Increased timeout to handle connection delays
-        async with websockets.connect(
-            f"wss://api.openai.com/v1/realtime?model={llm_model}&temperature={temperature}",
-            additional_headers={
-                "Authorization": f"Bearer {openai_api_key}",
-                "OpenAI-Beta": "realtime=v1"
-            },
-            open_timeout=30,  # Increased from default 10s to 30s
-            close_timeout=10,
-            ping_interval=20,
-            ping_timeout=20
-        ) as openai_ws:
+        # Read Twilio's `start` event first so a session pre-opened when the call was
+        # placed/answered (keyed by call SID) can be adopted; otherwise connect cold.
+        buffered_twilio_messages, stream_call_sid = await read_until_stream_start(websocket)
+
+        async with realtime_session_pool.session(
+            stream_call_sid,
+            runtime,
+            llm_model,
+            temperature,
+            openai_api_key
+        ) as (openai_ws, preopened):
             # Get VAD settings from assistant config for noise suppression
             vad_threshold = assistant.get('vad_threshold', 0.5)
             vad_prefix_padding_ms = assistant.get('vad_prefix_padding_ms', 300)
@@ -1316,18 +1237,29 @@ IMPORTANT:
             # Initialize session with interruption handling enabled
             # NOTE: send_session_update now calls send_initial_conversation_item internally
             # This matches the original pattern from CallTack_IN_out/outbound_call.py
-            await send_session_update(
-                openai_ws,
-                system_message,
-                voice,
-                temperature,
-                enable_interruptions=True,
-                greeting_text=call_greeting,
-                max_response_output_tokens="inf",  # Allow unlimited response length for natural conversation
-                vad_threshold=vad_threshold,
-                vad_prefix_padding_ms=vad_prefix_padding_ms,
-                vad_silence_duration_ms=vad_silence_duration_ms
-            )
+            if system_message == runtime.realtime_system_message and preopened:
+                # Pre-opened session already carries runtime.session_update; just start the greeting
+                await send_initial_conversation_item(openai_ws, call_greeting)
+            elif system_message == runtime.realtime_system_message:
+                # No campaign-specific instructions: replay the precompiled payload
+                await send_prebuilt_session_update(
+                    openai_ws,
+                    runtime.session_update,
+                    greeting_text=call_greeting
+                )
+            else:
+                await send_session_update(
+                    openai_ws,
+                    system_message,
+                    voice,
+                    temperature,
+                    enable_interruptions=True,
+                    greeting_text=call_greeting,
+                    max_response_output_tokens="inf",  # Allow unlimited response length for natural conversation
+                    vad_threshold=vad_threshold,
+                    vad_prefix_padding_ms=vad_prefix_padding_ms,
+                    vad_silence_duration_ms=vad_silence_duration_ms
+                )
 
             # Connection specific state
             stream_sid = None
@@ -1339,12 +1271,13 @@ IMPORTANT:
             awaiting_hangup_confirmation = False
             pending_hangup_goodbye = False
             hangup_completed = False
+            first_audio_sent = False
 
             async def receive_from_twilio():
                 """Receive audio data from Twilio and send it to the OpenAI Realtime API."""
                 nonlocal stream_sid, latest_media_timestamp, call_sid, hangup_completed
                 try:
-                    async for message in websocket.iter_text():
+                    async for message in replay_then_iter(buffered_twilio_messages, websocket):
                         if hangup_completed:
                             logger.info("Hangup already completed; stopping outbound receive loop")
                             break
@@ -1423,6 +1356,7 @@ IMPORTANT:
                 """Receive events from the OpenAI Realtime API, send audio back to Twilio."""
                 nonlocal stream_sid, last_assistant_item, response_start_timestamp_twilio
                 nonlocal awaiting_hangup_confirmation, pending_hangup_goodbye, hangup_completed
+                nonlocal first_audio_sent
                 nonlocal conversation_history, appointment_scheduled, scheduling_task
 
                 response_transcript_buffers: Dict[str, str] = {}
@@ -1435,7 +1369,7 @@ IMPORTANT:
                     pending_hangup_goodbye = False
                     if twilio_client and call_sid:
                         try:
-                            twilio_client.calls(call_sid).update(status="completed")
+                            await twilio_client_pool.hangup_call(twilio_client, call_sid)
                             logger.info(f"Requested Twilio to end outbound call {call_sid}")
                         except TwilioRestException as twilio_error:
                             logger.error(f"Twilio error ending outbound call {call_sid}: {twilio_error}")
@@ -1444,61 +1378,14 @@ IMPORTANT:
                     else:
                         logger.warning("Cannot end outbound call automatically - missing Twilio client or call SID")
 
-                    # CRITICAL FIX: Trigger next call IMMEDIATELY when call ends
-                    # This runs right when the call finishes, ensuring instant sequential dialing
-                    if campaign_id and lead_id:
-                        logger.info(f"[FINALIZE_CALL] Call ended - triggering next call for campaign {campaign_id}")
-
-                        def trigger_next_call_immediate():
-                            try:
-                                from app.services.campaign_dialer import CampaignDialer
-                                dialer = CampaignDialer()
-
-                                # Mark current lead as completed
-                                db = Database.get_db()
-                                leads_collection = db["leads"]
-                                campaigns_collection = db["campaigns"]
-
-                                lead = leads_collection.find_one({"_id": ObjectId(lead_id)})
-                                campaign = campaigns_collection.find_one({"_id": ObjectId(campaign_id)})
-
-                                if lead and campaign:
-                                    # Update lead status to completed
-                                    leads_collection.update_one(
-                                        {"_id": ObjectId(lead_id)},
-                                        {
-                                            "$set": {
-                                                "status": "completed",
-                                                "last_outcome": "completed",
-                                                "updated_at": datetime.utcnow()
-                                            }
-                                        }
-                                    )
-                                    logger.info(f"[FINALIZE_CALL] Marked lead {lead_id} as completed")
-
-                                    # Only trigger next call if campaign is still running
-                                    if campaign.get("status") == "running":
-                                        next_lead = dialer.get_next_lead(campaign_id, ignore_window=False)
-                                        if next_lead:
-                                            logger.info(f"[FINALIZE_CALL] Found next lead: {next_lead.get('name')} ({next_lead.get('e164')})")
-                                            next_call_sid = dialer.place_call(campaign_id, str(next_lead["_id"]))
-                                            if next_call_sid:
-                                                logger.info(f"[FINALIZE_CALL] Next call placed successfully: {next_call_sid}")
-                                            else:
-                                                logger.warning(f"[FINALIZE_CALL] Failed to place next call: {dialer.last_error}")
-                                        else:
-                                            logger.info(f"[FINALIZE_CALL] No more leads available for campaign {campaign_id}")
-                                    else:
-                                        logger.info(f"[FINALIZE_CALL] Campaign {campaign_id} is not running, skipping next call")
-                            except Exception as next_error:
-                                logger.error(f"[FINALIZE_CALL] Error triggering next call: {next_error}")
-                                import traceback
-                                logger.error(traceback.format_exc())
-
-                        # Run in background thread
-                        import threading
-                        threading.Thread(target=trigger_next_call_immediate, daemon=True).start()
-                        logger.info(f"[FINALIZE_CALL] Background thread started for next call")
+                    # The assistant ended the call: close it as completed now rather than
+                    # waiting for Twilio's status callback (whichever arrives first wins)
+                    if campaign_id and lead_id and call_sid:
+                        try:
+                            await call_events.submit(CallEvent(call_sid, "completed", None, lead_id, campaign_id, source="assistant-hangup"))
+                            logger.info(f"[FINALIZE_CALL] Queued completion of campaign call {call_sid}")
+                        except Exception as event_error:
+                            logger.error(f"[FINALIZE_CALL] Could not queue call completion: {event_error}")
 
                     try:
                         if openai_ws.state.name == 'OPEN':
@@ -1568,6 +1455,12 @@ IMPORTANT:
                                 await websocket.send_json(audio_delta)
                                 logger.debug(f"✅ Sent audio chunk to Twilio: {len(audio_payload)} bytes")
 
+                                if not first_audio_sent:
+                                    first_audio_sent = True
+                                    realtime_session_pool.record_first_audio(
+                                        preopened, (time.perf_counter() - media_connected_at) * 1000
+                                    )
+
                                 if response_start_timestamp_twilio is None:
                                     response_start_timestamp_twilio = latest_media_timestamp
                                     if SHOW_TIMING_MATH:
@@ -1704,12 +1597,13 @@ IMPORTANT:
 
                                             # Search knowledge base
                                             try:
-                                                kb_context = conversational_rag.search_conversation_context(
+                                                kb_context = await conversational_rag.search_conversation_context(
                                                     assistant_id=assistant_id,
                                                     query=transcript,
                                                     api_key=openai_api_key,
                                                     top_k=3,
-                                                    relevance_threshold=0.7
+                                                    relevance_threshold=0.7,
+                                                    database_config=runtime.database_config
                                                 )
                                                 if kb_context:
                                                     logger.info("Found relevant knowledge base context")
@@ -1759,13 +1653,13 @@ async def check_number_allowed(twilio_client: Client, phone_number: str) -> bool
     """
     try:
         # Check if it's one of our incoming phone numbers
-        incoming_numbers = twilio_client.incoming_phone_numbers.list(phone_number=phone_number)
+        incoming_numbers = await twilio_client_pool.run(twilio_client.incoming_phone_numbers.list, phone_number=phone_number)
         if incoming_numbers:
             logger.info(f"{phone_number} is an owned incoming number")
             return True
 
         # Check if it's a verified outgoing caller ID
-        outgoing_caller_ids = twilio_client.outgoing_caller_ids.list(phone_number=phone_number)
+        outgoing_caller_ids = await twilio_client_pool.run(twilio_client.outgoing_caller_ids.list, phone_number=phone_number)
         if outgoing_caller_ids:
             logger.info(f"{phone_number} is a verified caller ID")
             return True
@@ -1909,7 +1803,7 @@ async def get_twilio_phone_number(twilio_client: Client) -> str:
         str: Phone number in E.164 format, or None if no numbers available
     """
     try:
-        incoming_numbers = twilio_client.incoming_phone_numbers.list(limit=1)
+        incoming_numbers = await twilio_client_pool.run(twilio_client.incoming_phone_numbers.list, limit=1)
         if incoming_numbers:
             phone_number = incoming_numbers[0].phone_number
             logger.info(f"Using Twilio phone number: {phone_number}")
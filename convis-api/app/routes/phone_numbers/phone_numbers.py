@@ -18,10 +18,11 @@ from app.utils.encryption import encryption_service
 from app.utils.twilio_helpers import decrypt_twilio_credentials
 from app.utils.frejun_helpers import decrypt_frejun_credentials
 from app.utils.pricing import PricingCalculator
+from app.services.assistant_runtime_cache import assistant_runtime_cache
+from app.services.twilio_client_pool import twilio_client_pool
 from bson import ObjectId
 from datetime import datetime
 from typing import Any, List, Optional, Set
-from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 import httpx
 import logging
@@ -174,10 +175,10 @@ async def connect_provider(credentials: ProviderCredentials):
         if credentials.provider.lower() == "twilio":
             try:
                 # Initialize Twilio client
-                client = Client(credentials.account_sid, credentials.auth_token)
+                client = twilio_client_pool.get_client(credentials.account_sid, credentials.auth_token)
 
                 # Test connection and fetch phone numbers
-                incoming_phone_numbers = client.incoming_phone_numbers.list(limit=50)
+                incoming_phone_numbers = await twilio_client_pool.run(client.incoming_phone_numbers.list, limit=50)
 
                 logger.info(f"Found {len(incoming_phone_numbers)} phone numbers from Twilio")
 
@@ -203,6 +204,7 @@ async def connect_provider(credentials: ProviderCredentials):
                     {"$set": provider_connection},
                     upsert=True
                 )
+                assistant_runtime_cache.publish_invalidation(user_id=user_obj_id)
 
                 # Store phone numbers
                 for record in incoming_phone_numbers:
@@ -395,10 +397,10 @@ async def sync_phone_numbers(user_id: str):
                     detail="Stored Twilio credentials are missing or invalid. Please reconnect your provider."
                 )
 
-            client = Client(account_sid, auth_token)
+            client = twilio_client_pool.get_client(account_sid, auth_token)
 
             # Fetch phone numbers
-            incoming_phone_numbers = client.incoming_phone_numbers.list(limit=50)
+            incoming_phone_numbers = await twilio_client_pool.run(client.incoming_phone_numbers.list, limit=50)
 
             logger.info(f"Found {len(incoming_phone_numbers)} phone numbers from Twilio")
 
@@ -982,8 +984,8 @@ async def get_user_call_logs(user_id: str, limit: int = 1000):
                 if not account_sid or not auth_token:
                     raise RuntimeError("Stored Twilio credentials are missing or invalid")
 
-                client = Client(account_sid, auth_token)
-                calls = client.calls.list(limit=limit)
+                client = twilio_client_pool.get_client(account_sid, auth_token)
+                calls = await twilio_client_pool.list_calls(client, limit=limit)
 
                 for call in calls:
                     if call.sid in processed_sids:
@@ -1198,6 +1200,7 @@ async def assign_assistant_to_phone_number(request: Request, assignment: AssignA
             {"_id": phone_obj_id},
             {"$set": update_doc}
         )
+        assistant_runtime_cache.publish_invalidation(phone_number=phone_doc["phone_number"])
 
         webhook_configured = False
 
@@ -1213,7 +1216,7 @@ async def assign_assistant_to_phone_number(request: Request, assignment: AssignA
                 if twilio_connection:
                     account_sid, auth_token = decrypt_twilio_credentials(twilio_connection)
                     if account_sid and auth_token:
-                        client = Client(account_sid, auth_token)
+                        client = twilio_client_pool.get_client(account_sid, auth_token)
                     else:
                         raise HTTPException(
                             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1221,7 +1224,8 @@ async def assign_assistant_to_phone_number(request: Request, assignment: AssignA
                         )
 
                     # Update the phone number's voice webhook
-                    incoming_phone_number = client.incoming_phone_numbers(phone_doc["provider_sid"]).update(
+                    incoming_phone_number = await twilio_client_pool.run(
+                        client.incoming_phone_numbers(phone_doc["provider_sid"]).update,
                         voice_url=webhook_url,
                         voice_method='POST'
                     )
@@ -1324,6 +1328,7 @@ async def unassign_assistant_from_phone_number(phone_number_id: str):
                 }
             }
         )
+        assistant_runtime_cache.publish_invalidation(phone_number=phone_doc["phone_number"])
 
         # Remove Twilio webhook if it's a Twilio number
         if phone_doc["provider"].lower() == "twilio":
@@ -1336,7 +1341,7 @@ async def unassign_assistant_from_phone_number(phone_number_id: str):
                 if twilio_connection:
                     account_sid, auth_token = decrypt_twilio_credentials(twilio_connection)
                     if account_sid and auth_token:
-                        client = Client(account_sid, auth_token)
+                        client = twilio_client_pool.get_client(account_sid, auth_token)
                     else:
                         raise HTTPException(
                             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1344,7 +1349,8 @@ async def unassign_assistant_from_phone_number(phone_number_id: str):
                         )
 
                     # Clear the voice webhook
-                    incoming_phone_number = client.incoming_phone_numbers(phone_doc["provider_sid"]).update(
+                    incoming_phone_number = await twilio_client_pool.run(
+                        client.incoming_phone_numbers(phone_doc["provider_sid"]).update,
                         voice_url='',
                         voice_method='POST'
                     )
@@ -1740,7 +1746,7 @@ async def transcribe_all_recordings(user_id: str):
             )
 
         # Initialize Twilio client and processor
-        client = Client(account_sid, auth_token)
+        client = twilio_client_pool.get_client(account_sid, auth_token)
         processor = InboundPostCallProcessor()
 
         # Get all user's call logs without transcriptions
@@ -1767,7 +1773,7 @@ async def transcribe_all_recordings(user_id: str):
 
             try:
                 # Fetch recordings for this call from Twilio
-                recordings = client.recordings.list(call_sid=call_sid, limit=1)
+                recordings = await twilio_client_pool.run(client.recordings.list, call_sid=call_sid, limit=1)
 
                 if not recordings:
                     logger.debug(f"No recording found for call {call_sid}")
@@ -10,11 +10,11 @@ from typing import Optional, List
 from bson import ObjectId
 from datetime import datetime
 import logging
-from twilio.rest import Client
 
 from app.config.database import Database
 from app.config.settings import settings
 from app.services.twilio_service import TwilioService
+from app.services.twilio_client_pool import twilio_client_pool
 from app.utils.twilio_helpers import decrypt_twilio_credentials
 from app.models.phone_number import PhoneNumberResponse, PhoneNumberCapabilities
 
@@ -754,7 +754,7 @@ def initiate_caller_id_verification(
             )
 
         # Initialize Twilio client
-        client = Client(twilio_account_sid, twilio_auth_token)
+        client = twilio_client_pool.get_client(twilio_account_sid, twilio_auth_token)
 
         # Validate phone number format
         if not request.phone_number.startswith('+'):
@@ -873,7 +873,7 @@ def confirm_caller_id_verification(
             )
 
         # Initialize Twilio client
-        client = Client(twilio_account_sid, twilio_auth_token)
+        client = twilio_client_pool.get_client(twilio_account_sid, twilio_auth_token)
 
         # Validate the code format (should be 6 digits)
         if not request.verification_code.isdigit() or len(request.verification_code) != 6:
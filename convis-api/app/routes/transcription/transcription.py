@@ -217,7 +217,7 @@ async def fetch_recordings_from_twilio():
     """
     try:
         import os
-        from twilio.rest import Client
+        from app.services.twilio_client_pool import twilio_client_pool
 
         account_sid = os.getenv("TWILIO_ACCOUNT_SID")
         auth_token = os.getenv("TWILIO_AUTH_TOKEN")
@@ -228,13 +228,13 @@ async def fetch_recordings_from_twilio():
                 detail="Twilio credentials not configured"
             )
 
-        client = Client(account_sid, auth_token)
+        client = twilio_client_pool.get_client(account_sid, auth_token)
         db = Database.get_db()
         call_logs = db['call_logs']
 
         # Fetch recordings from last 30 days
         cutoff = datetime.utcnow() - timedelta(days=30)
-        recordings = client.recordings.list(date_created_after=cutoff, limit=500)
+        recordings = await twilio_client_pool.run(client.recordings.list, date_created_after=cutoff, limit=500)
 
         logger.info(f"Found {len(recordings)} recordings in Twilio")
 
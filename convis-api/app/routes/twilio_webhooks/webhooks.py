@@ -12,7 +12,10 @@ import logging
 
 from app.config.database import Database
 from app.config.settings import settings
-from app.services.call_status_processor import process_call_status
+from app.services.call_events import CallEvent, call_events
+from app.services.assistant_runtime_cache import assistant_runtime_cache
+from app.services.realtime_session_pool import realtime_session_pool
+from app.services.worker_load import worker_load
 from twilio.twiml.voice_response import VoiceResponse, Connect
 from twilio.twiml.messaging_response import MessagingResponse
 
@@ -110,36 +113,40 @@ async def voice_webhook(
             response.say("Sorry, we could not process your call. Please try again later.")
             return HTMLResponse(content=str(response), media_type="application/xml")
 
-        db = Database.get_db()
-        phone_numbers_collection = db['phone_numbers']
-        assistants_collection = db['assistants']
+        # Look up the phone number routing (cached per worker)
+        number_known, assistant_id = assistant_runtime_cache.assistant_for_number(To)
 
-        # Look up the phone number in our database
-        phone_doc = phone_numbers_collection.find_one({"phone_number": To})
-
-        if not phone_doc:
+        if not number_known:
             logger.warning(f"Phone number {To} not found in database")
             response = VoiceResponse()
             response.say("Sorry, this number is not configured. Please contact support.")
             return HTMLResponse(content=str(response), media_type="application/xml")
 
         # Check if an assistant is assigned
-        if not phone_doc.get("assigned_assistant_id"):
+        if not assistant_id:
             logger.warning(f"No assistant assigned to {To}")
             response = VoiceResponse()
             response.say("Sorry, this number is not yet configured with an AI assistant. Please contact support.")
             return HTMLResponse(content=str(response), media_type="application/xml")
 
-        assistant_id = str(phone_doc["assigned_assistant_id"])
-
-        # Verify assistant exists
-        assistant = assistants_collection.find_one({"_id": ObjectId(assistant_id)})
-        if not assistant:
+        # Verify assistant exists (also warms the runtime snapshot for the media stream)
+        runtime = assistant_runtime_cache.get(assistant_id)
+        if not runtime:
             logger.error(f"Assistant {assistant_id} not found for number {To}")
             response = VoiceResponse()
             response.say("Sorry, configuration error. Please contact support.")
             return HTMLResponse(content=str(response), media_type="application/xml")
 
+        # Admission control: don't start a stream the media tier cannot carry
+        if not worker_load.admit_call():
+            logger.warning(f"Rejecting call {CallSid} to {To}: media tier at capacity")
+            response = VoiceResponse()
+            response.reject(reason="busy")
+            return HTMLResponse(content=str(response), media_type="application/xml")
+
+        # Start the OpenAI Realtime handshake now; the media stream adopts it by CallSid
+        realtime_session_pool.preopen(CallSid, runtime)
+
         # Create TwiML response - connect directly to AI without artificial greetings
         response = VoiceResponse()
 
@@ -454,7 +461,8 @@ async def outbound_call_webhook(
     request: Request,
     leadId: Optional[str] = Form(None),
     campaignId: Optional[str] = Form(None),
-    assistantId: Optional[str] = Form(None)
+    assistantId: Optional[str] = Form(None),
+    CallSid: Optional[str] = Form(None)
 ):
     """
     TwiML endpoint for outbound campaign calls.
@@ -475,6 +483,11 @@ async def outbound_call_webhook(
             response.say("Sorry, no assistant configured for this campaign.")
             return HTMLResponse(content=str(response), media_type="application/xml")
 
+        # Warm the assistant runtime snapshot and pre-open the Realtime session
+        # (the call has just been answered) before Twilio opens the media stream
+        runtime = assistant_runtime_cache.get(assistantId)
+        realtime_session_pool.preopen(CallSid or request.query_params.get('CallSid'), runtime)
+
         # Connect to AI assistant via WebSocket
         # Use API_BASE_URL from settings for production, otherwise detect from request
         if settings.api_base_url:
@@ -521,7 +534,8 @@ async def campaign_call_status(
 ):
     """
     Campaign call status callback.
-    Updates lead status and triggers next call on completion.
+    Queues the status as a call event; the call-event consumer updates the lead
+    and frees the campaign line on completion.
     """
     try:
         # Try query params
@@ -538,9 +552,8 @@ async def campaign_call_status(
             logger.error(f"[WEBHOOK] Missing required parameters - CallSid: {CallSid}, CallStatus: {CallStatus}")
             return {"error": "Missing required parameters"}
 
-        # Process the status update
-        process_call_status(CallSid, CallStatus, CallDuration, leadId, campaignId)
-        logger.info(f"[WEBHOOK] Successfully processed call status for CallSid: {CallSid}")
+        await call_events.submit(CallEvent(CallSid, CallStatus, CallDuration, leadId, campaignId))
+        logger.info(f"[WEBHOOK] Queued call status for CallSid: {CallSid}")
 
         # Calculate cost for completed calls
         if CallStatus == "completed" and CallDuration:
@@ -632,6 +645,11 @@ async def campaign_recording_callback(
         if update_result.matched_count > 0:
             logger.info(f"Recording URL saved for CallSid: {CallSid}")
 
+        # A finished recording means the call is over; closes the campaign call
+        # if its status callback was lost (no-op once it has been handled)
+        if RecordingStatus == "completed" and leadId and campaignId:
+            await call_events.submit(CallEvent(CallSid, "completed", None, leadId, campaignId, source="recording"))
+
         # Trigger post-call processing for completed recordings
         if RecordingStatus == "completed" and recording_mp3_url:
             try:
@@ -20,6 +20,7 @@ from app.models.voice import (
 from app.config.database import Database
 from app.utils.encryption import encryption_service
 from app.config.settings import settings
+from app.services.http_clients import http_clients
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -830,7 +831,7 @@ async def remove_voice_from_preferences(user_id: str, request: RemoveVoiceReques
 async def generate_cartesia_demo(voice_id: str, model: str, text: str, api_key: str) -> bytes:
     """Generate voice demo using Cartesia API"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with http_clients.client("voices") as client:
             response = await client.post(
                 "https://api.cartesia.ai/tts/bytes",
                 headers={
@@ -878,7 +879,7 @@ async def generate_cartesia_demo(voice_id: str, model: str, text: str, api_key:
 async def generate_elevenlabs_demo(voice_id: str, model: str, text: str, api_key: str) -> bytes:
     """Generate voice demo using ElevenLabs API"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with http_clients.client("voices") as client:
             response = await client.post(
                 f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
                 headers={
@@ -919,7 +920,7 @@ async def generate_elevenlabs_demo(voice_id: str, model: str, text: str, api_key
 async def generate_sarvam_demo(voice_id: str, model: str, text: str, api_key: str) -> bytes:
     """Generate voice demo using Sarvam AI API"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with http_clients.client("voices") as client:
             response = await client.post(
                 "https://api.sarvam.ai/text-to-speech",
                 headers={
@@ -969,7 +970,7 @@ async def generate_sarvam_demo(voice_id: str, model: str, text: str, api_key: st
 async def generate_openai_demo(voice_id: str, model: str, text: str, api_key: str) -> bytes:
     """Generate voice demo using OpenAI TTS API"""
     try:
-        async with httpx.AsyncClient() as client:
+        async with http_clients.client("openai") as client:
             response = await client.post(
                 "https://api.openai.com/v1/audio/speech",
                 headers={
@@ -0,0 +1,278 @@
+"""
+Per-assistant semantic cache of answers to repeated questions.
+
+Inbound callers ask the same handful of things ("what are your hours?",
+"how much is the premium plan?", "where are you located?"), and every one of
+those turns paid for a full LLM generation and a TTS round. The cache keeps,
+per assistant, the caller's question embedding, the answer text and the
+synthesized audio (already encoded for the telephony platform). When a new
+utterance is within settings.answer_cache_similarity_threshold (cosine) of a
+cached question, the call replays the cached answer and audio straight away.
+
+Answers only stay valid for the configuration that produced them, so entries
+are grouped by a scope: a hash of the system prompt, LLM and TTS settings and
+the live knowledge-base generation (see answer_scope). Editing the assistant
+or uploading a document changes the scope, and the old entries are never
+matched again (older scopes are dropped). Entries also expire after
+settings.answer_cache_ttl_seconds.
+
+Utterances shorter than settings.answer_cache_min_words ("yes", "ok sure")
+depend on the conversation and are never looked up or stored. The cache is
+shared by every caller of an assistant, so calls only use it for the caller's
+opening question, which nothing but the prompt precedes. A follow-up such as
+"how much is it?" means something different in every conversation. Answers
+that repeat a name, number or address the caller gave are not stored
+(repeats_caller_details).
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import settings
+from app.services.embedding_service import embedding_service
+from app.utils.kb_index import kb_index_store
+from app.utils.vector_index import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+# Scopes kept per assistant (calls that switched language mid-call use their own scope)
+MAX_SCOPES_PER_ASSISTANT = 4
+# Assistants listed individually in stats(), busiest first
+STATS_TOP_ASSISTANTS = 50
+_WORD = re.compile(r"[\w@.+'-]+")
+
+
+def kb_version(assistant_id: str) -> str:
+    """Live knowledge-base generation of an assistant ("" when it has no KB); never loads the index."""
+    return kb_index_store.generation(assistant_id) or ""
+
+
+def _words(text: str) -> List[str]:
+    return [word.strip(".'-") for word in _WORD.findall(text)]
+
+
+def repeats_caller_details(question: str, answer: str, prompt: str = "") -> bool:
+    """
+    True when the answer echoes something specific the caller said: a word with digits,
+    an email address or a capitalized name that the prompt does not mention.
+    Such an answer belongs to this caller and must not be replayed to others.
+    """
+    answer_words = {word.lower() for word in _words(answer)}
+    prompt_words = {word.lower() for word in _words(prompt)}
+    for position, word in enumerate(_words(question)):
+        detail = (
+            any(ch.isdigit() for ch in word)
+            or "@" in word
+            or (position > 0 and word[:1].isupper() and not word.startswith("I'") and word != "I")
+        )
+        if detail and word.lower() in answer_words and word.lower() not in prompt_words:
+            return True
+    return False
+
+
+def answer_scope(assistant_id: str, system_message: str, config: Dict[str, Any]) -> str:
+    """
+    Key of everything a cached answer depends on besides the question.
+
+    Args:
+        assistant_id: Assistant the answers belong to
+        system_message: Prompt the LLM answers with (including language instructions)
+        config: LLM/TTS settings that change the answer text or audio (model, voice, ...)
+
+    Returns:
+        Hex digest; it changes when the prompt, the settings or the KB generation change
+    """
+    payload = json.dumps(
+        {"system_message": system_message, "config": config, "kb": kb_version(assistant_id)},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    """One cached question/answer, with audio per platform encoding."""
+
+    question: str
+    answer: str
+    # audio format (e.g. "twilio" = 8 kHz mu-law, "frejun" = 8 kHz PCM) -> bytes ready to send
+    audio: Dict[str, bytes] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.monotonic)
+    last_hit_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+class _ScopedAnswers:
+    """Answers of one assistant scope with their unit-length question vectors."""
+
+    def __init__(self):
+        self.entries: List[CachedAnswer] = []
+        self.vectors: Optional[np.ndarray] = None
+
+    def prune(self, now: float):
+        keep = [i for i, entry in enumerate(self.entries) if now - entry.created_at < settings.answer_cache_ttl_seconds]
+        if len(keep) > settings.answer_cache_max_entries:
+            # Least recently hit answers go first
+            keep = sorted(keep, key=lambda i: self.entries[i].last_hit_at)[-settings.answer_cache_max_entries:]
+            keep.sort()
+        if len(keep) != len(self.entries):
+            self.entries = [self.entries[i] for i in keep]
+            self.vectors = self.vectors[keep] if keep else None
+
+    def best(self, vector: np.ndarray) -> Tuple[Optional[CachedAnswer], float]:
+        if self.vectors is None or vector.shape[1] != self.vectors.shape[1]:
+            return None, 0.0
+        scores = self.vectors @ vector[0]
+        row = int(np.argmax(scores))
+        return self.entries[row], float(scores[row])
+
+    def add(self, entry: CachedAnswer, vector: np.ndarray):
+        if self.vectors is not None and vector.shape[1] != self.vectors.shape[1]:
+            # Embedding model changed; the old vectors cannot be compared any more
+            self.entries, self.vectors = [], None
+        self.entries.append(entry)
+        self.vectors = vector if self.vectors is None else np.vstack([self.vectors, vector])
+
+
+class _AssistantAnswers:
+    """Scopes and hit counters of one assistant."""
+
+    def __init__(self):
+        self.scopes: "OrderedDict[str, _ScopedAnswers]" = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+
+    def scope(self, key: str, create: bool = False) -> Optional[_ScopedAnswers]:
+        scoped = self.scopes.get(key)
+        if scoped is None and create:
+            scoped = self.scopes[key] = _ScopedAnswers()
+            while len(self.scopes) > MAX_SCOPES_PER_ASSISTANT:
+                self.scopes.popitem(last=False)
+        if scoped is not None:
+            self.scopes.move_to_end(key)
+        return scoped
+
+    @property
+    def entries(self) -> int:
+        return sum(len(scoped.entries) for scoped in self.scopes.values())
+
+
+class AnswerCache:
+    """Semantic question -> (answer, audio) cache, one per worker, partitioned by assistant."""
+
+    def __init__(self):
+        self._assistants: Dict[str, _AssistantAnswers] = {}
+        self.embedding_errors = 0
+
+    def eligible(self, question: str) -> bool:
+        return settings.answer_cache_enabled and len(question.split()) >= settings.answer_cache_min_words
+
+    async def lookup(
+        self,
+        assistant_id: str,
+        scope: str,
+        question: str,
+        api_key: Optional[str],
+        model: str,
+    ) -> Tuple[Optional[CachedAnswer], Optional[np.ndarray]]:
+        """
+        Find a cached answer to a question close enough to `question`.
+
+        Args:
+            assistant_id: Assistant taking the call
+            scope: answer_scope() of the call's current configuration
+            question: The caller's utterance
+            api_key: OpenAI API key for the query embedding (unused by the local backend)
+            model: Embedding model id ("<backend>:<model>")
+
+        Returns:
+            (answer or None, question vector to pass to store() on a miss;
+            None when the question is not eligible or could not be embedded)
+        """
+        if not self.eligible(question):
+            return None, None
+        try:
+            vector = normalize_rows(await embedding_service.embed_query(question, api_key, model))
+        except Exception as e:
+            self.embedding_errors += 1
+            logger.warning(f"[ANSWER_CACHE] Could not embed question for assistant {assistant_id}: {e}")
+            return None, None
+
+        assistant = self._assistants.setdefault(assistant_id, _AssistantAnswers())
+        assistant.lookups += 1
+        scoped = assistant.scope(scope)
+        if scoped is None:
+            return None, vector
+
+        now = time.monotonic()
+        scoped.prune(now)
+        entry, similarity = scoped.best(vector)
+        if entry is None or similarity < settings.answer_cache_similarity_threshold:
+            return None, vector
+
+        entry.hits += 1
+        entry.last_hit_at = now
+        assistant.hits += 1
+        logger.info(f"[ANSWER_CACHE] Hit for assistant {assistant_id} ({similarity:.3f}): \"{question}\" ~ \"{entry.question}\"")
+        return entry, vector
+
+    def store(
+        self,
+        assistant_id: str,
+        scope: str,
+        question: str,
+        vector: Optional[np.ndarray],
+        answer: str,
+        audio_format: Optional[str] = None,
+        audio: Optional[bytes] = None,
+    ) -> Optional[CachedAnswer]:
+        """Cache a freshly generated answer (and its audio) under the question vector from lookup()."""
+        if vector is None or not answer:
+            return None
+        assistant = self._assistants.setdefault(assistant_id, _AssistantAnswers())
+        scoped = assistant.scope(scope, create=True)
+        entry = CachedAnswer(question=question, answer=answer)
+        if audio_format and audio:
+            entry.audio[audio_format] = audio
+        scoped.add(entry, vector)
+        scoped.prune(time.monotonic())
+        assistant.stores += 1
+        return entry
+
+    def clear(self):
+        self._assistants.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = sum(a.lookups for a in self._assistants.values())
+        hits = sum(a.hits for a in self._assistants.values())
+        busiest = sorted(self._assistants.items(), key=lambda item: item[1].lookups, reverse=True)
+        return {
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": sum(a.entries for a in self._assistants.values()),
+            "embedding_errors": self.embedding_errors,
+            "assistants": {
+                assistant_id: {
+                    "lookups": a.lookups,
+                    "hits": a.hits,
+                    "hit_rate": round(a.hits / a.lookups, 3) if a.lookups else 0.0,
+                    "stores": a.stores,
+                    "entries": a.entries,
+                }
+                for assistant_id, a in busiest[:STATS_TOP_ASSISTANTS]
+            },
+        }
+
+
+answer_cache = AnswerCache()
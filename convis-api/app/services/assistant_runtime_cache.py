@@ -0,0 +1,493 @@
+"""
+Per-worker cache of compiled assistant runtime snapshots.
+
+Call setup (Twilio /voice webhook, inbound/outbound media websockets) used to
+re-read the assistant document, the Twilio provider connection, API keys,
+calendar accounts and the phone-number mapping on every connect. The cache
+compiles all of that once per assistant into an AssistantRuntimeSnapshot so
+that a warm call does zero database reads.
+
+Entries are invalidated through a MongoDB change stream on the collections the
+snapshot is derived from. Standalone MongoDB servers do not support change
+streams, so in that case the cache falls back to a Redis pub/sub channel that
+the write paths publish to via publish_invalidation().
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config.database import Database
+from app.config.settings import settings
+from app.constants import LANGUAGE_NAMES
+from app.utils.assistant_keys import resolve_assistant_api_key, resolve_provider_keys
+from app.utils.openai_session import build_session_update
+from app.utils.twilio_helpers import decrypt_twilio_credentials
+
+logger = logging.getLogger(__name__)
+
+# Collections a snapshot is compiled from; changes to any of them invalidate.
+WATCHED_COLLECTIONS = (
+    "assistants",
+    "provider_connections",
+    "api_keys",
+    "calendar_accounts",
+    "phone_numbers",
+)
+
+# OpenAI Realtime API requires temperature >= 0.6
+REALTIME_MIN_TEMPERATURE = 0.6
+
+
+def apply_language_instruction(system_message: str, bot_language: Optional[str]) -> str:
+    """Append the 'respond only in <language>' instruction for non-English assistants."""
+    if not bot_language or bot_language == 'en':
+        return system_message
+    language_name = LANGUAGE_NAMES.get(bot_language, bot_language.upper())
+    return (
+        f"{system_message}\n\nIMPORTANT: You MUST speak and respond ONLY in {language_name}. "
+        f"All your responses should be in {language_name} language."
+    )
+
+
+def build_calendar_instructions(timezone_hint: str) -> str:
+    """Scheduling instructions appended to the prompt when calendar booking is enabled."""
+    return f"""
+
+---
+Calendar Scheduling Instructions:
+You can schedule meetings and appointments during this call. When the person requests to schedule a meeting or appointment:
+
+1. Ask for the preferred date and time
+2. Confirm the meeting title/purpose
+3. Confirm the duration (default to 30 minutes if not specified)
+4. **IMPORTANT: Confirm their timezone** - Ask "What timezone are you in?" or "Just to confirm, you're in [timezone], correct?"
+5. Let them know you'll schedule it
+
+Default timezone (if they don't specify): {timezone_hint}
+
+Example conversation:
+Person: "Can we schedule a follow-up meeting?"
+You: "Of course! When would you like to schedule the meeting? What date and time works best for you?"
+Person: "How about next Tuesday at 2 PM?"
+You: "Perfect! And just to confirm, what timezone are you in?"
+Person: "I'm in India, IST timezone."
+You: "Great! So I'll schedule a follow-up meeting for next Tuesday at 2 PM Indian Standard Time. It will be for 30 minutes. Is that correct?"
+Person: "Yes, that works."
+You: "Excellent! I've scheduled your meeting and it will be added to your calendar."
+
+IMPORTANT:
+- Always confirm the timezone before finalizing the appointment
+- Be natural and conversational
+- Don't mention "the system" or technical details
+- If they mention a timezone, use it; otherwise use {timezone_hint}"""
+
+
+@dataclass
+class AssistantRuntimeSnapshot:
+    """Everything call setup needs for one assistant, resolved ahead of time."""
+
+    assistant_id: str
+    user_id: Optional[ObjectId]
+    assistant: Dict[str, Any]
+    voice_mode: str
+    voice: str
+    temperature: float
+    call_greeting: Optional[str]
+    bot_language: str
+    timezone_hint: str
+    # Prompt with the language instruction applied (no calendar instructions)
+    system_message: str
+    # Prompt used by the realtime path (language + calendar instructions)
+    realtime_system_message: str
+    llm_model: str
+    openai_api_key: Optional[str]
+    openai_key_error: Optional[str]
+    provider_keys: Dict[str, str]
+    twilio_account_sid: Optional[str]
+    twilio_auth_token: Optional[str]
+    calendar_enabled: bool
+    calendar_account_ids: List[str]
+    calendar_account_id_for_booking: Optional[ObjectId]
+    default_calendar_provider: str
+    # Customer database looked up on each user turn (None when not configured)
+    database_config: Optional[Dict[str, Any]]
+    session_update: Dict[str, Any]
+    built_at: float = field(default_factory=time.monotonic)
+
+    def assistant_copy(self) -> Dict[str, Any]:
+        """Shallow copy of the assistant document; handlers add per-call keys to it."""
+        return dict(self.assistant)
+
+    @property
+    def use_openai_realtime(self) -> bool:
+        asr_provider = self.assistant.get('asr_provider', 'openai')
+        tts_provider = self.assistant.get('tts_provider', 'openai')
+        llm_provider = self.assistant.get('llm_provider', 'openai')
+        return (
+            asr_provider == 'openai' and
+            tts_provider == 'openai' and
+            llm_provider in ('openai', 'openai-realtime')
+        )
+
+
+class AssistantRuntimeCache:
+    """Thread-safe per-worker cache of AssistantRuntimeSnapshot objects."""
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or settings.assistant_runtime_cache_ttl_seconds
+        self.channel = settings.assistant_runtime_invalidation_channel
+        self._snapshots: Dict[str, AssistantRuntimeSnapshot] = {}
+        # phone number -> assistant_id (None when the number has no assistant)
+        self._phone_routes: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._redis_client = None
+        self.invalidation_mode = "none"
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # ====== Lifecycle ======
+    async def start(self):
+        if self._thread and self._thread.is_alive():
+            logger.info("Assistant runtime cache invalidation listener already running")
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run_invalidation_listener,
+            name="assistant-runtime-invalidation",
+            daemon=True
+        )
+        self._thread.start()
+
+    async def shutdown(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.clear()
+
+    # ====== Lookups ======
+    def get(self, assistant_id: str) -> Optional[AssistantRuntimeSnapshot]:
+        """Return the snapshot for an assistant, compiling it on a miss."""
+        key = str(assistant_id)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot and time.monotonic() - snapshot.built_at < self.ttl_seconds:
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+
+        snapshot = self._build_snapshot(key)
+        if snapshot:
+            with self._lock:
+                self._snapshots[key] = snapshot
+        return snapshot
+
+    def assistant_for_number(self, phone_number: str) -> Tuple[bool, Optional[str]]:
+        """
+        Resolve which assistant answers a phone number.
+
+        Returns:
+            (known, assistant_id): known is False when the number is not in
+            phone_numbers at all; assistant_id is None when nothing is assigned.
+        """
+        with self._lock:
+            if phone_number in self._phone_routes:
+                return True, self._phone_routes[phone_number]
+
+        phone_doc = Database.get_db()['phone_numbers'].find_one(
+            {"phone_number": phone_number},
+            {"assigned_assistant_id": 1}
+        )
+        if not phone_doc:
+            return False, None
+        assigned = phone_doc.get("assigned_assistant_id")
+        assistant_id = str(assigned) if assigned else None
+        with self._lock:
+            self._phone_routes[phone_number] = assistant_id
+        return True, assistant_id
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._snapshots),
+                "phone_routes": len(self._phone_routes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "invalidation_mode": self.invalidation_mode,
+            }
+
+    # ====== Invalidation ======
+    def invalidate(
+        self,
+        assistant_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        phone_number: Optional[str] = None,
+    ):
+        """Drop cached entries for an assistant, every assistant of a user, or a number."""
+        with self._lock:
+            self.invalidations += 1
+            if assistant_id:
+                self._snapshots.pop(str(assistant_id), None)
+            if user_id:
+                user_key = str(user_id)
+                for key in [k for k, snap in self._snapshots.items() if str(snap.user_id) == user_key]:
+                    self._snapshots.pop(key, None)
+            if phone_number:
+                self._phone_routes.pop(phone_number, None)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._phone_routes.clear()
+
+    def publish_invalidation(
+        self,
+        assistant_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        phone_number: Optional[str] = None,
+    ):
+        """
+        Invalidate locally and notify the other workers.
+
+        Write paths call this after changing anything a snapshot depends on.
+        With change streams active the publish is redundant but harmless.
+        """
+        self.invalidate(assistant_id=assistant_id, user_id=user_id, phone_number=phone_number)
+        payload = {
+            "assistant_id": str(assistant_id) if assistant_id else None,
+            "user_id": str(user_id) if user_id else None,
+            "phone_number": phone_number,
+        }
+        try:
+            self._get_redis().publish(self.channel, json.dumps(payload))
+        except Exception as publish_error:
+            logger.warning(f"[RUNTIME_CACHE] Failed to publish invalidation {payload}: {publish_error}")
+
+    def _apply_change(self, change: Dict[str, Any]):
+        collection = (change.get("ns") or {}).get("coll")
+        document_id = (change.get("documentKey") or {}).get("_id")
+        full_document = change.get("fullDocument") or {}
+
+        if collection == "assistants":
+            self.invalidate(assistant_id=str(document_id))
+            # Deleting an assistant leaves phone routes pointing at it
+            if change.get("operationType") == "delete":
+                with self._lock:
+                    self._phone_routes.clear()
+        elif collection == "phone_numbers":
+            if full_document.get("phone_number"):
+                self.invalidate(phone_number=full_document["phone_number"])
+            else:
+                with self._lock:
+                    self._phone_routes.clear()
+        elif full_document.get("user_id"):
+            self.invalidate(user_id=str(full_document["user_id"]))
+        else:
+            # Deletes carry no fullDocument, so we cannot tell whose data changed
+            self.clear()
+        logger.debug(f"[RUNTIME_CACHE] Invalidated on {change.get('operationType')} in {collection}")
+
+    def _run_invalidation_listener(self):
+        while not self._stop_event.is_set():
+            try:
+                self._watch_change_stream()
+            except OperationFailure as watch_error:
+                # Code 40573: change streams need a replica set / sharded cluster
+                logger.warning(
+                    f"[RUNTIME_CACHE] Change streams unavailable ({watch_error}); "
+                    f"falling back to Redis channel {self.channel}"
+                )
+                self._listen_redis()
+            except Exception as listener_error:
+                # Anything we might have missed while disconnected is now suspect
+                self.clear()
+                logger.error(f"[RUNTIME_CACHE] Invalidation listener error: {listener_error}")
+                self._stop_event.wait(5)
+
+    def _watch_change_stream(self):
+        db = Database.get_db()
+        pipeline = [{"$match": {"ns.coll": {"$in": list(WATCHED_COLLECTIONS)}}}]
+        with db.watch(pipeline, full_document="updateLookup", max_await_time_ms=1000) as stream:
+            self.invalidation_mode = "change_stream"
+            logger.info("[RUNTIME_CACHE] Watching MongoDB change stream for assistant runtime invalidation")
+            while stream.alive and not self._stop_event.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    self._apply_change(change)
+
+    def _listen_redis(self):
+        pubsub = self._get_redis().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        self.invalidation_mode = "redis"
+        try:
+            while not self._stop_event.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if not message or message.get("type") != "message":
+                    continue
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    logger.warning(f"[RUNTIME_CACHE] Ignoring malformed invalidation: {message.get('data')}")
+                    continue
+                self.invalidate(
+                    assistant_id=payload.get("assistant_id"),
+                    user_id=payload.get("user_id"),
+                    phone_number=payload.get("phone_number"),
+                )
+        finally:
+            pubsub.close()
+
+    def _get_redis(self):
+        if self._redis_client is None:
+            redis_url = settings.redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+            self._redis_client = redis.from_url(redis_url, decode_responses=True)
+        return self._redis_client
+
+    # ====== Compilation ======
+    def _build_snapshot(self, assistant_id: str) -> Optional[AssistantRuntimeSnapshot]:
+        try:
+            assistant_obj_id = ObjectId(assistant_id)
+        except Exception:
+            return None
+
+        try:
+            db = Database.get_db()
+            assistant = db['assistants'].find_one({"_id": assistant_obj_id})
+        except PyMongoError as db_error:
+            logger.error(f"[RUNTIME_CACHE] Failed to load assistant {assistant_id}: {db_error}")
+            return None
+        if not assistant:
+            return None
+
+        user_id = assistant.get('user_id')
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
+
+        # Twilio credentials (user connection, then settings defaults)
+        account_sid = None
+        auth_token = None
+        if user_id:
+            twilio_connection = db['provider_connections'].find_one({
+                "user_id": user_id,
+                "provider": "twilio"
+            })
+            if twilio_connection:
+                try:
+                    account_sid, auth_token = decrypt_twilio_credentials(twilio_connection)
+                except Exception as cred_error:
+                    logger.error(f"[RUNTIME_CACHE] Failed to decrypt Twilio credentials for assistant {assistant_id}: {cred_error}")
+        account_sid = account_sid or settings.twilio_account_sid
+        auth_token = auth_token or settings.twilio_auth_token
+
+        # API keys
+        openai_api_key = None
+        openai_key_error = None
+        try:
+            openai_api_key, _ = resolve_assistant_api_key(db, assistant, required_provider="openai")
+        except HTTPException as exc:
+            openai_key_error = exc.detail
+        provider_keys = resolve_provider_keys(db, assistant, user_id)
+
+        # Prompt and voice configuration
+        bot_language = assistant.get('bot_language', 'en')
+        timezone_hint = assistant.get('timezone') or settings.default_timezone or "America/New_York"
+        system_message = apply_language_instruction(assistant['system_message'], bot_language)
+
+        calendar_enabled, calendar_account_ids, booking_id, calendar_provider = self._resolve_calendar(
+            db, assistant, user_id
+        )
+        realtime_system_message = system_message
+        if calendar_enabled:
+            realtime_system_message = f"{system_message}{build_calendar_instructions(timezone_hint)}"
+
+        voice = assistant.get('voice')
+        temperature = assistant.get('temperature', 0.8)
+        session_update = build_session_update(
+            realtime_system_message,
+            voice,
+            max(temperature, REALTIME_MIN_TEMPERATURE),
+            max_response_output_tokens="inf",
+            vad_threshold=assistant.get('vad_threshold', 0.5),
+            vad_prefix_padding_ms=assistant.get('vad_prefix_padding_ms', 300),
+            vad_silence_duration_ms=assistant.get('vad_silence_duration_ms', 500)
+        )
+
+        logger.info(f"[RUNTIME_CACHE] Compiled runtime snapshot for assistant {assistant_id}")
+        return AssistantRuntimeSnapshot(
+            assistant_id=assistant_id,
+            user_id=user_id,
+            assistant=assistant,
+            voice_mode=assistant.get('voice_mode', 'realtime'),
+            voice=voice,
+            temperature=temperature,
+            call_greeting=assistant.get('call_greeting'),
+            bot_language=bot_language,
+            timezone_hint=timezone_hint,
+            system_message=system_message,
+            realtime_system_message=realtime_system_message,
+            llm_model=assistant.get('llm_model', 'gpt-4o-mini-realtime-preview'),
+            openai_api_key=openai_api_key,
+            openai_key_error=openai_key_error,
+            provider_keys=provider_keys,
+            twilio_account_sid=account_sid,
+            twilio_auth_token=auth_token,
+            calendar_enabled=calendar_enabled,
+            calendar_account_ids=calendar_account_ids,
+            calendar_account_id_for_booking=booking_id,
+            default_calendar_provider=calendar_provider,
+            database_config=assistant.get('database_config'),
+            session_update=session_update,
+        )
+
+    def _resolve_calendar(
+        self,
+        db,
+        assistant: Dict[str, Any],
+        user_id: Optional[ObjectId],
+    ) -> Tuple[bool, List[str], Optional[ObjectId], str]:
+        """Validate the assistant's calendar accounts (multi-calendar first, then legacy single)."""
+        if not user_id:
+            return False, [], None, "google"
+
+        calendar_accounts_collection = db['calendar_accounts']
+        assistant_calendar_ids = assistant.get('calendar_account_ids', [])
+        if assistant_calendar_ids and assistant.get('calendar_enabled', False):
+            owned = calendar_accounts_collection.find(
+                {"_id": {"$in": assistant_calendar_ids}, "user_id": user_id},
+                {"_id": 1}
+            )
+            owned_ids = {doc["_id"] for doc in owned}
+            # Preserve the assistant's ordering for round-robin selection
+            valid_calendar_ids = [str(cal_id) for cal_id in assistant_calendar_ids if cal_id in owned_ids]
+            if valid_calendar_ids:
+                return True, valid_calendar_ids, None, "google"
+
+        legacy_id = assistant.get('calendar_account_id')
+        if legacy_id:
+            calendar_account = calendar_accounts_collection.find_one(
+                {"_id": legacy_id, "user_id": user_id},
+                {"provider": 1}
+            )
+            if calendar_account:
+                return True, [str(legacy_id)], legacy_id, calendar_account.get("provider", "google")
+
+        return False, [], None, "google"
+
+
+assistant_runtime_cache = AssistantRuntimeCache()
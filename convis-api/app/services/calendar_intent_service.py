@@ -7,9 +7,8 @@ import logging
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
-import httpx
-
 from app.config.settings import settings
+from app.services.http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -131,11 +130,12 @@ Respond with ONLY the JSON object."""
         }
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with http_clients.client("openai") as client:
                 response = await client.post(
                     "https://api.openai.com/v1/chat/completions",
                     headers=headers,
                     json=payload,
+                    timeout=30.0,
                 )
                 response.raise_for_status()
                 data = response.json()
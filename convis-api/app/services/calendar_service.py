@@ -9,6 +9,8 @@ import httpx
 from bson import ObjectId
 
 from app.config.database import Database
+from app.services.campaign_counters import campaign_counters
+from app.services.http_clients import http_clients
 from app.utils.encryption import encryption_service
 
 logger = logging.getLogger(__name__)
@@ -121,7 +123,7 @@ class CalendarService:
                 client_id = oauth_data.get("clientId") or os.getenv("GOOGLE_CLIENT_ID")
                 client_secret = oauth_data.get("clientSecret") or os.getenv("GOOGLE_CLIENT_SECRET")
 
-                async with httpx.AsyncClient() as client:
+                async with http_clients.client("google") as client:
                     response = await client.post(
                         "https://oauth2.googleapis.com/token",
                         data={
@@ -157,7 +159,7 @@ class CalendarService:
                 client_id = oauth_data.get("clientId") or os.getenv("MICROSOFT_CLIENT_ID")
                 client_secret = oauth_data.get("clientSecret") or os.getenv("MICROSOFT_CLIENT_SECRET")
 
-                async with httpx.AsyncClient() as client:
+                async with http_clients.client("microsoft") as client:
                     response = await client.post(
                         "https://login.microsoftonline.com/common/oauth2/v2.0/token",
                         data={
@@ -233,7 +235,7 @@ class CalendarService:
             Event ID or None
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("google") as client:
                 response = await client.post(
                     "https://www.googleapis.com/calendar/v3/calendars/primary/events",
                     headers={
@@ -289,7 +291,7 @@ class CalendarService:
             Event ID or None
         """
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("microsoft") as client:
                 response = await client.post(
                     "https://graph.microsoft.com/v1.0/me/events",
                     headers={
@@ -341,7 +343,7 @@ class CalendarService:
             if time_max:
                 params["timeMax"] = time_max
 
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("google") as client:
                 response = await client.get(
                     "https://www.googleapis.com/calendar/v3/calendars/primary/events",
                     headers={"Authorization": f"Bearer {access_token}"},
@@ -394,7 +396,7 @@ class CalendarService:
             if filters:
                 params["$filter"] = " and ".join(filters)
 
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("microsoft") as client:
                 response = await client.get(
                     "https://graph.microsoft.com/v1.0/me/events",
                     headers={"Authorization": f"Bearer {access_token}"},
@@ -546,7 +548,8 @@ class CalendarService:
             self.appointments_collection.insert_one(appointment_doc)
 
             # Update lead
-            self.leads_collection.update_one(
+            campaign_counters.update_lead(
+                self.leads_collection,
                 {"_id": ObjectId(lead_id)},
                 {"$set": {"calendar_booked": True, "updated_at": datetime.utcnow()}}
             )
@@ -734,7 +737,7 @@ class CalendarService:
 
             # Update event based on provider
             if provider == "google":
-                async with httpx.AsyncClient() as client:
+                async with http_clients.client("google") as client:
                     response = await client.patch(
                         f"https://www.googleapis.com/calendar/v3/calendars/primary/events/{event_id}",
                         headers={
@@ -761,7 +764,7 @@ class CalendarService:
                         return False
 
             elif provider == "microsoft":
-                async with httpx.AsyncClient() as client:
+                async with http_clients.client("microsoft") as client:
                     response = await client.patch(
                         f"https://graph.microsoft.com/v1.0/me/events/{event_id}",
                         headers={
@@ -820,7 +823,7 @@ class CalendarService:
 
             # Delete event based on provider
             if provider == "google":
-                async with httpx.AsyncClient() as client:
+                async with http_clients.client("google") as client:
                     response = await client.delete(
                         f"https://www.googleapis.com/calendar/v3/calendars/primary/events/{event_id}",
                         headers={"Authorization": f"Bearer {access_token}"},
@@ -834,7 +837,7 @@ class CalendarService:
                         return False
 
             elif provider == "microsoft":
-                async with httpx.AsyncClient() as client:
+                async with http_clients.client("microsoft") as client:
                     response = await client.delete(
                         f"https://graph.microsoft.com/v1.0/me/events/{event_id}",
                         headers={"Authorization": f"Bearer {access_token}"},
@@ -924,7 +927,7 @@ Click the link above to listen to the recording, view the full transcript, and s
     async def _update_google_event(self, access_token: str, event_id: str, description: str) -> bool:
         """Update Google Calendar event description."""
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("google") as client:
                 # First, get the existing event
                 get_response = await client.get(
                     f"https://www.googleapis.com/calendar/v3/calendars/primary/events/{event_id}",
@@ -958,7 +961,7 @@ Click the link above to listen to the recording, view the full transcript, and s
     async def _update_microsoft_event(self, access_token: str, event_id: str, description: str) -> bool:
         """Update Microsoft Calendar event description."""
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("microsoft") as client:
                 response = await client.patch(
                     f"https://graph.microsoft.com/v1.0/me/events/{event_id}",
                     headers={
@@ -0,0 +1,233 @@
+"""
+Webhook-driven handling of campaign call completions.
+
+Previously every dialled call got a thread that slept 10 s and then polled
+call_attempts every 2 s for up to 3 minutes, and completions (status webhook,
+assistant hang-up, campaign start) started more threads to dial the next
+lead. Now:
+
+- /call-status, the recording callback and the assistant hang-up only turn
+  what they saw into a CallEvent and push it onto a Redis list (any worker,
+  media or API); the request returns immediately
+- one consumer per API worker pops the events and applies them with
+  process_call_status, which records the attempt and runs the completion
+  (lead outcome, freeing the campaign line) at most once per call_sid
+- one sweeper, held by whichever worker owns a short Redis lease, closes
+  calls whose webhooks never arrived and frees the campaign lines of calls
+  that were never reported back
+
+If Redis is unavailable an event is applied in the submitting worker instead.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from app.config.database import Database
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+EVENTS_KEY = "convis:call-events"
+SWEEPER_LEASE_KEY = "convis:call-sweeper"
+# Stale attempts closed per sweep
+SWEEP_BATCH = 500
+
+
+@dataclass
+class CallEvent:
+    """A call status observation from a webhook, the assistant or the sweeper."""
+
+    call_sid: str
+    call_status: str
+    call_duration: Optional[str] = None
+    lead_id: Optional[str] = None
+    campaign_id: Optional[str] = None
+    source: str = "status-callback"
+
+
+class CallEventConsumer:
+    """Redis-queued call events, one consumer task and one (leased) sweeper."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._redis: Optional[redis.Redis] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stop_event = asyncio.Event()
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.inline = 0
+        self.swept = 0
+
+    def _get_redis(self) -> redis.Redis:
+        if self._redis is None:
+            redis_url = settings.redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+        return self._redis
+
+    # ====== Lifecycle ======
+    async def start(self):
+        if self._tasks:
+            return
+        self._stop_event.clear()
+        loop = asyncio.get_running_loop()
+        self._tasks = [
+            loop.create_task(self._consume(), name="call-events-consumer"),
+            loop.create_task(self._sweep_loop(), name="call-events-sweeper"),
+        ]
+        logger.info(f"[CALL_EVENTS] Consumer started on worker {self.worker_id}")
+
+    async def shutdown(self):
+        self._stop_event.set()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    # ====== Producers ======
+    def push(self, event: CallEvent):
+        """Queue an event (blocking Redis call; use submit() from async code)."""
+        try:
+            self._get_redis().rpush(EVENTS_KEY, json.dumps(asdict(event)))
+            self.submitted += 1
+        except Exception as e:
+            logger.warning(f"[CALL_EVENTS] Redis unavailable ({e}); applying {event.call_sid} {event.call_status} here")
+            self.inline += 1
+            self._apply(event)
+
+    async def submit(self, event: CallEvent):
+        """Queue an event from a request handler without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.push, event)
+
+    # ====== Consumer ======
+    def _pop(self, timeout: int) -> Optional[CallEvent]:
+        item = self._get_redis().blpop([EVENTS_KEY], timeout=timeout)
+        if not item:
+            return None
+        return CallEvent(**json.loads(item[1]))
+
+    def _apply(self, event: CallEvent):
+        # Imported on use: media workers only submit events and never load the campaign dialer
+        from app.services.call_status_processor import process_call_status
+
+        try:
+            process_call_status(event.call_sid, event.call_status, event.call_duration, event.lead_id, event.campaign_id)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"[CALL_EVENTS] Failed to apply {event.source} event {event.call_status} for {event.call_sid}: {e}")
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop_event.is_set():
+            try:
+                event = await loop.run_in_executor(None, self._pop, 1)
+                if event is not None:
+                    await loop.run_in_executor(None, self._apply, event)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"[CALL_EVENTS] Consumer error: {e}")
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+
+    # ====== Sweeper ======
+    async def _sweep_loop(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.call_sweep_interval_seconds
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                break
+            try:
+                # One sweep per interval across all workers
+                if await loop.run_in_executor(None, self._claim_sweep, interval):
+                    await loop.run_in_executor(None, self.sweep_once)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception(f"[CALL_EVENTS] Sweep failed: {e}")
+
+    def _claim_sweep(self, interval: float) -> bool:
+        return bool(self._get_redis().set(SWEEPER_LEASE_KEY, self.worker_id, nx=True, ex=max(1, int(interval))))
+
+    def sweep_once(self) -> int:
+        """
+        Close campaign calls whose status webhooks never arrived (blocking).
+
+        Calls still ringing after settings.campaign_ring_timeout_seconds are closed as
+        no-answer, any call open longer than settings.campaign_max_call_seconds as
+        completed; the campaign dispatcher's lines are released in the same pass.
+
+        Returns:
+            Number of call attempts closed
+        """
+        from app.services.call_status_processor import RINGING_STATUSES
+        from app.services.campaign_scheduler import campaign_scheduler
+
+        now = datetime.utcnow()
+        attempts = Database.get_db()["call_attempts"]
+        open_attempts = {"ended_at": None, "completion_handled": {"$ne": True}}
+        projection = {"call_sid": 1, "lead_id": 1, "campaign_id": 1}
+        unanswered = list(attempts.find(
+            dict(open_attempts, status={"$in": list(RINGING_STATUSES)},
+                 started_at={"$lt": now - timedelta(seconds=settings.campaign_ring_timeout_seconds)}),
+            projection,
+        ).limit(SWEEP_BATCH))
+        overdue = list(attempts.find(
+            dict(open_attempts, started_at={"$lt": now - timedelta(seconds=settings.campaign_max_call_seconds)}),
+            projection,
+        ).limit(SWEEP_BATCH))
+
+        closed = 0
+        seen = set()
+        for status, batch in (("no-answer", unanswered), ("completed", overdue)):
+            for attempt in batch:
+                if not attempt.get("call_sid") or attempt["call_sid"] in seen:
+                    continue
+                seen.add(attempt["call_sid"])
+                self._apply(CallEvent(
+                    call_sid=attempt["call_sid"],
+                    call_status=status,
+                    lead_id=str(attempt["lead_id"]) if attempt.get("lead_id") else None,
+                    campaign_id=str(attempt["campaign_id"]) if attempt.get("campaign_id") else None,
+                    source="sweeper",
+                ))
+                closed += 1
+        if closed:
+            self.swept += closed
+            logger.warning(f"[CALL_EVENTS] Closed {closed} call(s) with no status webhook")
+
+        campaign_scheduler.reset_stale_calls()
+        return closed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "applied_inline": self.inline,
+            "swept": self.swept,
+        }
+
+
+call_events = CallEventConsumer()
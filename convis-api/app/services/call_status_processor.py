@@ -6,12 +6,18 @@ from typing import Optional
 import logging
 
 from app.config.database import Database
+from app.services.campaign_counters import campaign_counters
 from app.services.campaign_dialer import CampaignDialer
+from app.services.campaign_queues import campaign_queues
 
 logger = logging.getLogger(__name__)
 
 _dialer = CampaignDialer()
 
+TERMINAL_STATUSES = ("completed", "busy", "no-answer", "failed", "canceled")
+# Statuses of a call that has not been answered yet
+RINGING_STATUSES = ("initiated", "queued", "ringing")
+
 
 def process_call_status(
     call_sid: Optional[str],
@@ -29,30 +35,63 @@ def process_call_status(
     db = Database.get_db()
     call_attempts_collection = db["call_attempts"]
 
+    now = datetime.utcnow()
+    ended = call_status in TERMINAL_STATUSES
     update_data = {
         "status": call_status,
-        "updated_at": datetime.utcnow()
+        "updated_at": now
     }
+    extra = {}
 
     if call_duration:
         try:
-            update_data["duration"] = int(call_duration)
+            extra["duration"] = int(call_duration)
         except ValueError:
             logger.warning("Invalid CallDuration '%s' for CallSid %s", call_duration, call_sid)
 
-    if call_status in ["completed", "busy", "no-answer", "failed", "canceled"]:
-        update_data["ended_at"] = datetime.utcnow()
+    if ended:
+        update_data["ended_at"] = now
         logger.info(f"[PROCESSOR] Call ended - Status: {call_status}, SID: {call_sid}")
 
-    call_attempts_collection.update_one(
-        {"call_sid": call_sid},
-        {"$set": update_data},
-        upsert=True
+    result = call_attempts_collection.update_one(
+        {"call_sid": call_sid, "ended_at": None},
+        {"$set": dict(update_data, **extra)}
     )
+    if not result.matched_count:
+        # Unknown call (record it), or a late/repeated webhook for a call that already
+        # ended: keep its outcome and only add what is new (e.g. the final duration)
+        update = {"$setOnInsert": update_data}
+        if extra:
+            update["$set"] = extra
+        call_attempts_collection.update_one({"call_sid": call_sid}, update, upsert=True)
     logger.info(f"[PROCESSOR] Updated call attempt record for SID: {call_sid}")
 
-    # CRITICAL FIX: If campaignId is missing, look it up from the lead
-    if call_status in ["completed", "busy", "no-answer", "failed", "canceled"]:
+    if "duration" in extra:
+        # Count each call's talk time once in its campaign's counters, however often it is reported
+        counted = call_attempts_collection.find_one_and_update(
+            {"call_sid": call_sid, "talk_time_counted": {"$ne": True}},
+            {"$set": {"talk_time_counted": True}},
+            projection={"campaign_id": 1}
+        )
+        if counted and counted.get("campaign_id"):
+            campaign_counters.talk_time(counted["campaign_id"], extra["duration"])
+
+    # An answered call holds its campaign line until it completes, not just for the ring timeout
+    if call_status == "in-progress" and lead_id and campaign_id:
+        campaign_queues.call_answered(campaign_id, lead_id)
+
+    if ended:
+        # Twilio retries, the recording callback, the assistant hang-up and the sweeper can all
+        # report the same call; only the first one completes it
+        claimed = call_attempts_collection.update_one(
+            {"call_sid": call_sid, "completion_handled": {"$ne": True}},
+            {"$set": {"completion_handled": True}}
+        )
+        if not claimed.modified_count:
+            logger.info(f"[PROCESSOR] Completion of {call_sid} already handled; ignoring {call_status}")
+            return
+
+        # CRITICAL FIX: If campaignId is missing, look it up from the lead
         if not campaign_id and lead_id:
             logger.warning(f"[PROCESSOR] campaignId missing from webhook, looking up from lead {lead_id}")
             try:
@@ -0,0 +1,386 @@
+"""
+Materialized per-campaign counters.
+
+The campaign stats and status endpoints ran a status $group over leads, a
+sentiment $avg, a calendar count_documents and an attempts $group over
+call_attempts on every request, and dashboards poll them while campaigns run.
+Now one campaign_counters document per campaign (_id = campaign id) holds:
+
+    leads_total, status.<status>        leads by status
+    sentiment.<label>, sentiment.scored, sentiment.score_sum
+    calendar_bookings
+    calls                               call attempts placed
+    talk.calls, talk.seconds            attempts with a reported duration
+    cost.<currency>                     calculated call cost
+
+Writers adjust it with $inc as leads change: single-lead updates go through
+update_lead(), which reads the lead's previous state with the same atomic
+find_one_and_update and applies only the difference; bulk status changes
+whose filter pins the old status use lead_transition() with the modified
+count; bulk changes that do not (reset a campaign, manual retry) call
+recount(). The stats endpoints read the document alone.
+
+The lead and the counters are two documents, so a crash between the writes
+or a recount racing an $inc can leave drift: a leased reconciliation pass
+recomputes the counters of running campaigns, and of any campaign changed
+since it was last reconciled, every settings.campaign_counters_reconcile_seconds.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import redis
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.config.database import Database
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "campaign_counters"
+RECONCILE_LEASE_KEY = "convis:campaign-counters-reconcile"
+# Lead fields the counters depend on (projection for update_lead)
+TRACKED_FIELDS = {"campaign_id": 1, "status": 1, "sentiment": 1, "calendar_booked": 1}
+
+
+def utc_now() -> datetime:
+    return datetime.utcnow()
+
+
+def _oid(campaign_id) -> ObjectId:
+    return campaign_id if isinstance(campaign_id, ObjectId) else ObjectId(str(campaign_id))
+
+
+def _key(value) -> str:
+    """Counter field name for a status or label (no dots or leading $ in MongoDB keys)."""
+    return str(value).replace(".", "_").lstrip("$") or "unknown"
+
+
+def _score(sentiment) -> Optional[float]:
+    if not isinstance(sentiment, dict) or not isinstance(sentiment.get("score"), (int, float)):
+        return None
+    return float(sentiment["score"])
+
+
+def _label(sentiment) -> Optional[str]:
+    if not isinstance(sentiment, dict) or not sentiment.get("label"):
+        return None
+    return _key(sentiment["label"])
+
+
+def lead_delta(before: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Counter increments for a lead going from `before` to `before` updated with `changes`.
+
+    Args:
+        before: The lead's tracked fields before the update
+        changes: The update's $set
+
+    Returns:
+        {counter field: increment}, without zero entries
+    """
+    inc: Dict[str, float] = {}
+
+    def add(field, amount):
+        inc[field] = inc.get(field, 0) + amount
+
+    if "status" in changes and changes["status"] != before.get("status"):
+        if before.get("status"):
+            add(f"status.{_key(before['status'])}", -1)
+        if changes["status"]:
+            add(f"status.{_key(changes['status'])}", 1)
+
+    if "sentiment" in changes:
+        old, new = before.get("sentiment"), changes["sentiment"]
+        if _label(old):
+            add(f"sentiment.{_label(old)}", -1)
+        if _label(new):
+            add(f"sentiment.{_label(new)}", 1)
+        if _score(old) is not None:
+            add("sentiment.scored", -1)
+            add("sentiment.score_sum", -_score(old))
+        if _score(new) is not None:
+            add("sentiment.scored", 1)
+            add("sentiment.score_sum", _score(new))
+
+    if "calendar_booked" in changes and bool(changes["calendar_booked"]) != bool(before.get("calendar_booked")):
+        add("calendar_bookings", 1 if changes["calendar_booked"] else -1)
+
+    return {field: amount for field, amount in inc.items() if amount}
+
+
+class CampaignCounters:
+    """campaign_counters maintenance, reads and the leased reconciliation loop."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event = asyncio.Event()
+        self.increments = 0
+        self.recounts = 0
+        self.drift_corrected = 0
+        self.errors = 0
+
+    def _get_redis(self) -> redis.Redis:
+        if self._redis is None:
+            redis_url = settings.redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+        return self._redis
+
+    def _collection(self):
+        return Database.get_db()[COLLECTION]
+
+    # ====== Writers ======
+    def increment(self, campaign_id, inc: Dict[str, float]):
+        """Apply counter increments; never raises (the reconciliation pass repairs a missed one)."""
+        if not inc or not campaign_id:
+            return
+        try:
+            self._collection().update_one(
+                {"_id": _oid(campaign_id)},
+                {"$inc": inc, "$set": {"updated_at": utc_now()}},
+                upsert=True,
+            )
+            self.increments += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"[COUNTERS] Could not update counters of campaign {campaign_id}: {e}")
+
+    def update_lead(self, leads_collection, query: Dict[str, Any], update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        update_one on a lead that keeps its campaign's counters in step.
+
+        Args:
+            leads_collection: The leads collection
+            query: Filter matching at most one lead
+            update: Update document; counters follow its $set of status, sentiment
+                and calendar_booked
+
+        Returns:
+            The lead's tracked fields before the update, or None if nothing matched
+        """
+        before = leads_collection.find_one_and_update(
+            query, update, projection=TRACKED_FIELDS, return_document=ReturnDocument.BEFORE
+        )
+        if before:
+            self.increment(before.get("campaign_id"), lead_delta(before, update.get("$set", {})))
+        return before
+
+    def lead_transition(self, campaign_id, old_status: str, new_status: str, count: int = 1):
+        """Leads moved between two known statuses (e.g. update_many filtered on the old one)."""
+        if count and old_status != new_status:
+            self.increment(campaign_id, {f"status.{_key(old_status)}": -count, f"status.{_key(new_status)}": count})
+
+    def leads_added(self, campaign_id, count: int, status: str = "queued"):
+        if count:
+            self.increment(campaign_id, {"leads_total": count, f"status.{_key(status)}": count})
+
+    def call_placed(self, campaign_id):
+        self.increment(campaign_id, {"calls": 1})
+
+    def talk_time(self, campaign_id, seconds: float):
+        self.increment(campaign_id, {"talk.calls": 1, "talk.seconds": seconds})
+
+    def call_cost(self, campaign_id, amount: float, currency: str):
+        if amount:
+            self.increment(campaign_id, {f"cost.{_key(currency)}": amount})
+
+    def remove(self, campaign_id):
+        self._collection().delete_one({"_id": _oid(campaign_id)})
+
+    # ====== Reads ======
+    def get(self, campaign_id) -> Dict[str, Any]:
+        """The campaign's counters (computed on first read for campaigns that predate them)."""
+        doc = self._collection().find_one({"_id": _oid(campaign_id)})
+        if doc is None or "reconciled_at" not in doc:
+            doc = self.recount(campaign_id)
+        return doc
+
+    # ====== Reconciliation ======
+    def compute(self, campaign_id) -> Dict[str, Any]:
+        """Counters recomputed from leads, call_attempts and call_logs (the old per-request queries)."""
+        db = Database.get_db()
+        campaign_obj_id = _oid(campaign_id)
+
+        status = {
+            _key(row["_id"]): row["count"]
+            for row in db["leads"].aggregate([
+                {"$match": {"campaign_id": campaign_obj_id}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+            ])
+            if row["_id"]
+        }
+        sentiment: Dict[str, float] = {"scored": 0, "score_sum": 0.0}
+        calendar_bookings = 0
+        for row in db["leads"].aggregate([
+            {"$match": {"campaign_id": campaign_obj_id, "$or": [{"sentiment": {"$ne": None}}, {"calendar_booked": True}]}},
+            {"$project": {"sentiment": 1, "calendar_booked": 1}},
+        ]):
+            label, score = _label(row.get("sentiment")), _score(row.get("sentiment"))
+            if label:
+                sentiment[label] = sentiment.get(label, 0) + 1
+            if score is not None:
+                sentiment["scored"] += 1
+                sentiment["score_sum"] += score
+            calendar_bookings += int(bool(row.get("calendar_booked")))
+
+        calls = list(db["call_attempts"].aggregate([
+            {"$match": {"campaign_id": campaign_obj_id}},
+            {"$group": {
+                "_id": None,
+                "calls": {"$sum": 1},
+                "talk_calls": {"$sum": {"$cond": [{"$ne": [{"$ifNull": ["$duration", None]}, None]}, 1, 0]}},
+                "talk_seconds": {"$sum": "$duration"},
+            }},
+        ]))
+        calls = calls[0] if calls else {}
+
+        cost = {
+            _key(row["_id"] or "USD"): row["total"]
+            for row in db["call_logs"].aggregate([
+                {"$match": {"campaign_id": {"$in": [campaign_obj_id, str(campaign_obj_id)]}, "cost_calculated": True}},
+                {"$group": {"_id": "$cost_currency", "total": {"$sum": "$cost_total"}}},
+            ])
+        }
+
+        return {
+            "leads_total": sum(status.values()),
+            "status": status,
+            "sentiment": sentiment,
+            "calendar_bookings": calendar_bookings,
+            "calls": calls.get("calls", 0),
+            "talk": {"calls": calls.get("talk_calls", 0), "seconds": calls.get("talk_seconds", 0)},
+            "cost": cost,
+        }
+
+    def recount(self, campaign_id) -> Dict[str, Any]:
+        """Recompute and store a campaign's counters (blocking).
+
+        Returns:
+            The stored counters document
+        """
+        computed = self.compute(campaign_id)
+        now = utc_now()
+        doc = self._collection().find_one_and_replace(
+            {"_id": _oid(campaign_id)},
+            dict(computed, updated_at=now, reconciled_at=now),
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self.recounts += 1
+        return doc
+
+    def reconcile_once(self) -> int:
+        """
+        Recount running campaigns and campaigns changed since their last recount (blocking).
+
+        Returns:
+            Number of campaigns whose counters had drifted
+        """
+        db = Database.get_db()
+        campaign_ids = {row["_id"] for row in db["campaigns"].find({"status": "running"}, {"_id": 1})}
+        campaign_ids.update(
+            row["_id"] for row in self._collection().find(
+                {"$expr": {"$gt": ["$updated_at", {"$ifNull": ["$reconciled_at", datetime(1970, 1, 1)]}]}},
+                {"_id": 1},
+            ).limit(settings.campaign_counters_reconcile_batch)
+        )
+
+        drifted = 0
+        for campaign_id in campaign_ids:
+            stored = self._collection().find_one({"_id": campaign_id}) or {}
+            doc = self.recount(campaign_id)
+            if not _same_counts(stored, doc):
+                drifted += 1
+                logger.warning(f"[COUNTERS] Corrected drifted counters of campaign {campaign_id}")
+        self.drift_corrected += drifted
+        return drifted
+
+    # ====== Lifecycle ======
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="campaign-counters-reconcile")
+
+    async def shutdown(self):
+        if not self._task:
+            return
+        self._stop_event.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.campaign_counters_reconcile_seconds
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                break
+            try:
+                # One pass per interval across all workers
+                if await loop.run_in_executor(None, self._claim_reconcile, interval):
+                    await loop.run_in_executor(None, self.reconcile_once)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception(f"[COUNTERS] Reconciliation failed: {e}")
+
+    def _claim_reconcile(self, interval: float) -> bool:
+        return bool(self._get_redis().set(RECONCILE_LEASE_KEY, self.worker_id, nx=True, ex=max(1, int(interval))))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "increments": self.increments,
+            "recounts": self.recounts,
+            "drift_corrected": self.drift_corrected,
+            "errors": self.errors,
+        }
+
+
+def _same_counts(stored: Dict[str, Any], recomputed: Dict[str, Any]) -> bool:
+    def normalize(doc):
+        counts = {key: value for key, value in doc.items() if key not in ("_id", "updated_at", "reconciled_at")}
+        counts["status"] = {key: value for key, value in counts.get("status", {}).items() if value}
+        counts["sentiment"] = {key: round(value, 6) for key, value in counts.get("sentiment", {}).items() if value}
+        counts["cost"] = {key: round(value, 4) for key, value in counts.get("cost", {}).items() if value}
+        return counts
+    return normalize(stored) == normalize(recomputed)
+
+
+def campaign_stats(counters: Dict[str, Any]) -> Dict[str, Any]:
+    """CampaignStats fields from a counters document."""
+    status = counters.get("status", {})
+    sentiment = counters.get("sentiment", {})
+    talk = counters.get("talk", {})
+    return {
+        "total_leads": sum(value for value in status.values() if value > 0),
+        "queued": status.get("queued", 0),
+        "completed": status.get("completed", 0),
+        "failed": status.get("failed", 0),
+        "no_answer": status.get("no-answer", 0),
+        "busy": status.get("busy", 0),
+        "calling": status.get("calling", 0),
+        "avg_sentiment_score": sentiment["score_sum"] / sentiment["scored"] if sentiment.get("scored") else None,
+        "calendar_bookings": counters.get("calendar_bookings", 0),
+        "total_calls": counters.get("calls", 0),
+        "avg_call_duration": talk["seconds"] / talk["calls"] if talk.get("calls") else None,
+        "total_cost": {currency: round(value, 4) for currency, value in counters.get("cost", {}).items() if value},
+    }
+
+
+campaign_counters = CampaignCounters()
@@ -3,21 +3,25 @@ Campaign dialer service with sequential calling and Redis locking
 """
 import logging
 import os
-import threading
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 
-import pytz
 import redis
 from bson import ObjectId
 from twilio.rest import Client
 
 from app.config.database import Database
 from app.config.settings import settings
-from app.utils.twilio_helpers import decrypt_twilio_credentials
+from app.services.campaign_counters import campaign_counters
+from app.services.campaign_queues import campaign_queues
+from app.services.campaign_windows import WindowCache, is_open, next_opening, window_spec
+from app.services.twilio_client_pool import twilio_client_pool
 
 logger = logging.getLogger(__name__)
 
+# Outcomes retried per the campaign's attempt_backoff while attempts remain
+RETRYABLE_STATUSES = {"busy", "no-answer"}
+
 
 class CampaignDialer:
     """Service for managing campaign calls"""
@@ -30,8 +34,9 @@ class CampaignDialer:
         # Default Twilio client (used if no per-user credentials are found)
         account_sid = settings.twilio_account_sid or os.getenv("TWILIO_ACCOUNT_SID")
         auth_token = settings.twilio_auth_token or os.getenv("TWILIO_AUTH_TOKEN")
-        self.default_twilio_client = Client(account_sid, auth_token) if account_sid and auth_token else None
-        self._user_twilio_clients: Dict[str, Client] = {}
+        self.default_twilio_client = (
+            twilio_client_pool.get_client(account_sid, auth_token) if account_sid and auth_token else None
+        )
 
         # Base URL for TwiML
         configured_base_url = settings.base_url or settings.api_base_url
@@ -49,6 +54,7 @@ class CampaignDialer:
         logger.info(f"  Recording: {self.recording_callback}")
 
         self.last_error: Optional[str] = None
+        self._windows = WindowCache()
 
     def acquire_lock(self, campaign_id: str, ttl: int = 180) -> bool:
         """
@@ -81,28 +87,9 @@ class CampaignDialer:
             True if within window, False otherwise
         """
         try:
-            # Get lead's timezone
-            lead_tz = lead.get("timezone", working_window.get("timezone", "America/New_York"))
-            tz = pytz.timezone(lead_tz)
-            now = datetime.now(tz)
-
-            # Check day of week (0=Monday, 6=Sunday)
-            if now.weekday() not in working_window.get("days", []):
-                logger.info(f"Lead {lead['_id']} outside working days")
-                return False
-
-            # Parse start and end times
-            start_time = working_window.get("start", "09:00")
-            end_time = working_window.get("end", "17:00")
-
-            start_hour, start_min = map(int, start_time.split(":"))
-            end_hour, end_min = map(int, end_time.split(":"))
-
-            # Create datetime objects for comparison
-            start_dt = now.replace(hour=start_hour, minute=start_min, second=0, microsecond=0)
-            end_dt = now.replace(hour=end_hour, minute=end_min, second=0, microsecond=0)
-
-            if start_dt <= now <= end_dt:
+            # Hours apply in the lead's timezone; the state is cached until the window next changes
+            spec = window_spec(working_window, "America/New_York", timezone=lead.get("timezone"))
+            if self._windows.is_open(spec, datetime.utcnow()):
                 return True
 
             logger.info(f"Lead {lead['_id']} outside working hours")
@@ -173,13 +160,36 @@ class CampaignDialer:
             logger.error(f"Error getting next lead: {e}")
             return None
 
-    def place_call(self, campaign_id: str, lead_id: str) -> Optional[str]:
+    def reserve_lead(self, campaign_id: str, lead_id: str) -> bool:
+        """
+        Move a queued lead to calling and count the attempt (atomic).
+
+        Returns:
+            False if the lead was no longer queued
+        """
+        db = Database.get_db()
+        before = campaign_counters.update_lead(
+            db["leads"],
+            {"_id": ObjectId(lead_id), "campaign_id": ObjectId(campaign_id), "status": "queued"},
+            {
+                "$set": {
+                    "status": "calling",
+                    "updated_at": datetime.utcnow()
+                },
+                "$inc": {"attempts": 1}
+            }
+        )
+        return before is not None
+
+    def place_call(self, campaign_id: str, lead_id: str, reserved: bool = False) -> Optional[str]:
         """
         Place an outbound call to a lead.
 
         Args:
             campaign_id: Campaign ID
             lead_id: Lead ID
+            reserved: The caller already reserved the lead (status calling, attempt
+                counted), as the campaign dispatcher does
 
         Returns:
             Call SID or None if failed
@@ -224,17 +234,13 @@ class CampaignDialer:
                 logger.error(f"Missing Twilio credentials for campaign {campaign_id}")
                 return None
 
-            # Update lead status to calling
-            leads_collection.update_one(
-                {"_id": ObjectId(lead_id)},
-                {
-                    "$set": {
-                        "status": "calling",
-                        "updated_at": datetime.utcnow()
-                    },
-                    "$inc": {"attempts": 1}
-                }
-            )
+            # Update lead status to calling; each dial counts one attempt, in its reservation
+            if not reserved:
+                if not self.reserve_lead(campaign_id, lead_id):
+                    logger.info(f"Lead {lead_id} is no longer queued, skipping")
+                    self.last_error = "Lead is no longer queued for calling."
+                    return None
+                lead["attempts"] = lead.get("attempts", 0) + 1
 
             # Get assistant ID for TwiML
             assistant_id = campaign.get("assistant_id", "")
@@ -289,6 +295,7 @@ class CampaignDialer:
                 "analysis": None,
                 "duration": None
             })
+            campaign_counters.call_placed(campaign_id)
 
             # Update lead with call SID
             leads_collection.update_one(
@@ -296,59 +303,8 @@ class CampaignDialer:
                 {"$set": {"last_call_sid": call.sid}}
             )
 
-            # CRITICAL FIX: Start background monitor to trigger next call when this one ends
-            def monitor_and_trigger_next():
-                """Monitor call completion and instantly trigger next call"""
-                import time
-                time.sleep(10)  # Wait for call to start
-
-                for _ in range(90):  # Monitor for up to 3 minutes
-                    time.sleep(2)  # Check every 2 seconds
-
-                    # Check if call has ended
-                    attempt = call_attempts_collection.find_one({"call_sid": call.sid})
-                    if attempt and attempt.get("status") in ["completed", "busy", "no-answer", "failed", "canceled"]:
-                        logger.info(f"[MONITOR] Call {call.sid} ended with status: {attempt.get('status')}")
-
-                        # Update lead status
-                        leads_collection.update_one(
-                            {"_id": ObjectId(lead_id)},
-                            {
-                                "$set": {
-                                    "status": attempt.get("status", "completed"),
-                                    "last_outcome": attempt.get("status", "completed"),
-                                    "updated_at": datetime.utcnow()
-                                }
-                            }
-                        )
-                        logger.info(f"[MONITOR] Lead {lead_id} marked as {attempt.get('status')}")
-
-                        # Check if campaign is still running
-                        campaign_check = campaigns_collection.find_one({"_id": ObjectId(campaign_id)})
-                        if campaign_check and campaign_check.get("status") == "running":
-                            logger.info(f"[MONITOR] Campaign still running - triggering next call")
-
-                            # Get next lead
-                            next_lead = self.get_next_lead(campaign_id, ignore_window=False)
-                            if next_lead:
-                                logger.info(f"[MONITOR] Found next lead: {next_lead.get('name')} ({next_lead.get('e164')})")
-
-                                # Place next call
-                                next_call_sid = self.place_call(campaign_id, str(next_lead["_id"]))
-                                if next_call_sid:
-                                    logger.info(f"[MONITOR] SUCCESS! Next call placed instantly: {next_call_sid}")
-                                else:
-                                    logger.warning(f"[MONITOR] Failed to place next call: {self.last_error}")
-                            else:
-                                logger.info(f"[MONITOR] No more leads available - campaign complete")
-                        else:
-                            logger.info(f"[MONITOR] Campaign not running - skipping next call")
-
-                        break  # Exit monitoring loop
-
-            # Start monitor in background thread
-            threading.Thread(target=monitor_and_trigger_next, daemon=True).start()
-            logger.info(f"[MONITOR] Started background monitor for call {call.sid}")
+            # Completion arrives through the status callback (see call_events), which
+            # updates the lead and frees the line for the campaign dispatcher
 
             self.last_error = None
             return call.sid
@@ -357,7 +313,8 @@ class CampaignDialer:
             logger.error(f"Error placing call: {e}")
             # Revert lead status
             db = Database.get_db()
-            db["leads"].update_one(
+            campaign_counters.update_lead(
+                db["leads"],
                 {"_id": ObjectId(lead_id)},
                 {"$set": {"status": "queued"}}
             )
@@ -372,14 +329,13 @@ class CampaignDialer:
             return None
 
     def _get_twilio_client_for_campaign(self, campaign: Dict[str, Any], provider_connections_collection) -> Optional[Client]:
-        """Return a Twilio client using the campaign owner's credentials or fall back to defaults."""
+        """Return a Twilio client using the campaign owner's credentials or fall back to defaults.
+
+        Clients come from the shared pool, so every campaign of the same account reuses one
+        keep-alive session; the pool replaces the client when the stored auth token changes.
+        """
         user_id = campaign.get("user_id")
         if user_id:
-            user_key = str(user_id)
-            cached = self._user_twilio_clients.get(user_key)
-            if cached:
-                return cached
-
             try:
                 user_obj_id = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
             except Exception:
@@ -392,14 +348,12 @@ class CampaignDialer:
                     "provider": "twilio"
                 })
                 if connection:
-                    account_sid, auth_token = decrypt_twilio_credentials(connection)
-                    if account_sid and auth_token:
-                        try:
-                            client = Client(account_sid, auth_token)
-                            self._user_twilio_clients[user_key] = client
+                    try:
+                        client = twilio_client_pool.get_client_for_connection(connection)
+                        if client:
                             return client
-                        except Exception as cred_error:
-                            logger.error(f"Failed to initialize Twilio client for user {user_id}: {cred_error}")
+                    except Exception as cred_error:
+                        logger.error(f"Failed to initialize Twilio client for user {user_id}: {cred_error}")
 
         return self.default_twilio_client
 
@@ -487,49 +441,10 @@ class CampaignDialer:
         return now + timedelta(minutes=5)
 
     def _is_within_window(self, campaign: Dict[str, Any], moment: datetime) -> bool:
-        window = campaign.get("working_window") or {}
-        tz_name = window.get("timezone", "UTC")
-        tz = pytz.timezone(tz_name)
-        aware_moment = moment if moment.tzinfo else pytz.utc.localize(moment)
-        local_dt = aware_moment.astimezone(tz)
-        days = window.get("days") or [0, 1, 2, 3, 4]
-        if days and local_dt.weekday() not in days:
-            return False
-        start_str = window.get("start", "09:00")
-        end_str = window.get("end", "17:00")
-        start_hour, start_min = map(int, start_str.split(":"))
-        end_hour, end_min = map(int, end_str.split(":"))
-        start_dt = local_dt.replace(hour=start_hour, minute=start_min, second=0, microsecond=0)
-        end_dt = local_dt.replace(hour=end_hour, minute=end_min, second=0, microsecond=0)
-        return start_dt <= local_dt <= end_dt
+        return is_open(window_spec(campaign.get("working_window"), "UTC"), moment)
 
     def _next_business_start(self, campaign: Dict[str, Any], reference: datetime, min_days: int = 1) -> Optional[datetime]:
-        window = campaign.get("working_window") or {}
-        tz_name = window.get("timezone", "UTC")
-        tz = pytz.timezone(tz_name)
-        days = window.get("days") or [0, 1, 2, 3, 4]
-        start_str = window.get("start", "09:00")
-        start_hour, start_min = map(int, start_str.split(":"))
-        aware_ref = reference if reference.tzinfo else pytz.utc.localize(reference)
-        local_ref = aware_ref.astimezone(tz)
-
-        for offset in range(min_days, min_days + 8):
-            candidate_day = local_ref + timedelta(days=offset)
-            if days and candidate_day.weekday() not in days:
-                continue
-            naive = datetime(
-                candidate_day.year,
-                candidate_day.month,
-                candidate_day.day,
-                start_hour,
-                start_min,
-                tzinfo=None
-            )
-            local_start = tz.localize(naive)
-            if offset == 0 and local_start <= aware_ref:
-                continue
-            return local_start.astimezone(pytz.utc).replace(tzinfo=None)
-        return None
+        return next_opening(window_spec(campaign.get("working_window"), "UTC"), reference, min_days=min_days)
 
     def dial_next(self, campaign_id: str) -> bool:
         """
@@ -590,6 +505,7 @@ class CampaignDialer:
                 "updated_at": now,
             }
             should_continue = campaign.get("status") == "running"
+            next_retry: Optional[datetime] = None
 
             if mapped_status == "completed":
                 update_doc.update({
@@ -599,19 +515,33 @@ class CampaignDialer:
                 })
                 logger.info(f"Lead {lead_id} marked as completed after successful call")
             else:
-                # Treat any non-completed outcome as terminal so we move to the next lead
                 fallback_round = lead.get("fallback_round", 0)
                 terminal_status = mapped_status if mapped_status in {"busy", "no-answer"} else "failed"
-                update_doc.update({
-                    "status": terminal_status,
-                    "next_retry_at": None,
-                    "fallback_round": fallback_round
-                })
-                logger.info(
-                    f"Lead {lead_id} ended with status {terminal_status} after attempt {attempts}; no additional retries will be scheduled"
-                )
-
-            leads_collection.update_one(
+                max_attempts = campaign.get("attempts_per_number") or (campaign.get("retry_policy") or {}).get("max_attempts", 1)
+                if settings.enable_auto_retry and terminal_status in RETRYABLE_STATUSES and attempts < max_attempts:
+                    next_retry = self._compute_next_retry(campaign, attempts, now, call_status)
+                if next_retry:
+                    # Back in the queue; the dispatcher's timer picks it up when it is due
+                    update_doc.update({
+                        "status": "queued",
+                        "next_retry_at": next_retry,
+                        "fallback_round": fallback_round
+                    })
+                    logger.info(
+                        f"Lead {lead_id} ended with status {terminal_status} after attempt {attempts}/{max_attempts}; retry at {next_retry}"
+                    )
+                else:
+                    update_doc.update({
+                        "status": terminal_status,
+                        "next_retry_at": None,
+                        "fallback_round": fallback_round
+                    })
+                    logger.info(
+                        f"Lead {lead_id} ended with status {terminal_status} after attempt {attempts}; no additional retries will be scheduled"
+                    )
+
+            campaign_counters.update_lead(
+                leads_collection,
                 {"_id": ObjectId(lead_id)},
                 {"$set": update_doc}
             )
@@ -626,32 +556,13 @@ class CampaignDialer:
             logger.info(
                 f"Call completed for lead {lead_id}: status={call_status} → {update_doc.get('status')}, next_retry={update_doc.get('next_retry_at')}"
             )
-            logger.info(f"Campaign {campaign_id} ready for next call - scheduler will pick immediately")
-
-            # CRITICAL FIX: Trigger next call immediately in background thread
-            # Don't wait for scheduler - dial next lead instantly for maximum throughput
+            # Free the line and wake the campaign dispatcher, which dials the next lead
+            # right away (no per-call thread, and the campaign's concurrency is respected)
+            campaign_queues.call_finished(campaign_id, lead_id)
+            if next_retry and should_continue:
+                campaign_queues.schedule(campaign_id, next_retry.replace(tzinfo=timezone.utc).timestamp())
             if should_continue:
-                def trigger_next_call():
-                    try:
-                        logger.info(f"[INSTANT_DIAL] Triggering next call for campaign {campaign_id}")
-                        next_lead = self.get_next_lead(campaign_id, ignore_window=False)
-                        if next_lead:
-                            logger.info(f"[INSTANT_DIAL] Found next lead: {next_lead.get('name')} ({next_lead.get('e164')})")
-                            next_call_sid = self.place_call(campaign_id, str(next_lead["_id"]))
-                            if next_call_sid:
-                                logger.info(f"[INSTANT_DIAL] Next call placed successfully: {next_call_sid}")
-                            else:
-                                logger.warning(f"[INSTANT_DIAL] Failed to place next call: {self.last_error}")
-                        else:
-                            logger.info(f"[INSTANT_DIAL] No more leads available for campaign {campaign_id}")
-                    except Exception as next_error:
-                        logger.error(f"[INSTANT_DIAL] Error triggering next call: {next_error}")
-                        import traceback
-                        logger.error(traceback.format_exc())
-
-                # Run in background thread to not block webhook response
-                threading.Thread(target=trigger_next_call, daemon=True).start()
-                logger.info(f"[INSTANT_DIAL] Background thread started for next call")
+                logger.info(f"Campaign {campaign_id} ready for next call - dispatcher woken")
 
         except Exception as e:
             logger.error(f"Error handling call completion for lead {lead_id}: {e}")
@@ -660,7 +571,8 @@ class CampaignDialer:
             # Even if there's an error, try to reset lead status so it's not stuck
             try:
                 db = Database.get_db()
-                db["leads"].update_one(
+                campaign_counters.update_lead(
+                    db["leads"],
                     {"_id": ObjectId(lead_id)},
                     {"$set": {"status": "queued", "updated_at": datetime.utcnow()}}
                 )
@@ -0,0 +1,241 @@
+"""
+Streaming campaign report exports.
+
+The export used to load every lead with list(find()), run one call_attempts
+query per lead for its latest recording (N+1 round trips), write the whole
+report into a StringIO and send it as one string, so memory grew with the
+campaign and the first byte left only after the last lead was processed.
+
+Now one aggregation walks the campaign's leads in dial order (served by the
+leads (campaign_id, order_index, _id) index, so large campaigns never hit
+the in-memory sort limit), joins each to its latest recorded attempt with
+$lookup (served by the call_attempts (lead_id, started_at) index), and the
+report is produced by generators that consume the cursor batch by batch:
+StreamingResponse sends every few hundred rows as they are ready. Formats:
+
+    csv      plain CSV, same columns as before
+    csv.gz   the same CSV, gzip-compressed on the fly
+    parquet  one row group per cursor batch (needs the optional pyarrow package)
+"""
+
+import csv
+import io
+import logging
+import zlib
+from typing import Any, Dict, Iterator, List
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+try:  # Parquet export needs the optional `pyarrow` package
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "csv.gz": ("application/gzip", "csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+COLUMNS = [
+    "Lead ID",
+    "Number",
+    "Name",
+    "Status",
+    "Attempts",
+    "Sentiment",
+    "Sentiment Score",
+    "Calendar Booked",
+    "Recording URL",
+    "Summary",
+]
+CALENDAR_BOOKED = COLUMNS.index("Calendar Booked")
+# Rows fetched per cursor batch, and per CSV chunk / Parquet row group sent
+BATCH_SIZE = 1000
+CSV_FLUSH_ROWS = 500
+
+
+def report_pipeline(campaign_obj_id: ObjectId) -> List[Dict[str, Any]]:
+    """Leads of a campaign in dial order, each with the URL of its latest recorded attempt."""
+    return [
+        {"$match": {"campaign_id": campaign_obj_id}},
+        {"$sort": {"order_index": 1, "_id": 1}},
+        {"$lookup": {
+            "from": "call_attempts",
+            "let": {"lead_id": "$_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$lead_id", "$$lead_id"]}, "recording_url": {"$ne": None}}},
+                {"$sort": {"started_at": -1}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "recording_url": 1}},
+            ],
+            "as": "last_recording",
+        }},
+        {"$project": {
+            "e164": 1, "name": 1, "status": 1, "attempts": 1, "sentiment": 1,
+            "calendar_booked": 1, "summary": 1, "last_recording": 1,
+        }},
+    ]
+
+
+def report_rows(db, campaign_obj_id: ObjectId) -> Iterator[List[Any]]:
+    """
+    Report rows in COLUMNS order as the aggregation cursor advances (blocking).
+
+    Values keep their types (None when missing, calendar_booked a bool); the
+    encoders format them.
+    """
+    cursor = db["leads"].aggregate(report_pipeline(campaign_obj_id), allowDiskUse=True, batchSize=BATCH_SIZE)
+    with cursor:
+        for lead in cursor:
+            sentiment = lead.get("sentiment") or {}
+            recording = lead.get("last_recording") or [{}]
+            yield [
+                str(lead["_id"]),
+                lead.get("e164"),
+                lead.get("name"),
+                lead.get("status"),
+                lead.get("attempts", 0),
+                sentiment.get("label"),
+                sentiment.get("score"),
+                bool(lead.get("calendar_booked")),
+                recording[0].get("recording_url"),
+                lead.get("summary"),
+            ]
+
+
+def iter_csv(rows: Iterator[List[Any]]) -> Iterator[bytes]:
+    """Encode rows as CSV, yielding a chunk every CSV_FLUSH_ROWS rows (header first)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    pending = 1
+    for row in rows:
+        row[CALENDAR_BOOKED] = "Yes" if row[CALENDAR_BOOKED] else "No"
+        writer.writerow(row)
+        pending += 1
+        if pending >= CSV_FLUSH_ROWS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink whose contents are taken out after each row group."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+PARQUET_FIELDS = [
+    ("lead_id", "string"),
+    ("number", "string"),
+    ("name", "string"),
+    ("status", "string"),
+    ("attempts", "int64"),
+    ("sentiment", "string"),
+    ("sentiment_score", "float64"),
+    ("calendar_booked", "bool"),
+    ("recording_url", "string"),
+    ("summary", "string"),
+]
+
+
+def iter_parquet(rows: Iterator[List[Any]]) -> Iterator[bytes]:
+    """Encode rows as Parquet, one row group per BATCH_SIZE rows."""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet export needs the pyarrow package")
+    schema = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in PARQUET_FIELDS])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def write_group(batch):
+        columns = [list(column) for column in zip(*batch)]
+        # Free-form fields written by other services may not have the expected type
+        columns[6] = [_to_float(value) for value in columns[6]]
+        columns[9] = [str(value) if value is not None else None for value in columns[9]]
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, field.type) for column, field in zip(columns, schema)],
+            schema=schema,
+        ))
+
+    batch: List[List[Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            write_group(batch)
+            batch = []
+            yield sink.take()
+    if batch:
+        write_group(batch)
+    writer.close()
+    yield sink.take()
+
+
+def _to_float(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def stream_report(db, campaign_obj_id: ObjectId, export_format: str = "csv") -> Iterator[bytes]:
+    """
+    Campaign report as a byte stream (blocking; StreamingResponse iterates it in a thread).
+
+    Args:
+        db: MongoDB database
+        campaign_obj_id: Campaign to export
+        export_format: One of EXPORT_FORMATS
+
+    Returns:
+        Iterator of encoded chunks
+    """
+    rows = report_rows(db, campaign_obj_id)
+    if export_format == "parquet":
+        stream = iter_parquet(rows)
+    elif export_format == "csv.gz":
+        stream = iter_gzip(iter_csv(rows))
+    else:
+        stream = iter_csv(rows)
+    try:
+        yield from stream
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated download
+        logger.error(f"[EXPORT] Campaign {campaign_obj_id} export failed mid-stream: {e}")
+        raise
@@ -0,0 +1,177 @@
+"""
+Predictive pacing for campaign dialing.
+
+With fixed pacing a campaign dials one lead per free line up to
+min(pacing.max_concurrent, lines), so every line waits out the ring time of a
+call that is often not answered. In predictive mode (pacing.mode =
+"predictive") pacing.max_concurrent is the number of live conversations to
+keep, `lines` caps the calls in flight (ringing + live), and the dispatcher
+launches as many extra dials as it can while the expected share of answered
+calls that find the campaign already at its target stays under
+pacing.max_abandon_rate. Those over-target answers are what a predictive
+dialer abandons; here the assistant still takes them when the media tier has
+room, so the bound mostly protects media capacity and the caller experience.
+
+The model uses rolling per-campaign estimates kept in Redis by
+campaign_queues (minute buckets over settings.campaign_pacing_window_minutes):
+
+    answer rate     answered / finished dials
+    ring time       mean seconds from dial to answer
+    no-answer time  mean seconds an unanswered call rings before it ends
+    handle time     mean seconds of an answered call
+
+Unanswered calls ring longer than answered ones, so a call seen ringing is
+less likely to be answered than a new dial: its answer probability is the
+answered calls' share of ringing time, p * ring / (p * ring + (1 - p) *
+no-answer). For n new dials, answers A are the sum of Binomial(ringing, that
+probability) and Binomial(n, p), and live calls that end before the new dials
+are answered F ~ Binomial(live, 1 - exp(-ring / handle)); the expected
+over-target ratio is E[max(0, A - (target - live + F))] / E[A]. It grows with
+n, so the largest n under the bound is the answer.
+Until enough dials have been observed, or if the observed over-target ratio
+exceeds the bound, the campaign is paced progressively (one dial per free
+conversation slot).
+
+Everything here is pure so the pacing can be checked against a discrete-event
+simulation (tests/test_campaign_pacing.py).
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List
+
+PACING_FIELDS = (
+    "answered", "unanswered", "ring_seconds", "unanswered_seconds", "handled", "handle_seconds", "over_target",
+)
+
+
+@dataclass
+class PacingEstimate:
+    """Rolling per-campaign call statistics."""
+
+    dials: int = 0
+    answer_rate: float = 0.0
+    ring_seconds: float = 0.0
+    no_answer_seconds: float = 0.0
+    handle_seconds: float = 0.0
+    over_target_rate: float = 0.0
+
+    @classmethod
+    def from_totals(cls, totals: Dict[str, float]) -> "PacingEstimate":
+        """Estimate from summed PACING_FIELDS counters (missing fields count as 0)."""
+        answered = totals.get("answered", 0)
+        unanswered = totals.get("unanswered", 0)
+        handled = totals.get("handled", 0)
+        dials = int(answered + unanswered)
+        return cls(
+            dials=dials,
+            answer_rate=answered / dials if dials else 0.0,
+            ring_seconds=totals.get("ring_seconds", 0) / answered if answered else 0.0,
+            no_answer_seconds=totals.get("unanswered_seconds", 0) / unanswered if unanswered else 0.0,
+            handle_seconds=totals.get("handle_seconds", 0) / handled if handled else 0.0,
+            over_target_rate=totals.get("over_target", 0) / answered if answered else 0.0,
+        )
+
+
+def _binomial_pmf(n: int, p: float) -> List[float]:
+    p = min(1.0, max(0.0, p))
+    return [math.comb(n, k) * p ** k * (1 - p) ** (n - k) for k in range(n + 1)]
+
+
+def _convolve(a: List[float], b: List[float]) -> List[float]:
+    out = [0.0] * (len(a) + len(b) - 1)
+    for i, pa in enumerate(a):
+        for j, pb in enumerate(b):
+            out[i + j] += pa * pb
+    return out
+
+
+def ringing_answer_rate(estimate: PacingEstimate) -> float:
+    """Answer probability of a call that is already ringing (its ring time so far unknown)."""
+    answered_time = estimate.answer_rate * estimate.ring_seconds
+    unanswered_time = (1 - estimate.answer_rate) * estimate.no_answer_seconds
+    if answered_time + unanswered_time <= 0:
+        return estimate.answer_rate
+    return answered_time / (answered_time + unanswered_time)
+
+
+def expected_over_target_ratio(
+    estimate: PacingEstimate,
+    ringing: int,
+    new_dials: int,
+    live: int,
+    target_live: int,
+) -> float:
+    """
+    Expected share of the answers of the ringing calls and `new_dials` more that
+    arrive with `target_live` conversations already live.
+
+    Args:
+        estimate: Campaign statistics
+        ringing: Calls ringing now
+        new_dials: Calls about to be dialed
+        live: Conversations in progress
+        target_live: Conversations the campaign should keep live
+
+    Returns:
+        E[over-target answers] / E[answers], 0 when no answer is expected
+    """
+    ringing_rate = ringing_answer_rate(estimate)
+    expected_answers = ringing * ringing_rate + new_dials * estimate.answer_rate
+    if expected_answers <= 0:
+        return 0.0
+    if estimate.handle_seconds > 0:
+        free_probability = 1 - math.exp(-estimate.ring_seconds / estimate.handle_seconds)
+    else:
+        free_probability = 0.0
+    answers = _convolve(_binomial_pmf(ringing, ringing_rate), _binomial_pmf(new_dials, estimate.answer_rate))
+    spare = target_live - live
+    over = 0.0
+    for freed, p_freed in enumerate(_binomial_pmf(live, free_probability)):
+        capacity = spare + freed
+        if capacity < 0:
+            over += p_freed * (expected_answers - capacity)
+        else:
+            over += p_freed * sum(
+                p_answered * (answered - capacity)
+                for answered, p_answered in enumerate(answers[capacity + 1:], start=capacity + 1)
+            )
+    return over / expected_answers
+
+
+def dials_to_launch(
+    estimate: PacingEstimate,
+    ringing: int,
+    live: int,
+    target_live: int,
+    lines: int,
+    max_abandon_rate: float,
+    min_samples: int,
+) -> int:
+    """
+    New calls to place now.
+
+    Args:
+        estimate: Campaign statistics
+        ringing: Calls in flight that are not answered yet
+        live: Answered calls in progress
+        target_live: Conversations to keep live (pacing.max_concurrent)
+        lines: Calls allowed in flight, ringing or live (campaign lines)
+        max_abandon_rate: Bound on the expected over-target share of answers
+        min_samples: Finished dials needed before dialing ahead of free slots
+
+    Returns:
+        Number of dials, never more than the free lines
+    """
+    free_lines = max(0, lines - ringing - live)
+    progressive = max(0, min(free_lines, target_live - live - ringing))
+    if estimate.dials < min_samples or estimate.over_target_rate > max_abandon_rate:
+        return progressive
+
+    dials = 0
+    while dials < free_lines:
+        if expected_over_target_ratio(estimate, ringing, dials + 1, live, target_live) > max_abandon_rate:
+            break
+        dials += 1
+    # Dialing ahead never paces below one call per free slot
+    return max(dials, progressive)
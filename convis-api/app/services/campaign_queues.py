@@ -0,0 +1,394 @@
+"""
+Redis state shared by the campaign dispatcher and the call-status webhooks.
+
+Per running campaign:
+
+    <ns>:campaign:<id>:ready     LIST of queued lead ids, loaded from MongoDB in
+                                 batches in dial order (a cache: every lead is
+                                 still claimed with a conditional update)
+    <ns>:campaign:<id>:inflight  ZSET lead id -> deadline (epoch seconds) of the
+                                 calls the dispatcher started; its size is the
+                                 number of busy lines
+    <ns>:campaign:<id>:dialed    HASH lead id -> dial time of the calls in flight
+    <ns>:campaign:<id>:live      ZSET lead id -> answer time of the answered ones
+    <ns>:campaign:<id>:pacing:<minute>
+                                 HASH of pacing counters (answers, ring and
+                                 handle seconds, see campaign_pacing) per minute
+    <ns>:campaign:<id>:target    live conversations the dispatcher aims for
+    <ns>:campaign:<id>:owner     lease of the worker dispatching the campaign
+
+Completion webhooks (any worker) remove the lead from the in-flight set and
+push the campaign onto the owner's <ns>:campaign-dispatcher:wake:<worker>
+(or the shared <ns>:campaign-dispatcher:wake while no worker holds the
+campaign; whoever pops it forwards it to the owner), which the dispatcher
+blocks on, so a freed line is redialled within milliseconds instead of on the
+next polling tick. A call whose deadline passes without a webhook is treated
+as lost and its line is freed by the call sweeper (see call_events).
+
+Campaigns that will need the dispatcher later (their working window or a
+lead-timezone cohort opens, start_at arrives, a retry falls due) have an entry
+in <ns>:campaign-dispatcher:timers, a ZSET campaign id -> earliest due time
+(epoch seconds). The dispatcher sleeps until the earliest entry instead of
+scanning every campaign each second; scheduling an entry earlier than all
+others wakes it so it can shorten its sleep. Each worker only pops the timers
+of the campaigns it owns.
+
+Every worker dispatches a share of the campaigns (see campaign_sharding): live
+workers heartbeat into <ns>:campaign-dispatcher:workers, a ZSET worker id ->
+last heartbeat (epoch seconds), and entries older than the lease are dropped.
+"""
+
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import redis
+
+from app.config.settings import settings
+from app.services.campaign_pacing import PACING_FIELDS
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "convis"
+# Idle per-campaign keys are dropped after this long (campaign paused or finished)
+KEY_TTL_SECONDS = 86400
+# Wake-up entry that only makes the dispatcher re-read its timers
+TIMERS_WAKE = "timers"
+
+_RENEW_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _parse_wakes(entries: Sequence[str]) -> Dict[str, float]:
+    woken: Dict[str, float] = {}
+    for entry in entries:
+        campaign_id, _, woken_at = entry.partition("|")
+        try:
+            at = float(woken_at)
+        except ValueError:
+            at = time.time()
+        woken[campaign_id] = min(at, woken.get(campaign_id, at))
+    return woken
+
+
+class CampaignQueues:
+    """Ready-queues, in-flight sets, wake-ups, timers and dispatcher ownership in Redis."""
+
+    def __init__(self, redis_url: Optional[str] = None, namespace: str = NAMESPACE):
+        self.redis_url = redis_url
+        self.namespace = namespace
+        self.wake_key = f"{namespace}:campaign-dispatcher:wake"
+        self.workers_key = f"{namespace}:campaign-dispatcher:workers"
+        self.timers_key = f"{namespace}:campaign-dispatcher:timers"
+        self._redis: Optional[redis.Redis] = None
+
+    def _get_redis(self) -> redis.Redis:
+        if self._redis is None:
+            redis_url = self.redis_url or settings.redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+        return self._redis
+
+    def _ready_key(self, campaign_id: str) -> str:
+        return f"{self.namespace}:campaign:{campaign_id}:ready"
+
+    def _inflight_key(self, campaign_id: str) -> str:
+        return f"{self.namespace}:campaign:{campaign_id}:inflight"
+
+    def _dialed_key(self, campaign_id: str) -> str:
+        return f"{self.namespace}:campaign:{campaign_id}:dialed"
+
+    def _live_key(self, campaign_id: str) -> str:
+        return f"{self.namespace}:campaign:{campaign_id}:live"
+
+    def _owner_key(self, campaign_id: str) -> str:
+        return f"{self.namespace}:campaign:{campaign_id}:owner"
+
+    def _worker_wake_key(self, worker_id: str) -> str:
+        return f"{self.wake_key}:{worker_id}"
+
+    def _target_key(self, campaign_id: str) -> str:
+        return f"{self.namespace}:campaign:{campaign_id}:target"
+
+    def _pacing_key(self, campaign_id: str, minute: int) -> str:
+        return f"{self.namespace}:campaign:{campaign_id}:pacing:{minute}"
+
+    # ====== Ready-queue ======
+    def ready_leads(self, campaign_id: str) -> List[str]:
+        return self._get_redis().lrange(self._ready_key(campaign_id), 0, -1)
+
+    def push_ready(self, campaign_id: str, lead_ids: Sequence[str]):
+        if not lead_ids:
+            return
+        key = self._ready_key(campaign_id)
+        pipe = self._get_redis().pipeline()
+        pipe.rpush(key, *lead_ids)
+        pipe.expire(key, KEY_TTL_SECONDS)
+        pipe.execute()
+
+    def pop_ready(self, campaign_id: str, count: int) -> List[str]:
+        if count <= 0:
+            return []
+        return self._get_redis().lpop(self._ready_key(campaign_id), count) or []
+
+    def drop_ready(self, campaign_id: str):
+        """Forget the loaded leads (the set of dialable leads changed); the next dispatch reloads."""
+        self._get_redis().delete(self._ready_key(campaign_id))
+
+    # ====== In-flight calls ======
+    def inflight_count(self, campaign_id: str) -> int:
+        return int(self._get_redis().zcard(self._inflight_key(campaign_id)))
+
+    def add_inflight(self, campaign_id: str, lead_id: str, timeout_seconds: float):
+        key = self._inflight_key(campaign_id)
+        dialed_key = self._dialed_key(campaign_id)
+        now = time.time()
+        pipe = self._get_redis().pipeline()
+        pipe.zadd(key, {lead_id: now + timeout_seconds})
+        pipe.expire(key, KEY_TTL_SECONDS)
+        pipe.hset(dialed_key, lead_id, now)
+        pipe.expire(dialed_key, KEY_TTL_SECONDS)
+        pipe.execute()
+
+    def extend_inflight(self, campaign_id: str, lead_id: str, timeout_seconds: float):
+        """Push back the deadline of a call still in flight (e.g. once it is answered)."""
+        self._get_redis().zadd(self._inflight_key(campaign_id), {lead_id: time.time() + timeout_seconds}, xx=True)
+
+    def remove_inflight(self, campaign_id: str, lead_ids: Sequence[str]) -> int:
+        if not lead_ids:
+            return 0
+        pipe = self._get_redis().pipeline()
+        pipe.zrem(self._inflight_key(campaign_id), *lead_ids)
+        pipe.zrem(self._live_key(campaign_id), *lead_ids)
+        pipe.hdel(self._dialed_key(campaign_id), *lead_ids)
+        return int(pipe.execute()[0])
+
+    def expired_inflight(self, campaign_id: str) -> List[str]:
+        return self._get_redis().zrangebyscore(self._inflight_key(campaign_id), "-inf", time.time())
+
+    def inflight_leads(self, campaign_id: str) -> List[str]:
+        return self._get_redis().zrange(self._inflight_key(campaign_id), 0, -1)
+
+    def clear(self, campaign_id: str):
+        self._get_redis().delete(
+            self._ready_key(campaign_id),
+            self._inflight_key(campaign_id),
+            self._dialed_key(campaign_id),
+            self._live_key(campaign_id),
+        )
+        self._get_redis().zrem(self.timers_key, campaign_id)
+
+    # ====== Timers ======
+    def schedule(self, campaign_id: str, due_at: float):
+        """
+        Have the dispatcher look at a campaign at `due_at` (epoch seconds).
+
+        An earlier entry for the campaign is kept; a later one is brought forward.
+        """
+        client = self._get_redis()
+        pipe = client.pipeline()
+        pipe.zadd(self.timers_key, {campaign_id: due_at}, lt=True)
+        pipe.zrange(self.timers_key, 0, 0)
+        _, first = pipe.execute()
+        if first and first[0] == campaign_id:
+            # New earliest timer: the owner may be sleeping past it
+            owner = client.get(self._owner_key(campaign_id))
+            wake_key = self._worker_wake_key(owner) if owner else self.wake_key
+            client.rpush(wake_key, f"{TIMERS_WAKE}|{time.time()}")
+
+    def pop_due(self, owns: Callable[[str], bool], now: Optional[float] = None) -> Dict[str, float]:
+        """
+        Remove and return the due timers of the campaigns a worker owns.
+
+        Args:
+            owns: Whether the calling worker owns a campaign id
+            now: Epoch seconds (default: current time)
+
+        Returns:
+            {campaign_id: due time (epoch seconds)}
+        """
+        now = time.time() if now is None else now
+        client = self._get_redis()
+        due = {
+            campaign_id: float(score)
+            for campaign_id, score in client.zrangebyscore(self.timers_key, "-inf", now, withscores=True)
+            if owns(campaign_id)
+        }
+        if due:
+            client.zrem(self.timers_key, *due)
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """Due time (epoch seconds) of the earliest timer, None if there is none."""
+        first = self._get_redis().zrange(self.timers_key, 0, 0, withscores=True)
+        return float(first[0][1]) if first else None
+
+    # ====== Wake-ups ======
+    def wake(self, campaign_id: str):
+        """Ask the campaign's dispatcher to fill its free lines now."""
+        client = self._get_redis()
+        owner = client.get(self._owner_key(campaign_id))
+        wake_key = self._worker_wake_key(owner) if owner else self.wake_key
+        client.rpush(wake_key, f"{campaign_id}|{time.time()}")
+
+    def forward_wake(self, worker_id: str, campaign_id: str, woken_at: Optional[float] = None):
+        """Hand a wake-up popped by the wrong worker to the campaign's owner."""
+        at = time.time() if woken_at is None else woken_at
+        self._get_redis().rpush(self._worker_wake_key(worker_id), f"{campaign_id}|{at}")
+
+    def wait_for_wake(self, worker_id: str, timeout: float) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        Block until campaigns are woken (or `timeout` seconds pass).
+
+        Args:
+            worker_id: Reads this worker's wake-ups and the shared ones
+            timeout: Seconds to wait
+
+        Returns:
+            ({campaign_id: earliest wake time (epoch seconds)} sent to this worker,
+            the same for the shared wake-ups); both empty on timeout
+        """
+        client = self._get_redis()
+        own_key = self._worker_wake_key(worker_id)
+        first = client.blpop([own_key, self.wake_key], timeout=max(1, int(round(timeout))))
+        if not first:
+            return {}, {}
+        pipe = client.pipeline()
+        pipe.lpop(own_key, 1000)
+        pipe.lpop(self.wake_key, 1000)
+        own, shared = pipe.execute()
+        own, shared = own or [], shared or []
+        (own if first[0] == own_key else shared).insert(0, first[1])
+        return _parse_wakes(own), _parse_wakes(shared)
+
+    # ====== Pacing ======
+    def _record_pacing(self, campaign_id: str, counts: Dict[str, float], now: float):
+        key = self._pacing_key(campaign_id, int(now // 60))
+        pipe = self._get_redis().pipeline()
+        for field, amount in counts.items():
+            pipe.hincrbyfloat(key, field, amount)
+        pipe.expire(key, (settings.campaign_pacing_window_minutes + 1) * 60)
+        pipe.execute()
+
+    def set_pacing_target(self, campaign_id: str, target_live: int):
+        """Live conversations the campaign aims for (answers beyond it count as over-target)."""
+        self._get_redis().set(self._target_key(campaign_id), target_live, ex=KEY_TTL_SECONDS)
+
+    def pacing_snapshot(self, campaign_id: str) -> Tuple[int, int, Dict[str, float]]:
+        """
+        Current line usage and the rolling pacing counters of a campaign.
+
+        Returns:
+            (calls ringing, calls live, PACING_FIELDS summed over the pacing window)
+        """
+        current = int(time.time() // 60)
+        minutes = range(current - settings.campaign_pacing_window_minutes + 1, current + 1)
+        pipe = self._get_redis().pipeline()
+        pipe.zcard(self._inflight_key(campaign_id))
+        pipe.zcard(self._live_key(campaign_id))
+        for minute in minutes:
+            pipe.hgetall(self._pacing_key(campaign_id, minute))
+        in_flight, live, *buckets = pipe.execute()
+        totals: Dict[str, float] = {field: 0.0 for field in PACING_FIELDS}
+        for bucket in buckets:
+            for field, value in bucket.items():
+                if field in totals:
+                    totals[field] += float(value)
+        return max(0, int(in_flight) - int(live)), int(live), totals
+
+    # ====== Call lifecycle (webhooks) ======
+    def call_answered(self, campaign_id: str, lead_id: str):
+        try:
+            self.extend_inflight(campaign_id, lead_id, settings.campaign_max_call_seconds)
+            now = time.time()
+            pipe = self._get_redis().pipeline()
+            pipe.zadd(self._live_key(campaign_id), {lead_id: now}, nx=True)
+            pipe.expire(self._live_key(campaign_id), KEY_TTL_SECONDS)
+            pipe.zcard(self._live_key(campaign_id))
+            pipe.hget(self._dialed_key(campaign_id), lead_id)
+            pipe.get(self._target_key(campaign_id))
+            added, _, live, dialed_at, target = pipe.execute()
+            if not added or dialed_at is None:
+                return  # Repeated webhook, or a call the dispatcher did not place
+            counts = {"answered": 1, "ring_seconds": max(0.0, now - float(dialed_at))}
+            if target is not None and int(live) > int(target):
+                counts["over_target"] = 1
+            self._record_pacing(campaign_id, counts, now)
+        except Exception as e:
+            logger.warning(f"[DISPATCHER] Could not record answer of lead {lead_id}: {e}")
+
+    def call_finished(self, campaign_id: str, lead_id: str):
+        """Free the lead's line and wake the dispatcher (safe to call more than once)."""
+        try:
+            now = time.time()
+            pipe = self._get_redis().pipeline()
+            pipe.hget(self._dialed_key(campaign_id), lead_id)
+            pipe.zscore(self._live_key(campaign_id), lead_id)
+            dialed_at, answered_at = pipe.execute()
+            self.remove_inflight(campaign_id, [lead_id])
+            self.wake(campaign_id)
+            if dialed_at is not None:
+                if answered_at is not None:
+                    self._record_pacing(campaign_id, {"handled": 1, "handle_seconds": max(0.0, now - answered_at)}, now)
+                else:
+                    self._record_pacing(campaign_id, {"unanswered": 1, "unanswered_seconds": max(0.0, now - float(dialed_at))}, now)
+        except Exception as e:
+            # The call sweeper frees the line once the call's deadline passes
+            logger.warning(f"[DISPATCHER] Could not release line of lead {lead_id}: {e}")
+
+    # ====== Dispatcher workers and campaign leases ======
+    def heartbeat(self, worker_id: str, ttl_seconds: int) -> List[str]:
+        """
+        Record that a dispatcher worker is alive and drop the ones that stopped.
+
+        Returns:
+            Live worker ids, sorted
+        """
+        now = time.time()
+        pipe = self._get_redis().pipeline()
+        pipe.zadd(self.workers_key, {worker_id: now})
+        pipe.zremrangebyscore(self.workers_key, "-inf", now - ttl_seconds)
+        pipe.zrange(self.workers_key, 0, -1)
+        return sorted(pipe.execute()[2])
+
+    def leave(self, worker_id: str):
+        """Remove a stopping worker at once, so its campaigns move without waiting for the lease."""
+        client = self._get_redis()
+        client.zrem(self.workers_key, worker_id)
+        client.delete(self._worker_wake_key(worker_id))
+
+    def claim_campaign(self, campaign_id: str, worker_id: str, ttl_seconds: int) -> bool:
+        """Take (or keep) the lease of a campaign; False while another worker holds it."""
+        client = self._get_redis()
+        key = self._owner_key(campaign_id)
+        if client.set(key, worker_id, nx=True, ex=ttl_seconds):
+            return True
+        return bool(client.eval(_RENEW_LEASE, 1, key, worker_id, ttl_seconds))
+
+    def renew_campaigns(self, campaign_ids: Sequence[str], worker_id: str, ttl_seconds: int) -> List[bool]:
+        """Renew several campaign leases in one round trip (False where the lease was lost)."""
+        if not campaign_ids:
+            return []
+        pipe = self._get_redis().pipeline()
+        for campaign_id in campaign_ids:
+            pipe.eval(_RENEW_LEASE, 1, self._owner_key(campaign_id), worker_id, ttl_seconds)
+        return [bool(renewed) for renewed in pipe.execute()]
+
+    def release_campaign(self, campaign_id: str, worker_id: str):
+        self._get_redis().eval(_RELEASE_LEASE, 1, self._owner_key(campaign_id), worker_id)
+
+    def owner(self, campaign_id: str) -> Optional[str]:
+        return self._get_redis().get(self._owner_key(campaign_id))
+
+
+campaign_queues = CampaignQueues()
@@ -1,14 +1,42 @@
 """
 Asynchronous campaign dispatcher that enforces concurrency, business hours,
 and fallback retry logic on top of the existing CampaignDialer.
+
+The dispatcher is event-driven (see campaign_queues for the Redis layout):
+
+- every worker dispatches its own share of the running campaigns, assigned
+  by rendezvous hashing over the workers heartbeating in Redis and guarded by
+  a per-campaign lease, so adding workers adds dispatch capacity and a dead
+  worker's campaigns move to the others within one lease (see
+  campaign_sharding)
+- queued leads are loaded into a per-campaign Redis ready-queue in batches,
+  so a free line costs one LPOP and one conditional claim instead of a
+  sorted find_one_and_update over the campaign's leads
+- busy lines are counted from the campaign's Redis in-flight set rather than
+  a count_documents per campaign per tick
+- completion webhooks wake the dispatcher for their campaign, which refills
+  the freed line right away (lost calls are swept by call_events)
+- a campaign outside its working window (or before start_at, or with only
+  retries that are not due yet) gets a Redis timer for the moment that
+  changes, and the dispatcher sleeps until the earliest timer; window states
+  are cached until they next change (see campaign_windows), and a slow full
+  scan (the interval) only covers campaigns started without a wake-up
+- Twilio calls.create runs for several leads in parallel
+- campaigns with pacing.mode "predictive" dial ahead of free conversation
+  slots using their rolling answer rate, ring and handle times (see
+  campaign_pacing)
 """
 
 from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Set, Tuple
 
 import pytz
 from bson import ObjectId
@@ -16,23 +44,60 @@ from pymongo import ReturnDocument
 
 from app.config.database import Database
 from app.config.settings import settings
+from app.services.campaign_counters import campaign_counters
 from app.services.campaign_dialer import CampaignDialer
+from app.services.campaign_pacing import PacingEstimate, dials_to_launch
+from app.services.campaign_queues import TIMERS_WAKE, CampaignQueues, campaign_queues
+from app.services.campaign_sharding import headroom_share, owner_of
+from app.services.campaign_windows import WindowCache, window_spec
+from app.services.worker_load import worker_load
 
 logger = logging.getLogger(__name__)
 
+# Times a campaign's ready-queue may be reloaded in one dispatch (leads claimed elsewhere)
+MAX_LOADS_PER_DISPATCH = 3
+
 
 def utc_now() -> datetime:
     return datetime.utcnow()
 
 
+def _epoch(moment: datetime) -> float:
+    """Epoch seconds of a naive UTC datetime."""
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
 class CampaignScheduler:
     """Background dispatcher that continuously feeds leads into the dialer."""
 
-    def __init__(self, interval_seconds: Optional[int] = None):
+    def __init__(
+        self,
+        interval_seconds: Optional[int] = None,
+        dialer: Optional[CampaignDialer] = None,
+        queues: Optional[CampaignQueues] = None,
+    ):
         self.interval_seconds = interval_seconds or settings.campaign_dispatch_interval_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        # Live dispatcher workers (as of the last heartbeat) and the campaigns whose lease we hold
+        self.workers: List[str] = []
+        self.owned: Set[str] = set()
         self._task: Optional[asyncio.Task] = None
         self._stop_event = asyncio.Event()
-        self._dialer = CampaignDialer()
+        self._dialer = dialer or CampaignDialer()
+        self._queues = queues or campaign_queues
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._windows = WindowCache()
+        # Lead-timezone cohorts: {campaign_id: (timezones of queued leads, refresh after)}
+        self._cohorts: Dict[str, Tuple[List[str], datetime]] = {}
+        self._open_zones: Dict[str, Optional[Set[str]]] = {}
+        self.dispatched = 0
+        self.dispatch_failures = 0
+        self.wakeups = 0
+        self.timers_fired = 0
+        self.stale_resets = 0
+        self.lag_samples = 0
+        self.lag_ms_total = 0.0
+        self.lag_ms_max = 0.0
 
     async def start(self):
         if self._task and not self._task.done():
@@ -55,82 +120,185 @@ class CampaignScheduler:
             pass
         finally:
             self._task = None
+        try:
+            # Hand our campaigns over now instead of when the leases lapse
+            self._queues.leave(self.worker_id)
+            for campaign_id in list(self.owned):
+                self._queues.release_campaign(campaign_id, self.worker_id)
+        except Exception as e:
+            logger.debug(f"[SCHEDULER] Could not release campaign leases: {e}")
+        self.owned.clear()
+        self.workers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.campaign_dispatch_concurrency,
+                thread_name_prefix="campaign-dial",
+            )
+        return self._executor
 
     async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_scan = 0.0
         while not self._stop_event.is_set():
             try:
-                loop = asyncio.get_running_loop()
-                await loop.run_in_executor(None, self.dispatch_once)
+                workers = await loop.run_in_executor(
+                    None, self._queues.heartbeat, self.worker_id, settings.campaign_dispatch_lease_seconds
+                )
+                if workers != self.workers:
+                    logger.info(f"[SCHEDULER] {len(workers)} campaign dispatcher worker(s) live; rebalancing campaigns")
+                    # New owners dispatch their campaigns without waiting for the next full scan
+                    next_scan = 0.0
+                self.workers = workers
+                await loop.run_in_executor(None, self._renew_campaigns)
+
+                if loop.time() >= next_scan:
+                    await loop.run_in_executor(None, self.dispatch_once)
+                    next_scan = loop.time() + self.interval_seconds
+                due = await loop.run_in_executor(None, self._queues.pop_due, self.owns)
+                if due:
+                    self.timers_fired += len(due)
+                    await loop.run_in_executor(None, self.dispatch_once, dict.fromkeys(due))
+
+                # Sleep until a completion webhook frees a line, the next timer is due,
+                # the next full scan, or the heartbeat and leases need renewing
+                timeout = min(next_scan - loop.time(), settings.campaign_dispatch_lease_seconds / 3)
+                next_due = await loop.run_in_executor(None, self._queues.next_due)
+                if next_due is not None:
+                    timeout = min(timeout, next_due - time.time())
+                own, shared = await loop.run_in_executor(None, self._queues.wait_for_wake, self.worker_id, max(0.0, timeout))
+                woken = await loop.run_in_executor(None, self._route_wakes, own, shared)
+                if woken:
+                    self.wakeups += len(woken)
+                    await loop.run_in_executor(None, self.dispatch_once, woken)
             except asyncio.CancelledError:
                 break
-            except Exception as exc:
-                logger.exception("Campaign dispatcher tick failed: %s", exc)
-            try:
-                await asyncio.wait_for(self._stop_event.wait(), timeout=self.interval_seconds)
             except asyncio.TimeoutError:
                 continue
+            except Exception as exc:
+                logger.exception("Campaign dispatcher tick failed: %s", exc)
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=settings.campaign_dispatch_lease_seconds / 3)
+                except asyncio.TimeoutError:
+                    continue
+
+    # ====== Campaign ownership ======
+    def owns(self, campaign_id: str) -> bool:
+        """Whether this worker is the campaign's owner under the current membership."""
+        return owner_of(campaign_id, self.workers) == self.worker_id
+
+    def _hold(self, campaign_id: str) -> bool:
+        """Whether this worker may dispatch the campaign now (owner, and holding its lease)."""
+        if not self.owns(campaign_id):
+            return False
+        if campaign_id in self.owned:
+            return True
+        if self._queues.claim_campaign(campaign_id, self.worker_id, settings.campaign_dispatch_lease_seconds):
+            self.owned.add(campaign_id)
+            return True
+        # The previous owner has not seen the new membership yet; its lease runs out at worst
+        return False
+
+    def _renew_campaigns(self):
+        """Renew the leases of the campaigns we still own and release the ones that moved."""
+        moved = [campaign_id for campaign_id in self.owned if not self.owns(campaign_id)]
+        for campaign_id in moved:
+            self._queues.release_campaign(campaign_id, self.worker_id)
+            self.owned.discard(campaign_id)
+        kept = sorted(self.owned)
+        for campaign_id, renewed in zip(kept, self._queues.renew_campaigns(kept, self.worker_id, settings.campaign_dispatch_lease_seconds)):
+            if not renewed:
+                logger.warning(f"[SCHEDULER] Lost the lease of campaign {campaign_id}")
+                self.owned.discard(campaign_id)
+        if moved:
+            logger.info(f"[SCHEDULER] Handed over {len(moved)} campaign(s); dispatching {len(self.owned)}")
+
+    def _route_wakes(self, own: Dict[str, float], shared: Dict[str, float]) -> Dict[str, float]:
+        """
+        Wake-ups to dispatch here: the ones sent to this worker, and the shared ones
+        (campaigns nobody held a lease for) that hash to it; the rest of the shared
+        ones go to their owners. Sent wake-ups are never forwarded again, so workers
+        with different views of the membership cannot bounce them back and forth.
+        """
+        mine = dict(own)
+        for campaign_id, woken_at in shared.items():
+            owner = owner_of(campaign_id, self.workers)
+            if owner is None or owner == self.worker_id:
+                mine[campaign_id] = min(woken_at, mine.get(campaign_id, woken_at))
+            else:
+                self._queues.forward_wake(owner, campaign_id, woken_at)
+        mine.pop(TIMERS_WAKE, None)
+        return mine
 
     # ====== Core tick ======
-    def dispatch_once(self):
-        """One synchronous tick that scans running campaigns and dials leads."""
+    def dispatch_once(self, woken: Optional[Dict[str, float]] = None) -> int:
+        """
+        Fill the free lines of running campaigns (blocking).
+
+        Args:
+            woken: {campaign_id: wake time} to dispatch only campaigns whose lines
+                were just freed or whose timer is due (wake time None); None scans
+                every running campaign
+
+        Returns:
+            Number of calls started
+        """
         db = Database.get_db()
         campaigns_collection = db["campaigns"]
-        leads_collection = db["leads"]
-        running_campaigns = list(campaigns_collection.find({"status": "running"}))
         now = utc_now()
-        total_dispatched = 0
-
-        # CRITICAL FIX: Reset stale "calling" leads (stuck > 30 seconds)
-        # This handles cases where Twilio webhook never arrives or call is declined/rejected
-        stale_threshold = now - timedelta(seconds=30)
-        stale_reset = leads_collection.update_many(
-            {
-                "status": "calling",
-                "updated_at": {"$lt": stale_threshold}
-            },
-            {
-                "$set": {
-                    "status": "no-answer",
-                    "last_outcome": "timeout-no-webhook",
-                    "updated_at": now
-                }
-            }
-        )
-        if stale_reset.modified_count > 0:
-            logger.warning(f"[SCHEDULER] Reset {stale_reset.modified_count} stale 'calling' leads (no webhook received after 30s)")
-
-        if running_campaigns:
-            logger.debug(f"[SCHEDULER] Found {len(running_campaigns)} running campaign(s)")
 
+        if woken is None:
+            running_ids = [str(row["_id"]) for row in campaigns_collection.find({"status": "running"}, {"_id": 1})]
+            # Campaigns that stopped running no longer need our lease
+            for campaign_id in self.owned - set(running_ids):
+                self._queues.release_campaign(campaign_id, self.worker_id)
+                self.owned.discard(campaign_id)
+        else:
+            running_ids = [campaign_id for campaign_id in woken if ObjectId.is_valid(campaign_id)]
+        ids = [ObjectId(campaign_id) for campaign_id in running_ids if self._hold(campaign_id)]
+        running_campaigns = list(campaigns_collection.find({"_id": {"$in": ids}, "status": "running"})) if ids else []
+        if running_campaigns and woken is None:
+            logger.debug(f"[SCHEDULER] Dispatching {len(running_campaigns)} of {len(running_ids)} running campaign(s)")
+
+        # Never dial more calls than the media tier has free streams for (None = unknown);
+        # the dispatcher workers split the free streams between them
+        media_headroom = worker_load.media_headroom() if running_campaigns else None
+        if media_headroom is not None:
+            media_headroom = headroom_share(media_headroom, self.worker_id, self.workers)
+
+        reservations: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
         for campaign in running_campaigns:
             try:
                 campaign_id = str(campaign.get("_id"))
                 campaign_name = campaign.get("name", "Unknown")
 
                 if not self._campaign_is_active(campaign, now):
+                    self._schedule_activation(campaign, now)
                     logger.debug(f"[SCHEDULER] Campaign {campaign_name} ({campaign_id}) is not active (checking delays/business hours)")
                     continue
+                self._track_cohorts(campaign, now)
 
                 slots = self._available_slots_for_campaign(db, campaign)
+                if media_headroom is not None:
+                    slots = min(slots, media_headroom - len(reservations))
+                    if slots <= 0:
+                        logger.info(f"[SCHEDULER] Media tier at capacity; holding campaign {campaign_name} ({campaign_id})")
+                        continue
                 if slots <= 0:
                     logger.debug(f"[SCHEDULER] Campaign {campaign_name} ({campaign_id}) has no available slots (current calls in progress)")
                     continue
 
-                logger.info(f"[SCHEDULER] Campaign {campaign_name} ({campaign_id}) has {slots} available slot(s)")
-
-                for _ in range(slots):
-                    lead = self._reserve_lead(db, campaign, now)
-                    if not lead:
-                        logger.debug(f"[SCHEDULER] No ready leads found for campaign {campaign_name} ({campaign_id})")
-                        break
-                    lead_name = lead.get("name", "Unknown")
-                    logger.info(f"[SCHEDULER] Reserved lead {lead_name} for campaign {campaign_name}")
-                    dispatched = self._start_call(campaign, lead)
-                    if dispatched:
-                        total_dispatched += 1
-                        logger.info(f"[SCHEDULER] Successfully dispatched call for lead {lead_name}")
-                    else:
-                        logger.warning(f"[SCHEDULER] Failed to dispatch call for lead {lead_name}")
+                leads = self._reserve_leads(db, campaign, slots, now)
+                if not leads:
+                    logger.debug(f"[SCHEDULER] No ready leads found for campaign {campaign_name} ({campaign_id})")
+                if len(leads) < slots and woken is None:
+                    # Retries are timed when they are scheduled; this re-arms them after a Redis loss
+                    self._schedule_next_retry(db, campaign, now)
+                reservations.extend((campaign, lead) for lead in leads)
             except Exception as campaign_error:
                 logger.exception(
                     "[SCHEDULER] Failed to process campaign %s: %s",
@@ -138,10 +306,28 @@ class CampaignScheduler:
                     campaign_error
                 )
 
-        if total_dispatched:
-            logger.info(f"[SCHEDULER] Dispatched {total_dispatched} lead(s) this tick")
-        elif running_campaigns:
-            logger.debug(f"[SCHEDULER] Tick completed - no leads dispatched (campaigns may be waiting for delays)")
+        if not reservations:
+            if running_campaigns and woken is None:
+                logger.debug(f"[SCHEDULER] Tick completed - no leads dispatched (campaigns may be waiting for delays)")
+            return 0
+
+        results = list(self._get_executor().map(lambda item: self._start_call(*item), reservations))
+        total_dispatched = sum(results)
+        self.dispatched += total_dispatched
+        self.dispatch_failures += len(results) - total_dispatched
+
+        if woken:
+            placed_at = time.time()
+            for campaign, _ in reservations:
+                woken_at = woken.get(str(campaign["_id"]))
+                if woken_at is not None:
+                    lag_ms = max(0.0, (placed_at - woken_at) * 1000)
+                    self.lag_samples += 1
+                    self.lag_ms_total += lag_ms
+                    self.lag_ms_max = max(self.lag_ms_max, lag_ms)
+
+        logger.info(f"[SCHEDULER] Dispatched {total_dispatched} lead(s) ({len(results) - total_dispatched} failed)")
+        return total_dispatched
 
     def _campaign_is_active(self, campaign: Dict[str, Any], now: datetime) -> bool:
         start_at = campaign.get("start_at")
@@ -158,89 +344,242 @@ class CampaignScheduler:
         return self._within_business_hours(campaign, now)
 
     def _within_business_hours(self, campaign: Dict[str, Any], now: datetime) -> bool:
-        window = campaign.get("working_window") or {}
-        tz_name = window.get("timezone") or settings.default_timezone
-        start_str = window.get("start", "09:00")
-        end_str = window.get("end", "17:00")
-        days = window.get("days") or [0, 1, 2, 3, 4]
-
-        tz = pytz.timezone(tz_name)
-        aware_now = pytz.utc.localize(now)
-        local_now = aware_now.astimezone(tz)
+        zones, _ = self._open_timezones(campaign, now)
+        return zones is None or bool(zones)
 
-        if days and local_now.weekday() not in days:
-            return False
+    def _open_timezones(self, campaign: Dict[str, Any], now: datetime) -> Tuple[Optional[Set[str]], Optional[datetime]]:
+        """
+        Which leads the working window lets us dial now, and until when.
 
-        start_hour, start_minute = map(int, start_str.split(":"))
-        end_hour, end_minute = map(int, end_str.split(":"))
+        With working_window.use_lead_timezone the window's hours apply in each
+        lead's own timezone, so leads are dialed by timezone cohort.
 
-        start_dt = local_now.replace(
-            hour=start_hour, minute=start_minute, second=0, microsecond=0
-        )
-        end_dt = local_now.replace(
-            hour=end_hour, minute=end_minute, second=0, microsecond=0
+        Returns:
+            (None if the campaign window is open for every lead, else the set of
+            lead timezones whose window is open (empty if none); naive UTC time
+            of the next change, None if it never changes)
+        """
+        window = campaign.get("working_window") or {}
+        campaign_spec = window_spec(window, settings.default_timezone)
+        if not window.get("use_lead_timezone"):
+            is_open, until = self._windows.state(campaign_spec, now)
+            return (None if is_open else set()), until
+
+        open_zones: Set[str] = set()
+        next_change: Optional[datetime] = None
+        for zone in self._lead_timezones(campaign, now) + [campaign_spec.timezone]:
+            try:
+                is_open, until = self._windows.state(window_spec(window, settings.default_timezone, timezone=zone), now)
+            except pytz.UnknownTimeZoneError:
+                continue
+            if is_open:
+                open_zones.add(zone)
+            if until is not None and (next_change is None or until < next_change):
+                next_change = until
+        return open_zones, next_change
+
+    def _lead_timezones(self, campaign: Dict[str, Any], now: datetime) -> List[str]:
+        """Timezones of the campaign's queued leads (re-read every few minutes)."""
+        campaign_id = str(campaign["_id"])
+        cached = self._cohorts.get(campaign_id)
+        if cached and now < cached[1]:
+            return cached[0]
+        zones = [
+            zone for zone in Database.get_db()["leads"].distinct(
+                "timezone", {"campaign_id": campaign["_id"], "status": "queued"}
+            ) if zone
+        ]
+        self._cohorts[campaign_id] = (zones, now + timedelta(seconds=settings.campaign_cohort_refresh_seconds))
+        return zones
+
+    def _track_cohorts(self, campaign: Dict[str, Any], now: datetime):
+        """Time the next cohort change of an active campaign, and drop loaded leads of cohorts that closed."""
+        if not (campaign.get("working_window") or {}).get("use_lead_timezone"):
+            return
+        campaign_id = str(campaign["_id"])
+        zones, next_change = self._open_timezones(campaign, now)
+        if next_change is not None:
+            self._queues.schedule(campaign_id, _epoch(next_change))
+        previous = self._open_zones.get(campaign_id)
+        if previous is not None and zones != previous:
+            self._queues.drop_ready(campaign_id)
+        self._open_zones[campaign_id] = zones
+
+    def _schedule_activation(self, campaign: Dict[str, Any], now: datetime):
+        """Time the next dispatch of a campaign that is not active now (start_at or window opening)."""
+        start_at = campaign.get("start_at")
+        stop_at = campaign.get("stop_at")
+        if stop_at and stop_at <= now:
+            return
+        if start_at and start_at > now:
+            due_at = start_at
+        else:
+            _, due_at = self._open_timezones(campaign, now)
+        if due_at is not None and not (stop_at and due_at >= stop_at):
+            self._queues.schedule(str(campaign["_id"]), _epoch(due_at))
+
+    def _schedule_next_retry(self, db, campaign: Dict[str, Any], now: datetime):
+        """Time the dispatch of the campaign's earliest retry that is not due yet."""
+        lead = db["leads"].find_one(
+            {"campaign_id": campaign["_id"], "status": "queued", "next_retry_at": {"$gt": now}},
+            {"next_retry_at": 1},
+            sort=[("next_retry_at", 1)],
         )
-
-        return start_dt <= local_now <= end_dt
+        if lead:
+            self._queues.schedule(str(campaign["_id"]), _epoch(lead["next_retry_at"]))
 
     def _available_slots_for_campaign(self, db, campaign: Dict[str, Any]) -> int:
-        leads_collection = db["leads"]
-        campaign_id = campaign["_id"]
-        in_progress = leads_collection.count_documents({
-            "campaign_id": campaign_id,
-            "status": "calling"
-        })
         pacing = campaign.get("pacing", {})
+        if pacing.get("mode") == "predictive":
+            return self._predictive_slots(campaign)
+        in_progress = self._queues.inflight_count(str(campaign["_id"]))
         pacing_limit = pacing.get("max_concurrent", 1)
         lines = campaign.get("lines", 1)
         max_slots = max(1, min(pacing_limit, lines))
         available = max_slots - in_progress
         return max(0, available)
 
-    def _reserve_lead(self, db, campaign: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
-        leads_collection = db["leads"]
-        campaign_id = campaign["_id"]
+    def _predictive_slots(self, campaign: Dict[str, Any]) -> int:
+        """Dials to launch so max_concurrent conversations stay live within the abandon bound."""
+        campaign_id = str(campaign["_id"])
+        pacing = campaign.get("pacing", {})
+        target_live = max(1, pacing.get("max_concurrent", 1))
+        self._queues.set_pacing_target(campaign_id, target_live)
+        ringing, live, totals = self._queues.pacing_snapshot(campaign_id)
+        estimate = PacingEstimate.from_totals(totals)
+        dials = dials_to_launch(
+            estimate,
+            ringing=ringing,
+            live=live,
+            target_live=target_live,
+            lines=max(target_live, campaign.get("lines", 1)),
+            max_abandon_rate=pacing.get("max_abandon_rate", settings.campaign_pacing_max_abandon_rate),
+            min_samples=settings.campaign_pacing_min_samples,
+        )
+        if dials:
+            logger.debug(
+                f"[SCHEDULER] Campaign {campaign_id}: {dials} dial(s) for {ringing} ringing / {live} live "
+                f"(answer rate {estimate.answer_rate:.2f} over {estimate.dials} dials)"
+            )
+        return dials
 
-        # Simple query: just get queued leads in CSV order
-        # No attempt limits - each lead is called exactly once
-        query = {
-            "campaign_id": campaign_id,
-            "status": "queued"
+    def _load_ready_queue(self, db, campaign: Dict[str, Any], now: Optional[datetime] = None) -> int:
+        """Append the next batch of dialable queued leads (in CSV order) to the campaign's ready-queue."""
+        campaign_id = str(campaign["_id"])
+        now = now or utc_now()
+        already_queued = [ObjectId(lead_id) for lead_id in self._queues.ready_leads(campaign_id)]
+        query: Dict[str, Any] = {
+            "campaign_id": campaign["_id"],
+            "status": "queued",
+            # Retries wait for their time (a timer wakes the campaign then)
+            "$or": [{"next_retry_at": None}, {"next_retry_at": {"$lte": now}}],
         }
-
-        # Sort by order_index first (call in CSV order)
-        sort = [("order_index", 1), ("_id", 1)]
-
-        lead = leads_collection.find_one_and_update(
-            query,
-            {
-                "$set": {
+        window = campaign.get("working_window") or {}
+        if window.get("use_lead_timezone"):
+            zones, _ = self._open_timezones(campaign, now)
+            zone_filter: List[Optional[str]] = sorted(zones or [])
+            if window_spec(window, settings.default_timezone).timezone in (zones or ()):
+                zone_filter.append(None)  # Leads without a timezone follow the campaign's
+            query["timezone"] = {"$in": zone_filter}
+        if already_queued:
+            query["_id"] = {"$nin": already_queued}
+        batch = db["leads"].find(query, {"_id": 1}).sort([("order_index", 1), ("_id", 1)]).limit(settings.campaign_dispatch_batch_size)
+        lead_ids = [str(lead["_id"]) for lead in batch]
+        self._queues.push_ready(campaign_id, lead_ids)
+        return len(lead_ids)
+
+    def _reserve_leads(self, db, campaign: Dict[str, Any], slots: int, now: datetime) -> List[Dict[str, Any]]:
+        """Claim up to `slots` leads from the ready-queue and mark their lines busy."""
+        leads_collection = db["leads"]
+        campaign_id = str(campaign["_id"])
+        reserved: List[Dict[str, Any]] = []
+        loads = 0
+        while len(reserved) < slots:
+            lead_ids = self._queues.pop_ready(campaign_id, slots - len(reserved))
+            if not lead_ids:
+                if loads >= MAX_LOADS_PER_DISPATCH or not self._load_ready_queue(db, campaign, now):
+                    break
+                loads += 1
+                continue
+            for lead_id in lead_ids:
+                # The queue is only a cache: the lead may have been dialled or edited since it was loaded
+                lead = leads_collection.find_one_and_update(
+                    {"_id": ObjectId(lead_id), "campaign_id": campaign["_id"], "status": "queued"},
+                    {
+                        "$set": {
+                            "status": "calling",
+                            "updated_at": now,
+                            "next_retry_at": None,
+                            "last_outcome": "dialing",
+                        },
+                        "$inc": {"attempts": 1},
+                    },
+                    return_document=ReturnDocument.AFTER
+                )
+                if not lead:
+                    continue
+                campaign_counters.lead_transition(campaign["_id"], "queued", "calling")
+                lead.setdefault("fallback_round", 0)
+                self._queues.add_inflight(campaign_id, lead_id, settings.campaign_ring_timeout_seconds)
+                logger.info(
+                    "Reserved lead %s (attempt %s) for campaign %s",
+                    lead.get("_id"),
+                    lead.get("attempts"),
+                    campaign_id
+                )
+                reserved.append(lead)
+        return reserved
+
+    def reset_stale_calls(self) -> int:
+        """
+        Free lines whose call never reported back (no answer or completion webhook
+        before its in-flight deadline) and mark those leads as no-answer (blocking;
+        run by the call-events sweeper).
+
+        Returns:
+            Number of leads reset
+        """
+        db = Database.get_db()
+        leads_collection = db["leads"]
+        now = utc_now()
+        reset = 0
+        for campaign in db["campaigns"].find({"status": "running"}, {"_id": 1}):
+            campaign_id = str(campaign["_id"])
+            stale = self._queues.expired_inflight(campaign_id)
+            stale_ids = [ObjectId(lead_id) for lead_id in stale]
+            # Leads left "calling" without an in-flight entry (Redis flushed, dispatcher crashed mid-claim)
+            tracked = [ObjectId(lead_id) for lead_id in self._queues.inflight_leads(campaign_id)]
+            orphan_cutoff = now - timedelta(seconds=settings.campaign_max_call_seconds)
+            result = leads_collection.update_many(
+                {
+                    "campaign_id": campaign["_id"],
                     "status": "calling",
-                    "updated_at": now,
-                    "next_retry_at": None,
-                    "last_outcome": "dialing",
+                    "$or": [
+                        {"_id": {"$in": stale_ids}},
+                        {"_id": {"$nin": tracked}, "updated_at": {"$lt": orphan_cutoff}},
+                    ],
                 },
-                "$inc": {"attempts": 1},
-            },
-            sort=sort,
-            return_document=ReturnDocument.AFTER
-        )
-
-        if lead:
-            lead.setdefault("fallback_round", 0)
-            logger.info(
-                "Reserved lead %s (attempt %s) for campaign %s",
-                lead.get("_id"),
-                lead.get("attempts"),
-                campaign_id
+                {
+                    "$set": {
+                        "status": "no-answer",
+                        "last_outcome": "timeout-no-webhook",
+                        "updated_at": now
+                    }
+                }
             )
-        return lead
+            self._queues.remove_inflight(campaign_id, stale)
+            campaign_counters.lead_transition(campaign["_id"], "calling", "no-answer", result.modified_count)
+            if result.modified_count > 0:
+                reset += result.modified_count
+                logger.warning(f"[SCHEDULER] Reset {result.modified_count} stale 'calling' lead(s) of campaign {campaign_id} (no webhook received)")
+        self.stale_resets += reset
+        return reset
 
     def _start_call(self, campaign: Dict[str, Any], lead: Dict[str, Any]) -> bool:
         campaign_id = str(campaign["_id"])
         lead_id = str(lead["_id"])
         try:
-            call_sid = self._dialer.place_call(campaign_id, lead_id)
+            call_sid = self._dialer.place_call(campaign_id, lead_id, reserved=True)
             if not call_sid:
                 raise RuntimeError(self._dialer.last_error or "Unknown dialer error")
             return True
@@ -251,9 +590,10 @@ class CampaignScheduler:
                 lead_id,
                 error
             )
-            # Revert lead state to queued so it can be retried later
+            # Revert lead state to queued so it can be retried later, and free the line
             db = Database.get_db()
-            db["leads"].update_one(
+            campaign_counters.update_lead(
+                db["leads"],
                 {"_id": ObjectId(lead_id)},
                 {
                     "$set": {
@@ -263,7 +603,24 @@ class CampaignScheduler:
                     }
                 }
             )
+            self._queues.remove_inflight(campaign_id, [lead_id])
             return False
 
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "workers": len(self.workers),
+            "owned_campaigns": len(self.owned),
+            "dispatched": self.dispatched,
+            "dispatch_failures": self.dispatch_failures,
+            "wakeups": self.wakeups,
+            "timers_fired": self.timers_fired,
+            "window_cache_hits": self._windows.hits,
+            "window_cache_misses": self._windows.misses,
+            "stale_resets": self.stale_resets,
+            "refill_lag_ms_avg": round(self.lag_ms_total / self.lag_samples, 1) if self.lag_samples else None,
+            "refill_lag_ms_max": round(self.lag_ms_max, 1),
+        }
+
 
 campaign_scheduler = CampaignScheduler()
@@ -0,0 +1,55 @@
+"""
+Campaign ownership across dispatcher workers.
+
+Every API worker (several per container, several containers) runs the
+campaign dispatcher. Instead of one leader dispatching every campaign, each
+live worker owns a share of the running campaigns:
+
+- workers heartbeat into a Redis ZSET (campaign_queues.heartbeat); a worker
+  missing for settings.campaign_dispatch_lease_seconds is dropped, and its
+  campaigns move to the others
+- a campaign's owner is chosen by rendezvous (highest random weight) hashing
+  over the live workers, so adding or losing a worker only moves the
+  campaigns that hash to it
+- the owner also holds a per-campaign lease while it dispatches; while two
+  workers briefly disagree on membership, the lease keeps each campaign with
+  exactly one of them (the previous owner releases it once it sees the change)
+
+These helpers are pure; the Redis side lives in campaign_queues.
+"""
+
+import hashlib
+from typing import Optional, Sequence
+
+
+def _weight(worker_id: str, campaign_id: str) -> int:
+    digest = hashlib.blake2b(f"{worker_id}|{campaign_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def owner_of(campaign_id: str, workers: Sequence[str]) -> Optional[str]:
+    """
+    Worker that should dispatch a campaign.
+
+    Args:
+        campaign_id: Campaign id
+        workers: Live worker ids
+
+    Returns:
+        The worker with the highest weight for the campaign, None without workers
+    """
+    if not workers:
+        return None
+    return max(workers, key=lambda worker_id: (_weight(worker_id, campaign_id), worker_id))
+
+
+def headroom_share(headroom: int, worker_id: str, workers: Sequence[str]) -> int:
+    """
+    This worker's part of the media tier's free streams, split evenly across
+    dispatchers (the remainder goes to the first workers in id order).
+    """
+    if not workers or worker_id not in workers:
+        return headroom
+    ranked = sorted(workers)
+    share, remainder = divmod(max(0, headroom), len(ranked))
+    return share + (1 if ranked.index(worker_id) < remainder else 0)
@@ -0,0 +1,149 @@
+"""
+Working-window arithmetic for campaigns and lead-timezone cohorts.
+
+The dispatcher used to localize the campaign's working window with pytz on
+every tick for every running campaign, and the dialer did the same for every
+candidate lead. A window only changes state twice a day, so window_state()
+returns both whether a window is open and the moment that answer stops being
+true; WindowCache keeps that answer until then, and the dispatcher schedules a
+timer for the next opening instead of polling (see campaign_queues).
+
+A window is open from `start` to `end` inclusive (HH:MM, local time) on the
+listed weekdays (0 = Monday), as before; windows whose end is before their
+start never open.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import pytz
+
+DEFAULT_DAYS = (0, 1, 2, 3, 4)
+# State of a window stays valid up to (excluding) this long after its end minute
+_END_RESOLUTION = timedelta(microseconds=1)
+
+
+@dataclass(frozen=True)
+class WindowSpec:
+    """A working window in one timezone (hashable, so it can key caches)."""
+
+    timezone: str
+    start: Tuple[int, int]
+    end: Tuple[int, int]
+    days: Tuple[int, ...]
+
+
+def _hour_minute(value: str) -> Tuple[int, int]:
+    hour, minute = value.split(":")
+    return int(hour), int(minute)
+
+
+def window_spec(
+    window: Optional[Dict[str, Any]],
+    default_timezone: str,
+    timezone: Optional[str] = None,
+) -> WindowSpec:
+    """
+    WindowSpec of a campaign's working_window.
+
+    Args:
+        window: working_window document (missing fields take the usual defaults)
+        default_timezone: Timezone when the window has none
+        timezone: Evaluate the window's hours in this timezone instead (a lead's)
+    """
+    window = window or {}
+    return WindowSpec(
+        timezone=timezone or window.get("timezone") or default_timezone,
+        start=_hour_minute(window.get("start", "09:00")),
+        end=_hour_minute(window.get("end", "17:00")),
+        days=tuple(window.get("days") or DEFAULT_DAYS),
+    )
+
+
+@lru_cache(maxsize=512)
+def _zone(name: str):
+    return pytz.timezone(name)
+
+
+def _local_day(spec: WindowSpec, day: datetime, hour_minute: Tuple[int, int]) -> datetime:
+    """Aware local datetime at hour_minute on `day`'s date."""
+    naive = datetime(day.year, day.month, day.day, hour_minute[0], hour_minute[1])
+    return _zone(spec.timezone).localize(naive)
+
+
+def _to_utc(moment: datetime) -> datetime:
+    return moment.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def is_open(spec: WindowSpec, moment: datetime) -> bool:
+    """Whether the window is open at `moment` (naive UTC or aware)."""
+    return window_state(spec, moment)[0]
+
+
+def next_opening(spec: WindowSpec, after: datetime, min_days: int = 0) -> Optional[datetime]:
+    """
+    Next window start strictly after `after`, at least `min_days` local days later.
+
+    Returns:
+        Naive UTC datetime, or None if the window never opens
+    """
+    aware = after if after.tzinfo else pytz.utc.localize(after)
+    local = aware.astimezone(_zone(spec.timezone))
+    for offset in range(min_days, min_days + 8):
+        day = local + timedelta(days=offset)
+        if spec.days and day.weekday() not in spec.days:
+            continue
+        start = _local_day(spec, day, spec.start)
+        if start <= aware:
+            continue
+        return _to_utc(start)
+    return None
+
+
+def window_state(spec: WindowSpec, now: datetime) -> Tuple[bool, Optional[datetime]]:
+    """
+    Whether the window is open at `now`, and until when that holds.
+
+    Args:
+        spec: Window
+        now: Naive UTC or aware datetime
+
+    Returns:
+        (open, naive UTC datetime before which the state does not change; None if it never changes)
+    """
+    aware = now if now.tzinfo else pytz.utc.localize(now)
+    local = aware.astimezone(_zone(spec.timezone))
+    if not spec.days or local.weekday() in spec.days:
+        start = _local_day(spec, local, spec.start)
+        end = _local_day(spec, local, spec.end)
+        if start <= local <= end:
+            return True, _to_utc(end + _END_RESOLUTION)
+    return False, next_opening(spec, aware)
+
+
+class WindowCache:
+    """window_state() answers kept until they expire (one entry per distinct window and timezone)."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._states: Dict[WindowSpec, Tuple[bool, Optional[datetime]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def state(self, spec: WindowSpec, now: datetime) -> Tuple[bool, Optional[datetime]]:
+        """window_state(spec, now) for a naive UTC `now`."""
+        cached = self._states.get(spec)
+        if cached is not None and (cached[1] is None or now < cached[1]):
+            self.hits += 1
+            return cached
+        self.misses += 1
+        if len(self._states) >= self.max_entries:
+            self._states.clear()
+        state = window_state(spec, now)
+        self._states[spec] = state
+        return state
+
+    def is_open(self, spec: WindowSpec, now: datetime) -> bool:
+        return self.state(spec, now)[0]
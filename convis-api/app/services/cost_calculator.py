@@ -8,6 +8,7 @@ from datetime import datetime
 from bson import ObjectId
 
 from app.config.database import Database
+from app.services.campaign_counters import campaign_counters
 from app.utils.pricing import PricingCalculator, TWILIO_PRICING, USD_TO_INR
 
 logger = logging.getLogger(__name__)
@@ -144,11 +145,13 @@ async def calculate_and_store_call_cost(
             "is_realtime_api": is_realtime
         }
 
-        # Update call log with cost information
-        call_logs_collection.update_one(
-            {"call_sid": call_sid},
+        # Update call log with cost information (once: concurrent calculations count it once)
+        stored = call_logs_collection.update_one(
+            {"call_sid": call_sid, "cost_calculated": {"$ne": True}},
             {"$set": cost_data}
         )
+        if stored.modified_count and call_log.get("campaign_id"):
+            campaign_counters.call_cost(call_log["campaign_id"], cost_data["cost_total"], currency)
 
         logger.info(f"[COST] ✓ Cost calculated for {call_sid}: Total={currency} {total_cost:.4f} (API: {api_cost:.4f}, Twilio: {twilio_total:.4f})")
 
@@ -47,6 +47,17 @@ def create_all_indexes():
         assistants.create_index([("user_id", 1), ("created_at", -1)], name="idx_assistant_user_created")
         logger.info("[DATABASE_INDEXES] ✅ Created index on ai_assistants.user_id + created_at")
 
+        # Knowledge base ingestion jobs (claimed oldest-first by status; polled per assistant)
+        kb_jobs = db["kb_ingestion_jobs"]
+        kb_jobs.create_index([("status", 1), ("created_at", 1)], name="idx_kb_job_claim")
+        kb_jobs.create_index([("assistant_id", 1), ("created_at", -1)], name="idx_kb_job_assistant")
+        logger.info("[DATABASE_INDEXES] ✅ Created indexes on kb_ingestion_jobs")
+
+        # Shared chunk embeddings (looked up by _id; unused entries expire)
+        from app.utils.kb_embedding_store import kb_embedding_store
+        kb_embedding_store.ensure_indexes()
+        logger.info("[DATABASE_INDEXES] ✅ Created TTL index on kb_embeddings.last_used_at")
+
         # Phone Numbers Collection Indexes
         phone_numbers = db["phone_numbers"]
 
@@ -83,6 +94,57 @@ def create_all_indexes():
         campaigns.create_index([("user_id", 1), ("status", 1), ("scheduled_time", 1)], name="idx_campaign_active")
         logger.info("[DATABASE_INDEXES] ✅ Created index on campaigns.user_id + status + scheduled_time")
 
+        # Leads Collection Indexes
+
+        # 1. Campaign dispatcher: queued leads of a campaign in dial order, busy lines per campaign
+        db["leads"].create_index(
+            [("campaign_id", 1), ("status", 1), ("order_index", 1), ("_id", 1)],
+            name="idx_lead_dispatch"
+        )
+        logger.info("[DATABASE_INDEXES] ✅ Created index on leads.campaign_id + status + order_index")
+
+        # 2. Retry lookups and lead listing (formerly created on every lead upload); the _id
+        #    tiebreak lets report exports sort all of a campaign's leads without an in-memory sort
+        db["leads"].create_index([("campaign_id", 1), ("retry_on", 1)])
+        db["leads"].create_index([("campaign_id", 1), ("order_index", 1), ("_id", 1)], name="idx_lead_order")
+        logger.info("[DATABASE_INDEXES] ✅ Created indexes on leads.campaign_id + retry_on / order_index + _id")
+
+        # 3. Campaign dispatcher: earliest pending retry of a campaign
+        db["leads"].create_index(
+            [("campaign_id", 1), ("status", 1), ("next_retry_at", 1)],
+            name="idx_lead_retry_due"
+        )
+        logger.info("[DATABASE_INDEXES] ✅ Created index on leads.campaign_id + status + next_retry_at")
+
+        # 4. One lead per number per campaign: lead imports skip numbers already uploaded
+        try:
+            db["leads"].create_index([("campaign_id", 1), ("e164", 1)], unique=True, name="idx_lead_campaign_e164_unique")
+            logger.info("[DATABASE_INDEXES] ✅ Created unique index on leads.campaign_id + e164")
+        except Exception as e:
+            logger.warning(
+                f"[DATABASE_INDEXES] Could not create unique index on leads.campaign_id + e164 "
+                f"(run migrate_lead_duplicates.py if leads are duplicated): {e}"
+            )
+
+        # Lead Import Jobs Collection Indexes
+        db["lead_import_jobs"].create_index([("status", 1), ("created_at", 1)], name="idx_lead_import_claim")
+        logger.info("[DATABASE_INDEXES] ✅ Created index on lead_import_jobs.status + created_at")
+
+        # Call Attempts Collection Indexes
+        call_attempts = db["call_attempts"]
+
+        # 1. Status callbacks and call events look attempts up by call_sid
+        call_attempts.create_index("call_sid", name="idx_attempt_call_sid")
+        logger.info("[DATABASE_INDEXES] ✅ Created index on call_attempts.call_sid")
+
+        # 2. Call sweeper: open attempts by start time
+        call_attempts.create_index([("ended_at", 1), ("started_at", 1)], name="idx_attempt_open")
+        logger.info("[DATABASE_INDEXES] ✅ Created index on call_attempts.ended_at + started_at")
+
+        # 3. Campaign report: each lead's latest attempt ($lookup by lead_id)
+        call_attempts.create_index([("lead_id", 1), ("started_at", -1)], name="idx_attempt_lead_latest")
+        logger.info("[DATABASE_INDEXES] ✅ Created index on call_attempts.lead_id + started_at")
+
         logger.info("[DATABASE_INDEXES] 🎉 All indexes created successfully!")
         return True
 
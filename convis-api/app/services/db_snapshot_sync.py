@@ -0,0 +1,453 @@
+"""
+Background refresh of assistant database snapshots.
+
+For assistants whose database_config has sync_mode="snapshot", API workers
+copy the configured table into utils/db_snapshot.py snapshots so calls never
+query the customer's database. A refresh is claimed with a lease on the
+assistant's document in the db_snapshots collection, so one worker refreshes
+each assistant at a time:
+
+    full         every selected column of every row is streamed (server-side
+                 cursor) and a new generation is written
+    incremental  with an updated_at_column, only rows changed since the last
+                 watermark are fetched and merged by primary key
+
+Tables without an updated_at_column are fully reloaded every
+snapshot_refresh_minutes. Incremental mode cannot see deleted rows, so it
+falls back to a full reload every settings.db_snapshot_full_refresh_hours.
+Refresh outcome, size and duration are recorded on the state document for
+GET /database/{assistant_id}/snapshot.
+
+Only the api tier (app.main) runs this refresher. Media workers, which answer
+the calls, read the generations it writes, so settings.db_snapshot_path must
+be a directory both tiers mount (the db-snapshots volume in docker-compose).
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config.database import Database
+from app.config.settings import settings
+from app.models.ai_assistant import DatabaseConfig
+from app.services.external_db import check_identifier
+from app.utils.db_snapshot import snapshot_store
+
+logger = logging.getLogger(__name__)
+
+STATE_COLLECTION = "db_snapshots"
+# Rows fetched per round-trip from the customer's database
+FETCH_BATCH = 2000
+
+
+def utc_now() -> datetime:
+    return datetime.utcnow()
+
+
+def snapshot_columns(config: DatabaseConfig) -> List[str]:
+    """Columns copied into the snapshot, in a stable order."""
+    columns = list(config.snapshot_columns) or [config.primary_key, *config.search_columns, *config.key_columns]
+    if config.updated_at_column:
+        columns.append(config.updated_at_column)
+    return [check_identifier(column) for column in dict.fromkeys(columns)]
+
+
+def snapshot_fingerprint(config: DatabaseConfig) -> str:
+    """Changes whenever a new snapshot must be built from scratch (source, table or columns)."""
+    parts = [
+        config.type, config.host, str(config.port), config.database, config.table_name, config.primary_key,
+        ",".join(snapshot_columns(config)), ",".join(config.search_columns), ",".join(config.key_columns),
+        config.updated_at_column or "",
+    ]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def jsonable(value: Any) -> Any:
+    """Row value as stored in the snapshot."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)  # ObjectId, UUID, ...
+
+
+def encode_watermark(value: Any) -> Optional[Dict[str, Any]]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return {"type": "datetime", "value": value.isoformat()}
+    return {"type": "value", "value": jsonable(value)}
+
+
+def decode_watermark(mark: Optional[Dict[str, Any]]) -> Any:
+    if not mark:
+        return None
+    if mark["type"] == "datetime":
+        return datetime.fromisoformat(mark["value"])
+    return mark["value"]
+
+
+# ====== Sources (blocking; run on the executor) ======
+def _fetch_postgresql(config: DatabaseConfig, columns: List[str], since: Any) -> Iterator[Dict[str, Any]]:
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=config.host,
+        port=int(config.port),
+        database=config.database,
+        user=config.username,
+        password=config.password,
+        connect_timeout=settings.external_db_connect_timeout_seconds,
+        options=f"-c statement_timeout={settings.db_snapshot_statement_timeout_seconds * 1000}",
+    )
+    try:
+        query = f"SELECT {', '.join(columns)} FROM {check_identifier(config.table_name)}"
+        params: Tuple = ()
+        if since is not None:
+            query += f" WHERE {config.updated_at_column} >= %s ORDER BY {config.updated_at_column}"
+            params = (since,)
+        # Named (server-side) cursor: rows are streamed instead of loaded into memory at once
+        with conn.cursor(name="convis_snapshot") as cursor:
+            cursor.itersize = FETCH_BATCH
+            cursor.execute(query, params)
+            for row in cursor:
+                yield dict(zip(columns, row))
+    finally:
+        conn.close()
+
+
+def _fetch_mysql(config: DatabaseConfig, columns: List[str], since: Any) -> Iterator[Dict[str, Any]]:
+    import mysql.connector
+
+    conn = mysql.connector.connect(
+        host=config.host,
+        port=int(config.port),
+        database=config.database,
+        user=config.username,
+        password=config.password,
+        connection_timeout=settings.external_db_connect_timeout_seconds,
+    )
+    try:
+        query = (
+            f"SELECT /*+ MAX_EXECUTION_TIME({settings.db_snapshot_statement_timeout_seconds * 1000}) */ "
+            f"{', '.join(columns)} FROM {check_identifier(config.table_name)}"
+        )
+        params: Tuple = ()
+        if since is not None:
+            query += f" WHERE {config.updated_at_column} >= %s ORDER BY {config.updated_at_column}"
+            params = (since,)
+        cursor = conn.cursor()  # unbuffered: rows stream as they are fetched
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def _fetch_mongodb(config: DatabaseConfig, columns: List[str], since: Any) -> Iterator[Dict[str, Any]]:
+    import pymongo
+
+    client = pymongo.MongoClient(
+        host=config.host,
+        port=int(config.port),
+        username=config.username or None,
+        password=config.password or None,
+        serverSelectionTimeoutMS=settings.external_db_connect_timeout_seconds * 1000,
+    )
+    try:
+        collection = client[config.database][config.table_name]
+        query = {config.updated_at_column: {"$gte": since}} if since is not None else {}
+        cursor = (
+            collection.find(query, {column: 1 for column in columns})
+            .batch_size(FETCH_BATCH)
+            .max_time_ms(settings.db_snapshot_statement_timeout_seconds * 1000)
+        )
+        if since is not None:
+            cursor = cursor.sort(config.updated_at_column, 1)
+        for document in cursor:
+            yield {column: document.get(column) for column in columns}
+    finally:
+        client.close()
+
+
+FETCHERS = {"postgresql": _fetch_postgresql, "mysql": _fetch_mysql, "mongodb": _fetch_mongodb}
+
+
+class DatabaseSnapshotSync:
+    """Claims due snapshot refreshes and runs them on the executor."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event = asyncio.Event()
+        self._wake_event = asyncio.Event()
+        self._running: Dict[str, asyncio.Task] = {}
+        self.refreshed = 0
+        self.incremental = 0
+        self.failed = 0
+
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        os.makedirs(snapshot_store.root, exist_ok=True)
+        self._stop_event.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="db-snapshot-sync")
+
+    async def shutdown(self):
+        if not self._task:
+            return
+        self._stop_event.set()
+        self._task.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        # A cancelled refresh leaves the live generation untouched; its lease simply expires
+        await asyncio.gather(self._task, *self._running.values(), return_exceptions=True)
+        self._task = None
+        self._running.clear()
+
+    # ====== State ======
+    def _states(self):
+        return Database.get_db()[STATE_COLLECTION]
+
+    def request_refresh(self, assistant_id: str, full: bool = False):
+        """Make an assistant's snapshot due now (full=True rebuilds it from scratch)."""
+        self._states().update_one(
+            {"_id": str(assistant_id)},
+            {"$set": {"next_refresh_at": utc_now(), "force_full": full}, "$setOnInsert": {"created_at": utc_now()}},
+            upsert=True,
+        )
+        self._wake_event.set()
+
+    def get_state(self, assistant_id: str) -> Optional[Dict[str, Any]]:
+        return self._states().find_one({"_id": str(assistant_id)})
+
+    def _snapshot_assistants(self) -> List[Tuple[str, Dict[str, Any]]]:
+        cursor = Database.get_db()["assistants"].find(
+            {"database_config.enabled": True, "database_config.sync_mode": "snapshot"},
+            {"database_config": 1},
+        )
+        return [(str(doc["_id"]), doc["database_config"]) for doc in cursor]
+
+    def _claim(self, assistant_id: str) -> Optional[Dict[str, Any]]:
+        states = self._states()
+        now = utc_now()
+        try:
+            # First sight of an assistant: due immediately
+            states.update_one(
+                {"_id": assistant_id},
+                {"$setOnInsert": {"next_refresh_at": now, "force_full": True, "created_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            pass
+        return states.find_one_and_update(
+            {
+                "_id": assistant_id,
+                "next_refresh_at": {"$lte": now},
+                "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": now}}],
+            },
+            {"$set": {
+                "worker_id": self.worker_id,
+                "lease_expires_at": now + timedelta(seconds=settings.db_snapshot_lease_seconds),
+                "started_at": now,
+            }},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _claim_due(self, limit: int) -> List[Tuple[Dict[str, Any], DatabaseConfig]]:
+        claimed = []
+        for assistant_id, raw_config in self._snapshot_assistants():
+            if len(claimed) >= limit:
+                break
+            if assistant_id in self._running:
+                continue
+            state = self._claim(assistant_id)
+            if state is not None:
+                claimed.append((state, DatabaseConfig(**raw_config)))
+        return claimed
+
+    # ====== Loop ======
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop_event.is_set():
+            try:
+                free = settings.db_snapshot_max_concurrent_refreshes - len(self._running)
+                if free > 0:
+                    for state, config in await loop.run_in_executor(None, self._claim_due, free):
+                        assistant_id = state["_id"]
+                        self._running[assistant_id] = loop.create_task(
+                            self._refresh(state, config), name=f"db-snapshot-{assistant_id}"
+                        )
+                        self._running[assistant_id].add_done_callback(lambda _, a=assistant_id: self._on_done(a))
+            except asyncio.CancelledError:
+                break
+            except Exception as exc:
+                logger.exception("[DB_SNAPSHOT] Claim tick failed: %s", exc)
+            self._wake_event.clear()
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=settings.db_snapshot_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                continue
+
+    def _on_done(self, assistant_id: str):
+        self._running.pop(assistant_id, None)
+        self._wake_event.set()
+
+    # ====== Refresh ======
+    async def _refresh(self, state: Dict[str, Any], config: DatabaseConfig):
+        assistant_id = state["_id"]
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(None, self.refresh_snapshot, assistant_id, config, bool(state.get("force_full")))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"[DB_SNAPSHOT] Refresh for assistant {assistant_id} failed: {e}")
+            retry = min(config.snapshot_refresh_minutes * 60, settings.db_snapshot_retry_seconds)
+            await loop.run_in_executor(None, self._finish, assistant_id, {
+                "error": str(e),
+                "next_refresh_at": utc_now() + timedelta(seconds=retry),
+            })
+            return
+
+        self.refreshed += 1
+        if result["mode"] == "incremental":
+            self.incremental += 1
+        duration_ms = round((time.perf_counter() - started) * 1000)
+        logger.info(
+            f"[DB_SNAPSHOT] {result['mode']} refresh of {config.table_name} for assistant {assistant_id}: "
+            f"{result['changed']} rows fetched, {result['row_count']} in snapshot, {duration_ms}ms"
+        )
+        await loop.run_in_executor(None, self._finish, assistant_id, dict(
+            result,
+            error=None,
+            force_full=False,
+            duration_ms=duration_ms,
+            last_refresh_at=utc_now(),
+            next_refresh_at=utc_now() + timedelta(minutes=config.snapshot_refresh_minutes),
+        ))
+
+    def _finish(self, assistant_id: str, fields: Dict[str, Any]):
+        self._states().update_one(
+            {"_id": assistant_id, "worker_id": self.worker_id},
+            {"$set": dict(fields, lease_expires_at=None)},
+        )
+
+    def refresh_snapshot(self, assistant_id: str, config: DatabaseConfig, force_full: bool = False) -> Dict[str, Any]:
+        """
+        Bring an assistant's snapshot up to date (blocking).
+
+        Args:
+            assistant_id: AI Assistant ID
+            config: The assistant's database_config
+            force_full: Reload every row even if an incremental refresh is possible
+
+        Returns:
+            {"mode": "full" | "incremental", "changed", "row_count", "disk_bytes"}
+
+        Raises:
+            ValueError: Unsupported database type, invalid identifiers, missing
+                primary keys or a table larger than settings.db_snapshot_max_rows
+        """
+        fetch = FETCHERS.get(config.type)
+        if fetch is None:
+            raise ValueError(f"Unsupported database type: {config.type}")
+        columns = snapshot_columns(config)
+        fingerprint = snapshot_fingerprint(config)
+
+        with snapshot_store.writer(assistant_id):
+            rows, manifest = snapshot_store.read_live(assistant_id)
+            incremental = bool(
+                config.updated_at_column
+                and not force_full
+                and manifest
+                and manifest.get("fingerprint") == fingerprint
+                and manifest.get("watermark")
+                and time.time() - manifest.get("full_refreshed_at", 0) < settings.db_snapshot_full_refresh_hours * 3600
+            )
+            since = decode_watermark(manifest["watermark"]) if incremental else None
+            watermark = since
+            changed: Dict[str, Dict[str, Any]] = {}
+            for raw in fetch(config, columns, since):
+                if config.updated_at_column and raw.get(config.updated_at_column) is not None:
+                    value = raw[config.updated_at_column]
+                    watermark = value if watermark is None or value > watermark else watermark
+                key = raw.get(config.primary_key)
+                if key is None:
+                    raise ValueError(f"Row without primary key {config.primary_key!r} in {config.table_name}")
+                changed[str(key)] = {column: jsonable(value) for column, value in raw.items()}
+                if len(changed) > settings.db_snapshot_max_rows:
+                    raise ValueError(f"{config.table_name} has more than {settings.db_snapshot_max_rows} rows; use live mode")
+
+            if incremental:
+                merged = {str(row[config.primary_key]): row for row in rows}
+                merged.update(changed)
+                if len(merged) > settings.db_snapshot_max_rows:
+                    raise ValueError(f"{config.table_name} has more than {settings.db_snapshot_max_rows} rows; use live mode")
+                rows = list(merged.values())
+            else:
+                rows = list(changed.values())
+
+            written = snapshot_store.write(assistant_id, rows, config.search_columns, config.key_columns, {
+                "database_type": config.type,
+                "table": config.table_name,
+                "columns": columns,
+                "fingerprint": fingerprint,
+                "watermark": encode_watermark(watermark),
+                "full_refreshed_at": manifest.get("full_refreshed_at", 0) if incremental else time.time(),
+            })
+        return {
+            "mode": "incremental" if incremental else "full",
+            "changed": len(changed),
+            "row_count": written["row_count"],
+            "disk_bytes": written["disk_bytes"],
+        }
+
+    def status(self, assistant_id: str) -> Dict[str, Any]:
+        """Refresh state, snapshot size and staleness for one assistant."""
+        state = self.get_state(assistant_id) or {}
+        snapshot = snapshot_store.get(str(assistant_id))
+        return {
+            "has_snapshot": snapshot is not None,
+            "row_count": len(snapshot) if snapshot else 0,
+            "disk_bytes": snapshot.nbytes if snapshot else 0,
+            "staleness_seconds": round(snapshot.staleness_seconds, 1) if snapshot else None,
+            "last_mode": state.get("mode"),
+            "last_refresh_at": state.get("last_refresh_at"),
+            "last_duration_ms": state.get("duration_ms"),
+            "next_refresh_at": state.get("next_refresh_at"),
+            "refreshing": bool(state.get("lease_expires_at") and state["lease_expires_at"] > utc_now()),
+            "error": state.get("error"),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            snapshot_store.stats(),
+            worker_id=self.worker_id,
+            refreshing=len(self._running),
+            refreshed=self.refreshed,
+            incremental=self.incremental,
+            failed=self.failed,
+        )
+
+
+db_snapshot_sync = DatabaseSnapshotSync()
@@ -0,0 +1,316 @@
+"""
+Query-embedding service for the conversational call path.
+
+Knowledge-base lookups run once per user utterance. Embedding the utterance
+with a fresh synchronous OpenAI client blocked the event loop (and every other
+call on the worker) for a full round-trip. This service:
+
+- keeps one AsyncOpenAI client per API key, all sharing the pooled "openai"
+  httpx client from http_clients;
+- caches query text -> vector in an LRU keyed by (model, normalized text), so
+  repeated phrases ("yes", "what are your hours?") never leave the process;
+- micro-batches: concurrent misses from different calls with the same key and
+  model wait up to settings.embedding_batch_window_ms and go out as one
+  embeddings request;
+- reports cache hits, batch sizes and request latency via stats().
+
+Assistants choose a backend (assistant["kb_embedding_backend"]):
+
+    openai  text-embedding-3-small over the network (default)
+    local   fastembed ONNX model (settings.local_embedding_model), loaded once per
+            worker and run on a small thread pool, so no network on the call path
+
+Models are identified as "<backend>:<model>" (see embedding_model_id); the KB
+index records the id it was built with, and queries are embedded with that id.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from openai import AsyncOpenAI
+
+from app.config.settings import settings
+from app.services.http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+OPENAI_BACKEND = "openai"
+LOCAL_BACKEND = "local"
+EMBEDDING_BACKENDS = (OPENAI_BACKEND, LOCAL_BACKEND)
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+DEFAULT_EMBEDDING_MODEL = f"{OPENAI_BACKEND}:{OPENAI_EMBEDDING_MODEL}"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Cache key form of a query: lower-cased with whitespace collapsed."""
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def embedding_model_id(backend: Optional[str]) -> str:
+    """Model id ("<backend>:<model>") for an assistant's configured backend."""
+    if backend == LOCAL_BACKEND:
+        return f"{LOCAL_BACKEND}:{settings.local_embedding_model}"
+    return DEFAULT_EMBEDDING_MODEL
+
+
+def parse_model_id(model: str) -> Tuple[str, str]:
+    """Split "<backend>:<model>"; bare names are OpenAI models."""
+    backend, sep, name = model.partition(":")
+    if sep and backend in EMBEDDING_BACKENDS:
+        return backend, name
+    return OPENAI_BACKEND, model
+
+
+class LocalEmbeddingModels:
+    """fastembed models loaded once per worker, with inference on a dedicated thread pool."""
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def get(self, name: str):
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    from fastembed import TextEmbedding  # heavy import, only when a local backend is used
+
+                    started = time.perf_counter()
+                    model = TextEmbedding(model_name=name, threads=settings.local_embedding_threads)
+                    self._models[name] = model
+                    logger.info(f"[EMBEDDINGS] Loaded local model {name} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return model
+
+    def embed_queries(self, name: str, texts: List[str]) -> List[List[float]]:
+        return [vector.tolist() for vector in self.get(name).query_embed(texts)]
+
+    def embed_passages(self, name: str, texts: List[str], batch_size: int = 64) -> List[List[float]]:
+        return [vector.tolist() for vector in self.get(name).passage_embed(texts, batch_size=batch_size)]
+
+    async def run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.local_embedding_executor_workers,
+                thread_name_prefix="local-embed",
+            )
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @property
+    def loaded(self) -> List[str]:
+        return list(self._models)
+
+
+local_models = LocalEmbeddingModels()
+
+
+class _PendingBatch:
+    """Queries waiting to be sent together for one (api_key, model)."""
+
+    __slots__ = ("futures", "flush_handle")
+
+    def __init__(self):
+        self.futures: Dict[str, asyncio.Future] = {}
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingService:
+    """Async, cached, micro-batched query embeddings (one instance per worker)."""
+
+    def __init__(self):
+        self.local = local_models
+        self._clients: Dict[str, Tuple[AsyncOpenAI, Any]] = {}
+        self._cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, str], _PendingBatch] = {}
+        self._sends: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.max_batch_size = 0
+        self.api_errors = 0
+        self.api_time_ms = 0.0
+
+    async def start(self):
+        """Load the local model up front on workers that serve calls (first query would pay for it otherwise)."""
+        if settings.local_embedding_preload:
+            try:
+                await self.local.run(self.local.get, settings.local_embedding_model)
+            except Exception as e:
+                logger.warning(f"[EMBEDDINGS] Could not preload local model {settings.local_embedding_model}: {e}")
+
+    async def shutdown(self):
+        """Send the queries still waiting for their batch window, wait for in-flight batches, then stop."""
+        for batch_key, batch in list(self._pending.items()):
+            if batch.flush_handle is not None:
+                batch.flush_handle.cancel()
+            self._flush(batch_key)
+        if self._sends:
+            await asyncio.gather(*self._sends, return_exceptions=True)
+        self.local.shutdown()
+
+    # ====== Clients ======
+    def _get_client(self, api_key: str) -> AsyncOpenAI:
+        http_client = http_clients.get_client("openai")
+        cached = self._clients.get(api_key)
+        if cached is None or cached[1] is not http_client:
+            # (Re)bind to the live shared httpx client (it is recreated after a shutdown)
+            client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=1)
+            self._clients[api_key] = (client, http_client)
+            return client
+        return cached[0]
+
+    # ====== Cache ======
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        vector = self._cache.get(key)
+        if vector is not None:
+            self._cache.move_to_end(key)
+        return vector
+
+    def _cache_put(self, key: Tuple[str, str], vector: List[float]):
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > settings.embedding_cache_size:
+            self._cache.popitem(last=False)
+
+    # ====== Queries ======
+    async def embed_query(self, text: str, api_key: str, model: str = DEFAULT_EMBEDDING_MODEL) -> List[float]:
+        """
+        Embedding for one query, from cache or a (possibly shared) batched request.
+
+        Args:
+            text: Query text (e.g. the caller's last utterance)
+            api_key: OpenAI API key of the assistant (unused by the local backend)
+            model: Model id ("<backend>:<model>"; a bare name is an OpenAI model)
+
+        Returns:
+            The embedding vector
+        """
+        self.requests += 1
+        normalized = normalize_query(text)
+        cache_key = (model, normalized)
+        vector = self._cache_get(cache_key)
+        if vector is not None:
+            self.cache_hits += 1
+            return vector
+
+        backend, _ = parse_model_id(model)
+        batch_key = (api_key if backend == OPENAI_BACKEND else "", model)
+        batch = self._pending.get(batch_key)
+        if batch is None:
+            batch = self._pending[batch_key] = _PendingBatch()
+            batch.flush_handle = asyncio.get_running_loop().call_later(
+                settings.embedding_batch_window_ms / 1000, self._flush, batch_key
+            )
+
+        future = batch.futures.get(normalized)
+        if future is not None:
+            # Same text already queued by another call in this window
+            self.coalesced += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            batch.futures[normalized] = future
+            if len(batch.futures) >= settings.embedding_batch_max_size:
+                batch.flush_handle.cancel()
+                self._flush(batch_key)
+        return await asyncio.shield(future)
+
+    async def embed_queries(self, texts: List[str], api_key: str, model: str = DEFAULT_EMBEDDING_MODEL) -> List[List[float]]:
+        """Embeddings for several queries (each goes through the cache and the shared batch)."""
+        return list(await asyncio.gather(*(self.embed_query(text, api_key, model) for text in texts)))
+
+    def _flush(self, batch_key: Tuple[str, str]):
+        batch = self._pending.pop(batch_key, None)
+        if batch is not None and batch.futures:
+            task = asyncio.get_running_loop().create_task(self._send(batch_key, batch))
+            self._sends.add(task)
+            task.add_done_callback(self._send_done)
+
+    def _send_done(self, task: asyncio.Task):
+        self._sends.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"[EMBEDDINGS] Batch send crashed: {task.exception()!r}")
+
+    async def _send(self, batch_key: Tuple[str, str], batch: _PendingBatch):
+        api_key, model = batch_key
+        backend, name = parse_model_id(model)
+        texts = list(batch.futures)
+        self.batches += 1
+        self.batched_texts += len(texts)
+        self.max_batch_size = max(self.max_batch_size, len(texts))
+
+        started = time.perf_counter()
+        try:
+            if backend == LOCAL_BACKEND:
+                vectors = await self.local.run(self.local.embed_queries, name, texts)
+            else:
+                response = await self._get_client(api_key).embeddings.create(model=name, input=texts)
+                vectors = [item.embedding for item in response.data]
+            if len(vectors) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(vectors)}")
+        except asyncio.CancelledError:
+            for future in batch.futures.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            self.api_errors += 1
+            logger.error(f"[EMBEDDINGS] Batch of {len(texts)} queries failed: {e}")
+            for future in batch.futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.api_time_ms += (time.perf_counter() - started) * 1000
+
+        for text, vector in zip(texts, vectors):
+            self._cache_put((model, text), vector)
+            future = batch.futures[text]
+            if not future.done():
+                future.set_result(vector)
+
+    # ====== Documents ======
+    async def embed_documents(self, texts: List[str], api_key: str, model: str = DEFAULT_EMBEDDING_MODEL, batch_size: int = 100) -> List[List[float]]:
+        """Embeddings for knowledge-base chunks (uncached, sent in batches of `batch_size`)."""
+        backend, name = parse_model_id(model)
+        if backend == LOCAL_BACKEND:
+            return await self.local.run(self.local.embed_passages, name, texts)
+        client = self._get_client(api_key)
+        embeddings: List[List[float]] = []
+        for i in range(0, len(texts), batch_size):
+            response = await client.embeddings.create(model=name, input=texts[i:i + batch_size])
+            embeddings.extend(item.embedding for item in response.data)
+        return embeddings
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cache_hit_rate": round(self.cache_hits / self.requests, 3) if self.requests else 0.0,
+            "cache_size": len(self._cache),
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "api_errors": self.api_errors,
+            "avg_api_ms": round(self.api_time_ms / self.batches, 1) if self.batches else 0.0,
+            "clients": len(self._clients),
+            "local_models": self.local.loaded,
+        }
+
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,460 @@
+"""
+Pooled connectors for customers' own databases, queried during live calls.
+
+Assistants with a database_config get their records looked up on each user
+turn (conversational_rag.search_conversation_context). The old helpers
+opened a new psycopg2 / mysql.connector connection or MongoClient per query
+and ran it synchronously on the event loop, so a slow customer database
+stalled every call on the worker. Here:
+
+- each assistant gets one pool (psycopg2 ThreadedConnectionPool,
+  mysql.connector pooling, or a MongoClient with its own pool), recreated
+  when the connection settings change, and only kept once a ping with the
+  configured credentials succeeds (a failed pool is closed and rebuilt on
+  the next lookup);
+- queries run on a dedicated thread pool and are awaited with an overall
+  deadline (settings.external_db_query_timeout_seconds); the server also
+  stops them at settings.external_db_statement_timeout_ms
+  (statement_timeout / MAX_EXECUTION_TIME / maxTimeMS);
+- SQL lookups are prepared once per connection (PREPARE / prepared cursors)
+  and identifiers are validated, since they come from user configuration;
+- results are cached for settings.external_db_result_cache_ttl_seconds,
+  keyed by assistant and normalized query text;
+- a circuit breaker per assistant opens after
+  settings.external_db_breaker_failures consecutive failures or timeouts,
+  and lookups are skipped (no database context) until the cooldown passes
+  and a trial query succeeds.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from app.config.settings import settings
+from app.services.embedding_service import normalize_query
+from app.utils.db_snapshot import snapshot_store
+
+logger = logging.getLogger(__name__)
+
+SQL_TYPES = ("postgresql", "mysql")
+SUPPORTED_TYPES = SQL_TYPES + ("mongodb",)
+# Table/column names are interpolated into SQL, so only plain (optionally schema-qualified) names are allowed
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_$]*(\.[A-Za-z_][A-Za-z0-9_$]*)?$")
+PG_STATEMENT = "convis_lookup"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: open for a cooldown, then let one trial request through."""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            self.state = HALF_OPEN
+            return True
+        return False  # open, or a half-open trial is already running
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+
+    def abandon_trial(self):
+        """The half-open trial ended without a verdict (cancelled): let the next request try again."""
+        if self.state == HALF_OPEN:
+            self.state = OPEN  # opened_at is past the cooldown, so allow() starts a new trial
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+def connection_fingerprint(config) -> str:
+    """Hash of the settings a pool depends on (a change means a new pool)."""
+    parts = [config.type, config.host, str(config.port), config.database, config.username, config.password]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def _lookup_connection_class():
+    """psycopg2 connection class that remembers whether the lookup is prepared on it."""
+    import psycopg2.extensions
+
+    class LookupConnection(psycopg2.extensions.connection):
+        lookup_prepared = False
+
+    return LookupConnection
+
+
+def check_identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name or ""):
+        raise ValueError(f"Invalid table or column name: {name!r}")
+    return name
+
+
+class _Connector:
+    """One assistant's pool, prepared lookup and breaker."""
+
+    def __init__(self, config, fingerprint: str):
+        self.config = config
+        self.fingerprint = fingerprint
+        self.type = config.type
+        self.table = check_identifier(config.table_name)
+        self.columns = [check_identifier(column) for column in config.search_columns]
+        self.breaker = CircuitBreaker(settings.external_db_breaker_failures, settings.external_db_breaker_cooldown_seconds)
+        self.slots = asyncio.Semaphore(settings.external_db_pool_size)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    # ====== Pools (run on the executor) ======
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                pool = self._create_pool()
+                try:
+                    self._ping(pool)
+                except Exception:
+                    self._close_pool(pool)
+                    raise
+                self._pool = pool
+            return self._pool
+
+    def _create_pool(self):
+        config = self.config
+        if self.type == "postgresql":
+            from psycopg2.pool import ThreadedConnectionPool
+
+            return ThreadedConnectionPool(
+                1,
+                settings.external_db_pool_size,
+                host=config.host,
+                port=int(config.port),
+                database=config.database,
+                user=config.username,
+                password=config.password,
+                connect_timeout=settings.external_db_connect_timeout_seconds,
+                options=f"-c statement_timeout={settings.external_db_statement_timeout_ms}",
+                connection_factory=_lookup_connection_class(),
+            )
+        if self.type == "mysql":
+            from mysql.connector import pooling
+
+            return pooling.MySQLConnectionPool(
+                pool_name=f"convis_{self.fingerprint[:16]}",
+                pool_size=settings.external_db_pool_size,
+                host=config.host,
+                port=int(config.port),
+                database=config.database,
+                user=config.username,
+                password=config.password,
+                connection_timeout=settings.external_db_connect_timeout_seconds,
+            )
+        import pymongo
+
+        timeout_ms = settings.external_db_connect_timeout_seconds * 1000
+        return pymongo.MongoClient(
+            host=config.host,
+            port=int(config.port),
+            username=config.username or None,
+            password=config.password or None,
+            maxPoolSize=settings.external_db_pool_size,
+            serverSelectionTimeoutMS=timeout_ms,
+            connectTimeoutMS=timeout_ms,
+            socketTimeoutMS=settings.external_db_statement_timeout_ms + timeout_ms,
+        )
+
+    def _ping(self, pool):
+        """Check the pool can connect and authenticate (MongoClient, for one, connects lazily)."""
+        if self.type == "postgresql":
+            conn = pool.getconn()
+            broken = False
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except Exception:
+                broken = True
+                raise
+            finally:
+                pool.putconn(conn, close=broken)
+        elif self.type == "mysql":
+            conn = pool.get_connection()
+            try:
+                conn.ping()
+            finally:
+                conn.close()
+        else:
+            pool[self.config.database].command("ping")
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            self._close_pool(pool)
+
+    def _close_pool(self, pool):
+        try:
+            if self.type == "postgresql":
+                pool.closeall()
+            elif self.type == "mongodb":
+                pool.close()
+            # mysql.connector pools close their connections when garbage-collected
+        except Exception as e:
+            logger.warning(f"[EXTERNAL_DB] Error closing {self.type} pool: {e}")
+
+    # ====== Lookups (run on the executor) ======
+    def search(self, query_text: str) -> Dict[str, Any]:
+        if self.type == "postgresql":
+            return self._search_postgresql(query_text)
+        if self.type == "mysql":
+            return self._search_mysql(query_text)
+        return self._search_mongodb(query_text)
+
+    def _search_postgresql(self, query_text: str) -> Dict[str, Any]:
+        pool = self._get_pool()
+        conn = pool.getconn()
+        broken = False
+        try:
+            with conn.cursor() as cursor:
+                if not conn.lookup_prepared:
+                    conn.autocommit = True  # plain reads; no transaction left open between calls
+                    # $1 is reused for every column, so the statement takes a single parameter
+                    where_clause = " OR ".join(f"{column}::text ILIKE $1" for column in self.columns)
+                    cursor.execute(
+                        f"PREPARE {PG_STATEMENT} (text) AS "
+                        f"SELECT * FROM {self.table} WHERE {where_clause} LIMIT {settings.external_db_max_rows}"
+                    )
+                cursor.execute(f"EXECUTE {PG_STATEMENT} (%s)", (f"%{query_text}%",))
+                columns = [desc[0] for desc in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            conn.lookup_prepared = True
+            return {"source": "database", "database_type": "postgresql", "table": self.table, "records": rows, "count": len(rows)}
+        except Exception:
+            broken = True
+            raise
+        finally:
+            # A failed connection (timeout, dropped socket) is discarded instead of reused
+            pool.putconn(conn, close=broken)
+
+    def _search_mysql(self, query_text: str) -> Dict[str, Any]:
+        conn = self._get_pool().get_connection()
+        try:
+            cursor = conn.cursor(prepared=True)
+            where_clause = " OR ".join(f"{column} LIKE %s" for column in self.columns)
+            cursor.execute(
+                f"SELECT /*+ MAX_EXECUTION_TIME({settings.external_db_statement_timeout_ms}) */ * "
+                f"FROM {self.table} WHERE {where_clause} LIMIT {settings.external_db_max_rows}",
+                tuple([f"%{query_text}%"] * len(self.columns)),
+            )
+            columns = list(cursor.column_names)
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            cursor.close()
+            return {"source": "database", "database_type": "mysql", "table": self.table, "records": rows, "count": len(rows)}
+        finally:
+            conn.close()  # returns it to the pool
+
+    def _search_mongodb(self, query_text: str) -> Dict[str, Any]:
+        collection = self._get_pool()[self.config.database][self.config.table_name]
+        pattern = re.escape(query_text)
+        query = {"$or": [{field: {"$regex": pattern, "$options": "i"}} for field in self.columns]} if self.columns else {}
+        documents = list(
+            collection.find(query)
+            .limit(settings.external_db_max_rows)
+            .max_time_ms(settings.external_db_statement_timeout_ms)
+        )
+        for document in documents:
+            if "_id" in document:
+                document["_id"] = str(document["_id"])
+        return {"source": "database", "database_type": "mongodb", "collection": self.config.table_name, "documents": documents, "count": len(documents)}
+
+
+class ExternalDatabases:
+    """Per-assistant connectors with a shared executor and result cache (one instance per worker)."""
+
+    def __init__(self):
+        self._connectors: "OrderedDict[str, _Connector]" = OrderedDict()
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.queries = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.external_db_executor_workers,
+                thread_name_prefix="external-db",
+            )
+        return self._executor
+
+    def _connector(self, key: str, config) -> _Connector:
+        fingerprint = connection_fingerprint(config)
+        connector = self._connectors.get(key)
+        if connector is not None and (
+            connector.fingerprint != fingerprint
+            or connector.table != config.table_name
+            or connector.columns != list(config.search_columns)
+        ):
+            self._retire(self._connectors.pop(key))
+            connector = None
+        if connector is None:
+            connector = self._connectors[key] = _Connector(config, fingerprint)
+            while len(self._connectors) > settings.external_db_max_pools:
+                _, evicted = self._connectors.popitem(last=False)
+                self._retire(evicted)
+        self._connectors.move_to_end(key)
+        return connector
+
+    def _retire(self, connector: _Connector):
+        self._get_executor().submit(connector.close)
+        for cache_key in [k for k in self._cache if k[0] == connector.fingerprint]:
+            self._cache.pop(cache_key, None)
+
+    # ====== Result cache ======
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        cached = self._cache.get(key)
+        if cached is None:
+            return None
+        expires_at, result = cached
+        if time.monotonic() >= expires_at:
+            self._cache.pop(key, None)
+            return None
+        self._cache.move_to_end(key)
+        return result
+
+    def _cache_put(self, key: Tuple[str, str], result: Dict[str, Any]):
+        self._cache[key] = (time.monotonic() + settings.external_db_result_cache_ttl_seconds, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > settings.external_db_result_cache_size:
+            self._cache.popitem(last=False)
+
+    # ====== Queries ======
+    async def lookup(self, config, query_text: str, assistant_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Records for a caller's utterance, as used by the RAG context of live calls.
+
+        Assistants in snapshot mode are answered from the local copy of the table
+        (utils/db_snapshot.py); until the first snapshot exists they are queried live.
+        Returns None when nothing can be fetched.
+        """
+        if config.enabled and config.sync_mode == "snapshot" and assistant_id:
+            # The first lookup loads the snapshot from disk; keep it off the call's event loop
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, snapshot_store.lookup, str(assistant_id), query_text
+            )
+            if result is not None:
+                return result
+        return await self.query(config, query_text, assistant_id)
+
+    async def query(self, config, query_text: str, assistant_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Records matching a caller's utterance in an assistant's database.
+
+        Args:
+            config: The assistant's DatabaseConfig
+            query_text: Text to search for
+            assistant_id: Owner of the pool (pools are keyed by connection settings without it)
+
+        Returns:
+            {"source": "database", ...} result, or None when the database is disabled,
+            misconfigured, failing, too slow or behind an open circuit breaker
+        """
+        if not config.enabled or config.type not in SUPPORTED_TYPES or not query_text.strip():
+            return None
+
+        try:
+            connector = self._connector(str(assistant_id) if assistant_id else connection_fingerprint(config), config)
+        except ValueError as e:
+            logger.warning(f"[EXTERNAL_DB] Skipping lookup for assistant {assistant_id}: {e}")
+            return None
+
+        # Assistants on the same database and table may search different columns
+        lookup = "\x00".join([connector.table, ",".join(connector.columns), normalize_query(query_text)])
+        cache_key = (connector.fingerprint, lookup)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+
+        if not connector.breaker.allow():
+            self.rejected += 1
+            return None
+
+        self.queries += 1
+        started = time.perf_counter()
+        try:
+            async with connector.slots:
+                result = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(self._get_executor(), connector.search, query_text),
+                    timeout=settings.external_db_query_timeout_seconds,
+                )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            connector.breaker.record_failure()
+            logger.warning(
+                f"[EXTERNAL_DB] {connector.type} lookup for assistant {assistant_id} timed out after "
+                f"{settings.external_db_query_timeout_seconds}s (breaker {connector.breaker.state})"
+            )
+            return None
+        except Exception as e:
+            self.failures += 1
+            connector.breaker.record_failure()
+            logger.error(f"[EXTERNAL_DB] {connector.type} lookup for assistant {assistant_id} failed: {e} (breaker {connector.breaker.state})")
+            return None
+        except BaseException:
+            # Cancelled (call ended, turn interrupted): no verdict, but a half-open trial must not stay claimed
+            connector.breaker.abandon_trial()
+            raise
+
+        connector.breaker.record_success()
+        logger.info(f"[EXTERNAL_DB] {connector.type} lookup returned {result['count']} rows in {(time.perf_counter() - started) * 1000:.0f}ms")
+        self._cache_put(cache_key, result)
+        return result
+
+    async def shutdown(self):
+        connectors = list(self._connectors.values())
+        self._connectors.clear()
+        self._cache.clear()
+        for connector in connectors:
+            connector.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.queries + self.cache_hits
+        return {
+            "pools": len(self._connectors),
+            "queries": self.queries,
+            "cache_hits": self.cache_hits,
+            "cache_hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+            "cache_size": len(self._cache),
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected_open_breaker": self.rejected,
+            "open_breakers": sum(1 for c in self._connectors.values() if c.breaker.state != CLOSED),
+        }
+
+
+external_databases = ExternalDatabases()
@@ -0,0 +1,274 @@
+"""
+Process-wide registry of long-lived outbound HTTP clients.
+
+Opening `httpx.AsyncClient()` / `aiohttp.ClientSession()` per operation throws
+away the connection pool every time, so each OpenAI call, recording download,
+calendar request or TTS payload pays a fresh DNS + TCP + TLS handshake. This
+registry keeps one tuned client per upstream profile for the lifetime of the
+worker, created on startup and closed on shutdown.
+
+Usage keeps the familiar context-manager shape, but the client is shared and is
+not closed when the block exits:
+
+    async with http_clients.client("openai") as client:
+        response = await client.post(...)
+
+    async with http_clients.session("elevenlabs") as session:
+        async with session.post(...) as response:
+            ...
+
+Each profile records how many requests reused a pooled connection versus opened
+a new one, and how long requests waited for a free connection.
+"""
+
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict
+
+import aiohttp
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:  # HTTP/2 needs the optional `h2` package (httpx[http2])
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class HttpClientProfile:
+    """Connection settings for one upstream."""
+    max_connections: int = 50
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    timeout: float = 30.0
+    connect_timeout: float = 10.0
+    http2: bool = False
+
+
+# httpx profiles (request/response APIs)
+HTTPX_PROFILES: Dict[str, HttpClientProfile] = {
+    "openai": HttpClientProfile(max_connections=100, max_keepalive_connections=40, timeout=120.0, http2=True),
+    "twilio": HttpClientProfile(max_connections=50, timeout=60.0),
+    "google": HttpClientProfile(max_connections=50, timeout=30.0, http2=True),
+    "microsoft": HttpClientProfile(max_connections=50, timeout=30.0, http2=True),
+    "voices": HttpClientProfile(max_connections=20, timeout=60.0),
+    "default": HttpClientProfile(),
+}
+
+# aiohttp profiles (TTS payload endpoints used from the voice pipeline)
+AIOHTTP_PROFILES: Dict[str, HttpClientProfile] = {
+    "elevenlabs": HttpClientProfile(max_connections=100, keepalive_expiry=30.0, timeout=30.0),
+    "cartesia": HttpClientProfile(max_connections=100, keepalive_expiry=30.0, timeout=30.0),
+    "sarvam": HttpClientProfile(max_connections=100, keepalive_expiry=30.0, timeout=30.0),
+    "default": HttpClientProfile(),
+}
+
+
+class ClientStats:
+    """Connection reuse and pool-wait counters for one client."""
+
+    __slots__ = ("requests", "errors", "new_connections", "reused_connections", "pool_wait_total_ms", "pool_wait_max_ms")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.pool_wait_total_ms = 0.0
+        self.pool_wait_max_ms = 0.0
+
+    def record(self, new_connection: bool, pool_wait_ms: float, failed: bool = False):
+        self.requests += 1
+        if new_connection:
+            self.new_connections += 1
+        else:
+            self.reused_connections += 1
+        self.pool_wait_total_ms += pool_wait_ms
+        self.pool_wait_max_ms = max(self.pool_wait_max_ms, pool_wait_ms)
+        if failed:
+            self.errors += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        connections = self.new_connections + self.reused_connections
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_ratio": round(self.reused_connections / connections, 3) if connections else 0.0,
+            "avg_pool_wait_ms": round(self.pool_wait_total_ms / self.requests, 2) if self.requests else 0.0,
+            "max_pool_wait_ms": round(self.pool_wait_max_ms, 2),
+        }
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """
+    AsyncHTTPTransport that hooks httpcore's trace events.
+
+    The first trace event of a request is either `connection.connect_tcp.started`
+    (a new connection) or `*.send_request_headers.started` (a pooled connection);
+    the time until that event is the wait for a pool slot.
+    """
+
+    def __init__(self, stats: ClientStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        state = {"first_event_at": None, "new_connection": False}
+        upstream_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            if state["first_event_at"] is None:
+                state["first_event_at"] = time.perf_counter()
+            if event_name == "connection.connect_tcp.started":
+                state["new_connection"] = True
+            if upstream_trace is not None:
+                await upstream_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        failed = False
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            first_event_at = state["first_event_at"] or time.perf_counter()
+            self._stats.record(state["new_connection"], (first_event_at - started) * 1000, failed)
+
+
+def _aiohttp_trace_config(stats: ClientStats) -> aiohttp.TraceConfig:
+    """TraceConfig feeding aiohttp connector events into `stats`."""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, ctx: SimpleNamespace, params):
+        ctx.new_connection = False
+        ctx.pool_wait_ms = 0.0
+
+    async def on_queued_start(session, ctx: SimpleNamespace, params):
+        ctx.queued_at = time.perf_counter()
+
+    async def on_queued_end(session, ctx: SimpleNamespace, params):
+        ctx.pool_wait_ms = (time.perf_counter() - ctx.queued_at) * 1000
+
+    async def on_create_start(session, ctx: SimpleNamespace, params):
+        ctx.new_connection = True
+
+    async def on_request_end(session, ctx: SimpleNamespace, params):
+        stats.record(ctx.new_connection, ctx.pool_wait_ms)
+
+    async def on_request_exception(session, ctx: SimpleNamespace, params):
+        stats.record(getattr(ctx, "new_connection", False), getattr(ctx, "pool_wait_ms", 0.0), failed=True)
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_queued_start.append(on_queued_start)
+    trace_config.on_connection_queued_end.append(on_queued_end)
+    trace_config.on_connection_create_start.append(on_create_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+class HttpClientRegistry:
+    """Owns the shared httpx clients and aiohttp sessions for this worker."""
+
+    def __init__(self):
+        self._httpx_clients: Dict[str, httpx.AsyncClient] = {}
+        self._aiohttp_sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._stats: Dict[str, ClientStats] = {}
+
+    async def start(self):
+        """Create every profile's client up front so the first call of each kind is warm-pooled."""
+        for name in HTTPX_PROFILES:
+            self.get_client(name)
+        for name in AIOHTTP_PROFILES:
+            self.get_session(name)
+        logger.info(
+            f"[HTTP_CLIENTS] Started {len(self._httpx_clients)} httpx clients and "
+            f"{len(self._aiohttp_sessions)} aiohttp sessions (http2={'on' if HTTP2_AVAILABLE else 'off'})"
+        )
+
+    async def shutdown(self):
+        for name, client in list(self._httpx_clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"[HTTP_CLIENTS] Error closing httpx client '{name}': {e}")
+        for name, session in list(self._aiohttp_sessions.items()):
+            try:
+                await session.close()
+            except Exception as e:
+                logger.warning(f"[HTTP_CLIENTS] Error closing aiohttp session '{name}': {e}")
+        self._httpx_clients.clear()
+        self._aiohttp_sessions.clear()
+        logger.info("[HTTP_CLIENTS] Closed shared HTTP clients")
+
+    # ====== httpx ======
+    def get_client(self, name: str = "default") -> httpx.AsyncClient:
+        """Shared httpx client for a profile (unknown names use the default profile)."""
+        key = f"httpx:{name}"
+        client = self._httpx_clients.get(name)
+        if client is None or client.is_closed:
+            profile = HTTPX_PROFILES.get(name, HTTPX_PROFILES["default"])
+            stats = self._stats.setdefault(key, ClientStats())
+            limits = httpx.Limits(
+                max_connections=profile.max_connections,
+                max_keepalive_connections=profile.max_keepalive_connections,
+                keepalive_expiry=profile.keepalive_expiry,
+            )
+            client = httpx.AsyncClient(
+                transport=InstrumentedTransport(
+                    stats,
+                    http2=profile.http2 and HTTP2_AVAILABLE,
+                    limits=limits,
+                ),
+                timeout=httpx.Timeout(profile.timeout, connect=profile.connect_timeout),
+            )
+            self._httpx_clients[name] = client
+        return client
+
+    @asynccontextmanager
+    async def client(self, name: str = "default") -> AsyncIterator[httpx.AsyncClient]:
+        """`async with` drop-in for `httpx.AsyncClient()` that leaves the shared client open."""
+        yield self.get_client(name)
+
+    # ====== aiohttp ======
+    def get_session(self, name: str = "default") -> aiohttp.ClientSession:
+        """Shared aiohttp session for a profile (unknown names use the default profile)."""
+        key = f"aiohttp:{name}"
+        session = self._aiohttp_sessions.get(name)
+        if session is None or session.closed:
+            profile = AIOHTTP_PROFILES.get(name, AIOHTTP_PROFILES["default"])
+            stats = self._stats.setdefault(key, ClientStats())
+            connector = aiohttp.TCPConnector(
+                limit=profile.max_connections,
+                keepalive_timeout=profile.keepalive_expiry,
+                ttl_dns_cache=300,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=profile.timeout, connect=profile.connect_timeout),
+                trace_configs=[_aiohttp_trace_config(stats)],
+            )
+            self._aiohttp_sessions[name] = session
+        return session
+
+    @asynccontextmanager
+    async def session(self, name: str = "default") -> AsyncIterator[aiohttp.ClientSession]:
+        """`async with` drop-in for `aiohttp.ClientSession()` that leaves the shared session open."""
+        yield self.get_session(name)
+
+    # ====== Metrics ======
+    def stats(self) -> Dict[str, Any]:
+        return {key: value.as_dict() for key, value in self._stats.items()}
+
+
+http_clients = HttpClientRegistry()
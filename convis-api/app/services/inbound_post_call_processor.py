@@ -3,13 +3,13 @@ Inbound Post-Call Processor
 Handles transcription, analysis, and appointment booking for inbound calls
 """
 import logging
-import httpx
 from typing import Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
 
 from app.config.database import Database
 from app.config.settings import settings
+from app.services.http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -45,7 +45,7 @@ class InboundPostCallProcessor:
             if settings.twilio_account_sid and settings.twilio_auth_token:
                 auth = (settings.twilio_account_sid, settings.twilio_auth_token)
 
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("twilio") as client:
                 response = await client.get(
                     recording_url,
                     auth=auth,
@@ -75,7 +75,7 @@ class InboundPostCallProcessor:
                 logger.error("OpenAI API key not configured")
                 return None
 
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("openai") as client:
                 files = {
                     'file': ('recording.mp3', audio_bytes, 'audio/mpeg'),
                 }
@@ -149,7 +149,7 @@ TRANSCRIPT:
 
 Respond ONLY with the JSON object, no additional text."""
 
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("openai") as client:
                 response = await client.post(
                     'https://api.openai.com/v1/chat/completions',
                     headers={
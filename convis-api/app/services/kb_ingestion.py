@@ -0,0 +1,480 @@
+"""
+Background, resumable knowledge-base ingestion jobs.
+
+Uploading a document used to extract, chunk, embed and index it inside the
+request, so a 300-page PDF held the HTTP request (and a worker thread) for
+minutes and a crash lost all of the work. Uploads now save the file, enqueue a
+job in the kb_ingestion_jobs collection and return its id; API workers claim
+jobs with a lease and run them in stages:
+
+    extracting  text streamed page by page into pages.jsonl
+    chunking    pages -> chunks.json
+    embedding   chunks not embedded before -> shared embedding store, several batches in flight
+    indexing    the document's chunks replaced in the assistant's KB index
+
+Every stage leaves a checkpoint in settings.kb_ingest_work_path/<job_id>, so a
+job whose worker died (lease expired) is picked up by another worker and
+continues from the last finished page or embedding batch (finished batches
+are found in the shared embedding store). Progress is written
+to the job document for status polling; a worker that finds its lease taken
+over stops without writing anything more. Uploads, checkpoints and the index
+live under settings.kb_index_path, which every API and media worker mounts.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.config.database import Database
+from app.config.settings import settings
+from app.services.embedding_service import LOCAL_BACKEND, embedding_model_id, embedding_service
+from app.utils import conversational_rag
+from app.utils.assistant_keys import resolve_assistant_api_key
+from app.utils.kb_embedding_store import kb_embedding_store
+from app.utils.kb_index import EmbeddingModelMismatch, kb_index_store
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "kb_ingestion_jobs"
+PAGES_FILE = "pages.jsonl"
+PAGES_DONE_FILE = "pages.done"
+CHUNKS_FILE = "chunks.json"
+# Less PDF text than this means PyMuPDF could not read the file (fall back to PyPDF2)
+MIN_STREAMED_TEXT = 100
+
+
+def utc_now() -> datetime:
+    return datetime.utcnow()
+
+
+class IngestionError(ValueError):
+    """Document problem that retrying will not fix (no text, no chunks, file removed)."""
+
+
+class LeaseLost(Exception):
+    """Another worker took the job over after this worker's lease expired."""
+
+
+def user_error_message(error: str) -> str:
+    """Failure shown on the knowledge base file, with advice for documents that need OCR."""
+    if 'OCR not available' in error or 'Tesseract' in error:
+        return (
+            "This PDF appears to be image-based/scanned and requires OCR to extract text. "
+            "Please install Tesseract OCR:\n"
+            "Ubuntu/Debian: sudo apt-get install tesseract-ocr tesseract-ocr-eng\n"
+            "macOS: brew install tesseract\n"
+            "Or convert your PDF to a text-searchable PDF first."
+        )
+    if 'Could not extract text' in error:
+        return (
+            "Failed to extract text from PDF. This may be an image-based/scanned document. "
+            "Try converting it to a text-searchable PDF or install Tesseract OCR for automatic text recognition."
+        )
+    return error
+
+
+class KnowledgeBaseIngestion:
+    """Claims queued ingestion jobs and runs them with per-stage checkpoints."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event = asyncio.Event()
+        self._wake_event = asyncio.Event()
+        self._running: Dict[str, asyncio.Task] = {}
+        self.completed = 0
+        self.failed = 0
+        self.resumed = 0
+
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        os.makedirs(settings.kb_ingest_work_path, exist_ok=True)
+        logger.info(f"[KB_INGEST] Starting ingestion worker {self.worker_id} (max {settings.kb_ingest_max_concurrent_jobs} jobs)")
+        self._stop_event.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="kb-ingestion")
+
+    async def shutdown(self):
+        if not self._task:
+            return
+        self._stop_event.set()
+        self._task.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        # Cancelled jobs keep their checkpoints; their leases expire and another worker resumes them
+        await asyncio.gather(self._task, *self._running.values(), return_exceptions=True)
+        self._task = None
+        self._running.clear()
+
+    # ====== Queue ======
+    def enqueue(
+        self,
+        assistant_id: str,
+        filename: str,
+        file_type: str,
+        file_path: str,
+        file_size: int,
+        job_id: Optional[str] = None,
+    ) -> str:
+        """
+        Queue a saved upload for ingestion.
+
+        Args:
+            assistant_id: AI Assistant ID
+            filename: Original filename (the index key for the document's chunks)
+            file_type: Type of file (pdf, docx, etc.)
+            file_path: Where the upload was saved
+            file_size: Size in bytes
+            job_id: Id to use (the upload records it on the file entry before queueing)
+
+        Returns:
+            The job id
+        """
+        now = utc_now()
+        result = Database.get_db()[JOBS_COLLECTION].insert_one({
+            "_id": ObjectId(job_id) if job_id else ObjectId(),
+            "assistant_id": str(assistant_id),
+            "filename": filename,
+            "file_type": file_type,
+            "file_path": file_path,
+            "file_size": file_size,
+            "status": "queued",
+            "stage": "queued",
+            "progress": {"pages_done": 0, "chunks": 0, "reused": 0, "batches_done": 0, "batches_total": 0},
+            "attempts": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        })
+        self._wake_event.set()
+        return str(result.inserted_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return Database.get_db()[JOBS_COLLECTION].find_one({"_id": ObjectId(job_id)})
+        except Exception:
+            return None
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued job, or a running job whose worker stopped renewing its lease."""
+        jobs = Database.get_db()[JOBS_COLLECTION]
+        now = utc_now()
+        # Jobs that keep killing their worker are not retried forever
+        jobs.update_many(
+            {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": settings.kb_ingest_max_attempts}},
+            {"$set": {"status": "failed", "error": "Ingestion did not finish after repeated attempts", "updated_at": now}},
+        )
+        return jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued"},
+                    {"status": "running", "lease_expires_at": {"$lt": now}},
+                ],
+                "attempts": {"$lt": settings.kb_ingest_max_attempts},
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=settings.kb_ingest_lease_seconds),
+                    "started_at": now,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _update(self, job_id, fields: Dict[str, Any]) -> bool:
+        """Write progress and renew the lease; False if another worker has taken the job over."""
+        now = utc_now()
+        fields = dict(fields, updated_at=now, lease_expires_at=now + timedelta(seconds=settings.kb_ingest_lease_seconds))
+        result = Database.get_db()[JOBS_COLLECTION].update_one(
+            {"_id": job_id, "worker_id": self.worker_id, "status": "running"},
+            {"$set": fields},
+        )
+        return result.matched_count == 1
+
+    def _renew(self, job_id, fields: Dict[str, Any]):
+        """_update that stops the job (LeaseLost) once another worker owns it."""
+        if not self._update(job_id, fields):
+            raise LeaseLost(f"Job {job_id} was taken over by another worker")
+
+    # ====== Loop ======
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop_event.is_set():
+            try:
+                while len(self._running) < settings.kb_ingest_max_concurrent_jobs:
+                    job = await loop.run_in_executor(None, self._claim)
+                    if job is None:
+                        break
+                    job_id = str(job["_id"])
+                    self._running[job_id] = loop.create_task(self._process(job), name=f"kb-ingest-{job_id}")
+                    self._running[job_id].add_done_callback(lambda _, job_id=job_id: self._on_done(job_id))
+            except asyncio.CancelledError:
+                break
+            except Exception as exc:
+                logger.exception("[KB_INGEST] Claim tick failed: %s", exc)
+            self._wake_event.clear()
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=settings.kb_ingest_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                continue
+
+    def _on_done(self, job_id: str):
+        self._running.pop(job_id, None)
+        self._wake_event.set()
+
+    async def _heartbeat(self, job_id, job_task: asyncio.Task):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(settings.kb_ingest_lease_seconds / 3)
+            if not await loop.run_in_executor(None, self._update, job_id, {}):
+                logger.warning(f"[KB_INGEST] Job {job_id} was taken over by another worker; stopping")
+                job_task.cancel()
+                return
+
+    # ====== Job ======
+    async def _process(self, job: Dict[str, Any]):
+        job_id = job["_id"]
+        work_dir = os.path.join(settings.kb_ingest_work_path, str(job_id))
+        if job["attempts"] > 1:
+            self.resumed += 1
+            logger.info(f"[KB_INGEST] Resuming job {job_id} ({job['filename']}) from stage {job.get('stage')}")
+        os.makedirs(work_dir, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        heartbeat = loop.create_task(self._heartbeat(job_id, asyncio.current_task()))
+        try:
+            assistant = await loop.run_in_executor(None, self._load_assistant, job)
+            model = embedding_model_id(assistant.get("kb_embedding_backend"))
+            api_key = None
+            if assistant.get("kb_embedding_backend") != LOCAL_BACKEND:
+                api_key, _ = resolve_assistant_api_key(Database.get_db(), assistant, required_provider="openai")
+
+            await loop.run_in_executor(None, self._renew, job_id, {"stage": "extracting"})
+            await loop.run_in_executor(None, self._extract, job, work_dir)
+
+            await loop.run_in_executor(None, self._renew, job_id, {"stage": "chunking"})
+            chunks = await loop.run_in_executor(None, self._chunk, job, work_dir)
+
+            await loop.run_in_executor(None, self._renew, job_id, {"stage": "embedding", "progress.chunks": len(chunks)})
+            embeddings = await self._embed(job, chunks, api_key, model)
+
+            await loop.run_in_executor(None, self._renew, job_id, {"stage": "indexing"})
+            await loop.run_in_executor(None, self._index, job, chunks, embeddings, api_key, assistant, model)
+
+            if not await loop.run_in_executor(None, self._finish, job, "completed", len(chunks), None):
+                raise LeaseLost(f"Job {job_id} was taken over by another worker")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            self.completed += 1
+            logger.info(f"[KB_INGEST] Job {job_id} indexed {len(chunks)} chunks from {job['filename']}")
+        except asyncio.CancelledError:
+            raise
+        except LeaseLost:
+            # The new owner resumes from the same checkpoints; leave them and the job document alone
+            logger.warning(f"[KB_INGEST] Job {job_id} was taken over by another worker; stopping")
+        except Exception as exc:
+            retry = not isinstance(exc, IngestionError) and job["attempts"] < settings.kb_ingest_max_attempts
+            logger.error(f"[KB_INGEST] Job {job_id} failed at attempt {job['attempts']}: {exc}")
+            error = user_error_message(str(exc))
+            if retry:
+                # Checkpoints stay; the next claim resumes from them
+                await loop.run_in_executor(None, self._update, job_id, {"status": "queued", "error": error})
+            elif await loop.run_in_executor(None, self._finish, job, "failed", None, error):
+                self.failed += 1
+                shutil.rmtree(work_dir, ignore_errors=True)
+        finally:
+            heartbeat.cancel()
+
+    def _load_assistant(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        assistant = Database.get_db()["assistants"].find_one({
+            "_id": ObjectId(job["assistant_id"]),
+            "knowledge_base_files.job_id": str(job["_id"]),
+        })
+        if not assistant:
+            raise IngestionError("Assistant or knowledge base file no longer exists")
+        return assistant
+
+    def _extract(self, job: Dict[str, Any], work_dir: str):
+        """Stream page text to pages.jsonl, continuing after the last complete page."""
+        done_path = os.path.join(work_dir, PAGES_DONE_FILE)
+        if os.path.exists(done_path):
+            return
+        pages_path = os.path.join(work_dir, PAGES_FILE)
+        pages_done, text_chars = _truncate_to_complete_pages(pages_path)
+
+        with open(pages_path, "a", encoding="utf-8") as pages_file:
+            pages = conversational_rag.iter_document_pages(job["file_path"], job["file_type"], start_page=pages_done)
+            for page_number, text in pages:
+                pages_file.write(json.dumps({"page": page_number, "text": text}) + "\n")
+                pages_file.flush()
+                pages_done += 1
+                text_chars += len(text.strip())
+                if pages_done % 10 == 0:
+                    self._renew(job["_id"], {"progress.pages_done": pages_done})
+
+        if text_chars < MIN_STREAMED_TEXT and job["file_type"].lower() == "pdf":
+            # Whole document through extract_text_from_pdf, as a single page
+            text = conversational_rag.extract_text_from_pdf(job["file_path"])
+            with open(pages_path, "w", encoding="utf-8") as pages_file:
+                pages_file.write(json.dumps({"page": 0, "text": text}) + "\n")
+            pages_done = 1
+        self._renew(job["_id"], {"progress.pages_done": pages_done})
+        open(done_path, "w").close()
+
+    def _chunk(self, job: Dict[str, Any], work_dir: str) -> List[Dict[str, Any]]:
+        chunks_path = os.path.join(work_dir, CHUNKS_FILE)
+        if os.path.exists(chunks_path):
+            with open(chunks_path, encoding="utf-8") as chunks_file:
+                return json.load(chunks_file)
+
+        with open(os.path.join(work_dir, PAGES_FILE), encoding="utf-8") as pages_file:
+            text = "\n".join(json.loads(line)["text"] for line in pages_file)
+        if not text.strip():
+            raise IngestionError("Could not extract text from file")
+        chunks = conversational_rag.chunk_text_for_conversation(text, chunk_size=300, overlap=50)
+        if not chunks:
+            raise IngestionError("No chunks created from text")
+
+        index_chunks = conversational_rag.build_index_chunks(job["filename"], job["file_type"], chunks)
+        _write_atomic(chunks_path, lambda f: json.dump(index_chunks, f))
+        return index_chunks
+
+    async def _embed(self, job: Dict[str, Any], chunks: List[Dict[str, Any]], api_key: Optional[str], model: str) -> List[List[float]]:
+        """
+        Embed the chunks not already in the assistant's index or the shared embedding store,
+        in batches with bounded concurrency. Each finished batch is written to the store,
+        which is also the checkpoint: a resumed job finds those batches there.
+        """
+        loop = asyncio.get_running_loop()
+        hashes = [conversational_rag.chunk_content_hash(chunk) for chunk in chunks]
+        known = await loop.run_in_executor(None, conversational_rag.known_chunk_embeddings, job["assistant_id"], hashes, model)
+        texts = {h: chunk["text"] for h, chunk in zip(hashes, chunks)}
+        missing = list(dict.fromkeys(h for h in hashes if h not in known))
+
+        batch_size = settings.kb_ingest_embedding_batch_size
+        batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+        semaphore = asyncio.Semaphore(settings.kb_ingest_embedding_concurrency)
+        done = 0
+        await loop.run_in_executor(None, self._renew, job["_id"], {
+            "progress.reused": len(hashes) - len(missing),
+            "progress.batches_total": len(batches),
+            "progress.batches_done": 0,
+        })
+
+        async def embed_batch(batch: List[str]):
+            nonlocal done
+            async with semaphore:
+                vectors = await embedding_service.embed_documents([texts[h] for h in batch], api_key, model, batch_size=batch_size)
+                if len(vectors) != len(batch):
+                    raise ValueError("Failed to create embeddings")
+                new = dict(zip(batch, vectors))
+                await loop.run_in_executor(None, kb_embedding_store.put_many, model, new)
+                known.update(new)
+                done += 1
+                await loop.run_in_executor(None, self._renew, job["_id"], {"progress.batches_done": done})
+
+        await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        return [known[h] for h in hashes]
+
+    def _index(self, job, chunks, embeddings, api_key, assistant, model):
+        # Replacing the document's chunks makes this stage safe to repeat after a crash
+        self._load_assistant(job)  # the file may have been deleted while the job ran
+        try:
+            kb_index_store.replace_document(job["assistant_id"], job["filename"], embeddings, chunks, model)
+        except EmbeddingModelMismatch as mismatch:
+            logger.info(f"[KB_INGEST] Re-indexing knowledge base for assistant {job['assistant_id']}: {mismatch}")
+            reindex = conversational_rag.reindex_knowledge_base(job["assistant_id"], api_key, assistant.get("kb_embedding_backend"))
+            if not reindex["success"]:
+                raise ValueError(f"Could not re-index knowledge base: {reindex.get('error')}")
+            kb_index_store.replace_document(job["assistant_id"], job["filename"], embeddings, chunks, model)
+
+    def _finish(self, job: Dict[str, Any], status: str, chunks_count: Optional[int], error: Optional[str]) -> bool:
+        """Record the outcome on the job and the file entry; False (nothing written) if the job was taken over."""
+        db = Database.get_db()
+        now = utc_now()
+        result = db[JOBS_COLLECTION].update_one(
+            {"_id": job["_id"], "worker_id": self.worker_id, "status": "running"},
+            {"$set": {"status": status, "stage": "done" if status == "completed" else job.get("stage"), "error": error, "completed_at": now, "updated_at": now}},
+        )
+        if result.matched_count != 1:
+            return False
+        file_fields = {"knowledge_base_files.$.status": "ready" if status == "completed" else "failed", "updated_at": now}
+        if chunks_count is not None:
+            file_fields["knowledge_base_files.$.chunks_count"] = chunks_count
+        if error:
+            file_fields["knowledge_base_files.$.error"] = error
+        db["assistants"].update_one(
+            {"_id": ObjectId(job["assistant_id"]), "knowledge_base_files.job_id": str(job["_id"])},
+            {"$set": file_fields},
+        )
+        if status == "completed":
+            self._drop_previous_versions(db, job)
+        return True
+
+    def _drop_previous_versions(self, db, job: Dict[str, Any]):
+        """A re-upload replaced the document's chunks; forget the earlier upload entries and files."""
+        assistant = db["assistants"].find_one({"_id": ObjectId(job["assistant_id"])}, {"knowledge_base_files": 1})
+        previous = [
+            entry for entry in (assistant or {}).get("knowledge_base_files", [])
+            if entry.get("filename") == job["filename"] and entry.get("job_id") != str(job["_id"])
+        ]
+        if not previous:
+            return
+        db["assistants"].update_one(
+            {"_id": ObjectId(job["assistant_id"])},
+            {"$pull": {"knowledge_base_files": {"filename": job["filename"], "job_id": {"$ne": str(job["_id"])}}}},
+        )
+        for entry in previous:
+            if entry.get("file_path") and entry["file_path"] != job["file_path"] and os.path.exists(entry["file_path"]):
+                os.remove(entry["file_path"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "running": len(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+            "resumed": self.resumed,
+        }
+
+
+def _truncate_to_complete_pages(pages_path: str):
+    """Drop a partially written last line; returns (complete pages, characters of text)."""
+    if not os.path.exists(pages_path):
+        return 0, 0
+    pages, chars, valid_bytes = 0, 0, 0
+    with open(pages_path, "rb") as pages_file:
+        for line in pages_file:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("partial line")
+                chars += len(json.loads(line)["text"].strip())
+            except ValueError:
+                break
+            pages += 1
+            valid_bytes += len(line)
+    with open(pages_path, "r+b") as pages_file:
+        pages_file.truncate(valid_bytes)
+    return pages, chars
+
+
+def _write_atomic(path: str, write):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+kb_ingestion = KnowledgeBaseIngestion()
@@ -0,0 +1,437 @@
+"""
+Background, streaming CSV lead imports.
+
+Uploading leads used to read the whole file into memory, decode it into one
+string, validate every number with phonenumbers in the request loop, build
+every lead dict in one list and insert them with a single insert_many; a
+million-row file held the request (and gigabytes of memory) for minutes.
+Uploads now stream the file to disk, enqueue a job in the lead_import_jobs
+collection and return its id; API workers claim jobs with a lease and:
+
+- read the saved file incrementally with the csv module, handing chunks of
+  settings.lead_import_chunk_rows raw rows to a process pool that validates
+  and normalizes the numbers (app.utils.lead_csv)
+- keep at most two chunks per process in flight and collect them in file
+  order, so memory is bounded and leads keep their upload order
+- reserve an order_index range per chunk on the campaign ($inc next_index)
+  and write the chunk with one bulk insert; the unique (campaign_id, e164)
+  index drops numbers already in the campaign, counted as duplicates
+- checkpoint the rows written and the counts on the job document after every
+  chunk, so a job whose worker died continues from its last chunk
+
+Progress (rows, valid, invalid, duplicates, bytes read of bytes total) is
+polled through GET /api/campaigns/{id}/leads/imports/{job_id}.
+"""
+
+import asyncio
+import csv
+import io
+import itertools
+import logging
+import multiprocessing
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from app.config.database import Database
+from app.config.settings import settings
+from app.services.campaign_counters import campaign_counters
+from app.utils.lead_csv import PHONE_KEYS, normalize_chunk
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "lead_import_jobs"
+DUPLICATE_KEY = 11000
+
+
+def utc_now() -> datetime:
+    return datetime.utcnow()
+
+
+class LeadImportError(ValueError):
+    """Upload problem that retrying will not fix (campaign gone, file unreadable)."""
+
+
+def new_lead_document(fields: Dict[str, Any], campaign_id: ObjectId, order_index: int,
+                      batch_name: Optional[str], now: datetime) -> Dict[str, Any]:
+    """A queued lead from normalized CSV fields, with the defaults every new lead gets."""
+    return {
+        "campaign_id": campaign_id,
+        "raw_number": fields["raw_number"],
+        "e164": fields["e164"],
+        "timezone": fields["timezone"],
+        "first_name": fields["first_name"],
+        "last_name": fields["last_name"],
+        "batch_name": batch_name,
+        "name": fields["name"],
+        "email": fields["email"],
+        "status": "queued",
+        "attempts": 0,
+        "order_index": order_index,
+        "next_retry_at": None,
+        "fallback_round": 0,
+        "last_outcome": None,
+        "last_call_sid": None,
+        "retry_on": None,
+        "sentiment": None,
+        "summary": None,
+        "calendar_booked": False,
+        "created_at": now,
+        "updated_at": now,
+        "custom_fields": fields["custom_fields"],
+    }
+
+
+def insert_leads(leads_collection, docs: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Bulk insert leads, skipping numbers the campaign already has.
+
+    The batch is written unordered so a duplicate does not stop the rest of it.
+
+    Returns:
+        (inserted, duplicates)
+    """
+    if not docs:
+        return 0, 0
+    try:
+        result = leads_collection.insert_many(docs, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as bwe:
+        errors = bwe.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY for error in errors):
+            raise
+        return bwe.details.get("nInserted", 0), len(errors)
+
+
+class _ReadProgress(io.RawIOBase):
+    """Binary file wrapper that counts the bytes the csv reader has consumed."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self._raw.readinto(buffer)
+        self.bytes_read += count or 0
+        return count
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+class LeadImporter:
+    """Claims queued lead imports and runs them chunk by chunk."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event = asyncio.Event()
+        self._wake_event = asyncio.Event()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.completed = 0
+        self.failed = 0
+        self.resumed = 0
+        self.rows_imported = 0
+
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        os.makedirs(settings.lead_import_work_path, exist_ok=True)
+        logger.info(f"[LEAD_IMPORT] Starting import worker {self.worker_id} ({settings.lead_import_processes} processes)")
+        self._stop_event.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="lead-import")
+
+    async def shutdown(self):
+        if self._task:
+            self._stop_event.set()
+            self._task.cancel()
+            for task in list(self._running.values()):
+                task.cancel()
+            # Interrupted jobs keep their checkpoint; their leases expire and another worker resumes them
+            await asyncio.gather(self._task, *self._running.values(), return_exceptions=True)
+            self._task = None
+            self._running.clear()
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: the API process runs threads (event loop executors, pymongo)
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.lead_import_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    # ====== Queue ======
+    def enqueue(
+        self,
+        campaign_id: str,
+        filename: str,
+        file_path: str,
+        file_size: int,
+        batch_name: Optional[str] = None,
+        job_id: Optional[str] = None,
+    ) -> str:
+        """
+        Queue a saved upload for import.
+
+        Args:
+            campaign_id: Campaign the leads are added to
+            filename: Original filename
+            file_path: Where the upload was saved
+            file_size: Size in bytes
+            batch_name: Batch label stored on every lead
+            job_id: Id to use (the upload names the saved file after it)
+
+        Returns:
+            The job id
+        """
+        now = utc_now()
+        result = Database.get_db()[JOBS_COLLECTION].insert_one({
+            "_id": ObjectId(job_id) if job_id else ObjectId(),
+            "campaign_id": str(campaign_id),
+            "filename": filename,
+            "file_path": file_path,
+            "batch_name": batch_name,
+            "status": "queued",
+            "progress": {
+                "rows": 0, "valid": 0, "invalid": 0, "mismatches": 0, "duplicates": 0,
+                "bytes_read": 0, "bytes_total": file_size,
+            },
+            "attempts": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        })
+        self._wake_event.set()
+        return str(result.inserted_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return Database.get_db()[JOBS_COLLECTION].find_one({"_id": ObjectId(job_id)})
+        except Exception:
+            return None
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued job, or a running job whose worker stopped renewing its lease."""
+        jobs = Database.get_db()[JOBS_COLLECTION]
+        now = utc_now()
+        jobs.update_many(
+            {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": settings.lead_import_max_attempts}},
+            {"$set": {"status": "failed", "error": "Import did not finish after repeated attempts", "updated_at": now}},
+        )
+        return jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued"},
+                    {"status": "running", "lease_expires_at": {"$lt": now}},
+                ],
+                "attempts": {"$lt": settings.lead_import_max_attempts},
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=settings.lead_import_lease_seconds),
+                    "started_at": now,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _update(self, job_id, fields: Dict[str, Any]) -> bool:
+        """Write progress and renew the lease; False if another worker has taken the job over."""
+        now = utc_now()
+        fields = dict(fields, updated_at=now, lease_expires_at=now + timedelta(seconds=settings.lead_import_lease_seconds))
+        result = Database.get_db()[JOBS_COLLECTION].update_one(
+            {"_id": job_id, "worker_id": self.worker_id, "status": "running"},
+            {"$set": fields},
+        )
+        return result.matched_count == 1
+
+    # ====== Loop ======
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop_event.is_set():
+            try:
+                while len(self._running) < settings.lead_import_max_concurrent_jobs:
+                    job = await loop.run_in_executor(None, self._claim)
+                    if job is None:
+                        break
+                    job_id = str(job["_id"])
+                    self._running[job_id] = loop.create_task(self._process(job), name=f"lead-import-{job_id}")
+                    self._running[job_id].add_done_callback(lambda _, job_id=job_id: self._on_done(job_id))
+            except asyncio.CancelledError:
+                break
+            except Exception as exc:
+                logger.exception("[LEAD_IMPORT] Claim tick failed: %s", exc)
+            self._wake_event.clear()
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=settings.lead_import_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                continue
+
+    def _on_done(self, job_id: str):
+        self._running.pop(job_id, None)
+        self._wake_event.set()
+
+    # ====== Job ======
+    async def _process(self, job: Dict[str, Any]):
+        job_id = job["_id"]
+        if job["attempts"] > 1:
+            self.resumed += 1
+            logger.info(f"[LEAD_IMPORT] Resuming job {job_id} ({job['filename']}) after row {job['progress']['rows']}")
+        loop = asyncio.get_running_loop()
+        cancelled = asyncio.Event()
+        try:
+            # The import loop is blocking (file, pool, MongoDB); it checks `cancelled` between chunks
+            if await loop.run_in_executor(None, self.run_job, job, cancelled.is_set):
+                self.completed += 1
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        except Exception as exc:
+            retry = not isinstance(exc, LeadImportError) and job["attempts"] < settings.lead_import_max_attempts
+            logger.error(f"[LEAD_IMPORT] Job {job_id} failed at attempt {job['attempts']}: {exc}")
+            if retry:
+                await loop.run_in_executor(None, self._update, job_id, {"status": "queued", "error": str(exc)})
+            else:
+                self.failed += 1
+                await loop.run_in_executor(None, self._finish, job, "failed", str(exc))
+
+    def run_job(self, job: Dict[str, Any], cancelled=lambda: False) -> bool:
+        """
+        Import a claimed job from its checkpoint to the end of the file (blocking).
+
+        Args:
+            job: Job document as returned by the claim
+            cancelled: Returns True when the worker is shutting down
+
+        Returns:
+            True if the file was imported to the end, False if the job was interrupted
+        """
+        db = Database.get_db()
+        job_id = job["_id"]
+        campaign_obj_id = ObjectId(job["campaign_id"])
+        campaign = db["campaigns"].find_one({"_id": campaign_obj_id}, {"country": 1, "working_window.timezone": 1})
+        if not campaign:
+            raise LeadImportError("Campaign no longer exists")
+        if not os.path.exists(job["file_path"]):
+            raise LeadImportError("Uploaded file is missing")
+        country = campaign.get("country", "US")
+        campaign_tz = campaign.get("working_window", {}).get("timezone", "America/New_York")
+
+        progress = dict(job["progress"])
+        pool = self._get_pool()
+        window = max(1, settings.lead_import_processes) * 2
+        with open(job["file_path"], "rb") as raw:
+            counter = _ReadProgress(raw)
+            text = io.TextIOWrapper(io.BufferedReader(counter), encoding="utf-8-sig", errors="replace", newline="")
+            reader = csv.reader(text)
+            header = [(name or "").strip() for name in next(reader, [])]
+            if not any(key.lower() in PHONE_KEYS for key in header):
+                raise LeadImportError("CSV has no phone column")
+
+            def collect(row_count, future) -> bool:
+                leads, invalid, mismatches = future.result()
+                inserted, duplicates = self._write_chunk(db, job, campaign_obj_id, leads)
+                progress["rows"] += row_count
+                progress["valid"] += inserted
+                progress["invalid"] += invalid
+                progress["mismatches"] += mismatches
+                progress["duplicates"] += duplicates
+                progress["bytes_read"] = min(counter.bytes_read, progress["bytes_total"])
+                self.rows_imported += inserted
+                if not self._update(job_id, {"progress": progress}):
+                    logger.warning(f"[LEAD_IMPORT] Job {job_id} was taken over by another worker; stopping")
+                    return False
+                return not cancelled()
+
+            # Chunks after the checkpoint; the oldest is always written first so leads keep file order
+            pending = []
+            for rows in _chunked(itertools.islice(reader, progress["rows"], None), settings.lead_import_chunk_rows):
+                pending.append((len(rows), pool.submit(normalize_chunk, header, rows, country, campaign_tz)))
+                if len(pending) >= window and not collect(*pending.pop(0)):
+                    return False
+            while pending:
+                if not collect(*pending.pop(0)):
+                    return False
+
+        progress["bytes_read"] = progress["bytes_total"]
+        self._finish(dict(job, progress=progress), "completed", None)
+        logger.info(
+            f"[LEAD_IMPORT] Job {job_id} imported {progress['valid']} of {progress['rows']} rows for campaign "
+            f"{job['campaign_id']} ({progress['invalid']} invalid, {progress['duplicates']} duplicates)"
+        )
+        return True
+
+    def _write_chunk(self, db, job: Dict[str, Any], campaign_obj_id: ObjectId, leads: List[Dict[str, Any]]) -> Tuple[int, int]:
+        if not leads:
+            return 0, 0
+        # Reserve this chunk's order_index range; concurrent uploads get disjoint ranges
+        campaign = db["campaigns"].find_one_and_update(
+            {"_id": campaign_obj_id},
+            {"$inc": {"next_index": len(leads)}},
+            projection={"next_index": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if campaign is None:
+            raise LeadImportError("Campaign no longer exists")
+        first_index = int(campaign.get("next_index", 0) or 0)
+        now = utc_now()
+        docs = [
+            new_lead_document(fields, campaign_obj_id, first_index + offset, job.get("batch_name"), now)
+            for offset, fields in enumerate(leads)
+        ]
+        inserted, duplicates = insert_leads(db["leads"], docs)
+        campaign_counters.leads_added(campaign_obj_id, inserted)
+        return inserted, duplicates
+
+    def _finish(self, job: Dict[str, Any], status: str, error: Optional[str]):
+        now = utc_now()
+        Database.get_db()[JOBS_COLLECTION].update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": status, "error": error, "completed_at": now, "updated_at": now}},
+        )
+        try:
+            os.remove(job["file_path"])
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "running": len(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+            "resumed": self.resumed,
+            "rows_imported": self.rows_imported,
+        }
+
+
+def _chunked(rows: Iterator[List[str]], size: int) -> Iterator[List[List[str]]]:
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+lead_importer = LeadImporter()
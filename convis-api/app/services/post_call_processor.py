@@ -5,12 +5,13 @@ Handles transcription, sentiment analysis, and summary generation using OpenAI
 import logging
 import os
 import json
-import httpx
 from datetime import datetime
 from typing import Optional, Dict, Any
 from bson import ObjectId
 
 from app.config.database import Database
+from app.services.campaign_counters import campaign_counters
+from app.services.http_clients import http_clients
 from app.utils.assistant_keys import (
     resolve_assistant_api_key,
     resolve_user_provider_key,
@@ -50,7 +51,7 @@ class PostCallProcessor:
                 logger.error("Twilio credentials not configured")
                 return None
 
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("twilio") as client:
                 response = await client.get(
                     recording_url,
                     auth=(account_sid, auth_token),
@@ -80,7 +81,7 @@ class PostCallProcessor:
 
             # OpenAI Whisper API expects multipart/form-data with a filename and mimetype.
             # Twilio recordings are WAV by default; label accordingly to avoid 400 errors.
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("openai") as client:
                 response = await client.post(
                     "https://api.openai.com/v1/audio/transcriptions",
                     headers={"Authorization": f"Bearer {openai_api_key}"},
@@ -162,7 +163,7 @@ Example format:
 
 Return ONLY the JSON, no other text."""
 
-            async with httpx.AsyncClient() as client:
+            async with http_clients.client("openai") as client:
                 response = await client.post(
                     "https://api.openai.com/v1/chat/completions",
                     headers={
@@ -285,7 +286,8 @@ Return ONLY the JSON, no other text."""
                 "score": analysis.get("sentiment_score", 0.0)
             }
 
-            leads_collection.update_one(
+            campaign_counters.update_lead(
+                leads_collection,
                 {"_id": ObjectId(lead_id)},
                 {
                     "$set": {
@@ -0,0 +1,272 @@
+"""
+Pre-opened OpenAI Realtime sessions keyed by Twilio call SID.
+
+Without this, the media-stream handler only dials `wss://api.openai.com/v1/realtime`
+after Twilio has opened the media websocket, then sends `session.update` and the
+greeting in series, so the caller hears silence for the whole TLS + websocket +
+session handshake. The Twilio `/voice` webhook (and the outbound dial paths)
+already know the call SID and the assistant a few hundred milliseconds to several
+seconds earlier, so they call `preopen()` to connect and configure the session in
+the background. The media-stream handler then adopts it through `session()`.
+
+Sessions nobody claims (caller hung up during ringing, media stream landed on a
+different worker) are closed by a reaper once their TTL expires. Time-to-first-
+audio is recorded separately for adopted and cold sessions.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import websockets
+
+from app.config.settings import settings
+from app.services.assistant_runtime_cache import AssistantRuntimeSnapshot, REALTIME_MIN_TEMPERATURE
+
+logger = logging.getLogger(__name__)
+
+REALTIME_URL = "wss://api.openai.com/v1/realtime"
+
+
+async def connect_realtime(llm_model: str, temperature: float, openai_api_key: str):
+    """Open a Realtime websocket with the settings the call handlers have always used."""
+    return await websockets.connect(
+        f"{REALTIME_URL}?model={llm_model}&temperature={temperature}",
+        additional_headers={
+            "Authorization": f"Bearer {openai_api_key}",
+            "OpenAI-Beta": "realtime=v1"
+        },
+        open_timeout=30,  # Increased from default 10s to 30s
+        close_timeout=10,
+        ping_interval=20,
+        ping_timeout=20
+    )
+
+
+class LatencyStats:
+    """Count / average / max of a latency series in milliseconds."""
+
+    __slots__ = ("count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, value_ms: float):
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class PreopenedSession:
+    """A Realtime session being opened (or already open) for one call."""
+
+    __slots__ = ("call_sid", "assistant_id", "session_update", "task", "expires_at")
+
+    def __init__(self, call_sid: str, assistant_id: str, session_update: Dict[str, Any], task: asyncio.Task, ttl: float):
+        self.call_sid = call_sid
+        self.assistant_id = assistant_id
+        self.session_update = session_update
+        self.task = task
+        self.expires_at = time.monotonic() + ttl
+
+
+class RealtimeSessionPool:
+    """Per-worker registry of pre-opened Realtime sessions."""
+
+    def __init__(self):
+        self._sessions: Dict[str, PreopenedSession] = {}
+        self._reaper_task: Optional[asyncio.Task] = None
+        self.preopened = 0
+        self.claimed = 0
+        self.expired = 0
+        self.failed = 0
+        self.cold = 0
+        self.first_audio = {"preopened": LatencyStats(), "cold": LatencyStats()}
+
+    async def start(self):
+        if not settings.realtime_preopen_enabled:
+            logger.info("[REALTIME_POOL] Pre-opened Realtime sessions disabled")
+            return
+        if self._reaper_task is None:
+            self._reaper_task = asyncio.create_task(self._reap_loop())
+            logger.info("[REALTIME_POOL] Started")
+
+    async def shutdown(self):
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+            self._reaper_task = None
+        for call_sid in list(self._sessions):
+            await self._discard(self._sessions.pop(call_sid))
+
+    # ====== Pre-open ======
+    def preopen(self, call_sid: Optional[str], runtime: Optional[AssistantRuntimeSnapshot], ttl: Optional[float] = None) -> bool:
+        """
+        Start opening and configuring a Realtime session for `call_sid` in the background.
+
+        Args:
+            call_sid: Twilio Call SID the media stream will report in its `start` event
+            runtime: Compiled assistant snapshot for the call
+            ttl: Seconds to keep the session if nobody claims it (defaults to settings)
+
+        Returns:
+            True if a session is being opened
+        """
+        if not settings.realtime_preopen_enabled or not call_sid or not runtime:
+            return False
+        if settings.worker_role == "api":
+            # Media streams are served by another tier; a session opened here would never be adopted
+            return False
+        if call_sid in self._sessions:
+            return True
+        if not runtime.use_openai_realtime or not runtime.openai_api_key:
+            return False
+
+        task = asyncio.create_task(self._open(runtime))
+        task.add_done_callback(self._on_open_done)
+        self._sessions[call_sid] = PreopenedSession(
+            call_sid,
+            runtime.assistant_id,
+            runtime.session_update,
+            task,
+            ttl or settings.realtime_preopen_ttl_seconds,
+        )
+        self.preopened += 1
+        logger.info(f"[REALTIME_POOL] Pre-opening Realtime session for call {call_sid}")
+        return True
+
+    async def _open(self, runtime: AssistantRuntimeSnapshot):
+        openai_ws = await connect_realtime(
+            runtime.llm_model,
+            max(runtime.temperature, REALTIME_MIN_TEMPERATURE),
+            runtime.openai_api_key,
+        )
+        try:
+            await openai_ws.send(json.dumps(runtime.session_update))
+            # Consume session.created / session.updated so the session is fully configured on adoption
+            deadline = time.monotonic() + settings.realtime_preopen_claim_wait_seconds
+            while time.monotonic() < deadline:
+                event = json.loads(await asyncio.wait_for(openai_ws.recv(), timeout=deadline - time.monotonic()))
+                if event.get("type") == "session.updated":
+                    break
+                if event.get("type") == "error":
+                    raise RuntimeError(f"Realtime session.update rejected: {event.get('error')}")
+            return openai_ws
+        except BaseException:
+            await openai_ws.close()
+            raise
+
+    def _on_open_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+            logger.warning(f"[REALTIME_POOL] Failed to pre-open Realtime session: {task.exception()}")
+
+    # ====== Adoption ======
+    async def claim(self, call_sid: Optional[str], assistant_id: str, session_update: Dict[str, Any]):
+        """Take the pre-opened session for a call, or None if there is no usable one."""
+        entry = self._sessions.pop(call_sid, None) if call_sid else None
+        if entry is None:
+            return None
+        if entry.assistant_id != assistant_id or entry.session_update != session_update:
+            # Assistant changed between the webhook and the media stream
+            await self._discard(entry)
+            return None
+        try:
+            openai_ws = await asyncio.wait_for(
+                asyncio.shield(entry.task),
+                timeout=settings.realtime_preopen_claim_wait_seconds
+            )
+        except Exception:
+            await self._discard(entry)
+            return None
+        if openai_ws.state.name != 'OPEN':
+            return None
+        self.claimed += 1
+        return openai_ws
+
+    @asynccontextmanager
+    async def session(
+        self,
+        call_sid: Optional[str],
+        runtime: AssistantRuntimeSnapshot,
+        llm_model: str,
+        temperature: float,
+        openai_api_key: str,
+    ) -> AsyncIterator[Tuple[Any, bool]]:
+        """
+        Yield `(openai_ws, preopened)` for a call and close the websocket afterwards.
+
+        When `preopened` is True the session already carries `runtime.session_update`;
+        the caller only needs to send the greeting.
+        """
+        openai_ws = await self.claim(call_sid, runtime.assistant_id, runtime.session_update)
+        preopened = openai_ws is not None
+        if preopened:
+            logger.info(f"[REALTIME_POOL] Adopted pre-opened Realtime session for call {call_sid}")
+        else:
+            self.cold += 1
+            openai_ws = await connect_realtime(llm_model, temperature, openai_api_key)
+        try:
+            yield openai_ws, preopened
+        finally:
+            await openai_ws.close()
+
+    def record_first_audio(self, preopened: bool, elapsed_ms: float):
+        """Record time from media-stream connect to the first audio chunk sent to Twilio."""
+        self.first_audio["preopened" if preopened else "cold"].add(elapsed_ms)
+        logger.info(
+            f"[REALTIME_POOL] Time to first audio: {elapsed_ms:.0f}ms "
+            f"({'pre-opened' if preopened else 'cold'} session)"
+        )
+
+    # ====== Cleanup ======
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(settings.realtime_preopen_reap_interval_seconds)
+            now = time.monotonic()
+            for call_sid, entry in list(self._sessions.items()):
+                if entry.expires_at <= now:
+                    self._sessions.pop(call_sid, None)
+                    self.expired += 1
+                    logger.info(f"[REALTIME_POOL] Closing unclaimed Realtime session for call {call_sid}")
+                    await self._discard(entry)
+
+    async def _discard(self, entry: PreopenedSession):
+        if not entry.task.done():
+            entry.task.cancel()
+            return
+        if entry.task.cancelled() or entry.task.exception() is not None:
+            return
+        try:
+            await entry.task.result().close()
+        except Exception as e:
+            logger.debug(f"[REALTIME_POOL] Error closing session for call {entry.call_sid}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._sessions),
+            "preopened": self.preopened,
+            "claimed": self.claimed,
+            "expired": self.expired,
+            "failed": self.failed,
+            "cold": self.cold,
+            "time_to_first_audio": {key: value.as_dict() for key, value in self.first_audio.items()},
+        }
+
+
+realtime_session_pool = RealtimeSessionPool()
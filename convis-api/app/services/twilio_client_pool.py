@@ -0,0 +1,193 @@
+"""
+Pooled Twilio REST clients keyed by account SID.
+
+`twilio.rest.Client(account_sid, auth_token)` creates its own HTTP session, so
+building one per request pays a fresh TCP/TLS handshake every time. This module
+keeps one client per account with a keep-alive connection pool, records request
+counts and latency per REST endpoint, and offers an async facade that runs the
+(synchronous) Twilio SDK calls in a bounded thread pool so they do not block
+the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+from app.config.settings import settings
+from app.utils.twilio_helpers import decrypt_twilio_credentials
+
+logger = logging.getLogger(__name__)
+
+# Twilio resource SIDs: two-letter prefix + 32 hex characters (CA..., AC..., PN...)
+_SID_PATTERN = re.compile(r"\b[A-Z]{2}[0-9a-fA-F]{32}\b")
+
+
+def normalize_endpoint(method: str, url: str) -> str:
+    """Collapse a Twilio request URL into a metrics key, e.g. 'POST /2010-04-01/Accounts/{sid}/Calls.json'."""
+    parsed = urlparse(url)
+    path = _SID_PATTERN.sub("{sid}", parsed.path)
+    return f"{method.upper()} {parsed.netloc}{path}"
+
+
+class EndpointStats:
+    """Running request count and latency for one endpoint."""
+
+    __slots__ = ("count", "errors", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class InstrumentedTwilioHttpClient(TwilioHttpClient):
+    """TwilioHttpClient with a larger keep-alive pool that reports per-endpoint latency."""
+
+    def __init__(self, pool: "TwilioClientPool", pool_maxsize: int, timeout: float, max_retries: int):
+        super().__init__(pool_connections=True, timeout=timeout, max_retries=max_retries)
+        self._pool = pool
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=max_retries)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        started = time.perf_counter()
+        failed = False
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            failed = response.status_code >= 400
+            return response
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._pool.record(method, url, (time.perf_counter() - started) * 1000, failed)
+
+
+class TwilioClientPool:
+    """Registry of long-lived Twilio clients plus a bounded executor for async callers."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or settings.twilio_executor_workers
+        self._clients: Dict[str, Tuple[str, Client]] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, EndpointStats] = {}
+        self._stats_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # ====== Clients ======
+    def get_client(self, account_sid: str, auth_token: str) -> Client:
+        """Return the pooled client for an account, replacing it if the token changed."""
+        with self._lock:
+            cached = self._clients.get(account_sid)
+            if cached and cached[0] == auth_token:
+                return cached[1]
+            http_client = InstrumentedTwilioHttpClient(
+                self,
+                pool_maxsize=self.max_workers,
+                timeout=settings.twilio_http_timeout_seconds,
+                max_retries=settings.twilio_http_max_retries,
+            )
+            client = Client(account_sid, auth_token, http_client=http_client)
+            self._clients[account_sid] = (auth_token, client)
+            if cached:
+                logger.info(f"[TWILIO_POOL] Auth token changed for account ...{account_sid[-4:]}; client replaced")
+            return client
+
+    def get_default_client(self) -> Optional[Client]:
+        """Client for the platform-level TWILIO_ACCOUNT_SID/TWILIO_AUTH_TOKEN, if configured."""
+        if settings.twilio_account_sid and settings.twilio_auth_token:
+            return self.get_client(settings.twilio_account_sid, settings.twilio_auth_token)
+        return None
+
+    def get_client_for_connection(self, connection: Optional[Dict[str, Any]]) -> Optional[Client]:
+        """Client for a provider_connections document, or None if its credentials are unusable."""
+        account_sid, auth_token = decrypt_twilio_credentials(connection)
+        if not account_sid or not auth_token:
+            return None
+        return self.get_client(account_sid, auth_token)
+
+    def discard(self, account_sid: str):
+        """Forget a client, e.g. after the user disconnects Twilio."""
+        with self._lock:
+            self._clients.pop(account_sid, None)
+
+    # ====== Async facade ======
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking Twilio SDK call in the bounded executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(func, *args, **kwargs))
+
+    async def create_call(self, client: Client, **kwargs):
+        return await self.run(client.calls.create, **kwargs)
+
+    async def hangup_call(self, client: Client, call_sid: str):
+        return await self.run(client.calls(call_sid).update, status="completed")
+
+    async def fetch_call(self, client: Client, call_sid: str):
+        return await self.run(client.calls(call_sid).fetch)
+
+    async def list_calls(self, client: Client, **kwargs):
+        return await self.run(client.calls.list, **kwargs)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="twilio-rest"
+                    )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        with self._lock:
+            self._clients.clear()
+
+    # ====== Metrics ======
+    def record(self, method: str, url: str, elapsed_ms: float, failed: bool):
+        key = normalize_endpoint(method, url)
+        with self._stats_lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = EndpointStats()
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            if failed:
+                stats.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            endpoints = {key: value.as_dict() for key, value in self._stats.items()}
+        return {
+            "accounts": len(self._clients),
+            "max_workers": self.max_workers,
+            "endpoints": endpoints,
+        }
+
+
+twilio_client_pool = TwilioClientPool()
@@ -6,9 +6,9 @@ and subaccount management via the Twilio REST API.
 
 import logging
 from typing import Optional, List, Dict, Any
-from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 from app.config.settings import settings
+from app.services.twilio_client_pool import twilio_client_pool
 
 logger = logging.getLogger(__name__)
 
@@ -32,10 +32,10 @@ class TwilioService:
         # If subaccount is provided, use it; otherwise use main account
         if subaccount_sid:
             # Parent account client can manage subaccounts
-            parent_client = Client(account_sid, auth_token)
+            parent_client = twilio_client_pool.get_client(account_sid, auth_token)
             self.client = parent_client.api.accounts(subaccount_sid)
         else:
-            self.client = Client(account_sid, auth_token)
+            self.client = twilio_client_pool.get_client(account_sid, auth_token)
 
     # ==================== TwiML App Management ====================
 
@@ -0,0 +1,236 @@
+"""
+Worker load reporting and media-tier call admission.
+
+Workers run in one of three roles (settings.worker_role, or forced by the entry
+point):
+
+    all    - app.main serving REST and media websockets (single-tier default)
+    api    - app.main behind a proxy that sends media websockets elsewhere
+    media  - app.media_main, media websockets and the TwiML webhooks only
+
+Every worker tracks its in-flight HTTP requests, open websockets and event-loop
+lag. Workers that serve media publish a heartbeat to a Redis hash so any process
+(the /voice webhook, make_outbound_call, the campaign dispatcher) can check the
+remaining stream capacity of the media tier before starting another call.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import Any, Dict, Optional
+
+import redis
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+MEDIA_WORKERS_KEY = "convis:workers:media"
+MEDIA_ROLES = ("all", "media")
+
+
+class WorkerLoad:
+    """Load counters for this process plus the shared media-capacity registry."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.role = settings.worker_role
+        self.max_streams = settings.media_worker_max_streams
+        self.active_streams = 0
+        self.peak_streams = 0
+        self.streams_total = 0
+        self.inflight_requests = 0
+        self.requests_total = 0
+        self.loop_lag_ms = 0.0
+        self.loop_lag_max_ms = 0.0
+        self.admission_rejections = 0
+        self._task: Optional[asyncio.Task] = None
+        self._redis: Optional[redis.Redis] = None
+        self._capacity_cache: Optional[Dict[str, Any]] = None
+        self._capacity_cached_at = 0.0
+
+    # ====== Lifecycle ======
+    async def start(self, role: Optional[str] = None):
+        self.role = role or settings.worker_role
+        if self._task is None:
+            self._task = asyncio.create_task(self._report_loop())
+            logger.info(f"[WORKER_LOAD] Worker {self.worker_id} started in '{self.role}' role")
+
+    async def shutdown(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.serves_media:
+            try:
+                self._get_redis().hdel(MEDIA_WORKERS_KEY, self.worker_id)
+            except Exception as e:
+                logger.debug(f"[WORKER_LOAD] Could not remove heartbeat: {e}")
+
+    @property
+    def serves_media(self) -> bool:
+        return self.role in MEDIA_ROLES
+
+    def _get_redis(self) -> redis.Redis:
+        if self._redis is None:
+            redis_url = settings.redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+            self._redis = redis.from_url(redis_url, decode_responses=True, socket_timeout=1.0)
+        return self._redis
+
+    async def _report_loop(self):
+        """Sample event-loop lag and publish the media heartbeat every interval."""
+        interval = settings.worker_load_report_interval_seconds
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            lag_ms = max(0.0, (loop.time() - started - interval) * 1000)
+            self.loop_lag_ms = lag_ms
+            self.loop_lag_max_ms = max(self.loop_lag_max_ms, lag_ms)
+            if self.serves_media:
+                try:
+                    await loop.run_in_executor(None, self._publish_heartbeat)
+                except Exception as e:
+                    logger.warning(f"[WORKER_LOAD] Failed to publish media heartbeat: {e}")
+
+    def _publish_heartbeat(self):
+        payload = {
+            "active_streams": self.active_streams,
+            "max_streams": self.max_streams,
+            "loop_lag_ms": round(self.loop_lag_ms, 1),
+            "updated_at": time.time(),
+        }
+        self._get_redis().hset(MEDIA_WORKERS_KEY, self.worker_id, json.dumps(payload))
+
+    # ====== Counters (driven by WorkerLoadMiddleware) ======
+    def stream_opened(self):
+        self.active_streams += 1
+        self.streams_total += 1
+        self.peak_streams = max(self.peak_streams, self.active_streams)
+
+    def stream_closed(self):
+        self.active_streams = max(0, self.active_streams - 1)
+
+    def request_started(self):
+        self.inflight_requests += 1
+        self.requests_total += 1
+
+    def request_finished(self):
+        self.inflight_requests = max(0, self.inflight_requests - 1)
+
+    # ====== Admission ======
+    def media_capacity(self) -> Optional[Dict[str, Any]]:
+        """
+        Aggregate capacity of live media workers, or None when it cannot be determined
+        (Redis unavailable or no media worker has reported yet).
+        """
+        now = time.monotonic()
+        if self._capacity_cache is not None and now - self._capacity_cached_at < settings.media_capacity_cache_seconds:
+            return self._capacity_cache
+
+        try:
+            heartbeats = self._get_redis().hgetall(MEDIA_WORKERS_KEY)
+        except Exception as e:
+            logger.warning(f"[WORKER_LOAD] Media capacity unavailable: {e}")
+            return None
+
+        stale_after = settings.worker_load_report_interval_seconds * 3
+        wall_now = time.time()
+        workers = 0
+        active = 0
+        capacity = 0
+        stale = []
+        for worker_id, raw in heartbeats.items():
+            try:
+                beat = json.loads(raw)
+            except ValueError:
+                stale.append(worker_id)
+                continue
+            if wall_now - beat.get("updated_at", 0) > stale_after:
+                stale.append(worker_id)
+                continue
+            workers += 1
+            active += int(beat.get("active_streams", 0))
+            capacity += int(beat.get("max_streams", 0))
+        if stale:
+            try:
+                self._get_redis().hdel(MEDIA_WORKERS_KEY, *stale)
+            except Exception:
+                pass
+
+        if workers == 0:
+            result = None
+        else:
+            result = {
+                "workers": workers,
+                "active_streams": active,
+                "max_streams": capacity,
+                "available": max(0, capacity - active),
+            }
+        self._capacity_cache = result
+        self._capacity_cached_at = now
+        return result
+
+    def media_headroom(self) -> Optional[int]:
+        """Streams the media tier can still accept, or None if unknown (fail open)."""
+        capacity = self.media_capacity()
+        return None if capacity is None else capacity["available"]
+
+    def admit_call(self) -> bool:
+        """Whether a new call should be started given the media tier's capacity."""
+        headroom = self.media_headroom()
+        if headroom is None or headroom > 0:
+            return True
+        self.admission_rejections += 1
+        logger.warning("[WORKER_LOAD] Media tier at capacity; rejecting new call")
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "role": self.role,
+            "active_streams": self.active_streams,
+            "peak_streams": self.peak_streams,
+            "streams_total": self.streams_total,
+            "max_streams": self.max_streams if self.serves_media else 0,
+            "inflight_requests": self.inflight_requests,
+            "requests_total": self.requests_total,
+            "loop_lag_ms": round(self.loop_lag_ms, 1),
+            "loop_lag_max_ms": round(self.loop_lag_max_ms, 1),
+            "admission_rejections": self.admission_rejections,
+            "media_tier": self._capacity_cache,
+        }
+
+
+class WorkerLoadMiddleware:
+    """ASGI middleware counting in-flight HTTP requests and open websockets."""
+
+    def __init__(self, app, load: "WorkerLoad"):
+        self.app = app
+        self.load = load
+
+    async def __call__(self, scope, receive, send):
+        scope_type = scope["type"]
+        if scope_type == "websocket":
+            self.load.stream_opened()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.load.stream_closed()
+        elif scope_type == "http":
+            self.load.request_started()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.load.request_finished()
+        else:
+            await self.app(scope, receive, send)
+
+
+worker_load = WorkerLoad()
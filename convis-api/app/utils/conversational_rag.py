@@ -1,56 +1,56 @@
 """
 Conversational RAG - Optimized for real-time voice conversations
-Uses ChromaDB for fast vector search and conversation-aware chunking
+Uses the shared on-disk per-assistant index (app.utils.kb_index) for fast vector
+search and conversation-aware chunking
 """
-import os
+import asyncio
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from PyPDF2 import PdfReader
 from docx import Document
 import openpyxl
+import numpy as np
 from openai import OpenAI
-import chromadb
-from chromadb.config import Settings
+from app.utils.kb_index import EmbeddingModelMismatch, kb_index_store
+from app.utils.pdf_extraction import pdf_extractor
+from app.utils.kb_embedding_store import content_hash, kb_embedding_store
+from app.utils.lexical_index import identifier_terms, tokenize
+from app.config.settings import settings
+from app.services.embedding_service import (
+    DEFAULT_EMBEDDING_MODEL,
+    LOCAL_BACKEND,
+    embedding_model_id,
+    embedding_service,
+    local_models,
+    parse_model_id,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
-# ChromaDB client (persistent)
-CHROMA_DB_PATH = os.path.join(os.path.dirname(__file__), "../../chroma_db")
-chroma_client = chromadb.Client(Settings(
-    persist_directory=CHROMA_DB_PATH,
-    anonymized_telemetry=False
-))
-
 
 def extract_text_from_pdf(file_path: str) -> str:
     """
-    Extract text content from PDF file using multiple methods.
-    Tries PyMuPDF first, then PyPDF2, and finally OCR for image-based PDFs.
+    Extract text content from PDF file.
+    Pages with a text layer are read with PyMuPDF and scanned pages are OCR'd in
+    parallel (see pdf_extraction); PyPDF2 is the fallback when PyMuPDF fails.
     """
-    text = ""
-
-    # Method 1: Try PyMuPDF (fitz) - works better for most PDFs
+    # Method 1: PyMuPDF per page, OCR only for image pages (cached by file hash)
     try:
-        import fitz  # PyMuPDF
-        doc = fitz.open(file_path)
-        for page in doc:
-            text += page.get_text() + "\n"
-        doc.close()
-
-        # If we got substantial text, return it
-        if len(text.strip()) > 100:
-            logger.info(f"Extracted {len(text)} characters using PyMuPDF")
+        pages = pdf_extractor.extract(file_path)
+        text = "\n".join(page['text'] for page in pages)
+        if len(text.strip()) > 50:
+            logger.info(f"Extracted {len(text)} characters from {len(pages)} pages")
             return text.strip()
+    except ValueError:
+        raise  # OCR needed but Tesseract missing
     except Exception as e:
         logger.warning(f"PyMuPDF extraction failed: {e}")
 
     # Method 2: Try PyPDF2 as fallback
     try:
         reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
+        text = "\n".join((page.extract_text() or "") for page in reader.pages)
 
         # If we got substantial text, return it
         if len(text.strip()) > 100:
@@ -59,50 +59,7 @@ def extract_text_from_pdf(file_path: str) -> str:
     except Exception as e:
         logger.warning(f"PyPDF2 extraction failed: {e}")
 
-    # Method 3: Try OCR for image-based/scanned PDFs
-    try:
-        import fitz  # PyMuPDF
-        from PIL import Image
-        import pytesseract
-        import io
-
-        logger.info("Attempting OCR extraction for image-based PDF...")
-        doc = fitz.open(file_path)
-        ocr_text = ""
-
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-
-            # Convert page to image
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom for better OCR
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
-
-            # Perform OCR
-            try:
-                page_text = pytesseract.image_to_string(img)
-                ocr_text += page_text + "\n"
-                logger.info(f"OCR page {page_num + 1}/{len(doc)}: extracted {len(page_text)} chars")
-            except pytesseract.TesseractNotFoundError:
-                logger.error("Tesseract not installed. Install with: sudo apt-get install tesseract-ocr")
-                doc.close()
-                raise ValueError("OCR not available. Please install Tesseract OCR on your system.")
-            except Exception as ocr_error:
-                logger.warning(f"OCR failed for page {page_num + 1}: {ocr_error}")
-
-        doc.close()
-
-        if len(ocr_text.strip()) > 50:
-            logger.info(f"Extracted {len(ocr_text)} characters using OCR")
-            return ocr_text.strip()
-        else:
-            raise ValueError("No text could be extracted from PDF")
-
-    except Exception as e:
-        logger.error(f"OCR extraction failed: {e}")
-        raise ValueError(f"Could not extract text from PDF. The file may be corrupted or empty. Error: {str(e)}")
-
-    return ""
+    raise ValueError("Could not extract text from PDF. The file may be corrupted or empty. Error: No text could be extracted from PDF")
 
 
 def extract_text_from_docx(file_path: str) -> str:
@@ -166,6 +123,102 @@ def extract_text_from_file(file_path: str, file_type: str) -> str:
         return ""
 
 
+def iter_document_pages(file_path: str, file_type: str, start_page: int = 0) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) as pages are extracted.
+
+    PDFs stream from pdf_extractor.iter_pages (text layer per page, OCR for
+    scanned pages a window at a time, cached by file hash); resumed jobs start
+    at start_page without re-extracting the pages before it. Other formats are
+    a single page 0. If PyMuPDF cannot read the file the pages stop there and
+    callers fall back to extract_text_from_pdf when too little text came out.
+
+    Args:
+        file_path: Path to the file
+        file_type: Type of file (pdf, docx, etc.)
+        start_page: First page to yield (for resuming)
+    """
+    if file_type.lower() == 'pdf' or file_path.endswith('.pdf'):
+        try:
+            for page in pdf_extractor.iter_pages(file_path, start_page=start_page):
+                yield page['page'], page['text']
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.warning(f"PyMuPDF could not read {file_path}: {e}")
+    elif start_page == 0:
+        yield 0, extract_text_from_file(file_path, file_type)
+
+
+def build_index_chunks(filename: str, file_type: str, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Index entries for conversation chunks, keyed by content hash ("<filename>#<hash prefix>").
+
+    Repeated text within the document (headers, footers, boilerplate) is kept once.
+    """
+    index_chunks = []
+    seen = set()
+    for chunk in chunks:
+        digest = content_hash(chunk['text'])
+        if digest in seen:
+            continue
+        seen.add(digest)
+        index_chunks.append({
+            'id': f"{filename}#{digest[:16]}",
+            'text': chunk['text'],
+            'metadata': {
+                'filename': filename,
+                'paragraph_id': chunk['paragraph_id'],
+                'char_count': chunk['char_count'],
+                'file_type': file_type,
+                'content_hash': digest
+            }
+        })
+    return index_chunks
+
+
+def chunk_content_hash(chunk: Dict[str, Any]) -> str:
+    """Content hash of an index chunk (computed for chunks indexed before hashes were stored)."""
+    return chunk['metadata'].get('content_hash') or content_hash(chunk['text'])
+
+
+def known_chunk_embeddings(assistant_id: str, hashes: List[str], model: str) -> Dict[str, np.ndarray]:
+    """
+    Embeddings already computed with `model` for these content hashes: from the
+    assistant's live index first (re-uploads), then the shared embedding store.
+    """
+    known: Dict[str, np.ndarray] = {}
+    index = kb_index_store.get(assistant_id)
+    if index is not None and index.model == model:
+        known.update(index.vectors_for_hashes(hashes))
+    missing = [h for h in hashes if h not in known]
+    if missing:
+        known.update(kb_embedding_store.get_many(model, missing))
+    return known
+
+
+def embed_chunks(assistant_id: str, chunks: List[Dict[str, Any]], api_key: str, model: str) -> List[List[float]]:
+    """
+    One embedding per index chunk, embedding only text not seen before with this model.
+
+    New embeddings are added to the shared store, so the next upload of the same
+    content (any assistant) reuses them.
+    """
+    hashes = [chunk_content_hash(chunk) for chunk in chunks]
+    known = known_chunk_embeddings(assistant_id, hashes, model)
+    missing = list(dict.fromkeys(h for h in hashes if h not in known))
+    if missing:
+        texts = {chunk_content_hash(chunk): chunk['text'] for chunk in chunks}
+        embeddings = create_embeddings_batch([texts[h] for h in missing], api_key, model)
+        if len(embeddings) != len(missing):
+            raise ValueError("Failed to create embeddings")
+        new = dict(zip(missing, embeddings))
+        kb_embedding_store.put_many(model, new)
+        known.update(new)
+    logger.info(f"Embedded {len(missing)} of {len(chunks)} chunks ({len(chunks) - len(missing)} reused)")
+    return [known[h] for h in hashes]
+
+
 def chunk_text_for_conversation(text: str, chunk_size: int = 300, overlap: int = 50) -> List[Dict[str, Any]]:
     """
     Chunk text optimized for voice conversations.
@@ -237,9 +290,14 @@ def chunk_text_for_conversation(text: str, chunk_size: int = 300, overlap: int =
     return chunks
 
 
-def create_embeddings_batch(texts: List[str], api_key: str) -> List[List[float]]:
-    """Create embeddings for text chunks using OpenAI (batch processing)"""
+def create_embeddings_batch(texts: List[str], api_key: str, model: str = DEFAULT_EMBEDDING_MODEL) -> List[List[float]]:
+    """Create embeddings for text chunks with the given model id (OpenAI or local fastembed, batch processing)"""
     try:
+        backend, model_name = parse_model_id(model)
+        if backend == LOCAL_BACKEND:
+            # Local ONNX model, batched inference in this (ingestion) thread
+            return local_models.embed_passages(model_name, texts)
+
         client = OpenAI(api_key=api_key)
         embeddings = []
 
@@ -248,7 +306,7 @@ def create_embeddings_batch(texts: List[str], api_key: str) -> List[List[float]]
         for i in range(0, len(texts), batch_size):
             batch = texts[i:i + batch_size]
             response = client.embeddings.create(
-                model="text-embedding-3-small",  # Fast and cost-effective
+                model=model_name,  # text-embedding-3-small: fast and cost-effective
                 input=batch
             )
             batch_embeddings = [item.embedding for item in response.data]
@@ -265,10 +323,11 @@ def process_document_for_conversation(
     file_path: str,
     filename: str,
     file_type: str,
-    api_key: str
+    api_key: str,
+    embedding_backend: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    Process document and store in ChromaDB for fast conversational retrieval
+    Process document and store in the knowledge base index for fast conversational retrieval
 
     Args:
         assistant_id: AI Assistant ID (used as collection name)
@@ -276,6 +335,7 @@ def process_document_for_conversation(
         filename: Original filename
         file_type: Type of file (pdf, docx, etc.)
         api_key: OpenAI API key for embeddings
+        embedding_backend: Assistant's kb_embedding_backend ("openai" or "local")
 
     Returns:
         Dict with processing results
@@ -293,49 +353,31 @@ def process_document_for_conversation(
 
         logger.info(f"Created {len(chunks)} conversation-optimized chunks from {filename}")
 
-        # Create embeddings
-        chunk_texts = [chunk['text'] for chunk in chunks]
-        embeddings = create_embeddings_batch(chunk_texts, api_key)
-        if not embeddings:
-            raise ValueError("Failed to create embeddings")
+        # Prepare index entries (deduplicated by content hash)
+        index_chunks = build_index_chunks(filename, file_type, chunks)
 
-        # Get or create collection for this assistant
-        collection_name = f"assistant_{assistant_id}"
-        try:
-            collection = chroma_client.get_collection(name=collection_name)
-        except:
-            collection = chroma_client.create_collection(
-                name=collection_name,
-                metadata={"assistant_id": assistant_id}
-            )
-
-        # Prepare data for ChromaDB
-        ids = [f"{filename}_{chunk['id']}" for chunk in chunks]
-        metadatas = [
-            {
-                'filename': filename,
-                'paragraph_id': chunk['paragraph_id'],
-                'char_count': chunk['char_count'],
-                'file_type': file_type
-            }
-            for chunk in chunks
-        ]
+        # Create embeddings for chunks not embedded before
+        model = embedding_model_id(embedding_backend)
+        embeddings = embed_chunks(assistant_id, index_chunks, api_key, model)
 
-        # Add to ChromaDB
-        collection.add(
-            embeddings=embeddings,
-            documents=chunk_texts,
-            metadatas=metadatas,
-            ids=ids
-        )
+        # Replace the document's chunks in the assistant's index and swap it in for every worker
+        try:
+            kb_index_store.replace_document(assistant_id, filename, embeddings, index_chunks, model)
+        except EmbeddingModelMismatch as mismatch:
+            # Assistant switched embedding backend: rebuild the existing chunks with the new model first
+            logger.info(f"Re-indexing knowledge base for assistant {assistant_id}: {mismatch}")
+            reindex = reindex_knowledge_base(assistant_id, api_key, embedding_backend)
+            if not reindex['success']:
+                raise ValueError(f"Could not re-index knowledge base: {reindex.get('error')}")
+            kb_index_store.replace_document(assistant_id, filename, embeddings, index_chunks, model)
 
-        logger.info(f"Successfully stored {len(chunks)} chunks in ChromaDB")
+        logger.info(f"Successfully stored {len(index_chunks)} chunks in the knowledge base index")
 
         return {
             'success': True,
-            'chunks_count': len(chunks),
+            'chunks_count': len(index_chunks),
             'text_length': len(text),
-            'collection_name': collection_name
+            'collection_name': f"assistant_{assistant_id}"
         }
 
     except Exception as e:
@@ -348,6 +390,91 @@ def process_document_for_conversation(
         }
 
 
+def reindex_knowledge_base(
+    assistant_id: str,
+    api_key: str,
+    embedding_backend: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Re-embed every indexed chunk with the assistant's current embedding backend
+    and swap the rebuilt index in (used when kb_embedding_backend changes)
+
+    Args:
+        assistant_id: AI Assistant ID
+        api_key: OpenAI API key (only used by the openai backend)
+        embedding_backend: Backend to rebuild with ("openai" or "local")
+
+    Returns:
+        Dict with success flag, model and chunk count
+    """
+    model = embedding_model_id(embedding_backend)
+    try:
+        index = kb_index_store.get(assistant_id)
+        if index is None:
+            return {'success': True, 'model': model, 'chunks_count': 0, 'reindexed': False}
+        if index.model == model:
+            return {'success': True, 'model': model, 'chunks_count': len(index), 'reindexed': False}
+
+        chunks = list(index.chunks)
+        embeddings = embed_chunks(assistant_id, chunks, api_key, model)
+
+        kb_index_store.replace(assistant_id, embeddings, chunks, model)
+        logger.info(f"Re-indexed {len(chunks)} chunks for assistant {assistant_id} ({index.model} -> {model})")
+        return {'success': True, 'model': model, 'chunks_count': len(chunks), 'reindexed': True}
+
+    except Exception as e:
+        logger.error(f"Error re-indexing knowledge base: {e}")
+        return {'success': False, 'error': str(e)}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English) for the context budget."""
+    return len(text) // 4 + 1
+
+
+def _hybrid_context(index, query_embedding: List[float], query: str, top_k: int, relevance_threshold: float) -> List[str]:
+    """
+    Context parts from the fused vector + BM25 ranking, within settings.kb_context_token_budget.
+
+    A chunk qualifies when its cosine similarity reaches the threshold, or when it
+    contains an identifier from the query (SKU, price, policy number), which
+    embeddings alone tend to miss.
+    """
+    identifiers = set(identifier_terms(query))
+    parts: List[str] = []
+    used_tokens = 0
+    for chunk, similarity, lexical_score in index.hybrid_search(
+        query_embedding, query, settings.kb_hybrid_candidates, settings.kb_rrf_k
+    ):
+        if len(parts) >= top_k:
+            break
+        exact_match = bool(identifiers) and lexical_score > 0 and bool(identifiers & set(tokenize(chunk['text'])))
+        if similarity < relevance_threshold and not exact_match:
+            continue
+        source = chunk['metadata'].get('filename', 'document')
+        part = f"[From {source}]: {chunk['text']}"
+        tokens = estimate_tokens(part)
+        if used_tokens + tokens > settings.kb_context_token_budget:
+            continue  # a shorter chunk further down may still fit
+        used_tokens += tokens
+        parts.append(part)
+    return parts
+
+
+def _index_context(index, query_embedding: List[float], query: str, top_k: int, relevance_threshold: float) -> List[str]:
+    """Context parts from the assistant's index (hybrid or vector-only ranking)."""
+    if settings.kb_hybrid_search:
+        return _hybrid_context(index, query_embedding, query, top_k, relevance_threshold)
+    # Build context from documents (similarity is cosine, best first)
+    parts: List[str] = []
+    for chunk, similarity in index.search(query_embedding, top_k):
+        # Only include if above threshold
+        if similarity >= relevance_threshold:
+            source = chunk['metadata'].get('filename', 'document')
+            parts.append(f"[From {source}]: {chunk['text']}")
+    return parts
+
+
 async def search_conversation_context(
     assistant_id: str,
     query: str,
@@ -364,8 +491,8 @@ async def search_conversation_context(
         assistant_id: AI Assistant ID
         query: User's question or conversation context
         api_key: OpenAI API key
-        top_k: Number of results to retrieve
-        relevance_threshold: Minimum similarity score (0-1)
+        top_k: Maximum number of knowledge base chunks to include
+        relevance_threshold: Minimum similarity score (0-1); chunks matching an identifier in the query are kept regardless
         database_config: Optional database configuration for querying user data
 
     Returns:
@@ -375,43 +502,20 @@ async def search_conversation_context(
 
     # Search knowledge base (documents)
     try:
-        collection_name = f"assistant_{assistant_id}"
-
-        # Check if collection exists
-        try:
-            collection = chroma_client.get_collection(name=collection_name)
-
-            # Create query embedding
-            client = OpenAI(api_key=api_key)
-            query_response = client.embeddings.create(
-                model="text-embedding-3-small",
-                input=[query]
-            )
-            query_embedding = query_response.data[0].embedding
-
-            # Search ChromaDB
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
-            )
-
-            if results['documents'] and results['documents'][0]:
-                # Build context from documents
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results['documents'][0],
-                    results['metadatas'][0],
-                    results['distances'][0]
-                )):
-                    # Convert distance to similarity (ChromaDB returns L2 distance)
-                    similarity = 1 / (1 + distance)
-
-                    # Only include if above threshold
-                    if similarity >= relevance_threshold:
-                        source = metadata.get('filename', 'document')
-                        context_parts.append(f"[From {source}]: {doc}")
+        # Loading the index and scoring it are CPU/disk work: keep them off the call's event loop
+        loop = asyncio.get_running_loop()
+        # Skip the embedding call entirely when the assistant has no index
+        index = await loop.run_in_executor(None, kb_index_store.get, assistant_id)
+        if index is None:
+            logger.info(f"No knowledge base found for assistant {assistant_id}")
+        else:
+            # Create query embedding with the model the index was built with
+            # (cached, batched with other calls, non-blocking; local models need no network)
+            query_embedding = await embedding_service.embed_query(query, api_key, index.model)
 
-        except Exception as e:
-            logger.info(f"No knowledge base found for assistant {assistant_id}: {e}")
+            context_parts.extend(await loop.run_in_executor(
+                None, _index_context, index, query_embedding, query, top_k, relevance_threshold
+            ))
 
     except Exception as e:
         logger.error(f"Error searching knowledge base: {e}")
@@ -419,12 +523,12 @@ async def search_conversation_context(
     # Search database if configured
     if database_config and database_config.get('enabled'):
         try:
-            from app.routes.ai_assistant.database import query_database
             from app.models.ai_assistant import DatabaseConfig
+            from app.services.external_db import external_databases
 
             # Convert dict to DatabaseConfig model
             db_config = DatabaseConfig(**database_config)
-            db_results = await query_database(db_config, query)
+            db_results = await external_databases.lookup(db_config, query, assistant_id)
 
             if db_results and db_results.get('records'):
                 # Format database results for conversation
@@ -467,26 +571,13 @@ def delete_document_from_kb(assistant_id: str, filename: str) -> bool:
         True if successful, False otherwise
     """
     try:
-        collection_name = f"assistant_{assistant_id}"
+        removed = kb_index_store.remove_document(assistant_id, filename)
 
-        try:
-            collection = chroma_client.get_collection(name=collection_name)
-        except:
-            logger.warning(f"Collection not found: {collection_name}")
-            return False
-
-        # Get all IDs for this filename
-        all_data = collection.get()
-        ids_to_delete = [
-            id for id, metadata in zip(all_data['ids'], all_data['metadatas'])
-            if metadata.get('filename') == filename
-        ]
-
-        if ids_to_delete:
-            collection.delete(ids=ids_to_delete)
-            logger.info(f"Deleted {len(ids_to_delete)} chunks for {filename}")
+        if removed:
+            logger.info(f"Deleted {removed} chunks for {filename}")
             return True
 
+        logger.warning(f"No indexed chunks found for {filename} (assistant {assistant_id})")
         return False
 
     except Exception as e:
@@ -497,23 +588,17 @@ def delete_document_from_kb(assistant_id: str, filename: str) -> bool:
 def get_kb_stats(assistant_id: str) -> Dict[str, Any]:
     """Get statistics about the knowledge base for an assistant"""
     try:
-        collection_name = f"assistant_{assistant_id}"
-
-        try:
-            collection = chroma_client.get_collection(name=collection_name)
-            count = collection.count()
-
-            # Get unique files
-            all_data = collection.get()
-            unique_files = set(m.get('filename') for m in all_data['metadatas'])
-
+        index = kb_index_store.get(assistant_id)
+        if index is not None:
+            # Files come from the index's metadata index, not a scan of every chunk
             return {
                 'exists': True,
-                'total_chunks': count,
-                'files_count': len(unique_files),
-                'files': list(unique_files)
+                'total_chunks': len(index),
+                'files_count': len(index.files),
+                'files': list(index.files),
+                'chunks_per_file': {filename: len(rows) for filename, rows in index.files.items()}
             }
-        except:
+        else:
             return {
                 'exists': False,
                 'total_chunks': 0,
@@ -0,0 +1,364 @@
+"""
+Local, searchable snapshots of customer tables for assistant database lookups.
+
+Assistants whose database_config has sync_mode="snapshot" do not query the
+customer's database during calls. services/db_snapshot_sync.py copies the
+configured table (selected columns only) into a per-assistant directory under
+settings.db_snapshot_path, laid out like the KB index:
+
+    assistant_<id>/
+        CURRENT                name of the live generation, swapped with os.replace
+        .lock                  flock()ed by writers
+        gen-<n>/rows.json      [{column: value}, ...]
+        gen-<n>/keys.json      {normalized key value: [row, ...]} for exact lookups
+        gen-<n>/bm25.json      BM25 index of the searchable columns (see lexical_index)
+        gen-<n>/manifest.json  table, columns, watermark, refresh times, size
+
+A lookup is a dict probe for identifiers the caller read out (account
+numbers, phone numbers said in groups of digits, emails) followed by BM25
+over the searchable columns, all in memory, so it takes well under a
+millisecond for typical tables and never touches the customer's server.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config.settings import settings
+from app.utils.lexical_index import BM25Index, identifier_terms
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+ROWS_FILE = "rows.json"
+KEYS_FILE = "keys.json"
+BM25_FILE = "bm25.json"
+MANIFEST_FILE = "manifest.json"
+KEEP_GENERATIONS = 2
+# Digits a caller must read out before they are tried as a phone/account number
+MIN_KEY_DIGITS = 7
+# Phone numbers are also indexed by their last digits, so "+1 (415) 555-0100" matches "415 555 0100"
+PHONE_SUFFIX_DIGITS = 10
+
+_NON_DIGITS = re.compile(r"\D")
+_PHONE_LIKE = re.compile(r"^\+?[\d\s().\-]+$")
+
+
+def key_variants(value: Any) -> List[str]:
+    """Normalized forms a key column value is indexed (and looked up) under."""
+    text = str(value).strip().lower()
+    if not text:
+        return []
+    digits = _NON_DIGITS.sub("", text)
+    if _PHONE_LIKE.match(text) and len(digits) >= MIN_KEY_DIGITS:
+        variants = [digits]
+        if len(digits) > PHONE_SUFFIX_DIGITS:
+            variants.append(digits[-PHONE_SUFFIX_DIGITS:])
+        return variants
+    return [text]
+
+
+def query_keys(query: str) -> List[str]:
+    """Exact-key candidates in an utterance: identifier-like terms and all of its digits run together."""
+    keys: List[str] = []
+    for term in identifier_terms(query):
+        keys.extend(key_variants(term))
+    digits = _NON_DIGITS.sub("", query)
+    if len(digits) >= MIN_KEY_DIGITS:
+        keys.extend(key_variants(digits))
+    for word in query.split():
+        if "@" in word:
+            keys.append(word.strip(".,;:!?").lower())
+    return list(dict.fromkeys(keys))
+
+
+def row_text(row: Dict[str, Any], columns: Sequence[str]) -> str:
+    return " ".join(str(row[column]) for column in columns if row.get(column) is not None)
+
+
+def build_keys(rows: Sequence[Dict[str, Any]], key_columns: Sequence[str]) -> Dict[str, List[int]]:
+    keys: Dict[str, List[int]] = {}
+    for row_number, row in enumerate(rows):
+        for column in key_columns:
+            if row.get(column) is None:
+                continue
+            for variant in key_variants(row[column]):
+                rows_for_key = keys.setdefault(variant, [])
+                if not rows_for_key or rows_for_key[-1] != row_number:
+                    rows_for_key.append(row_number)
+    return keys
+
+
+class TableSnapshot:
+    """One loaded generation of an assistant's table snapshot."""
+
+    def __init__(
+        self,
+        assistant_id: str,
+        generation: str,
+        rows: List[Dict[str, Any]],
+        keys: Dict[str, List[int]],
+        lexical: BM25Index,
+        manifest: Dict[str, Any],
+        version: Tuple[int, int],
+    ):
+        self.assistant_id = assistant_id
+        self.generation = generation
+        self.rows = rows
+        self.keys = keys
+        self.lexical = lexical
+        self.manifest = manifest
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.manifest.get("disk_bytes", 0))
+
+    @property
+    def staleness_seconds(self) -> float:
+        return max(0.0, time.time() - self.manifest.get("refreshed_at", 0))
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Rows matching an exact key read out in `query` first, then the best BM25 matches."""
+        found: Dict[int, None] = {}  # insertion-ordered set
+        for key in query_keys(query):
+            for row in self.keys.get(key, ()):
+                found.setdefault(row)
+        if len(found) < limit:
+            rows, _ = self.lexical.search(query, limit)
+            for row in rows:
+                found.setdefault(int(row))
+        return [self.rows[row] for row in list(found)[:limit]]
+
+
+def _read_json(path: str) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SnapshotStore:
+    """Per-assistant table snapshots on disk, loaded lazily and shared by every worker on the host."""
+
+    def __init__(self, root: Optional[str] = None, memory_budget_mb: Optional[int] = None):
+        self.root = root or settings.db_snapshot_path
+        budget_mb = memory_budget_mb if memory_budget_mb is not None else settings.db_snapshot_memory_budget_mb
+        self.memory_budget_bytes = budget_mb * 1024 * 1024
+        self._loaded: "OrderedDict[str, TableSnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.lookups = 0
+        self.lookup_ms_total = 0.0
+        self.lookup_ms_max = 0.0
+
+    def _assistant_dir(self, assistant_id: str) -> str:
+        return os.path.join(self.root, f"assistant_{assistant_id}")
+
+    def _current_version(self, assistant_dir: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(os.path.join(assistant_dir, CURRENT_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _live_dir(self, assistant_dir: str) -> Optional[str]:
+        try:
+            with open(os.path.join(assistant_dir, CURRENT_FILE), "r") as f:
+                return os.path.join(assistant_dir, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    # ====== Reads ======
+    def get(self, assistant_id: str) -> Optional[TableSnapshot]:
+        """Loaded snapshot for an assistant (reloaded after a refresh), or None if it has none."""
+        assistant_dir = self._assistant_dir(assistant_id)
+        version = self._current_version(assistant_dir)
+        with self._lock:
+            cached = self._loaded.get(assistant_id)
+            if version is None:
+                self._loaded.pop(assistant_id, None)
+                return None
+            if cached is not None and cached.version == version:
+                self._loaded.move_to_end(assistant_id)
+                return cached
+
+        snapshot = self._load(assistant_id, assistant_dir)
+        if snapshot is None:
+            return None
+        with self._lock:
+            self._loaded[assistant_id] = snapshot
+            self._loaded.move_to_end(assistant_id)
+            self._evict()
+        return snapshot
+
+    def _load(self, assistant_id: str, assistant_dir: str) -> Optional[TableSnapshot]:
+        # A refresh may swap and prune between reading CURRENT and opening the files; retry once
+        for attempt in range(2):
+            version = self._current_version(assistant_dir)
+            generation_dir = self._live_dir(assistant_dir)
+            if version is None or generation_dir is None:
+                return None
+            try:
+                rows = _read_json(os.path.join(generation_dir, ROWS_FILE))
+                keys = _read_json(os.path.join(generation_dir, KEYS_FILE))
+                lexical = BM25Index.from_dict(_read_json(os.path.join(generation_dir, BM25_FILE)))
+                manifest = _read_json(os.path.join(generation_dir, MANIFEST_FILE))
+            except FileNotFoundError:
+                if attempt == 0:
+                    continue
+                raise
+            self.loads += 1
+            logger.info(f"[DB_SNAPSHOT] Loaded {len(rows)} rows of {manifest.get('table')} for assistant {assistant_id}")
+            return TableSnapshot(assistant_id, os.path.basename(generation_dir), rows, keys, lexical, manifest, version)
+        return None
+
+    def _evict(self):
+        total = sum(snapshot.nbytes for snapshot in self._loaded.values())
+        while total > self.memory_budget_bytes and len(self._loaded) > 1:
+            assistant_id, snapshot = self._loaded.popitem(last=False)
+            total -= snapshot.nbytes
+            self.evictions += 1
+            logger.info(f"[DB_SNAPSHOT] Evicted snapshot for assistant {assistant_id} ({snapshot.nbytes} bytes)")
+
+    def read_live(self, assistant_id: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Rows and manifest of the live generation (for incremental refreshes)."""
+        generation_dir = self._live_dir(self._assistant_dir(assistant_id))
+        if generation_dir is None:
+            return [], None
+        try:
+            return _read_json(os.path.join(generation_dir, ROWS_FILE)), _read_json(os.path.join(generation_dir, MANIFEST_FILE))
+        except FileNotFoundError:
+            return [], None
+
+    def lookup(self, assistant_id: str, query: str, limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Search an assistant's snapshot.
+
+        Args:
+            assistant_id: AI Assistant ID
+            query: The caller's utterance
+            limit: Maximum rows (settings.external_db_max_rows by default)
+
+        Returns:
+            Result shaped like a live database lookup, or None when no snapshot exists yet
+        """
+        started = time.perf_counter()
+        snapshot = self.get(assistant_id)
+        if snapshot is None:
+            return None
+        records = snapshot.search(query, limit or settings.external_db_max_rows)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.lookups += 1
+        self.lookup_ms_total += elapsed_ms
+        self.lookup_ms_max = max(self.lookup_ms_max, elapsed_ms)
+        return {
+            "source": "database",
+            "database_type": snapshot.manifest.get("database_type"),
+            "table": snapshot.manifest.get("table"),
+            "records": records,
+            "count": len(records),
+            "snapshot": True,
+            "staleness_seconds": round(snapshot.staleness_seconds, 1),
+        }
+
+    # ====== Writes ======
+    @contextmanager
+    def writer(self, assistant_id: str) -> Iterator[str]:
+        """Serialize refreshes of one assistant across all workers on the host."""
+        assistant_dir = self._assistant_dir(assistant_id)
+        os.makedirs(assistant_dir, exist_ok=True)
+        with open(os.path.join(assistant_dir, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield assistant_dir
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def write(
+        self,
+        assistant_id: str,
+        rows: List[Dict[str, Any]],
+        search_columns: Sequence[str],
+        key_columns: Sequence[str],
+        manifest: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Write a new generation from `rows` and make it live (call inside writer()).
+
+        Returns:
+            The manifest written, with row_count, disk_bytes and refreshed_at filled in
+        """
+        assistant_dir = self._assistant_dir(assistant_id)
+        generation = f"gen-{time.time_ns()}"
+        generation_dir = os.path.join(assistant_dir, generation)
+        os.makedirs(generation_dir)
+        lexical = BM25Index.build(row_text(row, search_columns) for row in rows)
+        files = {
+            ROWS_FILE: rows,
+            KEYS_FILE: build_keys(rows, key_columns),
+            BM25_FILE: lexical.to_dict(),
+        }
+        disk_bytes = 0
+        for name, data in files.items():
+            path = os.path.join(generation_dir, name)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            disk_bytes += os.path.getsize(path)
+        manifest = dict(manifest, row_count=len(rows), disk_bytes=disk_bytes, refreshed_at=time.time())
+        with open(os.path.join(generation_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        tmp_path = os.path.join(assistant_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(generation)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(assistant_dir, CURRENT_FILE))
+        self._prune(assistant_dir, keep=KEEP_GENERATIONS)
+        with self._lock:
+            self._loaded.pop(assistant_id, None)
+        return manifest
+
+    def remove(self, assistant_id: str):
+        """Delete an assistant's snapshot (sync turned off or the assistant deleted)."""
+        with self._lock:
+            self._loaded.pop(assistant_id, None)
+        shutil.rmtree(self._assistant_dir(assistant_id), ignore_errors=True)
+
+    def _prune(self, assistant_dir: str, keep: int):
+        generations = sorted(
+            (name for name in os.listdir(assistant_dir) if name.startswith("gen-")),
+            key=lambda name: int(name.split("-", 1)[1]),
+        )
+        for name in generations[:max(0, len(generations) - keep)]:
+            shutil.rmtree(os.path.join(assistant_dir, name), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = list(self._loaded.values())
+        return {
+            "loaded": len(loaded),
+            "loaded_bytes": sum(snapshot.nbytes for snapshot in loaded),
+            "loaded_rows": sum(len(snapshot) for snapshot in loaded),
+            "max_staleness_seconds": round(max((s.staleness_seconds for s in loaded), default=0.0), 1),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "lookups": self.lookups,
+            "avg_lookup_ms": round(self.lookup_ms_total / self.lookups, 3) if self.lookups else 0.0,
+            "max_lookup_ms": round(self.lookup_ms_max, 3),
+        }
+
+
+snapshot_store = SnapshotStore()
@@ -0,0 +1,169 @@
+"""
+Shared, content-addressed store of knowledge-base chunk embeddings.
+
+Chunks are identified by the SHA-256 of their text, so the same paragraph in
+a re-uploaded (or lightly edited) document, or in a brochure attached to
+several assistants, is embedded once per model and then reused. Vectors live
+in the kb_embeddings collection, keyed "<model>:<hash>", and are shared by
+every worker and host. Entries not used for settings.kb_embedding_store_ttl_days
+expire through a TTL index on last_used_at.
+
+Vectors are stored packed (see packed_vectors) in settings.kb_embedding_store_dtype
+and read back in bulk into one NumPy matrix; entries written before packing
+are still readable and are converted by migrate_embedding_store.py.
+"""
+
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+
+from app.config.database import Database
+from app.config.settings import settings
+from app.utils.packed_vectors import pack_vectors, unpack_matrix
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "kb_embeddings"
+# Ids per $in query / operations per bulk write
+BATCH_SIZE = 500
+# Fields fetched when loading vectors (packed and legacy formats)
+VECTOR_PROJECTION = {"hash": 1, "packed": 1, "dtype": 1, "dims": 1, "scale": 1, "vector": 1}
+
+
+def content_hash(text: str) -> str:
+    """Key of a chunk's text (exact content; chunks are already whitespace-trimmed)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """get/put of chunk embeddings by (model, content hash)."""
+
+    def __init__(self, collection: Optional[str] = None):
+        self.collection_name = collection or COLLECTION
+        self.lookups = 0
+        self.hits = 0
+        self.stored = 0
+
+    def _collection(self):
+        return Database.get_db()[self.collection_name]
+
+    @staticmethod
+    def _key(model: str, digest: str) -> str:
+        return f"{model}:{digest}"
+
+    def load_matrix(self, model: str, hashes: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        Bulk-load stored embeddings as one matrix.
+
+        Args:
+            model: "<backend>:<model>" the embeddings must come from
+            hashes: Content hashes to look up
+
+        Returns:
+            (hashes found, float32 matrix with one row per found hash, in that order)
+        """
+        found: List[str] = []
+        blocks: List[np.ndarray] = []
+        unique = list(dict.fromkeys(hashes))
+        self.lookups += len(unique)
+        collection = self._collection()
+        for start in range(0, len(unique), BATCH_SIZE):
+            keys = [self._key(model, digest) for digest in unique[start:start + BATCH_SIZE]]
+            if not keys:
+                continue
+            docs = list(collection.find({"_id": {"$in": keys}}, VECTOR_PROJECTION))
+            if docs:
+                found.extend(doc["hash"] for doc in docs)
+                blocks.append(unpack_matrix(docs))
+            # Keep entries that are still in use away from the TTL
+            collection.update_many({"_id": {"$in": keys}}, {"$set": {"last_used_at": datetime.utcnow()}})
+        self.hits += len(found)
+        matrix = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+        return found, matrix
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Stored embeddings for the given content hashes.
+
+        Args:
+            model: "<backend>:<model>" the embeddings must come from
+            hashes: Content hashes to look up
+
+        Returns:
+            {hash: vector} for the hashes that were found (rows of one float32 matrix)
+        """
+        found, matrix = self.load_matrix(model, hashes)
+        return dict(zip(found, matrix))
+
+    def put_many(self, model: str, vectors: Dict[str, Sequence[float]], dtype: Optional[str] = None):
+        """Store {hash: vector} for a model (existing entries are left as they are)."""
+        if not vectors:
+            return
+        now = datetime.utcnow()
+        packed = pack_vectors(list(vectors.values()), dtype or settings.kb_embedding_store_dtype)
+        operations = [
+            UpdateOne(
+                {"_id": self._key(model, digest)},
+                {
+                    "$setOnInsert": dict(fields, model=model, hash=digest, created_at=now),
+                    "$set": {"last_used_at": now},
+                },
+                upsert=True,
+            )
+            for digest, fields in zip(vectors, packed)
+        ]
+        collection = self._collection()
+        for start in range(0, len(operations), BATCH_SIZE):
+            collection.bulk_write(operations[start:start + BATCH_SIZE], ordered=False)
+        self.stored += len(operations)
+
+    def migrate_legacy(self, dtype: Optional[str] = None, batch_size: int = BATCH_SIZE) -> int:
+        """
+        Rewrite entries stored as lists of doubles in the packed format.
+
+        Safe to interrupt and re-run: each batch only touches entries that still
+        have a "vector" field.
+
+        Returns:
+            Number of entries converted
+        """
+        dtype = dtype or settings.kb_embedding_store_dtype
+        collection = self._collection()
+        converted = 0
+        while True:
+            docs = list(collection.find({"vector": {"$exists": True}}, {"vector": 1}).limit(batch_size))
+            if not docs:
+                return converted
+            packed = pack_vectors([doc["vector"] for doc in docs], dtype)
+            collection.bulk_write(
+                [
+                    UpdateOne({"_id": doc["_id"]}, {"$set": fields, "$unset": {"vector": ""}})
+                    for doc, fields in zip(docs, packed)
+                ],
+                ordered=False,
+            )
+            converted += len(docs)
+            logger.info(f"Packed {converted} kb_embeddings entries as {dtype}")
+
+    def ensure_indexes(self):
+        self._collection().create_index(
+            "last_used_at",
+            expireAfterSeconds=settings.kb_embedding_store_ttl_days * 86400,
+            name="idx_kb_embedding_ttl",
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "stored": self.stored,
+            "dtype": settings.kb_embedding_store_dtype,
+        }
+
+
+kb_embedding_store = EmbeddingStore()
@@ -0,0 +1,492 @@
+"""
+Shared on-disk knowledge-base index, one per assistant.
+
+A document uploaded through one uvicorn worker must be searchable by calls on
+every other worker (and survive restarts), so each assistant's index lives
+under settings.kb_index_path as plain files every worker on the host can map:
+
+    assistant_<id>/
+        CURRENT              name of the live generation, swapped with os.replace
+        .lock                flock()ed by writers
+        gen-<n>/vectors.npy  float32 (chunks x dims), rows L2-normalized
+        gen-<n>/chunks.json  [{"id", "text", "metadata"}, ...] in row order
+        gen-<n>/manifest.json  {"model": "<backend>:<model>", "dims": n} the vectors were built with
+        gen-<n>/files.json   {filename: [row, ...]} metadata index for per-file deletes and stats
+        gen-<n>/bm25.json    BM25 inverted index of the chunk texts (see lexical_index)
+
+Writers build a complete new generation next to the live one and then point
+CURRENT at it, so readers always see either the old or the new index, never a
+partial one. Readers load an assistant lazily on first search, memory-map the
+vectors (the page cache is shared between workers), notice swaps by stat()ing
+CURRENT, and evict least-recently-used assistants once the loaded indexes
+exceed settings.kb_index_memory_budget_mb.
+
+Vectors are unit length, so similarity is plain cosine (a dot product);
+hybrid_search fuses it with the BM25 ranking by reciprocal rank. Queries
+must be embedded with the index's recorded model; appending chunks from a
+different model raises EmbeddingModelMismatch so the caller can re-index.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config.settings import settings
+from app.utils.lexical_index import BM25Index, reciprocal_rank_fusion
+from app.utils.vector_index import VectorIndex, normalize_rows, top_k_rows
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.json"
+MANIFEST_FILE = "manifest.json"
+FILES_FILE = "files.json"
+BM25_FILE = "bm25.json"
+# Model of generations written before manifests existed
+LEGACY_MODEL = "openai:text-embedding-3-small"
+# Generations kept on disk; the previous one stays for readers that resolved CURRENT just before a swap
+KEEP_GENERATIONS = 2
+
+
+class EmbeddingModelMismatch(ValueError):
+    """Chunks embedded with one model were added to an index built with another."""
+
+    def __init__(self, index_model: str, model: str):
+        super().__init__(f"Index was built with {index_model}, got embeddings from {model}")
+        self.index_model = index_model
+        self.model = model
+
+
+def _files_map(chunks: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    """filename -> row numbers of its chunks."""
+    files: Dict[str, List[int]] = {}
+    for row, chunk in enumerate(chunks):
+        files.setdefault(chunk["metadata"].get("filename"), []).append(row)
+    return files
+
+
+def _read_files(generation_dir: str) -> Optional[Dict[str, List[int]]]:
+    try:
+        with open(os.path.join(generation_dir, FILES_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None  # generation written before files.json existed
+
+
+def _read_bm25(generation_dir: str) -> Optional[BM25Index]:
+    try:
+        with open(os.path.join(generation_dir, BM25_FILE), "r", encoding="utf-8") as f:
+            return BM25Index.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None  # built from the chunks on first use
+
+
+def _read_manifest(generation_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(generation_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"model": LEGACY_MODEL}
+
+
+class AssistantIndex:
+    """One loaded generation of an assistant's index (vectors are memory-mapped, read-only)."""
+
+    def __init__(
+        self,
+        assistant_id: str,
+        generation: str,
+        vectors: np.ndarray,
+        chunks: List[Dict[str, Any]],
+        version: Tuple[int, int],
+        model: str = LEGACY_MODEL,
+        files: Optional[Dict[str, List[int]]] = None,
+        lexical: Optional[BM25Index] = None,
+    ):
+        self.assistant_id = assistant_id
+        self.generation = generation
+        self.model = model
+        self.vectors = vectors
+        self.index = VectorIndex(vectors, normalized=True)
+        self.chunks = chunks
+        self.files = files if files is not None else _files_map(chunks)
+        self.lexical = lexical if lexical is not None else BM25Index.build(chunk["text"] for chunk in chunks)
+        self.version = version
+        self.nbytes = self.index.nbytes + self.lexical.nbytes + sum(len(chunk["text"]) for chunk in chunks)
+        self._hash_rows: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def hybrid_search(self, query_embedding: Sequence[float], query: str, candidates: int = 20, rrf_k: int = 60) -> List[Tuple[Dict[str, Any], float, float]]:
+        """
+        Vector and BM25 rankings fused with reciprocal-rank fusion.
+
+        Args:
+            query_embedding: Raw query vector
+            query: Query text for the lexical ranking
+            candidates: Rows taken from each ranking before fusion
+            rrf_k: RRF constant (higher flattens the rank weights)
+
+        Returns:
+            [(chunk, cosine_similarity, bm25_score)] in fused order, best first
+        """
+        if not self.chunks or candidates <= 0:
+            return []
+        query_vector = normalize_rows(query_embedding)
+        if query_vector.shape[1] != self.index.dims:
+            raise ValueError(f"Query has {query_vector.shape[1]} dimensions, index has {self.index.dims}")
+        similarities = self.index.scores(query_vector)[0]
+        vector_rows, _ = top_k_rows(similarities[None, :], candidates)
+        lexical_scores = self.lexical.scores(query)
+        lexical_rows, _ = self.lexical.top(lexical_scores, candidates)
+        fused = reciprocal_rank_fusion([vector_rows[0], lexical_rows], k=rrf_k)
+        return [(self.chunks[row], float(similarities[row]), float(lexical_scores[row])) for row, _ in fused]
+
+    def file_chunks(self, filename: str) -> List[Dict[str, Any]]:
+        """Chunks of one document, via the metadata index."""
+        return [self.chunks[row] for row in self.files.get(filename, [])]
+
+    def vectors_for_hashes(self, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored (unit-length) vectors of chunks with these content hashes, for reuse on re-upload."""
+        if self._hash_rows is None:
+            self._hash_rows = {
+                chunk["metadata"]["content_hash"]: row
+                for row, chunk in enumerate(self.chunks)
+                if "content_hash" in chunk["metadata"]
+            }
+        return {h: np.asarray(self.vectors[self._hash_rows[h]]) for h in hashes if h in self._hash_rows}
+
+    def search(self, query_embedding: Sequence[float], top_k: int = 3) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Return up to `top_k` `(chunk, cosine_similarity)` pairs, best first.
+
+        Args:
+            query_embedding: Raw (not necessarily normalized) query vector
+            top_k: Number of results
+        """
+        if not self.chunks or top_k <= 0:
+            return []
+        indices, similarities = self.index.search(query_embedding, top_k)
+        return [(self.chunks[i], float(score)) for i, score in zip(indices, similarities)]
+
+
+class KnowledgeBaseIndexStore:
+    """Reads and atomically rewrites the per-assistant index files; caches loaded indexes per worker."""
+
+    def __init__(self, root: Optional[str] = None, memory_budget_bytes: Optional[int] = None):
+        self.root = root or settings.kb_index_path
+        self.memory_budget_bytes = (
+            memory_budget_bytes if memory_budget_bytes is not None
+            else settings.kb_index_memory_budget_mb * 1024 * 1024
+        )
+        self._loaded: "OrderedDict[str, AssistantIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    # ====== Paths ======
+    def _assistant_dir(self, assistant_id: str) -> str:
+        return os.path.join(self.root, f"assistant_{assistant_id}")
+
+    def _current_version(self, assistant_dir: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(os.path.join(assistant_dir, CURRENT_FILE))
+        except FileNotFoundError:
+            return None
+        # os.replace gives CURRENT a new inode, so (inode, mtime) changes on every swap
+        return stat.st_ino, stat.st_mtime_ns
+
+    # ====== Reads ======
+    def get(self, assistant_id: str) -> Optional[AssistantIndex]:
+        """Loaded index for an assistant (reloaded if another process swapped it), or None if it has none."""
+        assistant_dir = self._assistant_dir(assistant_id)
+        version = self._current_version(assistant_dir)
+        with self._lock:
+            cached = self._loaded.get(assistant_id)
+            if version is None:
+                self._loaded.pop(assistant_id, None)
+                return None
+            if cached is not None and cached.version == version:
+                self._loaded.move_to_end(assistant_id)
+                return cached
+
+        index = self._load(assistant_id, assistant_dir)
+        if index is None:
+            return None
+        with self._lock:
+            self._loaded[assistant_id] = index
+            self._loaded.move_to_end(assistant_id)
+            self._evict()
+        return index
+
+    def generation(self, assistant_id: str) -> Optional[str]:
+        """Name of the live generation without loading the index (a stat, plus a read of CURRENT if it is not loaded)."""
+        assistant_dir = self._assistant_dir(assistant_id)
+        version = self._current_version(assistant_dir)
+        if version is None:
+            return None
+        with self._lock:
+            cached = self._loaded.get(assistant_id)
+            if cached is not None and cached.version == version:
+                return cached.generation
+        generation_dir = self._live_dir(assistant_dir)
+        return os.path.basename(generation_dir) if generation_dir else None
+
+    def _load(self, assistant_id: str, assistant_dir: str) -> Optional[AssistantIndex]:
+        # A writer may swap and prune between reading CURRENT and opening the files; retry once
+        for attempt in range(2):
+            version = self._current_version(assistant_dir)
+            if version is None:
+                return None
+            try:
+                with open(os.path.join(assistant_dir, CURRENT_FILE), "r") as f:
+                    generation = f.read().strip()
+                generation_dir = os.path.join(assistant_dir, generation)
+                vectors = np.load(os.path.join(generation_dir, VECTORS_FILE), mmap_mode="r")
+                with open(os.path.join(generation_dir, CHUNKS_FILE), "r", encoding="utf-8") as f:
+                    chunks = json.load(f)
+                manifest = _read_manifest(generation_dir)
+                files = _read_files(generation_dir)
+                lexical = _read_bm25(generation_dir)
+            except FileNotFoundError:
+                if attempt == 0:
+                    continue
+                raise
+            self.loads += 1
+            logger.info(f"[KB_INDEX] Loaded {len(chunks)} chunks for assistant {assistant_id} ({generation})")
+            return AssistantIndex(assistant_id, generation, vectors, chunks, version, manifest["model"], files, lexical)
+        return None
+
+    def _evict(self):
+        total = sum(index.nbytes for index in self._loaded.values())
+        # Never evict the most recently used index, even if it alone exceeds the budget
+        while total > self.memory_budget_bytes and len(self._loaded) > 1:
+            assistant_id, index = self._loaded.popitem(last=False)
+            total -= index.nbytes
+            self.evictions += 1
+            logger.info(f"[KB_INDEX] Evicted index for assistant {assistant_id} ({index.nbytes} bytes)")
+
+    def search(self, assistant_id: str, query_embedding: Sequence[float], top_k: int = 3) -> List[Tuple[Dict[str, Any], float]]:
+        """Cosine top-k over an assistant's index; empty if the assistant has no index."""
+        index = self.get(assistant_id)
+        if index is None:
+            return []
+        return index.search(query_embedding, top_k)
+
+    # ====== Writes ======
+    @contextmanager
+    def _writer(self, assistant_id: str) -> Iterator[str]:
+        """Serialize writers for one assistant across all workers on the host."""
+        assistant_dir = self._assistant_dir(assistant_id)
+        os.makedirs(assistant_dir, exist_ok=True)
+        with open(os.path.join(assistant_dir, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield assistant_dir
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _live_dir(self, assistant_dir: str) -> Optional[str]:
+        try:
+            with open(os.path.join(assistant_dir, CURRENT_FILE), "r") as f:
+                return os.path.join(assistant_dir, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def _read_live(self, assistant_dir: str) -> Tuple[Optional[np.ndarray], List[Dict[str, Any]], Optional[str]]:
+        generation_dir = self._live_dir(assistant_dir)
+        if generation_dir is None:
+            return None, [], None
+        vectors = np.load(os.path.join(generation_dir, VECTORS_FILE))
+        with open(os.path.join(generation_dir, CHUNKS_FILE), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        return vectors, chunks, _read_manifest(generation_dir)["model"]
+
+    def _swap(self, assistant_id: str, assistant_dir: str, vectors: Optional[np.ndarray], chunks: List[Dict[str, Any]], model: Optional[str] = None):
+        """Write a new generation and make it live; an empty index removes CURRENT."""
+        if not chunks:
+            try:
+                os.remove(os.path.join(assistant_dir, CURRENT_FILE))
+            except FileNotFoundError:
+                pass
+            self._prune(assistant_dir, keep=0)
+        else:
+            generation = f"gen-{time.time_ns()}"
+            generation_dir = os.path.join(assistant_dir, generation)
+            os.makedirs(generation_dir)
+            np.save(os.path.join(generation_dir, VECTORS_FILE), np.ascontiguousarray(vectors, dtype=np.float32))
+            with open(os.path.join(generation_dir, CHUNKS_FILE), "w", encoding="utf-8") as f:
+                json.dump(chunks, f)
+            with open(os.path.join(generation_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump({"model": model or LEGACY_MODEL, "dims": int(vectors.shape[1])}, f)
+            with open(os.path.join(generation_dir, FILES_FILE), "w", encoding="utf-8") as f:
+                json.dump(_files_map(chunks), f)
+            with open(os.path.join(generation_dir, BM25_FILE), "w", encoding="utf-8") as f:
+                json.dump(BM25Index.build(chunk["text"] for chunk in chunks).to_dict(), f)
+
+            tmp_path = os.path.join(assistant_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                f.write(generation)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(assistant_dir, CURRENT_FILE))
+            self._prune(assistant_dir, keep=KEEP_GENERATIONS)
+
+        with self._lock:
+            self._loaded.pop(assistant_id, None)
+
+    def _prune(self, assistant_dir: str, keep: int):
+        generations = sorted(
+            (name for name in os.listdir(assistant_dir) if name.startswith("gen-")),
+            key=lambda name: int(name.split("-", 1)[1]),
+        )
+        for name in generations[:max(0, len(generations) - keep)]:
+            shutil.rmtree(os.path.join(assistant_dir, name), ignore_errors=True)
+
+    def add_chunks(self, assistant_id: str, embeddings: Sequence[Sequence[float]], chunks: List[Dict[str, Any]], model: str = LEGACY_MODEL) -> int:
+        """
+        Append chunks to an assistant's index and swap the new generation in.
+
+        Args:
+            assistant_id: AI Assistant ID
+            embeddings: One embedding per chunk
+            chunks: Dicts with "id", "text" and "metadata", in the same order as `embeddings`
+            model: "<backend>:<model>" the embeddings were created with
+
+        Returns:
+            Total number of chunks in the index
+
+        Raises:
+            EmbeddingModelMismatch: The live index was built with a different model
+        """
+        if len(embeddings) != len(chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(chunks)} chunks")
+        new_vectors = normalize_rows(embeddings)
+        with self._writer(assistant_id) as assistant_dir:
+            vectors, existing, index_model = self._read_live(assistant_dir)
+            if vectors is not None and len(existing):
+                if index_model != model:
+                    raise EmbeddingModelMismatch(index_model, model)
+                if vectors.shape[1] != new_vectors.shape[1]:
+                    raise ValueError(
+                        f"Embedding dimension {new_vectors.shape[1]} does not match the index ({vectors.shape[1]})"
+                    )
+                new_ids = {chunk["id"] for chunk in chunks}
+                # Re-uploading a file replaces its chunks instead of duplicating them
+                keep = [i for i, chunk in enumerate(existing) if chunk["id"] not in new_ids]
+                vectors = np.vstack([vectors[keep], new_vectors])
+                existing = [existing[i] for i in keep] + list(chunks)
+            else:
+                vectors, existing = new_vectors, list(chunks)
+            self._swap(assistant_id, assistant_dir, vectors, existing, model)
+        logger.info(f"[KB_INDEX] Assistant {assistant_id} index now has {len(existing)} chunks")
+        return len(existing)
+
+    def replace_document(self, assistant_id: str, filename: str, embeddings: Sequence[Sequence[float]], chunks: List[Dict[str, Any]], model: str = LEGACY_MODEL) -> int:
+        """
+        Swap in a new version of one document: all of its previous chunks are dropped
+        (found through the metadata index) and `chunks` appended, in one generation.
+
+        Args:
+            assistant_id: AI Assistant ID
+            filename: Document whose chunks are replaced
+            embeddings: One embedding per chunk
+            chunks: The document's chunks, in the same order as `embeddings`
+            model: "<backend>:<model>" the embeddings were created with
+
+        Returns:
+            Total number of chunks in the index
+
+        Raises:
+            EmbeddingModelMismatch: The live index was built with a different model
+        """
+        if len(embeddings) != len(chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(chunks)} chunks")
+        new_vectors = normalize_rows(embeddings)
+        with self._writer(assistant_id) as assistant_dir:
+            vectors, existing, index_model = self._read_live(assistant_dir)
+            if vectors is not None and len(existing):
+                if index_model != model:
+                    raise EmbeddingModelMismatch(index_model, model)
+                if vectors.shape[1] != new_vectors.shape[1]:
+                    raise ValueError(
+                        f"Embedding dimension {new_vectors.shape[1]} does not match the index ({vectors.shape[1]})"
+                    )
+                keep = np.ones(len(existing), dtype=bool)
+                keep[_files_map(existing).get(filename, [])] = False
+                vectors = np.vstack([vectors[keep], new_vectors])
+                existing = [chunk for chunk, kept in zip(existing, keep) if kept] + list(chunks)
+            else:
+                vectors, existing = new_vectors, list(chunks)
+            self._swap(assistant_id, assistant_dir, vectors, existing, model)
+        logger.info(f"[KB_INDEX] Assistant {assistant_id} index now has {len(existing)} chunks ({filename} replaced)")
+        return len(existing)
+
+    def replace(self, assistant_id: str, embeddings: Sequence[Sequence[float]], chunks: List[Dict[str, Any]], model: str) -> int:
+        """Swap in a complete index (e.g. every chunk re-embedded with a new model)."""
+        if len(embeddings) != len(chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(chunks)} chunks")
+        vectors = normalize_rows(embeddings) if chunks else None
+        with self._writer(assistant_id) as assistant_dir:
+            self._swap(assistant_id, assistant_dir, vectors, list(chunks), model)
+        logger.info(f"[KB_INDEX] Assistant {assistant_id} index rebuilt with {model} ({len(chunks)} chunks)")
+        return len(chunks)
+
+    def remove_where(self, assistant_id: str, metadata_key: str, value: Any) -> int:
+        """Drop every chunk whose metadata[metadata_key] == value; returns the number removed."""
+        with self._writer(assistant_id) as assistant_dir:
+            vectors, existing, index_model = self._read_live(assistant_dir)
+            if vectors is None:
+                return 0
+            keep = [i for i, chunk in enumerate(existing) if chunk["metadata"].get(metadata_key) != value]
+            removed = len(existing) - len(keep)
+            if removed:
+                self._swap(assistant_id, assistant_dir, vectors[keep], [existing[i] for i in keep], index_model)
+        return removed
+
+    def remove_document(self, assistant_id: str, filename: str) -> int:
+        """Drop one document's chunks; a file that is not indexed costs one small read, not a rewrite."""
+        with self._writer(assistant_id) as assistant_dir:
+            generation_dir = self._live_dir(assistant_dir)
+            if generation_dir is None:
+                return 0
+            files = _read_files(generation_dir)
+            if files is not None and filename not in files:
+                return 0
+            vectors, existing, index_model = self._read_live(assistant_dir)
+            rows = (files if files is not None else _files_map(existing)).get(filename, [])
+            if rows:
+                keep = np.ones(len(existing), dtype=bool)
+                keep[rows] = False
+                self._swap(assistant_id, assistant_dir, vectors[keep], [c for c, kept in zip(existing, keep) if kept], index_model)
+        return len(rows)
+
+    def drop(self, assistant_id: str):
+        """Delete an assistant's index entirely."""
+        with self._writer(assistant_id) as assistant_dir:
+            self._swap(assistant_id, assistant_dir, None, [])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded_assistants": len(self._loaded),
+                "loaded_bytes": sum(index.nbytes for index in self._loaded.values()),
+                "budget_bytes": self.memory_budget_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+kb_index_store = KnowledgeBaseIndexStore()
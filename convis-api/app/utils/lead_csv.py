@@ -0,0 +1,108 @@
+"""
+CSV lead rows -> lead documents.
+
+Pure functions (no database, no settings) so the import job can run them in a
+process pool: the parent streams the file and hands out chunks of raw rows,
+each child validates and normalizes its chunk with phonenumbers and returns
+the documents in row order.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.services.phone_service import PhoneService
+
+PHONE_KEYS = {"phone", "phone_number", "number", "mobile", "mobile_number", "contact_number", "contact"}
+NAME_KEYS = {"name", "full_name", "contact_name"}
+EMAIL_KEYS = {"email", "email_address"}
+FIRST_NAME_KEYS = {"firstname", "first_name", "first"}
+LAST_NAME_KEYS = {"lastname", "last_name", "surname", "family_name"}
+TIMEZONE_KEYS = {"timezone", "tz"}
+KNOWN_KEYS = PHONE_KEYS | NAME_KEYS | EMAIL_KEYS | FIRST_NAME_KEYS | LAST_NAME_KEYS | TIMEZONE_KEYS
+
+
+def _pick(lookup: Dict[str, str], keys) -> str:
+    for key in keys:
+        value = lookup.get(key, "")
+        if value:
+            return value
+    return ""
+
+
+def normalize_row(
+    header: Sequence[str],
+    row: Sequence[str],
+    campaign_country: str,
+    campaign_tz: str,
+) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Validate one CSV row and build its lead fields.
+
+    Args:
+        header: Column names (already stripped)
+        row: Cell values, in header order
+        campaign_country: Default region for numbers without a country code
+        campaign_tz: Timezone for numbers phonenumbers cannot place
+
+    Returns:
+        (lead fields or None if the row is invalid, whether the number's region
+        differs from the campaign country)
+    """
+    cells = {key: (value or "").strip() for key, value in zip(header, row) if key}
+    lookup = {key.lower(): value for key, value in cells.items()}
+
+    raw_number = _pick(lookup, PHONE_KEYS)
+    first_name = _pick(lookup, FIRST_NAME_KEYS) or None
+    last_name = _pick(lookup, LAST_NAME_KEYS) or None
+    name = _pick(lookup, NAME_KEYS) or None
+    email = _pick(lookup, EMAIL_KEYS) or None
+
+    if not raw_number or (not first_name and not name):
+        return None, False
+
+    is_valid, e164, region, timezones = PhoneService.normalize_and_validate(raw_number, campaign_country)
+    if not is_valid:
+        return None, False
+    # Same check as PhoneService.check_region_mismatch, without parsing the number again
+    mismatch = (region or "") != campaign_country.upper()
+
+    if not name and (first_name or last_name):
+        name = " ".join(part for part in [first_name, last_name] if part) or None
+
+    return {
+        "raw_number": raw_number,
+        "e164": e164,
+        "timezone": _pick(lookup, TIMEZONE_KEYS) or (timezones[0] if timezones else campaign_tz),
+        "first_name": first_name,
+        "last_name": last_name,
+        "name": name,
+        "email": email,
+        "custom_fields": {
+            key: value for key, value in cells.items()
+            if key.lower() not in KNOWN_KEYS and value
+        },
+    }, mismatch
+
+
+def normalize_chunk(
+    header: Sequence[str],
+    rows: List[Sequence[str]],
+    campaign_country: str,
+    campaign_tz: str,
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    normalize_row() over a chunk of rows (the unit of work sent to the process pool).
+
+    Returns:
+        (lead fields of the valid rows in row order, invalid count, region mismatch count)
+    """
+    leads: List[Dict[str, Any]] = []
+    invalid = 0
+    mismatches = 0
+    for row in rows:
+        lead, mismatch = normalize_row(header, row, campaign_country, campaign_tz)
+        if lead is None:
+            invalid += 1
+            continue
+        leads.append(lead)
+        mismatches += int(mismatch)
+    return leads, invalid, mismatches
@@ -0,0 +1,138 @@
+"""
+BM25 inverted index over knowledge-base chunks, and reciprocal-rank fusion.
+
+Embedding search is weak on exact tokens callers read out (plan names, SKUs,
+prices, policy numbers): "VX-4471" and "VX-4417" embed almost identically.
+Each index generation therefore also stores a BM25 index of its chunks
+(kb_index writes it next to the vectors), and queries fuse both rankings with
+reciprocal-rank fusion, which needs no score calibration between the two.
+
+The tokenizer keeps identifier-like tokens whole ("vx-4471", "49.99",
+"pol/2024/113") and also indexes their parts, so "4471" alone still matches.
+"""
+
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-/:][a-z0-9]+)*")
+_SEPARATORS = re.compile(r"[.\-/:]")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in is it its me my of on or our "
+    "so that the their there this to us was we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms; compound identifiers yield the whole token plus its parts."""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if _SEPARATORS.search(token):
+            terms.extend(part for part in _SEPARATORS.split(token) if part and part not in STOPWORDS)
+    return terms
+
+
+def identifier_terms(text: str) -> List[str]:
+    """Query terms that look like identifiers or amounts (contain a digit), e.g. SKUs and prices."""
+    return [term for term in _TOKEN.findall(text.lower()) if any(ch.isdigit() for ch in term)]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Fuse several best-first rankings of row ids.
+
+    Returns:
+        [(row, score)] best first, score = sum over rankings of 1 / (k + rank)
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[int(row)] = scores.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents (rows match the vector index)."""
+
+    def __init__(self, postings: Dict[str, List[List[int]]], doc_lengths: Sequence[int], k1: float = BM25_K1, b: float = BM25_B):
+        self.postings = postings
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self.avgdl = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "BM25Index":
+        postings: Dict[str, List[List[int]]] = {}
+        doc_lengths = []
+        for row, text in enumerate(texts):
+            terms = tokenize(text)
+            doc_lengths.append(len(terms))
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append([row, tf])
+        return cls(postings, doc_lengths)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k1": self.k1, "b": self.b, "doc_lengths": self.doc_lengths.astype(int).tolist(), "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        return cls(data["postings"], data["doc_lengths"], data.get("k1", BM25_K1), data.get("b", BM25_B))
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(rows) for rows in self.postings.values()) * 16 + int(self.doc_lengths.nbytes)
+
+    def _term_arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            rows = self.postings.get(term)
+            if not rows:
+                return None
+            pairs = np.asarray(rows, dtype=np.int64)
+            arrays = self._arrays[term] = (pairs[:, 0], pairs[:, 1].astype(np.float32))
+        return arrays
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for `query`."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        if not len(self):
+            return scores
+        for term in set(tokenize(query)):
+            arrays = self._term_arrays(term)
+            if arrays is None:
+                continue
+            rows, tf = arrays
+            idf = math.log(1.0 + (len(self) - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[rows] / (self.avgdl or 1.0))
+            scores[rows] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query: str, top_k: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k `(rows, scores)` best first; documents sharing no term with the query are left out."""
+        return self.top(self.scores(query), top_k)
+
+    @staticmethod
+    def top(scores: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Best `top_k` rows with a positive score, from a scores() array."""
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return order, scores[order]
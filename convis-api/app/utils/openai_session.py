@@ -2,10 +2,11 @@
 Shared utilities for OpenAI Realtime API session management.
 Used by both inbound and outbound call handlers.
 """
+import asyncio
 import json
 import logging
 import re
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.constants import DEFAULT_CALL_GREETING
 
@@ -36,34 +37,20 @@ LOG_EVENT_TYPES = [
     'error'
 ]
 
-async def send_session_update(
-    openai_ws,
+def build_session_update(
     system_message: str,
     voice: str,
     temperature: float = 0.8,
-    enable_interruptions: bool = True,
-    greeting_text: Optional[str] = None,
     max_response_output_tokens: Optional[int] = None,
     vad_threshold: float = 0.5,
     vad_prefix_padding_ms: int = 300,
     vad_silence_duration_ms: int = 500
-):
+) -> Dict[str, Any]:
     """
-    Send session update to OpenAI WebSocket with dynamic configuration.
-    CRITICAL: This matches the original pattern where send_initial_conversation_item
-    is called INSIDE send_session_update for proper timing.
+    Build the `session.update` event sent to the OpenAI Realtime API.
 
-    Args:
-        openai_ws: OpenAI WebSocket connection
-        system_message: System instructions for the AI
-        voice: Voice to use for output (e.g., 'alloy', 'echo', 'shimmer')
-        temperature: Temperature for response generation (0.0-1.0)
-        enable_interruptions: Whether to enable interruption handling
-        greeting_text: Optional custom greeting text (passed to send_initial_conversation_item)
-        max_response_output_tokens: Optional max tokens for AI responses (e.g., 'inf', 50-4096)
-        vad_threshold: Voice Activity Detection threshold (0.0-1.0) - lower=more sensitive to background noise
-        vad_prefix_padding_ms: Padding before speech starts (ms) - helps capture beginning of speech
-        vad_silence_duration_ms: Silence duration to detect end of speech (ms) - longer=less affected by noise
+    Kept separate from send_session_update so the payload can be compiled once
+    per assistant (see AssistantRuntimeCache) and replayed on every call.
     """
     session_config = {
         "turn_detection": {
@@ -87,12 +74,70 @@ async def send_session_update(
     if max_response_output_tokens is not None:
         session_config["max_response_output_tokens"] = max_response_output_tokens
 
-    session_update = {
+    return {
         "type": "session.update",
         "session": session_config
     }
 
-    logger.info(f'Sending session update with voice={voice}, temperature={temperature}, max_tokens={max_response_output_tokens}')
+async def send_session_update(
+    openai_ws,
+    system_message: str,
+    voice: str,
+    temperature: float = 0.8,
+    enable_interruptions: bool = True,
+    greeting_text: Optional[str] = None,
+    max_response_output_tokens: Optional[int] = None,
+    vad_threshold: float = 0.5,
+    vad_prefix_padding_ms: int = 300,
+    vad_silence_duration_ms: int = 500
+):
+    """
+    Send session update to OpenAI WebSocket with dynamic configuration.
+    CRITICAL: This matches the original pattern where send_initial_conversation_item
+    is called INSIDE send_session_update for proper timing.
+
+    Args:
+        openai_ws: OpenAI WebSocket connection
+        system_message: System instructions for the AI
+        voice: Voice to use for output (e.g., 'alloy', 'echo', 'shimmer')
+        temperature: Temperature for response generation (0.0-1.0)
+        enable_interruptions: Whether to enable interruption handling
+        greeting_text: Optional custom greeting text (passed to send_initial_conversation_item)
+        max_response_output_tokens: Optional max tokens for AI responses (e.g., 'inf', 50-4096)
+        vad_threshold: Voice Activity Detection threshold (0.0-1.0) - lower=more sensitive to background noise
+        vad_prefix_padding_ms: Padding before speech starts (ms) - helps capture beginning of speech
+        vad_silence_duration_ms: Silence duration to detect end of speech (ms) - longer=less affected by noise
+    """
+    session_update = build_session_update(
+        system_message,
+        voice,
+        temperature,
+        max_response_output_tokens=max_response_output_tokens,
+        vad_threshold=vad_threshold,
+        vad_prefix_padding_ms=vad_prefix_padding_ms,
+        vad_silence_duration_ms=vad_silence_duration_ms
+    )
+    await send_prebuilt_session_update(openai_ws, session_update, greeting_text)
+
+async def send_prebuilt_session_update(
+    openai_ws,
+    session_update: Dict[str, Any],
+    greeting_text: Optional[str] = None
+):
+    """
+    Send an already-built `session.update` payload followed by the initial greeting.
+
+    Args:
+        openai_ws: OpenAI WebSocket connection
+        session_update: Payload produced by build_session_update
+        greeting_text: Optional custom greeting text (passed to send_initial_conversation_item)
+    """
+    session_config = session_update.get("session", {})
+    logger.info(
+        f'Sending session update with voice={session_config.get("voice")}, '
+        f'temperature={session_config.get("temperature")}, '
+        f'max_tokens={session_config.get("max_response_output_tokens")}'
+    )
     logger.info('Session modalities: ["audio", "text"], formats: g711_ulaw')
     await openai_ws.send(json.dumps(session_update))
 
@@ -130,6 +175,43 @@ async def send_initial_conversation_item(openai_ws, greeting_text: Optional[str]
     await openai_ws.send(json.dumps({"type": "response.create"}))
     logger.info("Sent initial greeting to AI")
 
+async def read_until_stream_start(twilio_ws, timeout: float = 5.0) -> Tuple[List[str], Optional[str]]:
+    """
+    Read Twilio media-stream messages up to and including the `start` event.
+
+    Twilio sends `connected` then `start` right after the websocket opens, so this
+    is effectively instant; it lets the handler learn the call SID (to adopt a
+    pre-opened Realtime session) before connecting to OpenAI.
+
+    Returns:
+        (messages read so far, call SID or None) - replay the messages with replay_then_iter
+    """
+    messages: List[str] = []
+    call_sid = None
+    deadline = asyncio.get_running_loop().time() + timeout
+    try:
+        while True:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            message = await asyncio.wait_for(twilio_ws.receive_text(), timeout=remaining)
+            messages.append(message)
+            data = json.loads(message)
+            if data.get('event') == 'start':
+                start_info = data.get('start', {})
+                call_sid = start_info.get('callSid') or start_info.get('call_sid')
+                break
+    except asyncio.TimeoutError:
+        logger.warning("Twilio stream start event not received before timeout")
+    return messages, call_sid
+
+async def replay_then_iter(buffered: List[str], twilio_ws) -> AsyncIterator[str]:
+    """Yield messages consumed by read_until_stream_start, then the rest of the stream."""
+    for message in buffered:
+        yield message
+    async for message in twilio_ws.iter_text():
+        yield message
+
 async def send_mark(websocket, stream_sid: str, mark_queue: list):
     """
     Send a mark event to track audio playback position.
@@ -0,0 +1,110 @@
+"""
+Binary packing of embeddings for MongoDB storage, and bulk decoding into NumPy.
+
+Embeddings used to be stored as BSON arrays of doubles: a 1536-dim vector is
+1536 typed elements (~21 KB on disk with the per-element key strings) and,
+once loaded, a Python list of 1536 float objects. Decoding a few thousand
+chunks spent most of its time creating and then discarding those objects.
+
+A packed vector is the raw little-endian bytes of the row in one of:
+
+    float32  exact, 4 bytes per dimension
+    float16  2 bytes per dimension
+    int8     1 byte per dimension plus a float32 scale (row ~= bytes * scale)
+
+stored as a BSON binary next to its dtype, dims and (int8) scale. A batch of
+documents is decoded with one b"".join and one np.frombuffer per dtype, so
+loading never materializes per-element Python objects. Documents still in the
+old list format are decoded too, until migrate_embedding_store.py rewrites them.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PACKED_DTYPES = ("float32", "float16", "int8")
+_NUMPY_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2"), "int8": np.dtype("i1")}
+
+
+def pack_vectors(vectors, dtype: str = "float32") -> List[Dict[str, Any]]:
+    """
+    Pack embeddings into document fields.
+
+    Args:
+        vectors: (rows, dims) embeddings, any float dtype
+        dtype: Storage type, one of PACKED_DTYPES
+
+    Returns:
+        One {"packed", "dtype", "dims"[, "scale"]} dict per row
+    """
+    if dtype not in PACKED_DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype!r}; expected one of {PACKED_DTYPES}")
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    dims = int(matrix.shape[1]) if matrix.size else 0
+
+    scales: Optional[np.ndarray] = None
+    if dtype == "int8":
+        # Symmetric per-row quantization, as in VectorIndex
+        peaks = np.abs(matrix).max(axis=1) if dims else np.zeros(len(matrix), dtype=np.float32)
+        peaks[peaks == 0] = 1.0
+        scales = (peaks / 127.0).astype(np.float32)
+        packed = np.round(matrix / scales[:, None]).astype(_NUMPY_DTYPES[dtype])
+    else:
+        packed = matrix.astype(_NUMPY_DTYPES[dtype])
+
+    fields = []
+    for row in range(len(packed)):
+        entry: Dict[str, Any] = {"packed": packed[row].tobytes(), "dtype": dtype, "dims": dims}
+        if scales is not None:
+            entry["scale"] = float(scales[row])
+        fields.append(entry)
+    return fields
+
+
+def packed_nbytes(fields: Dict[str, Any]) -> int:
+    """Payload size of one packed vector."""
+    return len(fields["packed"])
+
+
+def unpack_matrix(docs: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """
+    Decode packed (or legacy list) vectors into one float32 matrix.
+
+    Args:
+        docs: Documents with the pack_vectors() fields, or a legacy "vector" list;
+            all of them must have the same number of dimensions
+
+    Returns:
+        (len(docs), dims) float32 matrix, rows in the order of `docs`
+    """
+    if not docs:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    groups: Dict[Tuple[str, int], List[int]] = {}
+    legacy: List[int] = []
+    for row, doc in enumerate(docs):
+        if doc.get("packed") is not None:
+            groups.setdefault((doc["dtype"], int(doc["dims"])), []).append(row)
+        else:
+            legacy.append(row)
+
+    dims = {key[1] for key in groups}
+    if legacy:
+        dims.add(len(docs[legacy[0]]["vector"]))
+    if len(dims) != 1:
+        raise ValueError(f"Vectors have different dimensions: {sorted(dims)}")
+    matrix = np.empty((len(docs), dims.pop()), dtype=np.float32)
+
+    for (dtype, width), rows in groups.items():
+        raw = b"".join(bytes(docs[row]["packed"]) for row in rows)
+        block = np.frombuffer(raw, dtype=_NUMPY_DTYPES[dtype]).reshape(len(rows), width)
+        if dtype == "int8":
+            scales = np.fromiter((docs[row]["scale"] for row in rows), dtype=np.float32, count=len(rows))
+            matrix[rows] = block * scales[:, None]
+        else:
+            matrix[rows] = block
+    if legacy:
+        matrix[legacy] = np.asarray([docs[row]["vector"] for row in legacy], dtype=np.float32)
+    return matrix
@@ -0,0 +1,295 @@
+"""
+Page-level PDF text extraction with selective, parallel OCR.
+
+The old extractor concatenated PyMuPDF text for the whole file, re-parsed it
+with PyPDF2 when that came out short, and then OCR'd every page one after the
+other in the request thread. Here each page is classified once:
+
+    text   has a usable text layer; PyMuPDF text is used as-is
+    ocr    little or no text but embedded images (a scan); rendered and OCR'd
+    empty  neither (blank or separator page)
+
+Only "ocr" pages are rendered and sent to a process pool, which runs
+settings.pdf_ocr_workers tesseract jobs side by side with a per-page timeout.
+Mixed documents therefore pay for OCR on their scanned pages only.
+
+Results are cached under settings.pdf_extraction_cache_path, keyed by the
+SHA-256 of the file, so preview, re-upload and resumed ingestion jobs read the
+pages back instead of extracting them again. iter_pages() yields pages as they
+are done (a window at a time), so ingestion can stream large documents.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TEXT_PAGE = "text"
+OCR_PAGE = "ocr"
+EMPTY_PAGE = "empty"
+TESSERACT_MISSING = "tesseract_missing"
+# Seconds added to the tesseract timeout for rendering a page and the pool round-trip
+RENDER_MARGIN_SECONDS = 15
+# Most pages classified ahead of the one being yielded
+PAGE_WINDOW = 16
+
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def classify_page(page, min_text_chars: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Text and kind of one PyMuPDF page.
+
+    Returns:
+        {"text": str, "kind": "text" | "ocr" | "empty"}
+    """
+    min_text_chars = settings.pdf_min_page_text_chars if min_text_chars is None else min_text_chars
+    text = page.get_text()
+    if len(text.strip()) >= min_text_chars:
+        return {"text": text, "kind": TEXT_PAGE}
+    if page.get_images(full=False):
+        return {"text": text, "kind": OCR_PAGE}
+    return {"text": text, "kind": EMPTY_PAGE}
+
+
+def ocr_page(file_path: str, page_number: int, zoom: float, timeout: float) -> Dict[str, Any]:
+    """
+    Render one page and OCR it (runs in a pool process).
+
+    Returns:
+        {"text": str, "error": None | "tesseract_missing" | message}
+    """
+    import io
+
+    import fitz  # PyMuPDF
+    import pytesseract
+    from PIL import Image
+
+    try:
+        with fitz.open(file_path) as doc:
+            pix = doc[page_number].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            image = Image.open(io.BytesIO(pix.tobytes("png")))
+        return {"text": pytesseract.image_to_string(image, timeout=timeout), "error": None}
+    except pytesseract.TesseractNotFoundError:
+        return {"text": "", "error": TESSERACT_MISSING}
+    except Exception as e:
+        # pytesseract kills tesseract and raises RuntimeError when the timeout is hit
+        return {"text": "", "error": str(e) or type(e).__name__}
+
+
+class PdfExtractor:
+    """Classifies PDF pages, OCRs scanned ones on a process pool and caches results by file hash."""
+
+    def __init__(self, cache_path: Optional[str] = None, workers: Optional[int] = None):
+        self.cache_path = cache_path or settings.pdf_extraction_cache_path
+        self.workers = workers or settings.pdf_ocr_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.cache_hits = 0
+        self.extractions = 0
+        self.pages_text = 0
+        self.pages_ocr = 0
+        self.ocr_failures = 0
+
+    # ====== Pool ======
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a process that runs an event loop and threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _reset_pool(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def shutdown(self):
+        self._reset_pool()
+
+    # ====== Cache ======
+    def _cache_file(self, digest: str) -> str:
+        return os.path.join(self.cache_path, f"{digest}.json")
+
+    def _cache_get(self, digest: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            with open(self._cache_file(digest), encoding="utf-8") as f:
+                pages = json.load(f)["pages"]
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(self._cache_file(digest))  # recency for pruning
+        return pages
+
+    def _cache_put(self, digest: str, pages: List[Dict[str, Any]]):
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+            tmp_path = f"{self._cache_file(digest)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"pages": pages}, f)
+            os.replace(tmp_path, self._cache_file(digest))
+            self._prune_cache()
+        except OSError as e:
+            logger.warning(f"[PDF_EXTRACT] Could not cache extraction {digest[:12]}: {e}")
+
+    def _prune_cache(self):
+        entries = [
+            os.path.join(self.cache_path, name)
+            for name in os.listdir(self.cache_path)
+            if name.endswith(".json")
+        ]
+        excess = len(entries) - settings.pdf_extraction_cache_max_entries
+        if excess > 0:
+            for path in sorted(entries, key=os.path.getmtime)[:excess]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # ====== Extraction ======
+    def extract(self, file_path: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        Text of every page of a PDF.
+
+        Args:
+            file_path: Path to the PDF
+            use_cache: Read/write the file-hash cache
+
+        Returns:
+            One {"page", "text", "kind", "error"} dict per page, in page order
+
+        Raises:
+            ValueError: OCR was needed but Tesseract is not installed
+        """
+        return list(self.iter_pages(file_path, use_cache=use_cache))
+
+    def iter_pages(self, file_path: str, start_page: int = 0, use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Pages of a PDF as they are extracted, in page order (same dicts as extract()).
+
+        Pages are classified and OCR'd a window at a time (PAGE_WINDOW pages, or
+        as many scanned pages as there are OCR workers), so rendered images and
+        OCR results for the rest of the document are never held. Only page text
+        is kept until the end, to fill the cache after a complete pass without
+        OCR errors.
+
+        Args:
+            file_path: Path to the PDF
+            start_page: First page to yield (resumed jobs skip pages they already have)
+            use_cache: Read/write the file-hash cache
+
+        Raises:
+            ValueError: OCR was needed but Tesseract is not installed (after the last page)
+        """
+        import fitz  # PyMuPDF
+
+        digest = file_sha256(file_path) if use_cache else None
+        if digest:
+            cached = self._cache_get(digest)
+            if cached is not None:
+                self.cache_hits += 1
+                yield from cached[start_page:]
+                return
+
+        started = time.perf_counter()
+        self.extractions += 1
+        # Only a full pass can be cached
+        extracted: Optional[List[Dict[str, Any]]] = [] if digest and start_page == 0 else None
+        page_count = ocr_count = 0
+        missing_tesseract = found_text = failed = False
+        with fitz.open(file_path) as doc:
+            window: List[Dict[str, Any]] = []
+            last_page = len(doc) - 1
+            for number in range(start_page, len(doc)):
+                window.append(dict(classify_page(doc[number]), page=number, error=None))
+                ocr_pages = [page for page in window if page["kind"] == OCR_PAGE]
+                if len(window) < PAGE_WINDOW and len(ocr_pages) < self.workers and number < last_page:
+                    continue
+
+                self.pages_text += len(window) - len(ocr_pages)
+                if ocr_pages:
+                    missing_tesseract = self._ocr_pages(file_path, ocr_pages) or missing_tesseract
+                for page in window:
+                    page_count += 1
+                    found_text = found_text or bool(page["text"].strip())
+                    failed = failed or bool(page["error"])
+                    if extracted is not None:
+                        extracted.append(page)
+                    yield page
+                ocr_count += len(ocr_pages)
+                window = []
+
+        logger.info(
+            f"[PDF_EXTRACT] {os.path.basename(file_path)}: {page_count} pages from page {start_page + 1}, "
+            f"{ocr_count} OCR'd in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        if missing_tesseract and not found_text:
+            logger.error("Tesseract not installed. Install with: sudo apt-get install tesseract-ocr")
+            raise ValueError("OCR not available. Please install Tesseract OCR on your system.")
+        if extracted is not None and not failed:
+            # Pages with OCR errors (timeouts) are retried on the next extraction
+            self._cache_put(digest, extracted)
+
+    def _ocr_pages(self, file_path: str, pages: List[Dict[str, Any]]) -> bool:
+        """OCR scanned pages in place, in parallel; True when Tesseract is missing."""
+        timeout = settings.pdf_ocr_page_timeout_seconds
+        pool = self._get_pool()
+        futures = [
+            (page, pool.submit(ocr_page, file_path, page["page"], settings.pdf_ocr_zoom, timeout))
+            for page in pages
+        ]
+        missing_tesseract = False
+        for page, future in futures:
+            try:
+                result = future.result(timeout=timeout + RENDER_MARGIN_SECONDS)
+            except FutureTimeoutError:
+                future.cancel()
+                result = {"text": "", "error": "timeout"}
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM on a huge page); start a fresh pool for the next pages
+                self._reset_pool()
+                result = {"text": "", "error": "ocr worker crashed"}
+
+            self.pages_ocr += 1
+            if result["error"]:
+                self.ocr_failures += 1
+                missing_tesseract = missing_tesseract or result["error"] == TESSERACT_MISSING
+                logger.warning(f"[PDF_EXTRACT] OCR failed for page {page['page'] + 1}: {result['error']}")
+            else:
+                # Keep whatever text layer the page had if OCR finds nothing better
+                if len(result["text"].strip()) > len(page["text"].strip()):
+                    page["text"] = result["text"]
+            page["error"] = result["error"]
+        return missing_tesseract
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "extractions": self.extractions,
+            "cache_hits": self.cache_hits,
+            "pages_text": self.pages_text,
+            "pages_ocr": self.pages_ocr,
+            "ocr_failures": self.ocr_failures,
+            "pool_running": self._pool is not None,
+        }
+
+
+pdf_extractor = PdfExtractor()
@@ -9,7 +9,7 @@ from docx import Document
 import openpyxl
 from openai import OpenAI
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from app.utils.vector_index import VectorIndex
 import logging
 
 logger = logging.getLogger(__name__)
@@ -160,7 +160,8 @@ def search_knowledge_base(
         List of relevant text chunks with similarity scores
     """
     try:
-        if not knowledge_base:
+        entries = [item for item in knowledge_base or [] if 'embedding' in item and 'text' in item]
+        if not entries:
             return []
 
         # Create embedding for the query
@@ -171,26 +172,17 @@ def search_knowledge_base(
         )
         query_embedding = query_response.data[0].embedding
 
-        # Calculate cosine similarity with all chunks
-        results = []
-        for item in knowledge_base:
-            if 'embedding' not in item or 'text' not in item:
-                continue
-
-            similarity = cosine_similarity(
-                [query_embedding],
-                [item['embedding']]
-            )[0][0]
-
-            results.append({
-                'text': item['text'],
+        # Cosine similarity against every chunk at once, top k only
+        index = VectorIndex([item['embedding'] for item in entries])
+        indices, similarities = index.search(query_embedding, top_k)
+        return [
+            {
+                'text': entries[i]['text'],
                 'similarity': float(similarity),
-                'filename': item.get('filename', 'unknown')
-            })
-
-        # Sort by similarity and return top k
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        return results[:top_k]
+                'filename': entries[i].get('filename', 'unknown')
+            }
+            for i, similarity in zip(indices, similarities)
+        ]
 
     except Exception as e:
         logger.error(f"Error searching knowledge base: {e}")
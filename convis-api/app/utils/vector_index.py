@@ -0,0 +1,131 @@
+"""
+Compact in-memory vector index for cosine top-k search.
+
+Rows are L2-normalized once at build time and kept in one contiguous matrix, so
+a query is a single matrix-vector product followed by argpartition instead of a
+per-chunk similarity call and a full sort. Storage can be:
+
+    float32  exact, 4 bytes per dimension
+    float16  2 bytes per dimension, scores within ~1e-3 of float32
+    int8     1 byte per dimension plus one float32 scale per row
+
+float16/int8 matrices are upcast in row blocks during scoring, which keeps
+the peak extra memory to one block instead of a float32 copy of the index.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+# Rows upcast at a time when scoring float16/int8 matrices
+SCORE_BLOCK_ROWS = 8192
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Return float32 rows scaled to unit length (zero rows are left as zeros)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k column indices (best first) for each row of a 2-D score matrix.
+
+    Returns:
+        (indices, scores), both shaped (rows, k)
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class VectorIndex:
+    """L2-normalized embedding matrix with vectorized (optionally batched) cosine top-k."""
+
+    def __init__(self, vectors, dtype: str = "float32", normalized: bool = False):
+        """
+        Args:
+            vectors: (rows, dims) embeddings, any float dtype; memory-mapped arrays are
+                used without copying when they are already normalized float32
+            dtype: Storage type, one of SUPPORTED_DTYPES
+            normalized: Rows are already unit length
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}; expected one of {SUPPORTED_DTYPES}")
+        self.dtype = dtype
+        self.scales: Optional[np.ndarray] = None
+
+        if normalized and isinstance(vectors, np.ndarray) and vectors.dtype == np.float32 and vectors.ndim == 2:
+            unit = vectors
+        else:
+            unit = normalize_rows(vectors) if len(vectors) else np.zeros((0, 0), dtype=np.float32)
+
+        if dtype == "float32":
+            self.matrix = unit if unit.flags.c_contiguous else np.ascontiguousarray(unit)
+        elif dtype == "float16":
+            self.matrix = unit.astype(np.float16)
+        else:
+            # Symmetric per-row quantization: row ~= matrix[row] * scales[row]
+            peaks = np.abs(unit).max(axis=1) if len(unit) else np.zeros(0, dtype=np.float32)
+            peaks[peaks == 0] = 1.0
+            self.scales = (peaks / 127.0).astype(np.float32)
+            self.matrix = np.round(unit / self.scales[:, None]).astype(np.int8)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dims(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.matrix.nbytes) + (int(self.scales.nbytes) if self.scales is not None else 0)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every row against unit-length `queries` (q, dims) -> (q, rows)."""
+        if self.dtype == "float32":
+            return queries @ self.matrix.T
+        out = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            block = self.matrix[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            out[:, start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def search_batch(self, queries: Sequence[Sequence[float]], top_k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows for several queries with one matrix product.
+
+        Args:
+            queries: (q, dims) raw query embeddings
+            top_k: Results per query
+
+        Returns:
+            (indices, similarities), both shaped (q, min(top_k, len(index))), best first
+        """
+        queries = normalize_rows(queries)
+        if len(self) == 0:
+            return top_k_rows(np.zeros((queries.shape[0], 0), dtype=np.float32), top_k)
+        if queries.shape[1] != self.dims:
+            raise ValueError(f"Query has {queries.shape[1]} dimensions, index has {self.dims}")
+        return top_k_rows(self.scores(queries), top_k)
+
+    def search(self, query: Sequence[float], top_k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k `(indices, similarities)` for one query, best first."""
+        indices, similarities = self.search_batch([query], top_k)
+        return indices[0], similarities[0]
@@ -1,10 +1,10 @@
 from typing import List, Optional, Union
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from fastembed import TextEmbedding
 
 from app.voice_pipeline.helpers.logger_config import configure_logger
 from app.voice_pipeline.memory.cache.base_cache import BaseCache
+from app.utils.vector_index import VectorIndex
 
 logger = configure_logger(__name__)
 
@@ -15,23 +15,26 @@ class VectorCache(BaseCache):
         self.index_provider = index_provider
         self.embedding_model = TextEmbedding(model_name=embedding_model)
         self.documents: List[str] = []
-        self.embeddings: List[List[float]] = []
+        self.embeddings: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        self.index: Optional[VectorIndex] = None
 
     def set(self, documents: List[str]):
         """
         Store documents and their embeddings in the cache.
         """
         self.documents = documents
-        self.embeddings = list(self.embedding_model.passage_embed(documents))
+        # One float32 matrix (fastembed yields a NumPy row per document), normalized once here
+        vectors = list(self.embedding_model.passage_embed(documents))
+        self.embeddings = np.asarray(vectors, dtype=np.float32) if vectors else np.zeros((0, 0), dtype=np.float32)
+        self.index = VectorIndex(self.embeddings)
         logger.info(f"Cached {len(documents)} documents.")
 
     def _get_most_similar_document(self, query_embedding: np.ndarray) -> str:
         """
         Return the document most similar to the query embedding.
         """
-        similarities = cosine_similarity([query_embedding], self.embeddings)[0]
-        best_match_idx = np.argmax(similarities)
-        return self.documents[best_match_idx]
+        indices, _ = self.index.search(query_embedding, top_k=1)
+        return self.documents[indices[0]]
 
     def get(self, query: Union[str, List[str]]) -> Optional[str]:
         """
@@ -41,5 +44,8 @@ class VectorCache(BaseCache):
             logger.info("Custom index_provider support is not implemented yet.")
             return None
 
+        if self.index is None or not len(self.index):
+            return None
+
         query_embedding = list(self.embedding_model.query_embed(query))[0]
         return self._get_most_similar_document(query_embedding)
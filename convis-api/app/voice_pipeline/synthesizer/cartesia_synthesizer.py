@@ -6,13 +6,13 @@ import websockets
 from websockets.exceptions import InvalidHandshake
 import base64
 import json
-import aiohttp
 import os
 import traceback
 import time
 from collections import deque
 
 from .base_synthesizer import BaseSynthesizer
+from app.services.http_clients import http_clients
 from app.voice_pipeline.helpers.logger_config import configure_logger
 from app.voice_pipeline.helpers.utils import convert_audio_to_wav, create_ws_data_packet, resample
 
@@ -190,7 +190,7 @@ class CartesiaSynthesizer(BaseSynthesizer):
             'Cartesia-Version': self.version
         }
 
-        async with aiohttp.ClientSession() as session:
+        async with http_clients.session("cartesia") as session:
             if payload is not None:
                 async with session.post(self.api_url, headers=headers, json=payload) as response:
                     if response.status == 200:
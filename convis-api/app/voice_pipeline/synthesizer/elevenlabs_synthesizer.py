@@ -5,13 +5,13 @@ import time
 import websockets
 import base64
 import json
-import aiohttp
 import os
 import traceback
 from collections import deque
 
 from app.voice_pipeline.memory.cache.inmemory_scalar_cache import InmemoryScalarCache
 from .base_synthesizer import BaseSynthesizer
+from app.services.http_clients import http_clients
 from app.voice_pipeline.helpers.logger_config import configure_logger
 from app.voice_pipeline.helpers.utils import convert_audio_to_wav, create_ws_data_packet, resample
 
@@ -184,7 +184,7 @@ class ElevenlabsSynthesizer(BaseSynthesizer):
             'xi-api-key': self.api_key
         }
         url = f"{self.api_url}{self.get_format(self.audio_format, self.sampling_rate)}" if format is None else f"{self.api_url}{format}"
-        async with aiohttp.ClientSession() as session:
+        async with http_clients.session("elevenlabs") as session:
             if payload is not None:
                 async with session.post(url, headers=headers, json=payload) as response:
                     if response.status == 200:
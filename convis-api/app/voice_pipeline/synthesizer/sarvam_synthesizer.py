@@ -3,7 +3,6 @@ Sarvam AI TTS Synthesizer for Convis
 Adapted from Bolna architecture
 Uses Sarvam's text-to-speech WebSocket API for Indian voices
 """
-import aiohttp
 import asyncio
 import os
 import websockets
@@ -17,6 +16,7 @@ import base64
 from collections import deque
 
 from .base_synthesizer import BaseSynthesizer
+from app.services.http_clients import http_clients
 from app.voice_pipeline.helpers.logger_config import configure_logger
 from app.voice_pipeline.helpers.utils import (
     create_ws_data_packet,
@@ -105,7 +105,7 @@ class SarvamSynthesizer(BaseSynthesizer):
         headers = self._build_auth_headers()
         headers['Content-Type'] = 'application/json'
 
-        async with aiohttp.ClientSession() as session:
+        async with http_clients.session("sarvam") as session:
             if payload is not None:
                 try:
                     async with session.post(self.api_url, headers=headers, json=payload) as response:
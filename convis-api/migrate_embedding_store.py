@@ -0,0 +1,36 @@
+"""
+Migration script to pack existing kb_embeddings vectors into binary storage.
+Entries stored as lists of doubles are rewritten as packed blobs in
+settings.kb_embedding_store_dtype (or --dtype). Safe to run more than once.
+"""
+import argparse
+import logging
+from app.config.database import Database
+from app.utils.kb_embedding_store import BATCH_SIZE, kb_embedding_store
+from app.utils.packed_vectors import PACKED_DTYPES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def migrate_embedding_store(dtype=None, batch_size=BATCH_SIZE):
+    """Pack all legacy list-format embeddings."""
+    try:
+        Database.connect()
+        converted = kb_embedding_store.migrate_legacy(dtype=dtype, batch_size=batch_size)
+        logger.info(f"Migration complete! Packed {converted} embeddings")
+        Database.close()
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dtype", choices=PACKED_DTYPES, default=None)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    logger.info("Starting kb_embeddings packing migration...")
+    migrate_embedding_store(args.dtype, args.batch_size)
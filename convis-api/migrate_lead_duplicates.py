@@ -0,0 +1,51 @@
+"""
+Migration script to remove duplicate leads before the unique (campaign_id, e164) index is built.
+Per campaign and number, the lead with the most call attempts (then the earliest
+order_index) is kept and the others are deleted. Use --dry-run to only count them.
+Safe to run more than once.
+"""
+import argparse
+import logging
+from app.config.database import Database
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def migrate_lead_duplicates(dry_run=False):
+    """Delete duplicate leads and create the unique index."""
+    try:
+        Database.connect()
+        leads = Database.get_db()["leads"]
+
+        groups = leads.aggregate([
+            {"$match": {"e164": {"$ne": None}}},
+            {"$sort": {"attempts": -1, "order_index": 1, "_id": 1}},
+            {"$group": {"_id": {"campaign_id": "$campaign_id", "e164": "$e164"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ], allowDiskUse=True)
+
+        duplicates = []
+        for group in groups:
+            duplicates.extend(group["ids"][1:])
+        logger.info(f"Found {len(duplicates)} duplicate leads")
+
+        if not dry_run:
+            for start in range(0, len(duplicates), 1000):
+                leads.delete_many({"_id": {"$in": duplicates[start:start + 1000]}})
+            leads.create_index([("campaign_id", 1), ("e164", 1)], unique=True, name="idx_lead_campaign_e164_unique")
+            logger.info(f"Migration complete! Deleted {len(duplicates)} duplicate leads and created the unique index")
+        Database.close()
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    logger.info("Starting duplicate lead migration...")
+    migrate_lead_duplicates(args.dry_run)
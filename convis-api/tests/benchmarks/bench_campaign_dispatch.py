@@ -0,0 +1,162 @@
+"""
+Benchmark: campaign dispatch throughput and refill lag with a fake Twilio
+
+Runs the campaign dispatcher against a scratch MongoDB database and a Redis
+namespace of its own, with a dialer whose place_call sleeps for the Twilio API
+latency and "completes" each call after a random duration. Completions are
+delivered the way the call-status webhook does it:
+
+    event  campaign_queues.call_finished frees the line and wakes the dispatcher
+    poll   the line is freed but the dispatcher is not woken, so it refills on
+           its next interval tick (the behaviour of the old polling loop)
+
+Reported: calls dispatched per second, refill lag (line freed -> next call
+placed, p50/p95/max) and the peak number of concurrent calls (must not exceed
+the campaign's lines).
+
+Needs MongoDB and Redis (e.g. the docker-compose redis service). Run from convis-api/:
+    python tests/benchmarks/bench_campaign_dispatch.py [--leads 2000] [--lines 50] [--mongodb-uri ...]
+
+Not collected by pytest (file name does not start with test_).
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+
+from app.config.database import Database  # noqa: E402
+from app.services.campaign_queues import CampaignQueues  # noqa: E402
+from app.services.campaign_scheduler import CampaignScheduler  # noqa: E402
+
+
+class FakeTwilioDialer:
+    """place_call() with Twilio-like latency; calls end on timers and report back like the webhook."""
+
+    def __init__(self, queues, leads, mode, api_ms, call_seconds):
+        self.queues = queues
+        self.leads = leads
+        self.mode = mode
+        self.api_ms = api_ms
+        self.call_seconds = call_seconds
+        self.last_error = None
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.placed = 0
+        self.completed = 0
+        self.freed_at = []  # lines freed and not refilled yet (epoch seconds)
+        self.lags_ms = []
+        self.done = threading.Event()
+        self.total = 0
+
+    def place_call(self, campaign_id, lead_id):
+        time.sleep(self.api_ms / 1000)
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.placed += 1
+            if self.freed_at:
+                self.lags_ms.append((time.time() - self.freed_at.pop(0)) * 1000)
+        duration = random.expovariate(1.0 / self.call_seconds)
+        threading.Timer(duration, self._complete, args=(campaign_id, lead_id)).start()
+        return f"CA{lead_id}"
+
+    def _complete(self, campaign_id, lead_id):
+        self.leads.update_one({"_id": ObjectId(lead_id)}, {"$set": {"status": "completed", "updated_at": datetime.utcnow()}})
+        with self.lock:
+            self.active -= 1
+            self.completed += 1
+            self.freed_at.append(time.time())
+            if self.completed >= self.total:
+                self.done.set()
+        if self.mode == "event":
+            self.queues.call_finished(campaign_id, lead_id)
+        else:
+            self.queues.remove_inflight(campaign_id, [lead_id])
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(args, mode):
+    client = MongoClient(args.mongodb_uri)
+    db = client[args.database]
+    Database.client, Database.db = client, db
+    namespace = f"bench-{os.getpid()}-{mode}"
+    queues = CampaignQueues(redis_url=args.redis_url, namespace=namespace)
+
+    campaign_id = db["campaigns"].insert_one({
+        "name": f"bench {mode}",
+        "status": "running",
+        "lines": args.lines,
+        "pacing": {"max_concurrent": args.lines},
+        "working_window": {"timezone": "UTC", "start": "00:00", "end": "23:59", "days": list(range(7))},
+    }).inserted_id
+    db["leads"].insert_many([
+        {"campaign_id": campaign_id, "status": "queued", "order_index": i, "e164": f"+1555{i:07d}", "attempts": 0}
+        for i in range(args.leads)
+    ])
+
+    dialer = FakeTwilioDialer(queues, db["leads"], mode, args.api_ms, args.call_seconds)
+    dialer.total = args.leads
+    scheduler = CampaignScheduler(interval_seconds=args.interval, dialer=dialer, queues=queues)
+    started = time.perf_counter()
+    await scheduler.start()
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, dialer.done.wait, args.timeout)
+    finally:
+        await scheduler.shutdown()
+    elapsed = time.perf_counter() - started
+
+    queues.clear(str(campaign_id))
+    client.drop_database(args.database)
+    return {
+        "mode": mode,
+        "calls": dialer.placed,
+        "seconds": elapsed,
+        "calls_per_second": dialer.placed / elapsed,
+        "lag_p50": percentile(dialer.lags_ms, 0.5),
+        "lag_p95": percentile(dialer.lags_ms, 0.95),
+        "lag_max": max(dialer.lags_ms or [0.0]),
+        "peak": dialer.peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--leads", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--call-seconds", type=float, default=2.0, help="mean fake call duration")
+    parser.add_argument("--api-ms", type=float, default=150.0, help="fake Twilio calls.create latency")
+    parser.add_argument("--interval", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--modes", nargs="+", default=["poll", "event"])
+    parser.add_argument("--mongodb-uri", default=os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default="convis_bench_dispatch")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379"))
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'calls':>6} {'seconds':>8} {'calls/s':>8} {'lag p50 ms':>10} {'lag p95 ms':>10} {'lag max ms':>10} {'peak lines':>10}")
+    for mode in args.modes:
+        r = asyncio.run(run(args, mode))
+        print(
+            f"{r['mode']:<6} {r['calls']:>6} {r['seconds']:>8.1f} {r['calls_per_second']:>8.1f} "
+            f"{r['lag_p50']:>10.1f} {r['lag_p95']:>10.1f} {r['lag_max']:>10.1f} {r['peak']:>5}/{args.lines:<4}"
+        )
+
+
+if __name__ == "__main__":
+    main()
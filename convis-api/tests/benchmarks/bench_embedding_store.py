@@ -0,0 +1,81 @@
+"""
+Benchmark: loading knowledge-base embeddings from kb_embeddings documents
+
+Compares the old storage (BSON arrays of doubles decoded into Python lists)
+against packed binary vectors (float32 / float16 / int8 + scale) decoded with
+unpack_matrix. Documents are BSON-encoded and decoded in-process with the
+bson module that ships with pymongo, so no MongoDB server is needed; the
+numbers cover what a worker spends after the bytes arrive from the server.
+
+Reported per size: BSON bytes per chunk, decode+load time, and the memory
+still held by the loaded result (tracemalloc), i.e. what a loaded KB costs.
+
+Run from convis-api/:
+    python tests/benchmarks/bench_embedding_store.py [--sizes 1000 10000] [--dims 1536]
+
+Not collected by pytest (file name does not start with test_).
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import bson
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.utils.packed_vectors import pack_vectors, unpack_matrix  # noqa: E402
+
+
+def encode_docs(embeddings, dtype):
+    if dtype == "legacy":
+        docs = [{"_id": f"m:{i}", "hash": str(i), "vector": row.tolist()} for i, row in enumerate(embeddings)]
+    else:
+        docs = [dict(fields, _id=f"m:{i}", hash=str(i)) for i, fields in enumerate(pack_vectors(embeddings, dtype))]
+    return [bson.encode(doc) for doc in docs]
+
+
+def load(raw_docs, dtype):
+    docs = [bson.decode(raw) for raw in raw_docs]
+    if dtype == "legacy":
+        # What callers held before: {hash: list of floats}
+        return {doc["hash"]: doc["vector"] for doc in docs}
+    return [doc["hash"] for doc in docs], unpack_matrix(docs)
+
+
+def measure(raw_docs, dtype):
+    load(raw_docs[:100], dtype)  # warm-up
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load(raw_docs, dtype)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed_ms, held / 1e6, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--dims", type=int, default=1536)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'storage':<10} {'KB/chunk':>9} {'load ms':>9} {'held MB':>9} {'peak MB':>9} {'per 10k MB':>10}")
+    for size in args.sizes:
+        embeddings = rng.standard_normal((size, args.dims)).astype(np.float32)
+        for dtype in ("legacy", "float32", "float16", "int8"):
+            raw_docs = encode_docs(embeddings, dtype)
+            kb_per_chunk = sum(len(raw) for raw in raw_docs) / size / 1024
+            load_ms, held_mb, peak_mb = measure(raw_docs, dtype)
+            print(
+                f"{size:>8} {dtype:<10} {kb_per_chunk:>9.1f} {load_ms:>9.1f} {held_mb:>9.1f} "
+                f"{peak_mb:>9.1f} {held_mb * 10000 / size:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
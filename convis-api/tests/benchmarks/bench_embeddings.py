@@ -0,0 +1,103 @@
+"""
+Benchmark: knowledge-base embedding backends
+
+Compares the OpenAI (text-embedding-3-small) and local fastembed
+(settings.local_embedding_model) backends on:
+  - query latency: one utterance at a time, as on the call path (p50/p95)
+  - ingestion throughput: chunks per second for a document's worth of chunks
+
+The OpenAI backend is skipped unless OPENAI_API_KEY is set.
+
+Run from convis-api/:
+    python tests/benchmarks/bench_embeddings.py [--queries 50] [--chunks 500]
+
+Not collected by pytest (file name does not start with test_).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.embedding_service import (  # noqa: E402
+    LOCAL_BACKEND,
+    OPENAI_BACKEND,
+    EmbeddingService,
+    embedding_model_id,
+)
+from app.services.http_clients import http_clients  # noqa: E402
+
+UTTERANCES = [
+    "what are your opening hours on saturday",
+    "do you have parking near the clinic",
+    "how much does a cleaning cost",
+    "can I reschedule my appointment to next week",
+    "is the doctor available in the evening",
+    "do you accept my insurance",
+    "where exactly is the office",
+    "how long does the first visit take",
+]
+
+CHUNK = (
+    "Our clinic is open Monday to Friday from 9am to 6pm and on Saturdays from 10am to 2pm. "
+    "Free parking is available behind the building; street parking is limited to two hours. "
+)
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+async def bench_backend(backend, api_key, queries, chunks):
+    service = EmbeddingService()
+    model = embedding_model_id(backend)
+
+    # Warm-up (model load / connection setup) is reported separately
+    started = time.perf_counter()
+    await service.embed_query("warm up", api_key, model)
+    warmup_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for i in range(queries):
+        # Unique text per query so the LRU cache does not hide the backend latency
+        text = f"{UTTERANCES[i % len(UTTERANCES)]} {i}"
+        started = time.perf_counter()
+        await service.embed_query(text, api_key, model)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    texts = [f"{CHUNK} ({i})" for i in range(chunks)]
+    started = time.perf_counter()
+    await service.embed_documents(texts, api_key, model)
+    ingest_s = time.perf_counter() - started
+
+    await service.shutdown()
+    print(
+        f"{backend:<8} {model:<40} warm-up {warmup_ms:>8.0f}ms  "
+        f"query p50 {percentile(latencies, 0.5):>7.1f}ms p95 {percentile(latencies, 0.95):>7.1f}ms  "
+        f"ingest {chunks / ingest_s:>8.1f} chunks/s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=500)
+    args = parser.parse_args()
+
+    await http_clients.start()
+    try:
+        await bench_backend(LOCAL_BACKEND, None, args.queries, args.chunks)
+        api_key = os.getenv("OPENAI_API_KEY")
+        if api_key:
+            await bench_backend(OPENAI_BACKEND, api_key, args.queries, args.chunks)
+        else:
+            print("openai   skipped (OPENAI_API_KEY not set)")
+    finally:
+        await http_clients.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Benchmark: vector-only vs BM25-only vs hybrid (RRF) knowledge-base retrieval
+
+Builds a sample KB (plans, SKUs, prices, policy numbers and FAQ prose, chunked
+like uploads) and a labelled query set mixing exact-token questions ("what
+does VX-4471 cost?") with paraphrased ones. Reports recall@k, MRR@10,
+per-query latency and the context tokens each mode would inject into a call.
+
+Embeddings come from the local fastembed model (settings.local_embedding_model),
+so the run is offline once the model is cached. Run from convis-api/:
+    python tests/benchmarks/bench_hybrid_retrieval.py [--products 200] [--top-k 3]
+
+Not collected by pytest (file name does not start with test_).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.config.settings import settings  # noqa: E402
+from app.services.embedding_service import local_models  # noqa: E402
+from app.utils.conversational_rag import _hybrid_context, build_index_chunks, estimate_tokens  # noqa: E402
+from app.utils.kb_index import KnowledgeBaseIndexStore  # noqa: E402
+
+PRODUCTS = ["headset", "speakerphone", "webcam", "desk phone", "router", "dock", "handset", "conference hub"]
+FEATURES = ["noise cancelling", "wireless", "wired", "bluetooth", "4K", "dual band", "USB-C", "solar"]
+FAQ = [
+    ("Our support team answers calls from nine to five, Monday to Friday.", "when can I call support"),
+    ("Refunds are issued to the original payment method within ten business days.", "how long does a refund take"),
+    ("Orders placed before noon ship the same day from our central warehouse.", "if I order this morning when will it ship"),
+    ("You can cancel a subscription at any time from the billing page of your account.", "how do I stop my subscription"),
+]
+
+
+def build_kb(products, rng):
+    docs, queries = [], []
+    for n in range(products):
+        sku = f"VX-{rng.randint(1000, 9999)}"
+        price = f"{rng.randint(9, 499)}.{rng.choice(['00', '49', '99'])}"
+        policy = f"POL/2024/{n:03d}"
+        product = f"{rng.choice(FEATURES)} {rng.choice(PRODUCTS)}"
+        docs.append(
+            f"SKU {sku} is our {product}. It costs ${price} and is covered by warranty policy {policy} "
+            f"for {rng.randint(1, 3)} years."
+        )
+        row = len(docs) - 1
+        queries.append((f"how much is {sku}", row, "exact"))
+        queries.append((f"what does policy {policy} cover", row, "exact"))
+        queries.append((f"which product costs {price} dollars", row, "exact"))
+    for text, question in FAQ:
+        docs.append(text)
+        queries.append((question, len(docs) - 1, "paraphrase"))
+    chunks = [
+        {'id': f"chunk_{i}", 'text': text, 'paragraph_id': i, 'char_count': len(text)}
+        for i, text in enumerate(docs)
+    ]
+    return build_index_chunks("catalog.pdf", "pdf", chunks), queries
+
+
+def rank_of(rows, target):
+    rows = list(rows)
+    return rows.index(target) if target in rows else None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    chunks, queries = build_kb(args.products, rng)
+    model = settings.local_embedding_model
+    embeddings = local_models.embed_passages(model, [chunk['text'] for chunk in chunks])
+    query_vectors = local_models.embed_queries(model, [q for q, _, _ in queries])
+
+    with tempfile.TemporaryDirectory() as root:
+        store = KnowledgeBaseIndexStore(root=root)
+        store.replace("bench", embeddings, chunks, f"local:{model}")
+        index = store.get("bench")
+        row_of = {chunk['id']: row for row, chunk in enumerate(index.chunks)}
+
+        modes = {
+            "vector": lambda q, v: [row_of[c['id']] for c, _ in index.search(v, 10)],
+            "bm25": lambda q, v: list(index.lexical.search(q, 10)[0]),
+            "hybrid": lambda q, v: [row_of[c['id']] for c, _, _ in index.hybrid_search(v, q, settings.kb_hybrid_candidates, settings.kb_rrf_k)][:10],
+        }
+        print(f"{len(chunks)} chunks, {len(queries)} queries")
+        print(f"{'mode':<8} {'kind':<11} {'recall@k':>8} {'MRR@10':>7} {'ms/query':>9}")
+        for name, search in modes.items():
+            for kind in ("exact", "paraphrase", "all"):
+                selected = [(q, target, v) for (q, target, k), v in zip(queries, query_vectors) if kind in (k, "all")]
+                hits, reciprocal, elapsed = 0, 0.0, 0.0
+                for query, target, vector in selected:
+                    start = time.perf_counter()
+                    rows = search(query, vector)
+                    elapsed += time.perf_counter() - start
+                    rank = rank_of(rows, target)
+                    hits += rank is not None and rank < args.top_k
+                    reciprocal += 1.0 / (rank + 1) if rank is not None else 0.0
+                print(f"{name:<8} {kind:<11} {hits / len(selected):>8.3f} {reciprocal / len(selected):>7.3f} {elapsed / len(selected) * 1000:>9.3f}")
+
+        # Context actually injected into a call (threshold + token budget)
+        vector_tokens = hybrid_tokens = 0
+        for (query, _, _), vector in zip(queries, query_vectors):
+            vector_parts = [
+                f"[From catalog.pdf]: {c['text']}" for c, s in index.search(vector, args.top_k) if s >= args.threshold
+            ]
+            vector_tokens += sum(estimate_tokens(part) for part in vector_parts)
+            hybrid_parts = _hybrid_context(index, vector, query, args.top_k, args.threshold)
+            hybrid_tokens += sum(estimate_tokens(part) for part in hybrid_parts)
+        print(
+            f"avg context tokens/query: vector {vector_tokens / len(queries):.1f}, "
+            f"hybrid {hybrid_tokens / len(queries):.1f} (budget {settings.kb_context_token_budget})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark: CSV lead import throughput and peak memory
+
+Generates a CSV of synthetic leads (valid, invalid and repeated numbers) and
+imports it into a scratch MongoDB database in two ways:
+
+    legacy     the old upload handler: whole file read and decoded, rows
+               validated one by one in the request, every lead built in one
+               list, one insert_many
+    streaming  LeadImporter.run_job: the file read incrementally, chunks
+               validated on a process pool, ordered bulk batches deduplicated
+               by the unique (campaign_id, e164) index
+
+Each mode runs in a fresh interpreter so peak RSS is its own; for streaming the
+peak of the pool processes is reported as well. Reported: rows per second and
+peak RSS (MB).
+
+Needs MongoDB. Run from convis-api/:
+    python tests/benchmarks/bench_lead_import.py [--rows 1000000] [--processes 4] [--mongodb-uri ...]
+
+Not collected by pytest (file name does not start with test_).
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from pymongo import MongoClient  # noqa: E402
+
+from app.config.database import Database  # noqa: E402
+from app.config.settings import settings  # noqa: E402
+
+
+def write_csv(path, rows, seed=7):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["phone", "first_name", "last_name", "email", "plan"])
+        for i in range(rows):
+            roll = rng.random()
+            if roll < 0.02:
+                phone = "12345"  # invalid
+            elif roll < 0.04:
+                phone = f"+1 650 253 {rng.randrange(10000):04d}"  # likely repeated
+            else:
+                phone = f"+1 {rng.choice(['212', '415', '646', '650', '718'])} {rng.randrange(200, 1000)} {rng.randrange(10000):04d}"
+            writer.writerow([phone, f"First{i}", f"Last{i}", f"lead{i}@example.com", rng.choice(["gold", "silver", ""])])
+
+
+def connect(args):
+    client = MongoClient(args.mongodb_uri)
+    client.drop_database(args.database)
+    db = client[args.database]
+    Database.client, Database.db = client, db
+    db["leads"].create_index([("campaign_id", 1), ("e164", 1)], unique=True)
+    campaign_id = db["campaigns"].insert_one({"country": "US", "working_window": {"timezone": "America/New_York"}, "next_index": 0}).inserted_id
+    return client, db, campaign_id
+
+
+def run_legacy(args, db, campaign_id):
+    from app.services.lead_import import insert_leads, new_lead_document
+    from app.utils.lead_csv import normalize_row
+
+    with open(args.csv, "rb") as f:
+        contents = f.read()
+    reader = csv.reader(io.StringIO(contents.decode("utf-8")))
+    header = [name.strip() for name in next(reader)]
+    now = datetime.utcnow()
+    docs = []
+    rows = 0
+    for row in reader:
+        rows += 1
+        fields, _ = normalize_row(header, row, "US", "America/New_York")
+        if fields is not None:
+            docs.append(new_lead_document(fields, campaign_id, len(docs), None, now))
+    inserted, _ = insert_leads(db["leads"], docs)
+    return rows, inserted
+
+
+def run_streaming(args, db, campaign_id):
+    from app.services.lead_import import LeadImporter
+
+    settings.lead_import_processes = args.processes
+    settings.lead_import_chunk_rows = args.chunk_rows
+    importer = LeadImporter()
+    importer.enqueue(str(campaign_id), "bench.csv", args.copy, os.path.getsize(args.copy))
+    job = importer._claim()
+    importer.run_job(job)
+    importer._pool.shutdown(wait=True)
+    progress = db["lead_import_jobs"].find_one({"_id": job["_id"]})["progress"]
+    return progress["rows"], progress["valid"]
+
+
+def child(args):
+    client, db, campaign_id = connect(args)
+    started = time.perf_counter()
+    rows, inserted = (run_legacy if args.run == "legacy" else run_streaming)(args, db, campaign_id)
+    elapsed = time.perf_counter() - started
+    client.drop_database(args.database)
+    print(json.dumps({
+        "rows": rows,
+        "inserted": inserted,
+        "seconds": elapsed,
+        # ru_maxrss is in KiB on Linux
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    parser.add_argument("--modes", nargs="+", default=["legacy", "streaming"])
+    parser.add_argument("--mongodb-uri", default=os.getenv("BENCH_MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default="convis_bench_lead_import")
+    parser.add_argument("--run", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    parser.add_argument("--copy", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "leads.csv")
+        write_csv(path, args.rows)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{args.rows} rows, {size_mb:.1f} MB CSV, {args.processes} processes")
+        print(f"{'mode':<10} {'rows':>9} {'inserted':>9} {'seconds':>8} {'rows/s':>9} {'peak MB':>8} {'pool MB':>8}")
+        for mode in args.modes:
+            # The import job deletes its file when it finishes
+            copy = os.path.join(tmp, f"{mode}.csv")
+            shutil.copyfile(path, copy)
+            output = subprocess.run(
+                [sys.executable, __file__, "--run", mode, "--csv", path, "--copy", copy,
+                 "--processes", str(args.processes), "--chunk-rows", str(args.chunk_rows),
+                 "--mongodb-uri", args.mongodb_uri, "--database", args.database],
+                check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(output)
+            pool_mb = f"{result['children_rss_mb']:8.0f}" if mode == "streaming" else f"{'-':>8}"
+            print(
+                f"{mode:<10} {result['rows']:>9} {result['inserted']:>9} {result['seconds']:>8.1f} "
+                f"{result['rows'] / result['seconds']:>9.0f} {result['rss_mb']:>8.0f} {pool_mb}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: PDF text extraction on a corpus of mixed PDFs
+
+Generates a corpus (text-only, scanned-only and mixed documents; scanned pages
+are rendered text embedded as images) and compares the previous extractor
+(PyMuPDF text, then sequential OCR of every page) with PdfExtractor
+(per-page classification, OCR of scanned pages on a process pool), cold and
+from the file-hash cache.
+
+Needs PyMuPDF, pytesseract, Pillow and the tesseract binary. Run from convis-api/:
+    python tests/benchmarks/bench_pdf_extraction.py [--pages 40] [--workers 4] [--corpus DIR]
+
+Not collected by pytest (file name does not start with test_).
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import fitz  # noqa: E402
+
+from app.utils.pdf_extraction import PdfExtractor  # noqa: E402
+
+PARAGRAPH = (
+    "Customers can reach support from nine to five on weekdays. Orders placed before noon ship "
+    "the same day, and returns are accepted within thirty days with the original receipt."
+)
+
+
+def add_text_page(doc, number):
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(50, 50, 545, 790), f"Page {number}\n\n" + (PARAGRAPH + "\n\n") * 6, fontsize=11)
+
+
+def add_scanned_page(doc, number):
+    source = fitz.open()
+    add_text_page(source, number)
+    pixmap = source[0].get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=pixmap)
+
+
+def build_corpus(directory, pages):
+    """text.pdf (all text), scanned.pdf (all image) and mixed.pdf (every third page scanned)."""
+    layouts = {
+        "text.pdf": lambda n: False,
+        "scanned.pdf": lambda n: True,
+        "mixed.pdf": lambda n: n % 3 == 0,
+    }
+    paths = []
+    for name, is_scanned in layouts.items():
+        doc = fitz.open()
+        for number in range(pages):
+            (add_scanned_page if is_scanned(number) else add_text_page)(doc, number + 1)
+        path = os.path.join(directory, name)
+        doc.save(path)
+        paths.append(path)
+    return paths
+
+
+def legacy_extract(file_path):
+    """The previous extract_text_from_pdf: whole-file text, else OCR every page in turn."""
+    import pytesseract
+    from PIL import Image
+
+    doc = fitz.open(file_path)
+    text = ""
+    for page in doc:
+        text += page.get_text() + "\n"
+    if len(text.strip()) > 100:
+        doc.close()
+        return text.strip()
+    ocr_text = ""
+    for page in doc:
+        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
+        ocr_text += pytesseract.image_to_string(Image.open(io.BytesIO(pix.tobytes("png")))) + "\n"
+    doc.close()
+    return ocr_text.strip()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--corpus", help="directory of PDFs to use instead of the generated corpus")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = [os.path.join(args.corpus, name) for name in sorted(os.listdir(args.corpus)) if name.endswith(".pdf")]
+        else:
+            paths = build_corpus(tmp, args.pages)
+        extractor = PdfExtractor(cache_path=os.path.join(tmp, "cache"), workers=args.workers)
+
+        print(f"{'document':<14} {'pages':>5} {'ocr':>4} {'legacy ms':>10} {'pool ms':>9} {'cached ms':>10} {'chars legacy/pool':>18}")
+        for path in paths:
+            legacy_text, legacy_ms = timed(lambda: legacy_extract(path))
+            pages, pool_ms = timed(lambda: extractor.extract(path))
+            _, cached_ms = timed(lambda: extractor.extract(path))
+            ocr_pages = sum(page["kind"] == "ocr" for page in pages)
+            chars = sum(len(page["text"].strip()) for page in pages)
+            print(
+                f"{os.path.basename(path):<14} {len(pages):>5} {ocr_pages:>4} {legacy_ms:>10.0f} {pool_ms:>9.0f} "
+                f"{cached_ms:>10.1f} {len(legacy_text):>9}/{chars:<8}"
+            )
+        extractor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: knowledge-base top-k search
+
+Compares the old per-chunk sklearn cosine_similarity loop + full sort against
+VectorIndex (float32 / float16 / int8) for single and batched queries, at 1k,
+10k and 100k chunks of 1536-dim embeddings (text-embedding-3-small).
+
+Run from convis-api/:
+    python tests/benchmarks/bench_vector_index.py [--sizes 1000 10000 100000] [--dims 1536]
+
+Not collected by pytest (file name does not start with test_).
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.utils.vector_index import VectorIndex  # noqa: E402
+
+
+def timeit(fn, repeat):
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def legacy_search(query, knowledge_base, top_k):
+    """The previous rag.search_knowledge_base scoring loop (without the embeddings call)."""
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    results = []
+    for item in knowledge_base:
+        similarity = cosine_similarity([query], [item['embedding']])[0][0]
+        results.append({'text': item['text'], 'similarity': float(similarity)})
+    results.sort(key=lambda x: x['similarity'], reverse=True)
+    return results[:top_k]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--legacy-max", type=int, default=10000, help="skip the legacy loop above this size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'variant':<22} {'index MB':>9} {'build ms':>9} {'query ms':>9} {'batch/q ms':>10} {'recall@k':>8}")
+    for size in args.sizes:
+        embeddings = rng.standard_normal((size, args.dims)).astype(np.float32)
+        queries = rng.standard_normal((args.batch, args.dims)).astype(np.float32)
+
+        exact = VectorIndex(embeddings)
+        exact_top, _ = exact.search_batch(queries, args.top_k)
+
+        if size <= args.legacy_max:
+            knowledge_base = [{'text': str(i), 'embedding': row.tolist()} for i, row in enumerate(embeddings)]
+            legacy_ms = timeit(lambda: legacy_search(queries[0].tolist(), knowledge_base, args.top_k), repeat=3)
+            print(f"{size:>8} {'legacy sklearn loop':<22} {'-':>9} {'-':>9} {legacy_ms:>9.2f} {'-':>10} {'1.000':>8}")
+
+        for dtype in ("float32", "float16", "int8"):
+            start = time.perf_counter()
+            index = VectorIndex(embeddings, dtype=dtype)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            query_ms = timeit(lambda: index.search(queries[0], args.top_k), repeat=20)
+            batch_ms = timeit(lambda: index.search_batch(queries, args.top_k), repeat=10) / args.batch
+
+            top, _ = index.search_batch(queries, args.top_k)
+            recall = np.mean([len(set(a) & set(b)) / args.top_k for a, b in zip(top, exact_top)])
+            print(
+                f"{size:>8} {'VectorIndex ' + dtype:<22} {index.nbytes / 1e6:>9.1f} {build_ms:>9.1f} "
+                f"{query_ms:>9.3f} {batch_ms:>10.3f} {recall:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Unit tests for the semantic answer cache (per-assistant scopes, threshold, TTL)
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import answer_cache as answer_cache_module
+from app.routes.frejun import custom_provider_stream
+from app.services.answer_cache import AnswerCache, answer_scope, repeats_caller_details
+
+VECTORS = {
+    "what are your opening hours": [1.0, 0.0, 0.0],
+    "when are you open today": [0.98, 0.2, 0.0],
+    "how much is the premium plan": [0.0, 1.0, 0.0],
+    "i would like the premium plan": [0.0, 0.6, 0.8],
+    "i would like the basic plan": [0.6, 0.0, 0.8],
+    "how much is that one": [0.0, 0.0, 1.0],
+}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(
+        answer_cache_module.embedding_service,
+        "embed_query",
+        AsyncMock(side_effect=lambda text, api_key, model: VECTORS[text]),
+    )
+    monkeypatch.setattr(answer_cache_module, "kb_version", lambda assistant_id: "gen-1")
+    return AnswerCache()
+
+
+async def store_hours(cache, scope="scope-a"):
+    answer, vector = await cache.lookup("a1", scope, "what are your opening hours", "key", "openai:test")
+    assert answer is None
+    return cache.store("a1", scope, "what are your opening hours", vector, "9 to 5, Monday to Friday.", "twilio", b"audio")
+
+
+@pytest.mark.asyncio
+async def test_similar_question_hits(cache):
+    await store_hours(cache)
+    answer, _ = await cache.lookup("a1", "scope-a", "when are you open today", "key", "openai:test")
+    assert answer.answer == "9 to 5, Monday to Friday."
+    assert answer.audio["twilio"] == b"audio"
+
+    missed, _ = await cache.lookup("a1", "scope-a", "how much is the premium plan", "key", "openai:test")
+    assert missed is None
+
+    stats = cache.stats()["assistants"]["a1"]
+    assert stats["lookups"] == 3 and stats["hits"] == 1 and stats["entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_other_scope_or_assistant_misses(cache):
+    await store_hours(cache)
+    answer, _ = await cache.lookup("a1", "scope-b", "what are your opening hours", "key", "openai:test")
+    assert answer is None
+    answer, _ = await cache.lookup("a2", "scope-a", "what are your opening hours", "key", "openai:test")
+    assert answer is None
+
+
+@pytest.mark.asyncio
+async def test_short_utterances_are_not_cached(cache):
+    answer, vector = await cache.lookup("a1", "scope-a", "yes", "key", "openai:test")
+    assert answer is None and vector is None
+    assert cache.store("a1", "scope-a", "yes", vector, "Great!") is None
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_miss(cache):
+    entry = await store_hours(cache)
+    entry.created_at -= answer_cache_module.settings.answer_cache_ttl_seconds + 1
+    answer, _ = await cache.lookup("a1", "scope-a", "what are your opening hours", "key", "openai:test")
+    assert answer is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_scope_changes_with_prompt_and_kb(monkeypatch):
+    monkeypatch.setattr(answer_cache_module, "kb_version", lambda assistant_id: "gen-1")
+    base = answer_scope("a1", "You are a receptionist.", {"tts": ["cartesia", "v1"]})
+    assert base == answer_scope("a1", "You are a receptionist.", {"tts": ["cartesia", "v1"]})
+    assert base != answer_scope("a1", "You are a sales agent.", {"tts": ["cartesia", "v1"]})
+    assert base != answer_scope("a1", "You are a receptionist.", {"tts": ["cartesia", "v2"]})
+
+    monkeypatch.setattr(answer_cache_module, "kb_version", lambda assistant_id: "gen-2")
+    assert base != answer_scope("a1", "You are a receptionist.", {"tts": ["cartesia", "v1"]})
+
+
+def test_answers_repeating_caller_details_are_flagged():
+    prompt = "You are the receptionist at Acme Dental."
+    assert repeats_caller_details("Hi this is Rahul, when are you open", "Hi Rahul! We open at nine.", prompt)
+    assert repeats_caller_details("my account is 4471 what do I owe", "Account 4471 owes nothing.", prompt)
+    assert not repeats_caller_details("Is Acme open on weekends", "Acme is closed on weekends.", prompt)
+    assert not repeats_caller_details("I'd like to know your hours", "We are open nine to five.", prompt)
+
+
+def make_conversation(cache, answers):
+    """Custom-provider call whose LLM returns `answers` in order (ASR, TTS and sending mocked)."""
+    handler = custom_provider_stream.CustomProviderStreamHandler(
+        MagicMock(), {"assistant_id": "a1", "system_message": "You sell plans."}, "key", "call", platform="twilio"
+    )
+    handler.conversation_history.append({"role": "system", "content": handler.system_message})
+    handler.asr_provider = MagicMock()
+    handler.generate_llm_response = AsyncMock(side_effect=answers)
+    handler._synthesize_response = AsyncMock(return_value=(b"pcm", 1.0))
+    handler._convert_tts_audio = lambda audio: audio
+    handler._send_response_audio = AsyncMock(return_value=True)
+    handler.log_interaction = AsyncMock()
+    return handler
+
+
+async def say(handler, transcript):
+    handler.asr_provider.transcribe = AsyncMock(return_value=transcript)
+    handler.audio_buffer.extend(b"audio")
+    await handler.transcribe_and_respond()
+    return handler.conversation_history[-1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_follow_ups_are_not_shared_between_conversations(cache, monkeypatch):
+    monkeypatch.setattr(custom_provider_stream, "answer_cache", cache)
+    first = make_conversation(cache, ["Premium it is.", "Premium is $50 a month."])
+    second = make_conversation(cache, ["Basic it is.", "Basic is $10 a month."])
+
+    await say(first, "i would like the premium plan")
+    assert await say(first, "how much is that one") == "Premium is $50 a month."
+    await say(second, "i would like the basic plan")
+    assert await say(second, "how much is that one") == "Basic is $10 a month."
+    assert second.generate_llm_response.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_opening_questions_are_shared_between_conversations(cache, monkeypatch):
+    monkeypatch.setattr(custom_provider_stream, "answer_cache", cache)
+    first = make_conversation(cache, ["9 to 5, Monday to Friday."])
+    second = make_conversation(cache, [])
+
+    await say(first, "what are your opening hours")
+    assert await say(second, "when are you open today") == "9 to 5, Monday to Friday."
+    assert second.generate_llm_response.await_count == 0
@@ -0,0 +1,98 @@
+"""
+Unit tests for call-status processing driven by call events (idempotent completion per call_sid)
+"""
+import pytest
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import call_status_processor
+from app.services.call_events import CallEvent, CallEventConsumer
+
+
+class FakeAttempts:
+    """The subset of a pymongo collection process_call_status uses on call_attempts."""
+
+    def __init__(self, attempts):
+        self.attempts = {attempt["call_sid"]: attempt for attempt in attempts}
+
+    @staticmethod
+    def _matches(doc, query):
+        for key, expected in query.items():
+            if isinstance(expected, dict) and "$ne" in expected:
+                if doc.get(key) == expected["$ne"]:
+                    return False
+            elif doc.get(key) != expected:
+                return False
+        return True
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.attempts.get(query["call_sid"])
+        if doc is None or not self._matches(doc, query):
+            if not upsert:
+                return SimpleNamespace(matched_count=0, modified_count=0)
+            if doc is None:
+                doc = self.attempts[query["call_sid"]] = {"call_sid": query["call_sid"]}
+                doc.update(update.get("$setOnInsert", {}))
+        before = dict(doc)
+        doc.update(update.get("$set", {}))
+        return SimpleNamespace(matched_count=1, modified_count=int(doc != before))
+
+    def find_one_and_update(self, query, update, projection=None):
+        doc = self.attempts.get(query["call_sid"])
+        if doc is None or not self._matches(doc, query):
+            return None
+        before = dict(doc)
+        doc.update(update["$set"])
+        return before
+
+
+class RecordingCounters:
+    def __init__(self):
+        self.talk = []
+
+    def talk_time(self, campaign_id, seconds):
+        self.talk.append((campaign_id, seconds))
+
+
+class RecordingDialer:
+    def __init__(self):
+        self.completed = []
+
+    def handle_call_completed(self, campaign_id, lead_id, call_status):
+        self.completed.append((campaign_id, lead_id, call_status))
+
+
+@pytest.fixture
+def attempts(monkeypatch):
+    collection = FakeAttempts([{"call_sid": "CA1", "campaign_id": "camp1", "status": "ringing", "ended_at": None}])
+    monkeypatch.setattr(call_status_processor.Database, "get_db", classmethod(lambda cls: {"call_attempts": collection}))
+    monkeypatch.setattr(call_status_processor, "_dialer", RecordingDialer())
+    monkeypatch.setattr(call_status_processor, "campaign_counters", RecordingCounters())
+    return collection
+
+
+def test_completion_is_handled_once_per_call(attempts):
+    consumer = CallEventConsumer()
+    # The assistant hang-up arrives first, then Twilio's callback and its retry
+    consumer._apply(CallEvent("CA1", "completed", None, "lead1", "camp1", source="assistant-hangup"))
+    consumer._apply(CallEvent("CA1", "completed", "42", "lead1", "camp1"))
+    consumer._apply(CallEvent("CA1", "completed", "42", "lead1", "camp1"))
+
+    assert call_status_processor._dialer.completed == [("camp1", "lead1", "completed")]
+    assert attempts.attempts["CA1"]["duration"] == 42
+    # The retried callback reports the duration again; talk time is counted once
+    assert call_status_processor.campaign_counters.talk == [("camp1", 42)]
+    assert consumer.processed == 3 and consumer.failed == 0
+
+
+def test_late_webhook_does_not_reopen_a_finished_call(attempts):
+    consumer = CallEventConsumer()
+    consumer._apply(CallEvent("CA1", "no-answer", None, "lead1", "camp1", source="sweeper"))
+    consumer._apply(CallEvent("CA1", "ringing", None, "lead1", "camp1"))
+
+    assert attempts.attempts["CA1"]["status"] == "no-answer"
+    assert attempts.attempts["CA1"]["ended_at"] is not None
+    assert call_status_processor._dialer.completed == [("camp1", "lead1", "no-answer")]
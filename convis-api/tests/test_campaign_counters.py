@@ -0,0 +1,67 @@
+"""
+Unit tests for campaign counter deltas and the stats computed from a counters document
+"""
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.campaign_counters import campaign_stats, lead_delta
+
+
+def test_status_change_moves_one_lead():
+    assert lead_delta({"status": "calling"}, {"status": "completed"}) == {
+        "status.calling": -1,
+        "status.completed": 1,
+    }
+
+
+def test_unchanged_status_is_not_counted():
+    assert lead_delta({"status": "queued"}, {"status": "queued", "attempts": 2}) == {}
+
+
+def test_sentiment_replaced():
+    delta = lead_delta(
+        {"sentiment": {"label": "neutral", "score": 0.0}},
+        {"sentiment": {"label": "positive", "score": 0.75}},
+    )
+    assert delta == {
+        "sentiment.neutral": -1,
+        "sentiment.positive": 1,
+        "sentiment.score_sum": 0.75,
+    }
+
+
+def test_first_sentiment_and_booking():
+    delta = lead_delta({}, {"sentiment": {"label": "positive", "score": 0.5}, "calendar_booked": True})
+    assert delta == {
+        "sentiment.positive": 1,
+        "sentiment.scored": 1,
+        "sentiment.score_sum": 0.5,
+        "calendar_bookings": 1,
+    }
+    assert lead_delta({"calendar_booked": True}, {"calendar_booked": True}) == {}
+
+
+def test_campaign_stats_from_counters():
+    stats = campaign_stats({
+        "status": {"queued": 3, "completed": 2, "no-answer": 1, "calling": 0},
+        "sentiment": {"positive": 2, "scored": 2, "score_sum": 1.5},
+        "calendar_bookings": 1,
+        "calls": 4,
+        "talk": {"calls": 2, "seconds": 90},
+        "cost": {"USD": 0.12345, "INR": 0},
+    })
+    assert stats["total_leads"] == 6
+    assert stats["no_answer"] == 1
+    assert stats["avg_sentiment_score"] == pytest.approx(0.75)
+    assert stats["avg_call_duration"] == pytest.approx(45)
+    assert stats["total_cost"] == {"USD": 0.1235}
+
+
+def test_campaign_stats_empty_campaign():
+    stats = campaign_stats({})
+    assert stats["total_leads"] == 0
+    assert stats["avg_sentiment_score"] is None
+    assert stats["avg_call_duration"] is None
@@ -0,0 +1,79 @@
+"""
+Unit tests for streaming campaign report exports (row mapping, chunked CSV, gzip)
+"""
+import csv
+import gzip
+import io
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+
+from app.services import campaign_export
+from app.services.campaign_export import COLUMNS, stream_report
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeDb:
+    def __init__(self, leads):
+        self.leads = leads
+        self.pipelines = []
+
+    def __getitem__(self, name):
+        assert name == "leads"
+        return self
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return FakeCursor(self.leads)
+
+
+def make_leads(count):
+    return [
+        {
+            "_id": ObjectId(), "e164": f"+1650253{i:04d}", "name": f"Lead {i}", "status": "completed",
+            "attempts": 1, "sentiment": {"label": "positive", "score": 0.9} if i % 2 else None,
+            "calendar_booked": i == 0,
+            "last_recording": [{"recording_url": f"https://example.com/{i}.mp3"}] if i % 3 == 0 else [],
+        }
+        for i in range(count)
+    ]
+
+
+def test_csv_export_streams_in_chunks(monkeypatch):
+    monkeypatch.setattr(campaign_export, "CSV_FLUSH_ROWS", 10)
+    leads = make_leads(25)
+    db = FakeDb(leads)
+
+    chunks = list(stream_report(db, ObjectId(), "csv"))
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+
+    assert rows[0] == COLUMNS
+    assert len(rows) == 26
+    assert rows[1][7] == "Yes" and rows[1][8] == "https://example.com/0.mp3" and rows[1][5] == ""
+    assert rows[2][5:9] == ["positive", "0.9", "No", ""]
+    assert any("$lookup" in stage for stage in db.pipelines[0])
+
+
+def test_gzip_export_matches_csv():
+    leads = make_leads(5)
+    plain = b"".join(stream_report(FakeDb(leads), ObjectId(), "csv"))
+    compressed = b"".join(stream_report(FakeDb(leads), ObjectId(), "csv.gz"))
+
+    assert gzip.decompress(compressed) == plain
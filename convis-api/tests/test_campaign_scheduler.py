@@ -0,0 +1,279 @@
+"""
+Unit tests for the event-driven campaign dispatcher (ready-queue refills and line accounting)
+"""
+import pytest
+from datetime import datetime, timedelta
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+
+from app.services import campaign_dialer as dialer_module
+from app.services import campaign_scheduler as scheduler_module
+from app.services.campaign_scheduler import CampaignScheduler
+
+
+class FakeQueues:
+    """In-memory stand-in for CampaignQueues."""
+
+    def __init__(self):
+        self.ready = {}
+        self.inflight = {}
+        self.timers = {}
+        self.leases = {}
+        self.forwarded = []
+
+    def ready_leads(self, campaign_id):
+        return list(self.ready.get(campaign_id, []))
+
+    def push_ready(self, campaign_id, lead_ids):
+        self.ready.setdefault(campaign_id, []).extend(lead_ids)
+
+    def pop_ready(self, campaign_id, count):
+        queue = self.ready.get(campaign_id, [])
+        popped, self.ready[campaign_id] = queue[:count], queue[count:]
+        return popped
+
+    def inflight_count(self, campaign_id):
+        return len(self.inflight.get(campaign_id, set()))
+
+    def add_inflight(self, campaign_id, lead_id, timeout_seconds):
+        self.inflight.setdefault(campaign_id, set()).add(lead_id)
+
+    def remove_inflight(self, campaign_id, lead_ids):
+        self.inflight.get(campaign_id, set()).difference_update(lead_ids)
+
+    def schedule(self, campaign_id, due_at):
+        self.timers[campaign_id] = min(due_at, self.timers.get(campaign_id, due_at))
+
+    def claim_campaign(self, campaign_id, worker_id, ttl):
+        return self.leases.setdefault(campaign_id, worker_id) == worker_id
+
+    def forward_wake(self, worker_id, campaign_id, woken_at):
+        self.forwarded.append((worker_id, campaign_id))
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        return self
+
+    def limit(self, count):
+        return self.docs[:count]
+
+
+class FakeLeads:
+    """The subset of a pymongo collection the dispatcher uses on leads."""
+
+    def __init__(self, leads):
+        self.leads = {lead["_id"]: lead for lead in leads}
+        self.finds = 0
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        excluded = set(query.get("_id", {}).get("$nin", []))
+        docs = sorted(
+            (lead for lead in self.leads.values() if lead["status"] == query["status"] and lead["_id"] not in excluded),
+            key=lambda lead: lead["order_index"],
+        )
+        return FakeCursor(docs)
+
+    def find_one(self, query):
+        lead = self.leads.get(query["_id"])
+        return dict(lead) if lead else None
+
+    def find_one_and_update(self, query, update, return_document=None, projection=None):
+        lead = self.leads.get(query["_id"])
+        if lead is None or lead["status"] != query.get("status", lead["status"]):
+            return None
+        lead.update(update["$set"])
+        for field, amount in update.get("$inc", {}).items():
+            lead[field] = lead.get(field, 0) + amount
+        return dict(lead)
+
+    def update_one(self, query, update):
+        self.find_one_and_update(query, update)
+
+
+class FakeCampaigns:
+    def __init__(self, campaign):
+        self.campaign = campaign
+
+    def find_one(self, query):
+        return self.campaign if query["_id"] == self.campaign["_id"] else None
+
+    def update_one(self, query, update):
+        self.campaign.update(update["$set"])
+
+
+class FakeCounters:
+    def __init__(self):
+        self.transitions = []
+
+    def lead_transition(self, campaign_id, old_status, new_status, count=1):
+        self.transitions.append((old_status, new_status, count))
+
+    def update_lead(self, leads_collection, query, update):
+        return leads_collection.find_one_and_update(query, update)
+
+    def call_placed(self, campaign_id):
+        pass
+
+
+@pytest.fixture
+def campaign():
+    return {"_id": ObjectId(), "name": "Spring promo", "lines": 3, "pacing": {"max_concurrent": 3}}
+
+
+@pytest.fixture
+def setup(campaign, monkeypatch):
+    monkeypatch.setattr(scheduler_module.settings, "campaign_dispatch_batch_size", 4)
+    monkeypatch.setattr(scheduler_module, "campaign_counters", FakeCounters())
+    leads = FakeLeads([
+        {"_id": ObjectId(), "campaign_id": campaign["_id"], "status": "queued", "order_index": i}
+        for i in range(10)
+    ])
+    queues = FakeQueues()
+    scheduler = CampaignScheduler(interval_seconds=1, dialer=object(), queues=queues)
+    return scheduler, {"leads": leads}, leads, queues
+
+
+def test_leads_are_loaded_in_batches_and_claimed_in_order(setup, campaign):
+    scheduler, db, leads, queues = setup
+    reserved = scheduler._reserve_leads(db, campaign, 3, datetime.utcnow())
+
+    assert [lead["order_index"] for lead in reserved] == [0, 1, 2]
+    assert all(lead["status"] == "calling" for lead in reserved)
+    assert queues.inflight_count(str(campaign["_id"])) == 3
+    # One batch of 4 loaded; the 4th lead waits in Redis for the next free line
+    assert leads.finds == 1
+    assert len(queues.ready_leads(str(campaign["_id"]))) == 1
+    assert scheduler._available_slots_for_campaign(db, campaign) == 0
+
+
+def test_leads_taken_elsewhere_are_skipped(setup, campaign):
+    scheduler, db, leads, queues = setup
+    scheduler._reserve_leads(db, campaign, 1, datetime.utcnow())
+    # Lead 1 is in the ready-queue but was paused (or dialled manually) meanwhile
+    for lead in leads.leads.values():
+        if lead["order_index"] == 1:
+            lead["status"] = "paused"
+
+    reserved = scheduler._reserve_leads(db, campaign, 2, datetime.utcnow())
+    assert [lead["order_index"] for lead in reserved] == [2, 3]
+
+
+def test_freed_line_is_available_again(setup, campaign):
+    scheduler, db, leads, queues = setup
+    reserved = scheduler._reserve_leads(db, campaign, 3, datetime.utcnow())
+    queues.remove_inflight(str(campaign["_id"]), [str(reserved[0]["_id"])])
+    assert scheduler._available_slots_for_campaign(db, campaign) == 1
+
+
+def test_closed_window_schedules_a_timer_for_its_opening(setup, campaign):
+    scheduler, db, leads, queues = setup
+    campaign["working_window"] = {"timezone": "UTC", "start": "09:00", "end": "17:00", "days": [0, 1, 2, 3, 4]}
+    saturday = datetime(2025, 1, 11, 12, 0)
+
+    assert not scheduler._campaign_is_active(campaign, saturday)
+    scheduler._schedule_activation(campaign, saturday)
+    assert queues.timers[str(campaign["_id"])] == scheduler_module._epoch(datetime(2025, 1, 13, 9, 0))
+
+
+def test_future_start_schedules_a_timer_for_start_at(setup, campaign):
+    scheduler, db, leads, queues = setup
+    monday = datetime(2025, 1, 13, 10, 0)
+    campaign["working_window"] = {"timezone": "UTC", "start": "09:00", "end": "17:00", "days": [0, 1, 2, 3, 4]}
+    campaign["start_at"] = monday + timedelta(hours=2)
+
+    assert not scheduler._campaign_is_active(campaign, monday)
+    scheduler._schedule_activation(campaign, monday)
+    assert queues.timers[str(campaign["_id"])] == scheduler_module._epoch(campaign["start_at"])
+
+
+def test_workers_dispatch_only_the_campaigns_they_own(setup):
+    scheduler, db, leads, queues = setup
+    other = "other-host:1"
+    scheduler.workers = sorted([scheduler.worker_id, other])
+    campaign_ids = [str(ObjectId()) for _ in range(40)]
+    mine = [cid for cid in campaign_ids if scheduler_module.owner_of(cid, scheduler.workers) == scheduler.worker_id]
+    assert 0 < len(mine) < len(campaign_ids)
+
+    # A campaign still leased by its previous owner is left alone until the lease lapses
+    queues.leases[mine[0]] = other
+    assert [cid for cid in campaign_ids if scheduler._hold(cid)] == mine[1:]
+
+    # Shared wake-ups of other workers' campaigns are forwarded; direct ones are kept
+    woken = scheduler._route_wakes({campaign_ids[0]: 1.0}, {cid: 2.0 for cid in campaign_ids})
+    assert set(woken) == set(mine) | {campaign_ids[0]}
+    assert sorted(cid for _, cid in queues.forwarded) == sorted(set(campaign_ids) - set(mine))
+
+
+def test_busy_lead_retries_at_the_first_backoff_step(setup, campaign, monkeypatch):
+    scheduler, db, leads, queues = setup
+    wednesday = datetime(2025, 1, 15, 10, 0)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return wednesday
+
+    class FakeDatabase:
+        @staticmethod
+        def get_db():
+            return {"leads": leads, "campaigns": FakeCampaigns(campaign), "call_attempts": attempts, "provider_connections": None}
+
+    class FakeLock:
+        def delete(self, key):
+            pass
+
+    class FakeTwilio:
+        class calls:
+            @staticmethod
+            def create(**kwargs):
+                return type("Call", (), {"sid": "CA1"})
+
+    class FakeAttempts:
+        def __init__(self):
+            self.docs = []
+
+        def insert_one(self, doc):
+            self.docs.append(doc)
+
+    attempts = FakeAttempts()
+
+    queues.call_finished = lambda campaign_id, lead_id: None
+    monkeypatch.setattr(dialer_module, "datetime", FrozenDatetime)
+    monkeypatch.setattr(dialer_module, "Database", FakeDatabase)
+    monkeypatch.setattr(dialer_module, "campaign_counters", FakeCounters())
+    monkeypatch.setattr(dialer_module, "campaign_queues", queues)
+    monkeypatch.setattr(dialer_module.settings, "enable_auto_retry", True)
+    campaign.update({
+        "status": "running",
+        "caller_id": "+15550000000",
+        "attempts_per_number": 2,
+        "attempt_backoff": {"type": "mixed", "schedule": ["+60s", "+300s"]},
+        "working_window": {"timezone": "UTC", "start": "09:00", "end": "17:00", "days": [0, 1, 2, 3, 4]},
+    })
+    for queued in leads.leads.values():
+        queued["e164"] = "+15551230000"
+    dialer = dialer_module.CampaignDialer.__new__(dialer_module.CampaignDialer)
+    dialer.redis_client = FakeLock()
+    dialer.twiml_url = dialer.status_callback = dialer.recording_callback = "https://example.com/hook"
+    dialer._get_twilio_client_for_campaign = lambda campaign, connections: FakeTwilio
+    scheduler._dialer = dialer
+
+    [lead] = scheduler._reserve_leads(db, campaign, 1, wednesday)
+    assert scheduler._start_call(campaign, lead)
+    assert leads.leads[lead["_id"]]["attempts"] == 1
+    assert attempts.docs[0]["attempt"] == 1
+    dialer.handle_call_completed(str(campaign["_id"]), str(lead["_id"]), "busy")
+
+    retry_at = wednesday + timedelta(seconds=60)
+    assert leads.leads[lead["_id"]]["status"] == "queued"
+    assert leads.leads[lead["_id"]]["next_retry_at"] == retry_at
+    assert queues.timers[str(campaign["_id"])] == scheduler_module._epoch(retry_at)
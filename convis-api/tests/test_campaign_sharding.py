@@ -0,0 +1,52 @@
+"""
+Unit tests for campaign ownership across dispatcher workers (rendezvous hashing, headroom split)
+"""
+import pytest
+from collections import Counter
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.campaign_sharding import headroom_share, owner_of
+
+
+WORKERS = [f"host-{i}:{1000 + i}" for i in range(4)]
+CAMPAIGNS = [f"campaign-{i}" for i in range(2000)]
+
+
+def test_no_workers_has_no_owner():
+    assert owner_of("campaign-1", []) is None
+
+
+def test_owner_is_stable_and_order_independent():
+    owners = [owner_of(cid, WORKERS) for cid in CAMPAIGNS[:50]]
+    assert owners == [owner_of(cid, list(reversed(WORKERS))) for cid in CAMPAIGNS[:50]]
+
+
+def test_campaigns_spread_across_workers():
+    counts = Counter(owner_of(cid, WORKERS) for cid in CAMPAIGNS)
+    assert set(counts) == set(WORKERS)
+    expected = len(CAMPAIGNS) / len(WORKERS)
+    assert all(abs(count - expected) < expected * 0.2 for count in counts.values())
+
+
+def test_losing_a_worker_only_moves_its_campaigns():
+    remaining = WORKERS[1:]
+    for cid in CAMPAIGNS:
+        before = owner_of(cid, WORKERS)
+        after = owner_of(cid, remaining)
+        if before != WORKERS[0]:
+            assert after == before
+
+
+@pytest.mark.parametrize("headroom", [0, 1, 7, 100])
+def test_headroom_shares_add_up(headroom):
+    shares = [headroom_share(headroom, worker_id, WORKERS) for worker_id in WORKERS]
+    assert sum(shares) == headroom
+    assert max(shares) - min(shares) <= 1
+
+
+def test_unknown_worker_keeps_full_headroom():
+    assert headroom_share(10, "other:1", WORKERS) == 10
+    assert headroom_share(10, "other:1", []) == 10
@@ -0,0 +1,60 @@
+"""
+Unit tests for working-window arithmetic (open state, next opening, cached states)
+"""
+from datetime import datetime, timedelta
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.campaign_windows import WindowCache, is_open, next_opening, window_spec, window_state
+
+NEW_YORK_WEEKDAYS = {"timezone": "America/New_York", "start": "09:00", "end": "17:00", "days": [0, 1, 2, 3, 4]}
+
+
+def test_open_window_is_valid_until_its_end():
+    spec = window_spec(NEW_YORK_WEEKDAYS, "UTC")
+    # Monday 10:00 EST
+    is_open_now, until = window_state(spec, datetime(2025, 1, 6, 15, 0))
+    assert is_open_now
+    assert datetime(2025, 1, 6, 22, 0) < until <= datetime(2025, 1, 6, 22, 0, 1)
+    assert is_open(spec, datetime(2025, 1, 6, 22, 0))
+    assert not is_open(spec, datetime(2025, 1, 6, 22, 0, 30))
+
+
+def test_closed_window_waits_for_next_working_day():
+    spec = window_spec(NEW_YORK_WEEKDAYS, "UTC")
+    # Friday 18:00 EST -> Monday 09:00 EST
+    is_open_now, until = window_state(spec, datetime(2025, 1, 10, 23, 0))
+    assert not is_open_now
+    assert until == datetime(2025, 1, 13, 14, 0)
+
+
+def test_next_opening_follows_daylight_saving_time():
+    spec = window_spec(NEW_YORK_WEEKDAYS, "UTC")
+    # Clocks go forward on Sunday 9 March 2025: Monday 09:00 is 13:00 UTC
+    assert next_opening(spec, datetime(2025, 3, 8, 12, 0)) == datetime(2025, 3, 10, 13, 0)
+
+
+def test_next_opening_min_days_skips_today():
+    spec = window_spec(NEW_YORK_WEEKDAYS, "UTC")
+    assert next_opening(spec, datetime(2025, 1, 6, 15, 0), min_days=1) == datetime(2025, 1, 7, 14, 0)
+
+
+def test_lead_timezone_overrides_window_timezone():
+    spec = window_spec(NEW_YORK_WEEKDAYS, "UTC", timezone="Asia/Kolkata")
+    # Monday 15:00 UTC is 20:30 in India
+    assert not is_open(spec, datetime(2025, 1, 6, 15, 0))
+    assert is_open(spec, datetime(2025, 1, 7, 4, 0))
+
+
+def test_cache_answers_until_the_state_changes():
+    cache = WindowCache()
+    spec = window_spec(NEW_YORK_WEEKDAYS, "UTC")
+    now = datetime(2025, 1, 6, 15, 0)
+
+    assert cache.is_open(spec, now)
+    assert cache.is_open(spec, now + timedelta(hours=6))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not cache.is_open(spec, now + timedelta(hours=8))
+    assert cache.misses == 2
@@ -0,0 +1,109 @@
+"""
+Unit tests for local customer-table snapshots (exact-key and BM25 lookup, incremental refresh)
+"""
+import pytest
+from datetime import datetime
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.ai_assistant import DatabaseConfig
+from app.services import db_snapshot_sync, external_db
+from app.services.db_snapshot_sync import DatabaseSnapshotSync
+from app.utils import conversational_rag
+from app.utils.db_snapshot import SnapshotStore, key_variants, query_keys
+
+ROWS = [
+    {"id": 1, "name": "Asha Patel", "phone": "+91 98200 12345", "plan": "Premium", "updated_at": datetime(2026, 1, 1)},
+    {"id": 2, "name": "Rahul Mehta", "phone": "9820054321", "plan": "Basic", "updated_at": datetime(2026, 1, 2)},
+    {"id": 3, "name": "Neha Shah", "phone": "+1 (415) 555-0199", "plan": "Premium", "updated_at": datetime(2026, 1, 3)},
+]
+
+
+def make_config(**overrides):
+    fields = dict(enabled=True, type="postgresql", host="db.example.com", database="crm", table_name="customers",
+                  search_columns=["name", "plan"], sync_mode="snapshot", key_columns=["phone"],
+                  updated_at_column="updated_at")
+    fields.update(overrides)
+    return DatabaseConfig(**fields)
+
+
+def test_key_variants_normalize_phone_numbers():
+    assert key_variants("+91 98200 12345") == ["919820012345", "9820012345"]
+    assert key_variants("ACC-1001") == ["acc-1001"]
+    assert "9820012345" in query_keys("my number is 98200 12345")
+    assert "asha@example.com" in query_keys("email is asha@example.com.")
+
+
+def test_lookup_by_phone_and_by_name(tmp_path):
+    store = SnapshotStore(root=str(tmp_path))
+    rows = [{k: v for k, v in row.items() if k != "updated_at"} for row in ROWS]
+    with store.writer("a1"):
+        manifest = store.write("a1", rows, ["name", "plan"], ["phone"], {"database_type": "postgresql", "table": "customers"})
+    assert manifest["row_count"] == 3
+
+    result = store.lookup("a1", "it's 9820054321 calling")
+    assert result["records"][0]["name"] == "Rahul Mehta"
+    assert result["snapshot"] is True
+    assert result["staleness_seconds"] < 60
+
+    result = store.lookup("a1", "this is neha shah")
+    assert result["records"][0]["id"] == 3
+    assert store.lookup("unknown", "neha") is None
+    assert store.stats()["lookups"] == 2
+
+
+def test_incremental_refresh_merges_changed_rows(tmp_path, monkeypatch):
+    store = SnapshotStore(root=str(tmp_path))
+    monkeypatch.setattr(db_snapshot_sync, "snapshot_store", store)
+    since_seen = []
+
+    def fake_fetch(config, columns, since):
+        since_seen.append(since)
+        if since is None:
+            return iter(ROWS)
+        return iter([dict(ROWS[1], plan="Premium", updated_at=datetime(2026, 2, 1)),
+                     {"id": 4, "name": "Vikram Rao", "phone": "9000000004", "plan": "Basic", "updated_at": datetime(2026, 2, 2)}])
+
+    monkeypatch.setitem(db_snapshot_sync.FETCHERS, "postgresql", fake_fetch)
+    sync = DatabaseSnapshotSync()
+    config = make_config()
+
+    first = sync.refresh_snapshot("a1", config)
+    assert first["mode"] == "full" and first["row_count"] == 3
+
+    second = sync.refresh_snapshot("a1", config)
+    assert second["mode"] == "incremental"
+    assert second["changed"] == 2 and second["row_count"] == 4
+    assert since_seen == [None, datetime(2026, 1, 3)]
+
+    records = store.lookup("a1", "9820054321")["records"]
+    assert records[0]["plan"] == "Premium"
+
+    # Changing the copied columns invalidates the snapshot and forces a full reload
+    third = sync.refresh_snapshot("a1", make_config(search_columns=["name"]))
+    assert third["mode"] == "full"
+
+
+@pytest.mark.asyncio
+async def test_call_context_is_answered_from_the_snapshot(tmp_path, monkeypatch):
+    store = SnapshotStore(root=str(tmp_path))
+    rows = [{k: v for k, v in row.items() if k != "updated_at"} for row in ROWS]
+    with store.writer("a1"):
+        store.write("a1", rows, ["name", "plan"], ["phone"], {"database_type": "postgresql", "table": "customers"})
+    monkeypatch.setattr(external_db, "snapshot_store", store)
+    monkeypatch.setattr(conversational_rag.kb_index_store, "get", lambda assistant_id: None)
+
+    async def live_query(*args, **kwargs):
+        raise AssertionError("snapshot-mode lookups must not query the customer database")
+
+    monkeypatch.setattr(external_db.external_databases, "query", live_query)
+
+    context = await conversational_rag.search_conversation_context(
+        assistant_id="a1",
+        query="hi, my number is 98200 54321",
+        api_key="key",
+        database_config=make_config().model_dump(),
+    )
+    assert "[From Database]" in context and "Rahul Mehta" in context
@@ -0,0 +1,100 @@
+"""
+Unit tests for the query-embedding service (cache + cross-call micro-batching)
+"""
+import pytest
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.embedding_service import EmbeddingService, normalize_query
+
+
+def fake_client():
+    """AsyncOpenAI stand-in returning [len(text)] as the embedding of each input"""
+    client = MagicMock()
+    client.embeddings.create = AsyncMock(side_effect=lambda model, input: SimpleNamespace(
+        data=[SimpleNamespace(embedding=[float(len(text))]) for text in input]
+    ))
+    return client
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = EmbeddingService()
+    client = fake_client()
+    monkeypatch.setattr(service, "_get_client", lambda api_key: client)
+    return service, client
+
+
+def test_normalize_query():
+    assert normalize_query("  What are\n your  HOURS? ") == "what are your hours?"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_one_request(service):
+    service, client = service
+    results = await asyncio.gather(
+        service.embed_query("opening hours", "key"),
+        service.embed_query("price list", "key"),
+        service.embed_query("Opening  hours", "key"),
+    )
+
+    assert results == [[13.0], [10.0], [13.0]]
+    assert client.embeddings.create.await_count == 1
+    assert client.embeddings.create.await_args.kwargs["input"] == ["opening hours", "price list"]
+    assert service.stats()["max_batch_size"] == 2
+    assert service.coalesced == 1
+
+
+@pytest.mark.asyncio
+async def test_repeated_query_served_from_cache(service):
+    service, client = service
+    await service.embed_query("yes", "key")
+    await service.embed_query("YES", "key")
+
+    assert client.embeddings.create.await_count == 1
+    assert service.stats()["cache_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_raises_for_every_waiter(service):
+    service, client = service
+    client.embeddings.create = AsyncMock(side_effect=RuntimeError("boom"))
+
+    results = await asyncio.gather(
+        service.embed_query("a", "key"),
+        service.embed_query("b", "key"),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert service.api_errors == 1
+
+
+@pytest.mark.asyncio
+async def test_shutdown_sends_queued_queries(service, monkeypatch):
+    service, client = service
+    monkeypatch.setattr(service.local, "shutdown", lambda: None)
+    monkeypatch.setattr("app.services.embedding_service.settings.embedding_batch_window_ms", 60_000)
+
+    waiter = asyncio.ensure_future(service.embed_query("still queued", "key"))
+    await asyncio.sleep(0)
+    await service.shutdown()
+
+    assert await waiter == [12.0]
+    assert client.embeddings.create.await_count == 1
+    assert not service._sends
+
+
+@pytest.mark.asyncio
+async def test_short_response_fails_the_batch(service):
+    service, client = service
+    client.embeddings.create = AsyncMock(return_value=SimpleNamespace(data=[]))
+
+    with pytest.raises(ValueError):
+        await service.embed_query("a", "key")
+    assert service.api_errors == 1
@@ -0,0 +1,138 @@
+"""
+Unit tests for pooled external-database lookups (result cache, timeouts, circuit breaker)
+"""
+import pytest
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.ai_assistant import DatabaseConfig
+from app.services import external_db
+from app.services.external_db import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ExternalDatabases
+
+
+def make_config(**overrides):
+    fields = dict(enabled=True, type="postgresql", host="db.example.com", port="5432", database="crm",
+                  username="u", password="p", table_name="customers", search_columns=["name", "phone"])
+    fields.update(overrides)
+    return DatabaseConfig(**fields)
+
+
+@pytest.fixture
+def databases(monkeypatch):
+    calls = []
+
+    def fake_search(self, query_text):
+        calls.append(query_text)
+        if query_text == "slow":
+            time.sleep(0.3)
+        if query_text == "broken":
+            raise RuntimeError("connection refused")
+        return {"source": "database", "records": [{"name": query_text}], "count": 1}
+
+    monkeypatch.setattr(external_db._Connector, "search", fake_search)
+    monkeypatch.setattr(external_db.settings, "external_db_query_timeout_seconds", 0.1)
+    monkeypatch.setattr(external_db.settings, "external_db_breaker_failures", 2)
+    databases = ExternalDatabases()
+    yield databases, calls
+    databases._get_executor().shutdown(wait=True)
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.trips == 1
+
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # one trial at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_results_are_cached_by_normalized_query(databases):
+    databases, calls = databases
+    first = await databases.query(make_config(), "Jane  Doe", "a1")
+    second = await databases.query(make_config(), "jane doe", "a1")
+    assert first == second and calls == ["Jane  Doe"]
+    assert databases.stats()["cache_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_open_the_breaker(databases):
+    databases, calls = databases
+    assert await databases.query(make_config(), "slow", "a1") is None
+    assert await databases.query(make_config(), "broken", "a1") is None
+    assert await databases.query(make_config(), "jane", "a1") is None  # breaker open, not queried
+    assert calls == ["slow", "broken"]
+    stats = databases.stats()
+    assert stats["timeouts"] == 1 and stats["failures"] == 1 and stats["rejected_open_breaker"] == 1
+
+    # Other assistants have their own breaker
+    assert (await databases.query(make_config(), "jane", "a2"))["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_does_not_keep_the_breaker_half_open(databases, monkeypatch):
+    databases, calls = databases
+    monkeypatch.setattr(external_db.settings, "external_db_breaker_cooldown_seconds", 0)
+    assert await databases.query(make_config(), "broken", "a1") is None
+    assert await databases.query(make_config(), "broken", "a1") is None  # breaker opens
+
+    trial = asyncio.ensure_future(databases.query(make_config(), "slow", "a1"))
+    await asyncio.sleep(0.02)
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+
+    assert (await databases.query(make_config(), "jane", "a1"))["count"] == 1
+    assert databases.stats()["open_breakers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_is_keyed_by_search_columns(databases):
+    databases, calls = databases
+    await databases.query(make_config(search_columns=["name"]), "jane", "a1")
+    await databases.query(make_config(search_columns=["email"]), "jane", "a2")
+    assert calls == ["jane", "jane"]
+
+
+@pytest.mark.asyncio
+async def test_unsafe_identifiers_are_rejected(databases):
+    databases, calls = databases
+    config = make_config(table_name="customers; DROP TABLE customers")
+    assert await databases.query(config, "jane", "a1") is None
+    assert calls == []
+
+
+def fake_pg_pool(ping_error=None):
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value.execute.side_effect = ping_error
+    pool = MagicMock()
+    pool.getconn.return_value = conn
+    return pool
+
+
+def test_pool_is_kept_only_after_a_successful_ping(monkeypatch):
+    rejected = fake_pg_pool(RuntimeError("password authentication failed"))
+    accepted = fake_pg_pool()
+    pools = iter([rejected, accepted])
+    monkeypatch.setattr(external_db._Connector, "_create_pool", lambda self: next(pools))
+    connector = external_db._Connector(make_config(), "fp")
+
+    with pytest.raises(RuntimeError):
+        connector._get_pool()
+    assert connector._pool is None
+    rejected.putconn.assert_called_once_with(rejected.getconn.return_value, close=True)
+    rejected.closeall.assert_called_once()
+
+    # The next lookup builds a new pool instead of reusing the failed one
+    assert connector._get_pool() is accepted
+    assert connector._get_pool() is accepted
+    accepted.getconn.assert_called_once()
@@ -0,0 +1,139 @@
+"""
+Unit tests for the shared on-disk knowledge-base index
+Covers cosine search, cross-process swap detection, deletes and the memory budget
+"""
+import pytest
+import numpy as np
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.kb_index import EmbeddingModelMismatch, KnowledgeBaseIndexStore
+
+
+def make_chunks(filename, count):
+    return [
+        {'id': f"{filename}_chunk_{i}", 'text': f"{filename} text {i}", 'metadata': {'filename': filename}}
+        for i in range(count)
+    ]
+
+
+class TestKnowledgeBaseIndexStore:
+    """Test suite for KnowledgeBaseIndexStore"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return KnowledgeBaseIndexStore(root=str(tmp_path), memory_budget_bytes=1024 * 1024)
+
+    def test_search_returns_cosine_top_k(self, store):
+        """Best match first, similarity is cosine regardless of vector length"""
+        embeddings = [[1.0, 0.0, 0.0], [0.0, 10.0, 0.0], [1.0, 1.0, 0.0]]
+        store.add_chunks("a1", embeddings, make_chunks("doc.pdf", 3))
+
+        results = store.search("a1", [0.0, 3.0, 0.0], top_k=2)
+
+        assert [chunk['id'] for chunk, _ in results] == ["doc.pdf_chunk_1", "doc.pdf_chunk_2"]
+        assert results[0][1] == pytest.approx(1.0)
+        assert results[1][1] == pytest.approx(1 / np.sqrt(2))
+
+    def test_missing_assistant_has_no_index(self, store):
+        assert store.get("missing") is None
+        assert store.search("missing", [1.0, 0.0]) == []
+
+    def test_other_process_swap_is_visible(self, tmp_path, store):
+        """A second store on the same directory (another worker) sees uploads and deletes"""
+        other_worker = KnowledgeBaseIndexStore(root=str(tmp_path))
+        store.add_chunks("a1", [[1.0, 0.0]], make_chunks("first.txt", 1))
+        assert len(other_worker.get("a1")) == 1
+
+        store.add_chunks("a1", [[0.0, 1.0]], make_chunks("second.txt", 1))
+        assert len(other_worker.get("a1")) == 2
+
+        assert store.remove_where("a1", 'filename', "first.txt") == 1
+        assert [c['metadata']['filename'] for c in other_worker.get("a1").chunks] == ["second.txt"]
+
+    def test_reupload_replaces_chunks(self, store):
+        store.add_chunks("a1", [[1.0, 0.0], [0.0, 1.0]], make_chunks("doc.pdf", 2))
+        assert store.add_chunks("a1", [[1.0, 1.0]], make_chunks("doc.pdf", 1)) == 2
+
+    def test_removing_last_file_drops_index(self, store):
+        store.add_chunks("a1", [[1.0, 0.0]], make_chunks("doc.pdf", 1))
+        store.remove_where("a1", 'filename', "doc.pdf")
+        assert store.get("a1") is None
+
+    def test_generation_does_not_load_the_index(self, tmp_path, store):
+        other_worker = KnowledgeBaseIndexStore(root=str(tmp_path))
+        assert other_worker.generation("a1") is None
+        store.add_chunks("a1", [[1.0, 0.0]], make_chunks("a.txt", 1))
+
+        assert other_worker.generation("a1") == store.get("a1").generation
+        assert other_worker.loads == 0
+
+    def test_evicts_least_recently_used_over_budget(self, tmp_path):
+        store = KnowledgeBaseIndexStore(root=str(tmp_path), memory_budget_bytes=1)
+        store.add_chunks("a1", [[1.0, 0.0]], make_chunks("a.txt", 1))
+        store.add_chunks("a2", [[1.0, 0.0]], make_chunks("b.txt", 1))
+        store.get("a1")
+        store.get("a2")
+
+        assert store.stats()['loaded_assistants'] == 1
+        assert store.evictions == 1
+        # Evicted indexes reload lazily
+        assert len(store.get("a1")) == 1
+
+    def test_records_model_and_rejects_other_model(self, store):
+        """Chunks from another embedding model need a re-index, not an append"""
+        store.add_chunks("a1", [[1.0, 0.0]], make_chunks("a.txt", 1), model="local:BAAI/bge-small-en-v1.5")
+        assert store.get("a1").model == "local:BAAI/bge-small-en-v1.5"
+
+        with pytest.raises(EmbeddingModelMismatch):
+            store.add_chunks("a1", [[1.0, 0.0]], make_chunks("b.txt", 1), model="openai:text-embedding-3-small")
+
+        store.replace("a1", [[0.0, 1.0]], store.get("a1").chunks, model="openai:text-embedding-3-small")
+        assert store.get("a1").model == "openai:text-embedding-3-small"
+
+
+    def test_replace_document_drops_all_previous_chunks(self, store):
+        """An edited document with fewer chunks leaves none of the old ones behind"""
+        store.add_chunks("a1", [[1.0, 0.0], [0.0, 1.0]], make_chunks("doc.pdf", 2))
+        store.add_chunks("a1", [[1.0, 1.0]], make_chunks("other.pdf", 1))
+
+        assert store.replace_document("a1", "doc.pdf", [[0.5, 0.5]], make_chunks("doc.pdf", 1)) == 2
+
+        index = store.get("a1")
+        assert index.files == {"other.pdf": [0], "doc.pdf": [1]}
+        assert [chunk['id'] for chunk in index.file_chunks("doc.pdf")] == ["doc.pdf_chunk_0"]
+
+    def test_remove_document_uses_metadata_index(self, store):
+        store.add_chunks("a1", [[1.0, 0.0], [0.0, 1.0]], make_chunks("doc.pdf", 2))
+        generation = store.get("a1").generation
+
+        assert store.remove_document("a1", "missing.pdf") == 0
+        assert store.get("a1").generation == generation  # nothing rewritten
+        assert store.remove_document("a1", "doc.pdf") == 2
+        assert store.get("a1") is None
+
+    def test_vectors_reused_by_content_hash(self, store):
+        chunks = make_chunks("doc.pdf", 2)
+        for i, chunk in enumerate(chunks):
+            chunk['metadata']['content_hash'] = f"hash-{i}"
+        store.add_chunks("a1", [[3.0, 0.0], [0.0, 1.0]], chunks)
+
+        reused = store.get("a1").vectors_for_hashes(["hash-0", "unknown"])
+
+        assert list(reused) == ["hash-0"]
+        assert np.allclose(reused["hash-0"], [1.0, 0.0])
+
+
+    def test_hybrid_search_surfaces_exact_token_match(self, store):
+        """A chunk naming the queried SKU is fused in even when its vector ranks last"""
+        chunks = make_chunks("catalog.pdf", 3)
+        chunks[2]['text'] = "SKU VX-4471 is the wireless headset"
+        store.add_chunks("a1", [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]], chunks)
+
+        results = store.get("a1").hybrid_search([1.0, 0.0], "price of VX-4471", candidates=2)
+
+        ids = [chunk['id'] for chunk, _, _ in results]
+        assert "catalog.pdf_chunk_2" in ids
+        assert results[ids.index("catalog.pdf_chunk_2")][2] > 0
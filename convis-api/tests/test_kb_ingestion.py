@@ -0,0 +1,87 @@
+"""
+Unit tests for resumable knowledge-base ingestion checkpoints
+"""
+import json
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import kb_ingestion as ingestion_module
+from app.services.kb_ingestion import (
+    KnowledgeBaseIngestion, LeaseLost, PAGES_FILE, _truncate_to_complete_pages, user_error_message,
+)
+
+
+@pytest.fixture
+def ingestion(monkeypatch):
+    ingestion = KnowledgeBaseIngestion()
+    monkeypatch.setattr(ingestion, "_update", lambda job_id, fields: True)
+    return ingestion
+
+
+def test_partial_last_page_is_dropped(tmp_path):
+    pages_path = tmp_path / PAGES_FILE
+    pages_path.write_text(
+        json.dumps({"page": 0, "text": "first page"}) + "\n"
+        + json.dumps({"page": 1, "text": "second"}) + "\n"
+        + '{"page": 2, "te'
+    )
+
+    assert _truncate_to_complete_pages(str(pages_path)) == (2, len("first page") + len("second"))
+    assert pages_path.read_text().count("\n") == 2
+
+
+def test_extract_resumes_after_last_complete_page(ingestion, tmp_path, monkeypatch):
+    requested = []
+
+    def fake_pages(file_path, file_type, start_page=0):
+        requested.append(start_page)
+        for page in range(start_page, 4):
+            yield page, f"text of page {page} " * 10
+
+    monkeypatch.setattr(ingestion_module.conversational_rag, "iter_document_pages", fake_pages)
+    (tmp_path / PAGES_FILE).write_text(json.dumps({"page": 0, "text": "text of page 0 " * 10}) + "\n")
+    job = {"_id": "job", "file_path": "doc.pdf", "file_type": "pdf"}
+
+    ingestion._extract(job, str(tmp_path))
+
+    assert requested == [1]
+    pages = [json.loads(line)["page"] for line in (tmp_path / PAGES_FILE).read_text().splitlines()]
+    assert pages == [0, 1, 2, 3]
+
+    # A finished extraction is not repeated
+    ingestion._extract(job, str(tmp_path))
+    assert requested == [1]
+
+
+def test_chunk_stage_reuses_checkpoint(ingestion, tmp_path):
+    (tmp_path / PAGES_FILE).write_text(json.dumps({"page": 0, "text": "Opening hours are 9 to 5. " * 20}) + "\n")
+    job = {"_id": "job", "filename": "faq.txt", "file_type": "txt"}
+
+    chunks = ingestion._chunk(job, str(tmp_path))
+    (tmp_path / PAGES_FILE).unlink()
+
+    assert chunks and chunks[0]["id"].startswith("faq.txt#")
+    assert ingestion._chunk(job, str(tmp_path)) == chunks
+
+
+def test_extract_stops_when_the_job_is_taken_over(ingestion, tmp_path, monkeypatch):
+    pages = (page for page in range(100))
+    monkeypatch.setattr(
+        ingestion_module.conversational_rag, "iter_document_pages",
+        lambda file_path, file_type, start_page=0: ((page, f"text of page {page}") for page in pages),
+    )
+    monkeypatch.setattr(ingestion, "_update", lambda job_id, fields: False)
+
+    with pytest.raises(LeaseLost):
+        ingestion._extract({"_id": "job", "file_path": "doc.pdf", "file_type": "pdf"}, str(tmp_path))
+    # Extraction stopped at the first progress write
+    assert next(pages) == 10
+
+
+def test_scanned_pdf_failures_explain_ocr():
+    assert "Tesseract OCR" in user_error_message("OCR not available. Please install Tesseract OCR on your system.")
+    assert "image-based/scanned" in user_error_message("Could not extract text from file")
+    assert user_error_message("No chunks created from text") == "No chunks created from text"
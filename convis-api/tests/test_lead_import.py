@@ -0,0 +1,62 @@
+"""
+Unit tests for streaming lead imports (row normalization and duplicate-tolerant bulk inserts)
+"""
+from types import SimpleNamespace
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pymongo.errors import BulkWriteError
+
+from app.services.lead_import import insert_leads
+from app.utils.lead_csv import normalize_chunk
+
+HEADER = ["Phone", "First_Name", "Last Name", "Email", "Plan"]
+
+
+def test_normalize_chunk_keeps_row_order_and_counts():
+    rows = [
+        ["+1 650 253 0000", "Ada", "Lovelace", "ada@example.com", "gold"],
+        ["", "No", "Number", "", ""],
+        ["12", "Bad", "Number", "", ""],
+        ["+44 20 7031 3000", "Alan", "", "", ""],
+        ["4155552672"],  # short row: no name
+    ]
+    leads, invalid, mismatches = normalize_chunk(HEADER, rows, "US", "America/New_York")
+
+    assert [lead["e164"] for lead in leads] == ["+16502530000", "+442070313000"]
+    assert invalid == 3
+    assert mismatches == 1
+    assert leads[0]["name"] == "Ada"
+    assert leads[0]["custom_fields"] == {"Last Name": "Lovelace", "Plan": "gold"}
+    assert leads[1]["timezone"] == "Europe/London"
+
+
+class FakeLeads:
+    """insert_many against a unique (campaign_id, e164) index."""
+
+    def __init__(self, existing):
+        self.keys = set(existing)
+
+    def insert_many(self, docs, ordered=True):
+        errors = []
+        for index, doc in enumerate(docs):
+            key = (doc["campaign_id"], doc["e164"])
+            if key in self.keys:
+                errors.append({"index": index, "code": 11000})
+            else:
+                self.keys.add(key)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+        return SimpleNamespace(inserted_ids=list(range(len(docs))))
+
+
+def test_insert_leads_skips_numbers_already_in_campaign():
+    leads = FakeLeads({("c1", "+14155552671")})
+    docs = [{"campaign_id": "c1", "e164": "+14155552671"}, {"campaign_id": "c1", "e164": "+14155552672"},
+            {"campaign_id": "c2", "e164": "+14155552671"}]
+
+    assert insert_leads(leads, docs) == (2, 1)
+    assert insert_leads(leads, docs) == (0, 3)
+    assert insert_leads(leads, []) == (0, 0)
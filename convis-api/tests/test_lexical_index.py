@@ -0,0 +1,50 @@
+"""
+Unit tests for the BM25 index and reciprocal-rank fusion used by hybrid KB search
+"""
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.lexical_index import BM25Index, identifier_terms, reciprocal_rank_fusion, tokenize
+
+
+DOCS = [
+    "The Basic plan costs $19.99 per month and includes 500 minutes.",
+    "SKU VX-4471 is the wireless headset, warranty policy POL/2024/113.",
+    "SKU VX-4417 is the wired headset with a two year warranty.",
+    "Our support team is available from nine to five on weekdays.",
+]
+
+
+def test_tokenize_keeps_identifiers_and_parts():
+    terms = tokenize("Is VX-4471 covered by POL/2024/113?")
+    assert "vx-4471" in terms and "4471" in terms
+    assert "pol/2024/113" in terms and "is" not in terms
+
+
+def test_identifier_terms():
+    assert identifier_terms("How much is the Basic plan, 19.99 or SKU VX-4471?") == ["19.99", "vx-4471"]
+
+
+def test_exact_identifier_ranks_first():
+    rows, scores = BM25Index.build(DOCS).search("what is VX-4471", top_k=3)
+    assert rows[0] == 1
+    assert scores[0] > scores[1]
+
+
+def test_unmatched_documents_are_left_out():
+    rows, _ = BM25Index.build(DOCS).search("weekdays support", top_k=10)
+    assert list(rows) == [3]
+
+
+def test_round_trip_preserves_scores():
+    index = BM25Index.build(DOCS)
+    restored = BM25Index.from_dict(index.to_dict())
+    assert list(restored.scores("basic plan minutes")) == pytest.approx(list(index.scores("basic plan minutes")))
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert [row for row, _ in fused] == [1, 3, 2]
@@ -0,0 +1,33 @@
+"""
+The media entry point must not load the REST tier's routes and background services
+"""
+import subprocess
+
+import sys
+import os
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+API_ONLY_MODULES = [
+    "app.main",
+    "app.routes.ai_assistant",
+    "app.routes.campaigns",
+    "app.services.call_status_processor",
+    "app.services.campaign_dialer",
+    "app.services.campaign_export",
+    "app.services.campaign_scheduler",
+    "app.services.db_snapshot_sync",
+    "app.services.kb_ingestion",
+    "app.services.lead_import",
+]
+
+
+def test_media_tier_skips_api_only_modules():
+    # A fresh interpreter, so modules imported by other tests do not count
+    script = (
+        "import sys, app.media_main\n"
+        f"print('\\n'.join(m for m in {API_ONLY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == []
@@ -0,0 +1,51 @@
+"""
+Unit tests for packed embedding storage (pack_vectors / unpack_matrix)
+"""
+import pytest
+import numpy as np
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.packed_vectors import pack_vectors, unpack_matrix
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(3).standard_normal((50, 96)).astype(np.float32)
+
+
+def test_float32_round_trip_is_exact(embeddings):
+    docs = pack_vectors(embeddings)
+    assert len(docs[0]["packed"]) == 96 * 4
+    assert np.array_equal(unpack_matrix(docs), embeddings)
+
+
+@pytest.mark.parametrize("dtype,bytes_per_dim,tolerance", [("float16", 2, 1e-2), ("int8", 1, 3e-2)])
+def test_compact_dtypes_stay_close(embeddings, dtype, bytes_per_dim, tolerance):
+    docs = pack_vectors(embeddings, dtype)
+    assert len(docs[0]["packed"]) == 96 * bytes_per_dim
+    assert ("scale" in docs[0]) == (dtype == "int8")
+    matrix = unpack_matrix(docs)
+    assert matrix.dtype == np.float32
+    # Relative error per row
+    error = np.linalg.norm(matrix - embeddings, axis=1) / np.linalg.norm(embeddings, axis=1)
+    assert error.max() < tolerance
+
+
+def test_mixed_and_legacy_documents_keep_their_order(embeddings):
+    docs = pack_vectors(embeddings[:2], "int8") + [{"vector": embeddings[2].tolist()}] + pack_vectors(embeddings[3:5], "float32")
+    matrix = unpack_matrix(docs)
+    assert matrix.shape == (5, 96)
+    assert np.allclose(matrix[2], embeddings[2])
+    assert np.array_equal(matrix[3:5], embeddings[3:5])
+    assert np.allclose(matrix[:2], embeddings[:2], atol=0.05)
+
+
+def test_rejects_mismatched_dimensions(embeddings):
+    docs = pack_vectors(embeddings[:1]) + pack_vectors(embeddings[:1, :32])
+    with pytest.raises(ValueError):
+        unpack_matrix(docs)
+    with pytest.raises(ValueError):
+        pack_vectors(embeddings, "float64")
@@ -0,0 +1,110 @@
+"""
+Unit tests for page-level PDF extraction (classification, selective OCR, file-hash cache)
+"""
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+fitz = pytest.importorskip("fitz")
+
+from app.utils import pdf_extraction
+from app.utils.pdf_extraction import PdfExtractor
+
+
+def make_pdf(path):
+    """Three pages: text layer, scanned (image only), blank"""
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Our opening hours are nine to five, Monday to Friday.")
+
+    scan = fitz.open()
+    scan.new_page().insert_text((72, 72), "Scanned price list")
+    pixmap = scan[0].get_pixmap()
+    doc.new_page().insert_image(fitz.Rect(0, 0, 300, 300), pixmap=pixmap)
+
+    doc.new_page()
+    doc.save(str(path))
+
+
+def make_scanned_pdf(path, pages):
+    """Image-only pages (every one needs OCR)"""
+    scan = fitz.open()
+    scan.new_page().insert_text((72, 72), "Scanned page")
+    pixmap = scan[0].get_pixmap()
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page().insert_image(fitz.Rect(0, 0, 300, 300), pixmap=pixmap)
+    doc.save(str(path))
+
+
+@pytest.fixture
+def extractor(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_ocr(file_path, page_number, zoom, timeout):
+        calls.append(page_number)
+        return {"text": "Scanned price list", "error": None}
+
+    extractor = PdfExtractor(cache_path=str(tmp_path / "cache"), workers=1)
+    monkeypatch.setattr(pdf_extraction, "ocr_page", fake_ocr)
+    monkeypatch.setattr(extractor, "_get_pool", lambda: ThreadPoolExecutor(max_workers=1))
+    return extractor, calls
+
+
+def test_only_image_pages_are_ocrd(extractor, tmp_path):
+    extractor, calls = extractor
+    make_pdf(tmp_path / "mixed.pdf")
+
+    pages = extractor.extract(str(tmp_path / "mixed.pdf"))
+
+    assert [page["kind"] for page in pages] == ["text", "ocr", "empty"]
+    assert calls == [1]
+    assert "opening hours" in pages[0]["text"]
+    assert pages[1]["text"] == "Scanned price list"
+
+
+def test_second_extraction_served_from_cache(extractor, tmp_path):
+    extractor, calls = extractor
+    make_pdf(tmp_path / "mixed.pdf")
+
+    first = extractor.extract(str(tmp_path / "mixed.pdf"))
+    second = extractor.extract(str(tmp_path / "mixed.pdf"))
+
+    assert second == first
+    assert calls == [1]
+    assert extractor.stats()["cache_hits"] == 1
+
+
+def test_failed_ocr_pages_are_not_cached(extractor, tmp_path, monkeypatch):
+    extractor, _ = extractor
+    monkeypatch.setattr(pdf_extraction, "ocr_page", lambda *args: {"text": "", "error": "timeout"})
+    make_pdf(tmp_path / "mixed.pdf")
+
+    pages = extractor.extract(str(tmp_path / "mixed.pdf"))
+
+    assert pages[1]["error"] == "timeout"
+    assert not (tmp_path / "cache").exists()
+
+
+def test_pages_are_yielded_before_the_rest_is_ocrd(extractor, tmp_path):
+    extractor, calls = extractor
+    make_scanned_pdf(tmp_path / "scan.pdf", 4)
+
+    pages = extractor.iter_pages(str(tmp_path / "scan.pdf"))
+    assert next(pages)["page"] == 0
+    assert calls == [0]
+    assert [page["page"] for page in pages] == [1, 2, 3]
+    assert calls == [0, 1, 2, 3]
+
+
+def test_resumed_extraction_starts_at_the_requested_page(extractor, tmp_path):
+    extractor, calls = extractor
+    make_scanned_pdf(tmp_path / "scan.pdf", 4)
+
+    pages = list(extractor.iter_pages(str(tmp_path / "scan.pdf"), start_page=2))
+
+    assert [page["page"] for page in pages] == [2, 3]
+    assert calls == [2, 3]
+    assert not (tmp_path / "cache").exists()  # partial pass, nothing to cache
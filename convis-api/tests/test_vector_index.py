@@ -0,0 +1,66 @@
+"""
+Unit tests for VectorIndex (vectorized cosine top-k)
+"""
+import pytest
+import numpy as np
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.vector_index import VectorIndex
+
+
+class TestVectorIndex:
+    """Test suite for VectorIndex"""
+
+    @pytest.fixture
+    def embeddings(self):
+        return np.random.default_rng(7).standard_normal((500, 64)).astype(np.float32)
+
+    def brute_force(self, embeddings, query, k):
+        unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        scores = unit @ (query / np.linalg.norm(query))
+        order = np.argsort(-scores)[:k]
+        return order, scores[order]
+
+    def test_float32_matches_brute_force(self, embeddings):
+        query = embeddings[42] + 0.1
+        indices, similarities = VectorIndex(embeddings).search(query, top_k=5)
+        expected_indices, expected_scores = self.brute_force(embeddings, query, 5)
+
+        assert list(indices) == list(expected_indices)
+        assert np.allclose(similarities, expected_scores, atol=1e-5)
+
+    def test_batch_matches_single_queries(self, embeddings):
+        index = VectorIndex(embeddings)
+        queries = embeddings[:4] * 3.0
+        batch_indices, batch_scores = index.search_batch(queries, top_k=3)
+
+        for row, query in enumerate(queries):
+            indices, scores = index.search(query, top_k=3)
+            assert list(batch_indices[row]) == list(indices)
+            assert np.allclose(batch_scores[row], scores)
+
+    @pytest.mark.parametrize("dtype,tolerance", [("float16", 2e-3), ("int8", 2e-2)])
+    def test_compact_dtypes_approximate_scores(self, embeddings, dtype, tolerance):
+        query = embeddings[10]
+        index = VectorIndex(embeddings, dtype=dtype)
+        indices, similarities = index.search(query, top_k=1)
+
+        assert indices[0] == 10
+        assert similarities[0] == pytest.approx(1.0, abs=tolerance)
+        assert index.nbytes < VectorIndex(embeddings).nbytes
+
+    def test_top_k_larger_than_index(self):
+        indices, similarities = VectorIndex([[1.0, 0.0], [0.0, 1.0]]).search([1.0, 0.0], top_k=10)
+        assert list(indices) == [0, 1]
+        assert similarities[0] == pytest.approx(1.0)
+
+    def test_empty_index(self):
+        indices, similarities = VectorIndex([]).search([1.0, 0.0], top_k=3)
+        assert len(indices) == 0 and len(similarities) == 0
+
+    def test_rejects_dimension_mismatch(self, embeddings):
+        with pytest.raises(ValueError):
+            VectorIndex(embeddings).search([1.0, 0.0], top_k=1)